@@ -326,6 +326,9 @@ class AutocompleteCache {
                 limit: options.limit || 20,
                 source: options.source || 'danbooru'
             });
+            if (options.session) {
+                params.set('session', options.session);
+            }
 
             const response = await fetch(`${apiEndpoint}?${params}`, {
                 method: 'GET',
@@ -341,6 +344,11 @@ class AutocompleteCache {
 
             const suggestions = await response.json();
 
+            // 被同一输入框的新查询取代：空结果不代表没有匹配，不缓存
+            if (response.headers.get('X-Autocomplete-Superseded')) {
+                return [];
+            }
+
             // 验证响应数据
             if (!Array.isArray(suggestions)) {
                 logger.warn('[AutocompleteCache] API返回的数据格式不正确');
@@ -32,6 +32,8 @@ class AutocompleteUI {
         this.debounceTimer = null;
         this.lastQuery = '';
         this.querySequence = 0; // 查询序列号，用于处理异步查询顺序问题
+        // 输入框会话ID：同一输入框的新查询会让服务端放弃等待旧的远程查询
+        this.sessionId = crypto.randomUUID ? crypto.randomUUID() : 'ac_' + Math.random().toString(36).slice(2, 12);
 
         // 初始化
         this.init();
@@ -240,7 +242,8 @@ class AutocompleteUI {
                 // 英文补全
                 suggestions = await globalAutocompleteCache.getAutocompleteSuggestions(query, {
                     limit: this.maxSuggestions,
-                    source: this.source
+                    source: this.source,
+                    session: this.sessionId
                 });
             }
 
@@ -0,0 +1,28 @@
+/**
+ * Save Image Plus WebSocket Listener
+ * 后台写入图像失败时显示 toast（节点此时已经返回）
+ */
+
+import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
+import { globalToastManager } from "./toast_manager.js";
+
+import { createLogger } from '../global/logger_client.js';
+
+// 创建logger实例
+const logger = createLogger('save_image_plus_listener');
+
+app.registerExtension({
+    name: "danbooru_gallery.save_image_plus_listener",
+
+    async setup() {
+        api.addEventListener("save_image_plus_error", (event) => {
+            const { filename, error } = event.detail;
+            logger.error('[保存图像] 后台写入失败:', filename, error);
+
+            if (typeof globalToastManager !== 'undefined' && globalToastManager.showToast) {
+                globalToastManager.showToast(`保存图像失败: ${filename} (${error})`, 'error', 0);
+            }
+        });
+    }
+});
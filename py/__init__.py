@@ -27,6 +27,36 @@ except Exception as e:
     import traceback
     traceback.print_exc()
 
+# 节点性能分析（默认关闭，见 config.json 的 profiling 段）
+try:
+    from .metadata_collector.node_profiler import load_profiler_config, setup_node_profiler_api
+
+    load_profiler_config()
+    setup_node_profiler_api()
+
+except Exception as e:
+    print(f"[Danbooru Gallery] Warning: Node profiler registration failed: {e}")
+
+# 元数据内存保留策略（见 config.json 的 metadata_retention 段）
+try:
+    from .metadata_collector.retention import load_retention_config, setup_metadata_retention_api
+
+    load_retention_config()
+    setup_metadata_retention_api()
+
+except Exception as e:
+    print(f"[Danbooru Gallery] Warning: Metadata retention setup failed: {e}")
+
+# 模型哈希后台预计算（见 config.json 的 model_prehash 段）
+try:
+    from .save_image_plus.prehasher import setup_model_prehash_api, start_model_prehasher
+
+    setup_model_prehash_api()
+    start_model_prehasher()
+
+except Exception as e:
+    print(f"[Danbooru Gallery] Warning: Model pre-hashing setup failed: {e}")
+
 # 注册配置管理API
 try:
     from .utils.config_api import setup_config_api
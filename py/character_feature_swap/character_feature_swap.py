@@ -8,6 +8,8 @@ from aiohttp import web
 import traceback
 import asyncio
 from ..utils.logger import get_logger
+from ..shared.translation.translation_store import get_translation_store
+from ..utils.response_cache import JsonResponseCache
 
 logger = get_logger(__name__)
 
@@ -509,46 +511,18 @@ async def test_llm_response(request):
         return web.json_response({"success": False, "error": f"未知错误: {e}"}, status=500)
 
 # API to get all tags
+_all_tags_response_cache = JsonResponseCache("character_swap/get_all_tags")
+
 @PromptServer.instance.routes.get("/character_swap/get_all_tags")
 async def get_all_tags(request):
-    """提供所有可用的标签给前端，优先使用JSON，失败则回退到CSV"""
-    zh_cn_dir = os.path.join(PLUGIN_DIR, "..", "danbooru_gallery", "zh_cn")
-    json_file = os.path.join(zh_cn_dir, "all_tags_cn.json")
-    csv_file = os.path.join(zh_cn_dir, "danbooru.csv")
-    
-    tags_data = {}
-
-    # 1. 尝试加载 JSON 文件
-    if os.path.exists(json_file):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                tags_data = json.load(f)
-            if isinstance(tags_data, dict) and tags_data:
-                return web.json_response(tags_data)
-        except Exception as e:
-            logger.warning(f"加载 all_tags_cn.json 失败: {e}。尝试回退到 CSV。")
-            tags_data = {} # 重置以确保从CSV加载
-
-    # 2. 如果JSON加载失败或文件不存在，尝试加载 CSV 文件
-    if not tags_data and os.path.exists(csv_file):
-        try:
-            import csv
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                # 假设CSV格式是: 英文标签,中文翻译
-                for row in reader:
-                    if len(row) >= 2:
-                        tags_data[row[0]] = row[1]
-            if tags_data:
-                return web.json_response(tags_data)
-        except Exception as e:
-            logger.error(f"加载 danbooru.csv 也失败了: {e}")
-
-    # 3. 如果两者都失败
-    if not tags_data:
+    """提供所有可用的标签给前端（共享翻译数据：优先JSON，失败则回退到CSV）"""
+    store = get_translation_store(wait=False)
+    if store is None:
+        return web.json_response({"error": "Tag data is still loading."}, status=503)
+    if not store.all_tags:
         return web.json_response({"error": "Tag files not found or are invalid."}, status=404)
-    
-    return web.json_response({"error": "An unknown error occurred while loading tags."}, status=500)
+    # 以数据源指纹作为版本：编码/压缩只做一次，浏览器凭ETag获得304
+    return await _all_tags_response_cache.respond(request, store.fingerprint, lambda: dict(store.all_tags))
 
 class CharacterFeatureSwapNode:
     """
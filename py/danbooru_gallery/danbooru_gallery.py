@@ -13,7 +13,6 @@ import urllib.parse
 import numpy as np
 from PIL import Image
 import os
-import csv
 import re
 from requests.auth import HTTPBasicAuth
 import urllib3
@@ -22,8 +21,13 @@ import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from ..utils.logger import get_logger
 from .site_adapters import get_site_adapter
-from .site_clients import DanbooruHttpClient, GelbooruHttpClient
+from .site_clients import CircuitOpenError, DanbooruHttpClient, GelbooruHttpClient
 from .post_cache import get_gallery_post_cache
+from ..shared.cache.remote_autocomplete import AutocompleteSuperseded, get_remote_autocomplete_coordinator
+from ..shared.translation.translation_store import (
+    get_translation_store,
+    start_background_load as start_translation_store_load,
+)
 from functools import partial
 
 logger = get_logger(__name__)
@@ -88,6 +92,8 @@ def _response_excerpt(response, limit=500):
 
 
 def _classify_request_exception(exc):
+    if isinstance(exc, CircuitOpenError):
+        return "circuit_open"
     if isinstance(exc, requests.exceptions.Timeout):
         return "timeout"
     if isinstance(exc, requests.exceptions.SSLError):
@@ -116,6 +122,9 @@ def build_gallery_error_payload(source, action, exc=None, response=None, message
     elif category == "ssl":
         status_title = "SSL 连接失败"
         status_advice = "证书校验或 HTTPS 握手失败，常见于代理、抓包工具或系统证书异常。"
+    elif category == "circuit_open":
+        status_title = "熔断保护中"
+        status_advice = f"该站点连续请求失败，已暂停访问，约 {int(exc.retry_in) + 1} 秒后后台会自动探测恢复。"
 
     if retries_exhausted:
         summary = f"{site_name} {action}失败：已达到最大尝试次数，最后一次结果是{status_title}。"
@@ -187,8 +196,35 @@ def _gelbooru_request(method, url, request_kind="api", display_all=False, force_
     )
 
 
+def _site_circuit_open(source, url, request_kind="api"):
+    """True while the site's circuit breaker refuses requests to url"""
+    try:
+        if source == "gelbooru":
+            _gelbooru_client.check_circuit(url, request_kind)
+        else:
+            # Every Danbooru request goes through its "api" breaker
+            _danbooru_client.check_circuit(url)
+    except CircuitOpenError:
+        return True
+    return False
+
+
 async def _run_http_request(request_func, *args, **kwargs):
-    """Run a synchronous site client without blocking aiohttp's event loop."""
+    """Run a synchronous site client without blocking aiohttp's event loop.
+
+    Direct site requests wait for their rate-limit slot on the event loop,
+    so throttled requests do not hold executor threads while they queue;
+    an open circuit fails them before they queue at all.
+    """
+    if request_func is _danbooru_request:
+        _danbooru_client.check_circuit(args[1])
+        await _danbooru_client.acquire()
+        kwargs["limiter_acquired"] = True
+    elif request_func is _gelbooru_request:
+        request_kind = kwargs.get("request_kind", "api")
+        _gelbooru_client.check_circuit(args[1], request_kind)
+        await _gelbooru_client.acquire(request_kind)
+        kwargs["limiter_acquired"] = True
     loop = asyncio.get_running_loop()
     return await loop.run_in_executor(None, partial(request_func, *args, **kwargs))
 
@@ -217,6 +253,8 @@ def load_settings():
         "cache_enabled": True,
         "max_cache_age": 3600,
         "persistent_post_cache_age": 2592000,
+        "circuit_failure_threshold": 5,
+        "circuit_open_seconds": 30,
         "default_page_size": 20,
         "autocomplete_enabled": True,
         "tooltip_enabled": True,
@@ -245,7 +283,9 @@ def load_autocomplete_config():
         "offline_mode": {
             "enabled": True,
             "fallback_to_remote": True,
-            "remote_timeout_ms": 2000  # 2秒超时
+            "remote_timeout_ms": 2000,  # 2秒超时
+            "remote_cache_ttl_hours": 168,  # 远程结果本地缓存 7 天
+            "remote_negative_ttl_hours": 24  # 空结果缓存 1 天
         },
         "cache": {
             "use_database_query": True
@@ -281,11 +321,30 @@ def save_settings(settings):
     try:
         with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
             json.dump(settings, f, ensure_ascii=False, indent=2)
+        apply_circuit_breaker_settings(settings)
         return True
     except Exception as e:
         logger.error(f"保存设置失败: {e}")
         return False
 
+
+def apply_circuit_breaker_settings(settings=None):
+    """把熔断阈值设置应用到两个站点客户端"""
+    settings = settings or load_settings()
+    try:
+        options = {
+            "failure_threshold": max(1, int(settings.get("circuit_failure_threshold", 5))),
+            "open_seconds": max(1.0, float(settings.get("circuit_open_seconds", 30))),
+        }
+    except (TypeError, ValueError):
+        logger.warning("熔断设置无效，继续使用默认值")
+        return
+    for client in (_danbooru_client, _gelbooru_client):
+        client.breakers.configure(**options)
+
+
+apply_circuit_breaker_settings()
+
 def load_user_auth():
     """从统一设置文件加载用户认证信息"""
     settings = load_settings()
@@ -398,147 +457,60 @@ def save_ui_settings(ui_settings):
 # ================================
 
 class TagTranslationSystem:
-    """Tag翻译系统，负责加载、处理和查询汉化数据"""
+    """Tag翻译系统，查询进程级共享的 TranslationStore，自身只保留查询缓存"""
     
-    def __init__(self):
-        self.en_to_cn = {}  # 英文->中文映射
-        self.cn_to_en = {}  # 中文->英文映射
-        self.cn_search_index = {}  # 中文搜索索引
-        self.loaded = False
+    def __init__(self, zh_cn_dir=None):
+        self.zh_cn_dir = zh_cn_dir or os.path.join(PLUGIN_DIR, "zh_cn")
+        self.store = None  # 共享的只读翻译数据，加载完成前为None
         self._translation_cache = {}  # 翻译缓存
         self._search_cache = {}  # 搜索缓存
         self.max_cache_size = 1000  # 最大缓存条目数
-        
-    def load_translation_data(self):
-        """加载所有汉化数据文件"""
-        if self.loaded:
-            return True
-            
-        try:
-            zh_cn_dir = os.path.join(PLUGIN_DIR, "zh_cn")
-            
-            # 加载JSON格式数据
-            self._load_json_data(zh_cn_dir)
-            # 加载CSV格式数据
-            self._load_csv_data(zh_cn_dir)
-            # 加载角色CSV数据
-            self._load_character_csv_data(zh_cn_dir)
-            
-            # 构建下划线匹配映射
-            self._build_underscore_variants()
-            # 构建中文搜索索引
-            self._build_chinese_search_index()
-            
-            self.loaded = True
-            return True
-            
-        except Exception as e:
-            logger.error(f"[翻译系统] 加载失败: {e}")
-            return False
     
-    def _load_json_data(self, zh_cn_dir):
-        """加载JSON格式的翻译数据"""
-        json_file = os.path.join(zh_cn_dir, "all_tags_cn.json")
-        if os.path.exists(json_file):
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for en_tag, cn_tag in data.items():
-                        if en_tag and cn_tag:
-                            self.en_to_cn[en_tag.strip()] = cn_tag.strip()
-                            self.cn_to_en[cn_tag.strip()] = en_tag.strip()
-            except Exception as e:
-                logger.error(f"[翻译系统] JSON加载失败: {e}")
+    @property
+    def loaded(self):
+        return self.store is not None
     
-    def _load_csv_data(self, zh_cn_dir):
-        """加载CSV格式的翻译数据"""
-        csv_file = os.path.join(zh_cn_dir, "danbooru.csv")
-        if os.path.exists(csv_file):
-            try:
-                with open(csv_file, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    count = 0
-                    for row in reader:
-                        if len(row) >= 2 and row[0] and row[1]:
-                            en_tag = row[0].strip()
-                            cn_tag = row[1].strip()
-                            # 如果已存在翻译，跳过（保持第一个找到的）
-                            if en_tag not in self.en_to_cn:
-                                self.en_to_cn[en_tag] = cn_tag
-                            if cn_tag not in self.cn_to_en:
-                                self.cn_to_en[cn_tag] = en_tag
-                            count += 1
-            except Exception as e:
-                logger.error(f"[翻译系统] CSV加载失败: {e}")
+    @property
+    def en_to_cn(self):
+        return self.store.en_to_cn if self.store else {}
     
-    def _load_character_csv_data(self, zh_cn_dir):
-        """加载角色CSV格式的翻译数据（格式：中文名称,英文tag）"""
-        csv_file = os.path.join(zh_cn_dir, "wai_characters.csv")
-        if os.path.exists(csv_file):
-            try:
-                with open(csv_file, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    count = 0
-                    for row in reader:
-                        if len(row) >= 2 and row[0] and row[1]:
-                            cn_tag = row[0].strip()
-                            en_tag = row[1].strip()
-                            # 如果已存在翻译，跳过（保持第一个找到的）
-                            if en_tag not in self.en_to_cn:
-                                self.en_to_cn[en_tag] = cn_tag
-                            if cn_tag not in self.cn_to_en:
-                                self.cn_to_en[cn_tag] = en_tag
-                            count += 1
-            except Exception as e:
-                logger.error(f"[翻译系统] 角色CSV加载失败: {e}")
+    @property
+    def cn_to_en(self):
+        return self.store.cn_to_en if self.store else {}
     
-    def _build_underscore_variants(self):
-        """构建下划线变体映射，处理有无下划线的匹配问题"""
-        variants_to_add = {}
-        
-        for en_tag, cn_tag in list(self.en_to_cn.items()):
-            # 为有下划线的tag生成无下划线版本
-            if '_' in en_tag:
-                no_underscore = en_tag.replace('_', '')
-                if no_underscore not in self.en_to_cn:
-                    variants_to_add[no_underscore] = cn_tag
-            
-            # 为无下划线的tag生成可能的下划线版本（基于常见模式）
-            else:
-                # 在数字和字母之间添加下划线 (如: 1girl -> 1_girl)
-                with_underscore = re.sub(r'(\d)([a-zA-Z])', r'\1_\2', en_tag)
-                if with_underscore != en_tag and with_underscore not in self.en_to_cn:
-                    variants_to_add[with_underscore] = cn_tag
-        
-        # 添加变体到主字典
-        self.en_to_cn.update(variants_to_add)
+    @property
+    def cn_search_index(self):
+        return self.store.cn_search_index if self.store else {}
     
-    def _build_chinese_search_index(self):
-        """构建中文搜索索引，支持部分匹配"""
-        for cn_tag in self.cn_to_en.keys():
-            # 为中文tag的每个字符建立索引
-            for i, char in enumerate(cn_tag):
-                if char not in self.cn_search_index:
-                    self.cn_search_index[char] = set()
-                self.cn_search_index[char].add(cn_tag)
-                
-                # 也为子字符串建立索引（2-3字符的组合）
-                for length in [2, 3]:
-                    if i + length <= len(cn_tag):
-                        substring = cn_tag[i:i + length]
-                        if substring not in self.cn_search_index:
-                            self.cn_search_index[substring] = set()
-                        self.cn_search_index[substring].add(cn_tag)
+    @property
+    def search_index(self):
+        return self.store.search_index if self.store else None
+    
+    @property
+    def load_stats(self):
+        return self.store.load_stats if self.store else {"source": None, "elapsed_ms": None}
         
-        # 转换set为list以便JSON序列化
-        for key in self.cn_search_index:
-            self.cn_search_index[key] = list(self.cn_search_index[key])
-            
+    def load_translation_data(self):
+        """阻塞加载共享翻译数据（已加载时直接返回）"""
+        if self.store is None:
+            self.store = get_translation_store(self.zh_cn_dir)
+        return self.store is not None
+    
+    def start_background_load(self):
+        """在后台线程加载翻译数据，避免阻塞插件导入"""
+        if self.store is None:
+            start_translation_store_load(self.zh_cn_dir)
+    
+    def ensure_loaded(self):
+        """数据就绪返回True；后台加载进行中时不阻塞请求，直接返回False（路由降级为空结果）"""
+        if self.store is None:
+            self.store = get_translation_store(self.zh_cn_dir, wait=False)
+        return self.store is not None
     
     def translate_tag(self, en_tag):
         """翻译单个英文tag到中文"""
-        if not self.loaded:
-            self.load_translation_data()
+        if not self.ensure_loaded():
+            return None
         
         tag_key = en_tag.strip()
         
@@ -557,8 +529,8 @@ class TagTranslationSystem:
     
     def translate_tags_batch(self, en_tags):
         """批量翻译英文tags"""
-        if not self.loaded:
-            self.load_translation_data()
+        if not self.ensure_loaded():
+            return {}
         
         result = {}
         for tag in en_tags:
@@ -569,8 +541,8 @@ class TagTranslationSystem:
     
     def search_chinese_tags(self, query, limit=10):
         """搜索中文tag，返回匹配的中文tag及对应英文tag，支持模糊搜索"""
-        if not self.loaded:
-            self.load_translation_data()
+        if not self.ensure_loaded():
+            return []
         
         query = query.strip()
         if not query:
@@ -581,51 +553,13 @@ class TagTranslationSystem:
         if cache_key in self._search_cache:
             return self._search_cache[cache_key]
         
-        matches = {}  # 使用字典存储匹配结果和权重
-        
-        # 1. 精确匹配（权重10）
-        if query in self.cn_to_en:
-            matches[query] = 10
-        
-        # 2. 前缀匹配（权重8）
-        for cn_tag in self.cn_to_en.keys():
-            if cn_tag.startswith(query) and cn_tag not in matches:
-                matches[cn_tag] = 8
-        
-        # 3. 索引匹配（权重6）
-        if query in self.cn_search_index:
-            for cn_tag in self.cn_search_index[query]:
-                if cn_tag not in matches:
-                    matches[cn_tag] = 6
-        
-        # 4. 包含匹配（权重4）
-        for cn_tag in self.cn_to_en.keys():
-            if query in cn_tag and cn_tag not in matches:
-                matches[cn_tag] = 4
-        
-        # 5. 模糊匹配（权重2）- 支持字符顺序模糊匹配
-        if len(query) >= 2:
-            query_chars = set(query)
-            for cn_tag in self.cn_to_en.keys():
-                if cn_tag not in matches:
-                    tag_chars = set(cn_tag)
-                    # 如果查询字符的50%以上都在tag中，认为是模糊匹配
-                    if len(query_chars & tag_chars) / len(query_chars) >= 0.5:
-                        matches[cn_tag] = 2
-        
-        # 6. 部分字符匹配（权重1）
-        for char in query:
-            if char in self.cn_search_index:
-                for cn_tag in self.cn_search_index[char]:
-                    if cn_tag not in matches:
-                        matches[cn_tag] = 1
-        
-        # 按权重和长度排序
-        sorted_matches = sorted(matches.items(), key=lambda x: (-x[1], len(x[0])))
+        # 前缀/包含/模糊匹配均由索引完成，排序与原线性扫描完全一致
+        # 权重：精确10、前缀8、索引6、包含4、模糊2、部分字符1
+        sorted_matches = self.search_index.search(query, limit)
         
         # 转换为结果格式并限制数量
         results = []
-        for cn_tag, weight in sorted_matches[:limit]:
+        for cn_tag, weight in sorted_matches:
             en_tag = self.cn_to_en.get(cn_tag)
             if en_tag:
                 results.append({
@@ -645,15 +579,13 @@ translation_system = TagTranslationSystem()
 
 # 预加载翻译数据
 def preload_translation_data():
-    """预加载翻译数据，在服务器启动时调用"""
+    """预加载翻译数据，在服务器启动时调用（后台线程，不阻塞插件导入）"""
     try:
-        success = translation_system.load_translation_data()
-        if not success:
-            logger.warning("[翻译系统] 预加载失败")
+        translation_system.start_background_load()
     except Exception as e:
         logger.error(f"[翻译系统] 预加载异常: {e}")
 
-# 在模块加载时预加载翻译数据
+# 在模块加载时启动后台预加载
 preload_translation_data()
 
 def check_network_connection(source="danbooru"):
@@ -1309,6 +1241,8 @@ def _fetch_gelbooru_public_posts(
                     _log_gelbooru_retry_warning(f"重试仍限流({response.status_code})，跳过本页", pid_value=_pid)
                     return None
                 return response
+            except CircuitOpenError:
+                raise
             except requests.exceptions.RequestException as exc:
                 _log_gelbooru_retry_warning(f"网络异常: {exc}", pid_value=_pid)
                 return None
@@ -1322,7 +1256,13 @@ def _fetch_gelbooru_public_posts(
             params = adapter.build_public_posts_params(tags, limit, cur_page, rating_query)
             params["pid"] = pid_value
 
-            list_response = _get_list_page(params, pid_value)
+            try:
+                list_response = _get_list_page(params, pid_value)
+            except CircuitOpenError as exc:
+                # 熔断中：后续页同样会立即失败，只放一个错误占位
+                payload = build_gallery_error_payload(adapter.key, "公开页抓取", exc=exc)
+                all_refs.append({**payload, "pid": pid_value, "page": cur_page})
+                break
             if list_response is None:
                 payload = build_gallery_error_payload(
                     adapter.key,
@@ -1475,6 +1415,9 @@ async def image_proxy(request):
                     headers=_image_proxy_headers_for_host(host),
                     timeout=15,
                 )
+        except CircuitOpenError as e:
+            return web.Response(status=503, text="upstream circuit open",
+                                headers={"Retry-After": str(int(e.retry_in) + 1)})
         except requests.exceptions.RequestException as e:
             logger.warning(f"[ImageProxy] 上游请求失败 {url}: {e}")
             return web.Response(status=502, text="upstream error")
@@ -1543,6 +1486,181 @@ async def get_posts_for_front(request):
         "Expires": "0"
     })
 
+# Where autocomplete answers came from; remote_fallbacks / requests is the
+# share of keystrokes that still wait on the network
+AUTOCOMPLETE_STATS = {
+    "requests": 0, "local_hits": 0, "alias_hits": 0, "remote_cache_hits": 0, "remote_fallbacks": 0,
+}
+# Marks the empty answer to a request a newer keystroke replaced; clients drop it
+SUPERSEDED_HEADERS = {"X-Autocomplete-Superseded": "1"}
+
+
+def _format_local_autocomplete(db_results):
+    """Local DB rows -> autocomplete items, counting the hit"""
+    AUTOCOMPLETE_STATS["local_hits"] += 1
+    formatted_results = []
+    for tag in db_results:
+        item = {
+            'name': tag['tag'],
+            'category': tag['category'],
+            'post_count': tag['post_count'],
+            'translation': tag.get('translation_cn'),
+            'aliases': tag.get('aliases', [])
+        }
+        if tag.get('matched_alias'):
+            # 用户输入的是别名，返回规范标签
+            item['matched_alias'] = tag['matched_alias']
+        formatted_results.append(item)
+    if any('matched_alias' in item for item in formatted_results):
+        AUTOCOMPLETE_STATS["alias_hits"] += 1
+    return formatted_results
+
+
+async def _fetch_remote_autocomplete(adapter, query, limit, offline_config, log_tag, session=None,
+                                     sort_by_post_count=False):
+    """
+    第2层：远程自动补全，经过按站点区分的本地写回缓存
+
+    Answers (including empty ones) are stored in the tag database with a TTL,
+    so a rare prefix goes to the network once instead of on every keystroke
+    and every session. Lookups go through the remote autocomplete
+    coordinator: a newer query from the same session (input field)
+    supersedes this one, and in-flight answers are shared.
+
+    Cached and shared answers keep the site's order. sort_by_post_count
+    returns an authenticated answer sorted by post count in a new list;
+    public Gelbooru answers are never re-sorted.
+
+    Returns:
+        Result list, or None when the remote call failed
+
+    Raises:
+        AutocompleteSuperseded: A newer query for the same session arrived
+    """
+    credentials = get_site_credentials(adapter)
+    public = not has_required_site_credentials(adapter, credentials)
+    if public and adapter.key != "gelbooru":
+        logger.warning(f"[{adapter.key}] 缺少必要认证信息，已跳过自动补全请求")
+        return []
+    # Public Gelbooru autocomplete2 answers differently from the API, cache it apart
+    cache_source = f"{adapter.key}_public" if public else adapter.key
+
+    async def fetch():
+        return await _query_remote_autocomplete(
+            adapter, query, limit, offline_config, log_tag, credentials, public, cache_source
+        )
+
+    result = await get_remote_autocomplete_coordinator().lookup(cache_source, query, limit, fetch, session)
+    if sort_by_post_count and not public and result is not None:
+        # 排序确保按热度排列（共享结果不原地修改）
+        result = sorted(result, key=lambda x: x.get('post_count', 0), reverse=True)
+    return result
+
+
+async def _query_remote_autocomplete(adapter, query, limit, offline_config, log_tag,
+                                                   credentials, public, cache_source):
+    """Write-through cache lookup, then the remote call"""
+    db = get_db_manager() if get_db_manager else None
+    if db is not None:
+        try:
+            cached = await db.get_remote_autocomplete(cache_source, query, limit)
+        except Exception as e:
+            logger.debug(f"[{log_tag}] 远程缓存读取失败: {e}")
+            cached = None
+        if cached is not None:
+            AUTOCOMPLETE_STATS["remote_cache_hits"] += 1
+            logger.debug(f"[{log_tag}] 远程缓存命中({cache_source}): '{query}' -> {len(cached)}条结果")
+            return cached
+
+    AUTOCOMPLETE_STATS["remote_fallbacks"] += 1
+    timeout = offline_config.get('remote_timeout_ms', 2000) / 1000.0
+    try:
+        tags_url = adapter.tags_url
+        if public:
+            logger.info("[Gelbooru] 未配置 User ID/API Key，改用公开 autocomplete2")
+            params = adapter.build_public_autocomplete_params(query, limit)
+            response = await _run_http_request(
+                _gelbooru_request,
+                "GET",
+                tags_url,
+                request_kind="api",
+                params=params,
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            result = adapter.normalize_public_autocomplete_response(response.json())
+        else:
+            params = adapter.apply_auth_params(adapter.build_autocomplete_params(query, limit), credentials)
+
+            username, api_key = load_user_auth()
+            auth = HTTPBasicAuth(username, api_key) if adapter.requires_auth and username and api_key else None
+
+            logger.debug(f"[{log_tag}] 调用远程API({adapter.key}): '{query}' (超时: {timeout}s)")
+            if adapter.key == "gelbooru":
+                response = await _run_http_request(
+                    _gelbooru_request,
+                    "GET",
+                    tags_url,
+                    request_kind="api",
+                    params=params,
+                    timeout=timeout,
+                )
+            else:
+                response = await _run_http_request(
+                    _danbooru_request,
+                    "GET",
+                    tags_url,
+                    params=params,
+                    auth=auth,
+                    timeout=timeout,
+                )
+            response.raise_for_status()
+            result = adapter.normalize_autocomplete_response(response.json())
+
+        logger.info(f"[{log_tag}] API查询成功({adapter.key}): '{query}' -> {len(result)}条结果")
+
+    except requests.Timeout:
+        logger.warning(f"[{log_tag}] 远程API超时 (>{timeout}s): '{query}'")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"[{log_tag}] 远程API失败: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"[{log_tag}] API调用错误: {e}")
+        return None
+
+    if db is not None:
+        try:
+            await db.put_remote_autocomplete(
+                cache_source, query, limit, result,
+                ttl=offline_config.get('remote_cache_ttl_hours', 168) * 3600,
+                negative_ttl=offline_config.get('remote_negative_ttl_hours', 24) * 3600,
+            )
+        except Exception as e:
+            logger.debug(f"[{log_tag}] 远程缓存写入失败: {e}")
+    return result
+
+
+@PromptServer.instance.routes.get("/danbooru_gallery/autocomplete_stats")
+async def get_autocomplete_stats(request):
+    """自动补全命中统计（本地 / 别名 / 远程回退）"""
+    stats = dict(AUTOCOMPLETE_STATS)
+    stats["remote_fallback_rate"] = round(stats["remote_fallbacks"] / stats["requests"], 4) if stats["requests"] else 0.0
+    stats["coordinator"] = get_remote_autocomplete_coordinator().get_status()
+    return web.json_response({"success": True, **stats})
+
+
+@PromptServer.instance.routes.get("/danbooru_gallery/rate_limits")
+async def get_rate_limits(request):
+    """各站点按请求类型的限速状态（当前速率、排队深度、等待时间、429次数）与熔断状态"""
+    return web.json_response({
+        "success": True,
+        "danbooru": _danbooru_client.get_limiter_stats(),
+        "gelbooru": _gelbooru_client.get_limiter_stats(),
+        "circuits": {**_danbooru_client.get_circuit_stats(), **_gelbooru_client.get_circuit_stats()},
+    })
+
+
 @PromptServer.instance.routes.get("/danbooru_gallery/autocomplete")
 async def get_autocomplete(request):
     """三层查询机制：数据库 → API → 空结果"""
@@ -1554,6 +1672,7 @@ async def get_autocomplete(request):
 
         if not query:
             return web.json_response([])
+        AUTOCOMPLETE_STATS["requests"] += 1
 
         # 加载配置
         config = load_autocomplete_config()
@@ -1566,16 +1685,7 @@ async def get_autocomplete(request):
 
                 if db_results:
                     # 数据库有结果，转换格式并返回
-                    formatted_results = [
-                        {
-                            'name': tag['tag'],
-                            'category': tag['category'],
-                            'post_count': tag['post_count'],
-                            'translation': tag.get('translation_cn'),
-                            'aliases': tag.get('aliases', [])
-                        }
-                        for tag in db_results
-                    ]
+                    formatted_results = _format_local_autocomplete(db_results)
                     logger.debug(f"[Autocomplete] 数据库查询成功: '{query}' -> {len(formatted_results)}条结果")
                     return web.json_response(formatted_results)
                 else:
@@ -1583,72 +1693,18 @@ async def get_autocomplete(request):
             except Exception as e:
                 logger.warning(f"[Autocomplete] 数据库查询失败: {e}，尝试API fallback")
 
-        # ✅ 第2层：Fallback到Danbooru API
+        # ✅ 第2层：远程缓存 → Fallback到站点API（结果写回本地缓存）
         if config['offline_mode'].get('fallback_to_remote', True):
             try:
-                timeout = config['offline_mode'].get('remote_timeout_ms', 2000) / 1000.0
-
-                tags_url = adapter.tags_url
-                params = adapter.build_autocomplete_params(query, limit)
-                credentials = get_site_credentials(adapter)
-                if not has_required_site_credentials(adapter, credentials):
-                    if adapter.key == "gelbooru":
-                        logger.info("[Gelbooru] 未配置 User ID/API Key，改用公开 autocomplete2")
-                        params = adapter.build_public_autocomplete_params(query, limit)
-                        response = await _run_http_request(
-                            _gelbooru_request,
-                            "GET",
-                            tags_url,
-                            request_kind="api",
-                            params=params,
-                            timeout=timeout,
-                        )
-                        response.raise_for_status()
-                        return web.json_response(adapter.normalize_public_autocomplete_response(response.json()))
-                    logger.warning(f"[{adapter.key}] 缺少必要认证信息，已跳过自动补全请求")
-                    return web.json_response([])
-                params = adapter.apply_auth_params(params, credentials)
-
-                username, api_key = load_user_auth()
-                auth = HTTPBasicAuth(username, api_key) if adapter.requires_auth and username and api_key else None
-
-                logger.debug(f"[Autocomplete] 调用远程API({adapter.key}): '{query}' (超时: {timeout}s)")
-                if adapter.key == "gelbooru":
-                    response = await _run_http_request(
-                        _gelbooru_request,
-                        "GET",
-                        tags_url,
-                        request_kind="api",
-                        params=params,
-                        timeout=timeout,
-                    )
-                else:
-                    response = await _run_http_request(
-                        _danbooru_request,
-                        "GET",
-                        tags_url,
-                        params=params,
-                        auth=auth,
-                        timeout=timeout,
-                    )
-                response.raise_for_status()
-
-                result = adapter.normalize_autocomplete_response(response.json())
-
-                # 排序确保按热度排列
-                if isinstance(result, list):
-                    result.sort(key=lambda x: x.get('post_count', 0), reverse=True)
-                    logger.info(f"[Autocomplete] API查询成功({adapter.key}): '{query}' -> {len(result)}条结果")
-
+                result = await _fetch_remote_autocomplete(
+                    adapter, query, limit, config['offline_mode'], "Autocomplete", request.query.get("session"),
+                    sort_by_post_count=True,
+                )
+            except AutocompleteSuperseded:
+                return web.json_response([], headers=SUPERSEDED_HEADERS)
+            if result is not None:
                 return web.json_response(result)
 
-            except requests.Timeout:
-                logger.warning(f"[Autocomplete] 远程API超时 (>{timeout}s): '{query}'")
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"[Autocomplete] 远程API失败: {e}")
-            except Exception as e:
-                logger.error(f"[Autocomplete] API调用错误: {e}")
-
         # ✅ 第3层：返回空结果
         logger.debug(f"[Autocomplete] 所有查询方式均无结果: '{query}'")
         return web.json_response([])
@@ -1804,7 +1860,8 @@ async def translate_tag_route(request):
         return web.json_response({
             "success": True,
             "tag": tag,
-            "translation": translation
+            "translation": translation,
+            "ready": translation_system.loaded
         })
     except Exception as e:
         logger.error(f"翻译tag接口错误: {e}")
@@ -1823,12 +1880,29 @@ async def translate_tags_batch_route(request):
         translations = translation_system.translate_tags_batch(tags)
         return web.json_response({
             "success": True,
-            "translations": translations
+            "translations": translations,
+            "ready": translation_system.loaded
         })
     except Exception as e:
         logger.error(f"批量翻译tags接口错误: {e}")
         return web.json_response({"success": False, "error": str(e)})
 
+@PromptServer.instance.routes.get("/danbooru_gallery/translation_status")
+async def translation_status_route(request):
+    """翻译数据加载状态与内存占用"""
+    try:
+        if not translation_system.ensure_loaded():
+            return web.json_response({"success": True, "ready": False})
+        return web.json_response({
+            "success": True,
+            "ready": True,
+            "load": translation_system.load_stats,
+            "memory": translation_system.store.memory_stats()
+        })
+    except Exception as e:
+        logger.error(f"翻译状态接口错误: {e}")
+        return web.json_response({"success": False, "error": str(e)})
+
 @PromptServer.instance.routes.get("/danbooru_gallery/search_chinese")
 async def search_chinese_route(request):
     """中文搜索匹配 - 优先使用FTS5数据库搜索"""
@@ -1878,7 +1952,8 @@ async def search_chinese_route(request):
             return web.json_response({
                 "success": True,
                 "query": query,
-                "results": results
+                "results": results,
+                "ready": translation_system.loaded
             })
         except Exception as e:
             logger.error(f"[SearchChinese] translation_system查询失败: {e}")
@@ -1902,6 +1977,7 @@ async def get_autocomplete_with_translation(request):
 
         if not query:
             return web.json_response([])
+        AUTOCOMPLETE_STATS["requests"] += 1
 
         # 加载配置
         config = load_autocomplete_config()
@@ -1914,16 +1990,7 @@ async def get_autocomplete_with_translation(request):
 
                 if db_results:
                     # 数据库有结果，转换格式（已包含translation_cn）
-                    formatted_results = [
-                        {
-                            'name': tag['tag'],
-                            'category': tag['category'],
-                            'post_count': tag['post_count'],
-                            'translation': tag.get('translation_cn'),
-                            'aliases': tag.get('aliases', [])
-                        }
-                        for tag in db_results
-                    ]
+                    formatted_results = _format_local_autocomplete(db_results)
                     logger.debug(f"[AutocompleteTranslation] 数据库查询成功: '{query}' -> {len(formatted_results)}条结果")
                     return web.json_response(formatted_results)
                 else:
@@ -1931,80 +1998,23 @@ async def get_autocomplete_with_translation(request):
             except Exception as e:
                 logger.warning(f"[AutocompleteTranslation] 数据库查询失败: {e}，尝试API fallback")
 
-        # ✅ 第2层：Fallback到Danbooru API（需要手动添加翻译）
+        # ✅ 第2层：远程缓存 → Fallback到站点API（需要手动添加翻译）
         if config['offline_mode'].get('fallback_to_remote', True):
             try:
-                timeout = config['offline_mode'].get('remote_timeout_ms', 2000) / 1000.0
-
-                tags_url = adapter.tags_url
-                params = adapter.build_autocomplete_params(query, limit)
-                credentials = get_site_credentials(adapter)
-                if not has_required_site_credentials(adapter, credentials):
-                    if adapter.key == "gelbooru":
-                        logger.info("[Gelbooru] 未配置 User ID/API Key，改用公开 autocomplete2")
-                        params = adapter.build_public_autocomplete_params(query, limit)
-                        response = await _run_http_request(
-                            _gelbooru_request,
-                            "GET",
-                            tags_url,
-                            request_kind="api",
-                            params=params,
-                            timeout=timeout,
-                        )
-                        response.raise_for_status()
-                        result = adapter.normalize_public_autocomplete_response(response.json())
-                        for tag_data in result:
-                            tag_name = tag_data.get('name', '')
-                            tag_data['translation'] = translation_system.translate_tag(tag_name)
-                        return web.json_response(result)
-                    logger.warning(f"[{adapter.key}] 缺少必要认证信息，已跳过带翻译自动补全请求")
-                    return web.json_response([])
-                params = adapter.apply_auth_params(params, credentials)
-
-                username, api_key = load_user_auth()
-                auth = HTTPBasicAuth(username, api_key) if adapter.requires_auth and username and api_key else None
-
-                logger.debug(f"[AutocompleteTranslation] 调用远程API({adapter.key}): '{query}' (超时: {timeout}s)")
-                if adapter.key == "gelbooru":
-                    response = await _run_http_request(
-                        _gelbooru_request,
-                        "GET",
-                        tags_url,
-                        request_kind="api",
-                        params=params,
-                        timeout=timeout,
-                    )
-                else:
-                    response = await _run_http_request(
-                        _danbooru_request,
-                        "GET",
-                        tags_url,
-                        params=params,
-                        auth=auth,
-                        timeout=timeout,
-                    )
-                response.raise_for_status()
-
-                result = adapter.normalize_autocomplete_response(response.json())
-
-                # 为每个tag添加翻译
-                if isinstance(result, list):
-                    for tag_data in result:
-                        tag_name = tag_data.get('name', '')
-                        translation = translation_system.translate_tag(tag_name)
-                        tag_data['translation'] = translation
-
-                    logger.info(f"[AutocompleteTranslation] API查询成功: '{query}' -> {len(result)}条结果")
-
+                result = await _fetch_remote_autocomplete(
+                    adapter, query, limit, config['offline_mode'], "AutocompleteTranslation",
+                    request.query.get("session")
+                )
+            except AutocompleteSuperseded:
+                return web.json_response([], headers=SUPERSEDED_HEADERS)
+            if result is not None:
+                # 为每个tag添加翻译（结果可能与其他请求共享，复制后再添加）
+                result = [
+                    dict(tag_data, translation=translation_system.translate_tag(tag_data.get('name', '')))
+                    for tag_data in result
+                ]
                 return web.json_response(result)
 
-            except requests.Timeout:
-                logger.warning(f"[AutocompleteTranslation] 远程API超时 (>{timeout}s): '{query}'")
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"[AutocompleteTranslation] 远程API失败: {e}")
-            except Exception as e:
-                logger.error(f"[AutocompleteTranslation] API调用错误: {e}")
-
         # ✅ 第3层：返回空结果
         logger.debug(f"[AutocompleteTranslation] 所有查询方式均无结果: '{query}'")
         return web.json_response([])
@@ -2019,14 +2029,14 @@ class DanbooruGalleryNode:
 
     @classmethod
     def _get_cached_posts(cls, cache_key, max_age):
+        """max_age=None 时返回任意年龄的缓存（熔断期间兜底用）；过期项由 _cache_posts 按容量淘汰"""
         with cls._post_cache_lock:
             cached = cls._post_cache.get(cache_key)
             if cached is None:
                 return None
             cached_data, timestamp = cached
-            if time.time() - timestamp < max_age:
+            if max_age is None or time.time() - timestamp < max_age:
                 return cached_data
-            cls._post_cache.pop(cache_key, None)
             return None
 
     @classmethod
@@ -2176,6 +2186,12 @@ class DanbooruGalleryNode:
         # 如果启用了缓存，则检查缓存
         if cache_enabled and not match:
             cached_data = DanbooruGalleryNode._get_cached_posts(cache_key, max_cache_age)
+            posts_kind = "public" if adapter.key == "gelbooru" and (force_public_detail or not has_gelbooru_creds) else "api"
+            if cached_data is None and _site_circuit_open(adapter.key, adapter.posts_url, posts_kind):
+                # 熔断期间不等超时，先用过期的缓存页
+                cached_data = DanbooruGalleryNode._get_cached_posts(cache_key, None)
+                if cached_data is not None:
+                    logger.info(f"[{adapter.key}] 站点熔断中，返回过期缓存: {cache_key}")
             if cached_data is not None:
                 if adapter.key == "gelbooru" and not force_public_detail:
                     try:
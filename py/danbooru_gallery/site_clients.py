@@ -2,12 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import re
 import threading
 import time
 import urllib.parse
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional, Tuple
 
 import requests
 
@@ -16,19 +17,340 @@ logger = logging.getLogger(__name__)
 SENSITIVE_QUERY_KEYS = {"api_key", "key", "login", "password", "token", "user_id"}
 
 
-class RateLimiter:
-    def __init__(self, min_interval_sec: float):
-        self.min_interval = min_interval_sec
-        self._last_ts = 0.0
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by threads and coroutines, with AIMD rate adaptation
+
+    Each caller reserves the next free slot under the lock and then sleeps
+    outside it, so waiters queue up concurrently instead of behind one
+    sleeping thread. Up to `burst` requests may go out back to back.
+
+    The rate grows additively while requests succeed (by about `increase`
+    requests/s for every second of traffic) up to `max_rate`, and is cut by
+    `decrease` on a 429/503, when every caller is also held until the
+    Retry-After delay has passed.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float = 1.0,
+        min_rate: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+    ):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.min_rate = rate / 8 if min_rate is None else min_rate
+        self.max_rate = rate if max_rate is None else max_rate
+        self.increase = increase
+        self.decrease = decrease
         self._lock = threading.Lock()
+        self._next_slot = 0.0  # theoretical send time of the next request
+        self._blocked_until = 0.0
+        self._waiting = 0
+        self._stats = {"acquired": 0, "throttled": 0, "max_queue_depth": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+    @property
+    def min_interval(self) -> float:
+        return 1.0 / self.rate if self.rate > 0 else 0.0
+
+    @min_interval.setter
+    def min_interval(self, value: float) -> None:
+        """Pin a fixed rate (0 disables limiting)"""
+        with self._lock:
+            self.rate = 1.0 / value if value > 0 else 0.0
+            self.min_rate = self.max_rate = self.rate
+
+    def _reserve(self) -> float:
+        """Claim the next slot and return how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate > 0:
+                interval = 1.0 / self.rate
+                start = max(now, self._next_slot - (self.burst - 1) * interval, self._blocked_until)
+                self._next_slot = max(self._next_slot, start) + interval
+            else:
+                start = max(now, self._blocked_until)
+            delay = start - now
+            stats = self._stats
+            stats["acquired"] += 1
+            stats["total_wait"] += delay
+            stats["max_wait"] = max(stats["max_wait"], delay)
+            if delay > 0:
+                self._waiting += 1
+                stats["max_queue_depth"] = max(stats["max_queue_depth"], self._waiting)
+            return delay
+
+    def _release(self) -> bool:
+        """Leave the queue; True if a pause that began meanwhile still holds us"""
+        with self._lock:
+            self._waiting -= 1
+            return time.monotonic() < self._blocked_until
 
     def wait(self) -> None:
+        """Block the calling thread until a request may be sent"""
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            try:
+                time.sleep(delay)
+            finally:
+                paused = self._release()
+            if not paused:
+                return
+
+    async def acquire(self) -> None:
+        """Wait on the event loop until a request may be sent"""
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                paused = self._release()
+            if not paused:
+                return
+
+    def on_success(self) -> None:
+        with self._lock:
+            if 0 < self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttled(self, retry_after: float) -> None:
+        """Back off after a 429/503: cut the rate and hold callers for retry_after"""
         with self._lock:
             now = time.monotonic()
-            elapsed = now - self._last_ts
-            if elapsed < self.min_interval:
-                time.sleep(self.min_interval - elapsed)
-            self._last_ts = time.monotonic()
+            self._stats["throttled"] += 1
+            # Requests already in flight when the first 429 arrived report
+            # the same episode; cut the rate once per pause
+            if now >= self._blocked_until and self.rate > 0:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            if self.rate > 0:
+                self._next_slot = max(self._next_slot, self._blocked_until + 1.0 / self.rate)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = self._stats
+            return {
+                "rate": round(self.rate, 3),
+                "base_rate": self.base_rate,
+                "queue_depth": self._waiting,
+                "max_queue_depth": stats["max_queue_depth"],
+                "acquired": stats["acquired"],
+                "throttled": stats["throttled"],
+                "avg_wait_ms": round(stats["total_wait"] * 1000 / stats["acquired"], 1) if stats["acquired"] else 0.0,
+                "max_wait_ms": round(stats["max_wait"] * 1000, 1),
+                "paused_ms": round(max(0.0, self._blocked_until - time.monotonic()) * 1000, 1),
+            }
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while a host's circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit open for {name}; next probe in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def _is_host_failure(response) -> bool:
+    """Responses that mean the host is down or blocking us, not a bad request"""
+    status = response.status_code
+    if status == 429 or status >= 500:
+        return True
+    if status == 403:
+        headers = response.headers
+        # Cloudflare challenge / block pages
+        return bool(headers.get("cf-mitigated")) or "cloudflare" in str(headers.get("Server", "")).lower()
+    return False
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one host and request kind
+
+    `failure_threshold` consecutive failures open the circuit: requests then
+    fail fast with CircuitOpenError. After `open_seconds` it goes half-open
+    and tries one probe - `probe` in a background thread when given,
+    otherwise the next real request. Success closes the circuit; failure
+    reopens it for twice as long, up to `max_open_seconds`. The open time
+    only drops back to `open_seconds` once a real request succeeds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        open_seconds: float = 30.0,
+        max_open_seconds: float = 300.0,
+        probe: Optional[Callable[[], bool]] = None,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(open_seconds, max_open_seconds)
+        self.probe = probe
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._current_open = open_seconds
+        self._open_until = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if a request would be refused now"""
+        self._admit(claim=False)
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError unless a request may go out now"""
+        self._admit(claim=True)
+
+    def _admit(self, claim: bool) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN and now >= self._open_until and self.probe is None:
+                # No background probe: the next request is the trial
+                if claim:
+                    self.state = self.HALF_OPEN
+                    self._stats["probes"] += 1
+                return
+            self._stats["rejected"] += 1
+            raise CircuitOpenError(self.name, max(0.0, self._open_until - now))
+
+    def record_success(self) -> None:
+        self._close(reset_backoff=True)
+
+    def _close(self, reset_backoff: bool) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("[Circuit] %s recovered; circuit closed", self.name)
+            self.state = self.CLOSED
+            self._failures = 0
+            if reset_backoff:
+                self._current_open = self.open_seconds
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._current_open = min(self._current_open * 2, self.max_open_seconds)
+                self._open_locked()
+            elif self.state == self.CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._open_locked()
+
+    def _open_locked(self) -> None:
+        self.state = self.OPEN
+        self._open_until = time.monotonic() + self._current_open
+        self._stats["opened"] += 1
+        logger.warning(
+            "[Circuit] %s opened after repeated failures; failing fast for %.0fs",
+            self.name,
+            self._current_open,
+        )
+        if self.probe is not None:
+            self._timer = threading.Timer(self._current_open, self._run_probe)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run_probe(self) -> None:
+        with self._lock:
+            if self.state != self.OPEN:
+                return
+            self.state = self.HALF_OPEN
+            self._stats["probes"] += 1
+        try:
+            healthy = bool(self.probe())
+        except Exception as exc:
+            logger.debug("[Circuit] %s probe failed: %s", self.name, exc)
+            healthy = False
+        if healthy:
+            # Only a real request proves recovery; keep the longer open time until then
+            self._close(reset_backoff=False)
+        else:
+            self.record_failure()
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "retry_in": round(max(0.0, self._open_until - time.monotonic()), 1) if self.state != self.CLOSED else 0.0,
+                **self._stats,
+            }
+
+
+class CircuitBreakerRegistry:
+    """Breakers created on first use, one per (host, request kind)"""
+
+    def __init__(self, probe_factory: Callable[[str, str], Callable[[], bool]], **options):
+        self._probe_factory = probe_factory
+        self._options = options
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, request_kind: str) -> CircuitBreaker:
+        host = (urllib.parse.urlparse(url).hostname or "").lower()
+        key = (host, request_kind)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    f"{host}/{request_kind}",
+                    probe=self._probe_factory(host, request_kind),
+                    **self._options,
+                )
+                self._breakers[key] = breaker
+            return breaker
+
+    def configure(self, **options) -> None:
+        """Change thresholds for existing and future breakers"""
+        with self._lock:
+            self._options.update(options)
+            for breaker in self._breakers.values():
+                for name, value in options.items():
+                    setattr(breaker, name, value)
+
+    def get_stats(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.get_stats() for breaker in breakers}
+
+
+def _probe_host(session_factory: Callable[[], requests.Session], host: str,
+                headers: Optional[Dict[str, str]] = None) -> Callable[[], bool]:
+    def probe() -> bool:
+        response = session_factory().head(f"https://{host}/", headers=headers, timeout=10, allow_redirects=True)
+        # A plain 403/404 for the bare root still proves the host answers
+        return not _is_host_failure(response)
+    return probe
+
+
+def _call_through_breaker(breaker: CircuitBreaker, send: Callable[[], requests.Response]):
+    breaker.before_request()
+    try:
+        response = send()
+    except Exception:
+        breaker.record_failure()
+        raise
+    if _is_host_failure(response):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
 
 
 def _retry_delay(response, default: float = 2.0) -> float:
@@ -70,23 +392,53 @@ class DanbooruHttpClient:
 
     DEFAULT_HEADERS = {"User-Agent": "Danbooru-Gallery/1.0"}
 
-    def __init__(self, session: Optional[requests.Session] = None):
+    def __init__(self, session: Optional[requests.Session] = None, **breaker_options):
         self.session = session or requests.Session()
-        self.rate_limiter = RateLimiter(0.2)
+        self.rate_limiter = AdaptiveRateLimiter(5.0, burst=2, max_rate=10.0)
+        self.breakers = CircuitBreakerRegistry(
+            lambda host, kind: _probe_host(lambda: self.session, host, self.DEFAULT_HEADERS),
+            **breaker_options,
+        )
+
+    def check_circuit(self, url: str) -> None:
+        """Raise CircuitOpenError now instead of after queueing for the limiter"""
+        self.breakers.get(url, "api").check()
+
+    async def acquire(self) -> None:
+        """Wait for a rate-limit slot on the event loop; pass limiter_acquired=True to request()"""
+        await self.rate_limiter.acquire()
 
-    def request(self, method: str, url: str, **kwargs):
+    def get_limiter_stats(self) -> Dict[str, Dict[str, float]]:
+        return {"api": self.rate_limiter.get_stats()}
+
+    def get_circuit_stats(self) -> Dict[str, Dict[str, object]]:
+        return self.breakers.get_stats()
+
+    def request(self, method: str, url: str, *, limiter_acquired: bool = False, **kwargs):
         _validate_site_url(url, "donmai.us")
         headers = dict(kwargs.pop("headers", None) or {})
         for key, value in self.DEFAULT_HEADERS.items():
             headers.setdefault(key, value)
+        return _call_through_breaker(
+            self.breakers.get(url, "api"),
+            lambda: self._send(method, url, headers, limiter_acquired, kwargs),
+        )
 
+    def _send(self, method: str, url: str, headers: Dict[str, str], limiter_acquired: bool, kwargs):
         response = None
         for attempt in range(2):
-            self.rate_limiter.wait()
+            if not limiter_acquired:
+                self.rate_limiter.wait()
             response = self.session.request(method, url, headers=headers, **kwargs)
-            if response.status_code not in (429, 503) or attempt == 1:
+            if response.status_code not in (429, 503):
+                self.rate_limiter.on_success()
                 return response
             delay = _retry_delay(response)
+            self.rate_limiter.on_throttled(delay)
+            if attempt == 1:
+                return response
+            # The retry takes the first slot after the pause it just slept through
+            limiter_acquired = True
             logger.warning(
                 "[Danbooru] %s limited; retrying in %.1fs: %s",
                 response.status_code,
@@ -100,16 +452,40 @@ class DanbooruHttpClient:
 class GelbooruHttpClient:
     """HTTP transport isolated to gelbooru.com hosts and session state."""
 
-    def __init__(self):
+    def __init__(self, **breaker_options):
         self._sessions: Dict[bool, requests.Session] = {}
         self._sessions_lock = threading.Lock()
+        self.breakers = CircuitBreakerRegistry(
+            lambda host, kind: _probe_host(lambda: self.get_session(False), host),
+            **breaker_options,
+        )
+        # Public HTML pages are scraped, so that limiter never rises above its base rate
         self._limiters = {
-            "api": RateLimiter(0.2),
-            "public": RateLimiter(0.75),
-            "hydrate": RateLimiter(0.2),
-            "image": RateLimiter(0.2),
+            "api": AdaptiveRateLimiter(5.0, burst=2, max_rate=10.0),
+            "public": AdaptiveRateLimiter(1 / 0.75),
+            "hydrate": AdaptiveRateLimiter(5.0, burst=2, max_rate=10.0),
+            "image": AdaptiveRateLimiter(5.0, burst=4, max_rate=10.0),
         }
 
+    def _limiter(self, request_kind: str) -> AdaptiveRateLimiter:
+        if request_kind not in self._limiters:
+            raise ValueError(f"unsupported Gelbooru request kind: {request_kind}")
+        return self._limiters[request_kind]
+
+    async def acquire(self, request_kind: str = "api") -> None:
+        """Wait for a rate-limit slot on the event loop; pass limiter_acquired=True to request()"""
+        await self._limiter(request_kind).acquire()
+
+    def get_limiter_stats(self) -> Dict[str, Dict[str, float]]:
+        return {kind: limiter.get_stats() for kind, limiter in self._limiters.items()}
+
+    def get_circuit_stats(self) -> Dict[str, Dict[str, object]]:
+        return self.breakers.get_stats()
+
+    def check_circuit(self, url: str, request_kind: str = "api") -> None:
+        """Raise CircuitOpenError now instead of after queueing for the limiter"""
+        self.breakers.get(url, request_kind).check()
+
     @staticmethod
     def browser_headers(accept: str = "text/html,*/*") -> Dict[str, str]:
         return {
@@ -191,20 +567,27 @@ class GelbooruHttpClient:
         request_kind: str = "api",
         display_all: bool = False,
         force_refresh: bool = False,
+        limiter_acquired: bool = False,
         **kwargs,
     ):
         _validate_site_url(url, "gelbooru.com")
-        if request_kind not in self._limiters:
-            raise ValueError(f"unsupported Gelbooru request kind: {request_kind}")
+        limiter = self._limiter(request_kind)
         headers = dict(kwargs.pop("headers", None) or {})
         defaults = self.browser_headers(headers.get("Accept", "text/html,*/*"))
         for key, value in defaults.items():
             headers.setdefault(key, value)
+        return _call_through_breaker(
+            self.breakers.get(url, request_kind),
+            lambda: self._send(method, url, limiter, headers, display_all, force_refresh, limiter_acquired, kwargs),
+        )
 
+    def _send(self, method, url, limiter, headers, display_all, force_refresh, limiter_acquired, kwargs):
         session = self.get_session(display_all, force_refresh)
         response = None
         for attempt in range(2):
-            self._limiters[request_kind].wait()
+            if not limiter_acquired:
+                limiter.wait()
+            limiter_acquired = False
             try:
                 response = session.request(method, url, headers=headers, **kwargs)
             except requests.exceptions.RequestException as exc:
@@ -217,9 +600,14 @@ class GelbooruHttpClient:
                 )
                 time.sleep(3.0)
                 continue
-            if response.status_code not in (429, 503) or attempt == 1:
+            if response.status_code not in (429, 503):
+                limiter.on_success()
                 return response
             delay = _retry_delay(response)
+            limiter.on_throttled(delay)
+            if attempt == 1:
+                return response
+            limiter_acquired = True
             logger.warning(
                 "[Gelbooru] %s limited; retrying in %.1fs: %s",
                 response.status_code,
@@ -1,6 +1,7 @@
 import sys
 import inspect
 from .metadata_registry import MetadataRegistry
+from .node_profiler import get_node_profiler
 from ..utils.logger import get_logger
 
 # 初始化logger
@@ -81,7 +82,10 @@ class MetadataHook:
         original_map_node_over_list = execution._map_node_over_list
 
         # Define the wrapped _map_node_over_list function
+        profiler = get_node_profiler()
+
         def map_node_over_list_with_metadata(obj, input_data_all, func, allow_interrupt=False, execution_block_cb=None, pre_execute_cb=None):
+            profile_key = None
             # 收集元数据（前置）- 异常隔离，不影响其他 hook
             if func == obj.FUNCTION and hasattr(obj, '__class__'):
                 try:
@@ -101,12 +105,17 @@ class MetadataHook:
                                 frame = frame.f_back
 
                         if node_id is not None:
-                            registry.record_node_execution(node_id, class_type, input_data_all, None)
+                            registry.record_node_execution(node_id, class_type, input_data_all, None, prompt_id)
+                            profile_key = (prompt_id, node_id, class_type)
                 except Exception as e:
                     logger.error(f"Metadata collection error (pre): {e}")
 
             # 调用原始函数（可能包含其他插件的 hook）
-            results = original_map_node_over_list(obj, input_data_all, func, allow_interrupt, execution_block_cb, pre_execute_cb)
+            profile_token = profiler.begin(*profile_key) if profile_key else None
+            try:
+                results = original_map_node_over_list(obj, input_data_all, func, allow_interrupt, execution_block_cb, pre_execute_cb)
+            finally:
+                profiler.end(profile_token)
 
             # 收集元数据（后置）- 异常隔离
             if func == obj.FUNCTION and hasattr(obj, '__class__'):
@@ -127,7 +136,7 @@ class MetadataHook:
                                 frame = frame.f_back
 
                         if node_id is not None:
-                            registry.update_node_execution(node_id, class_type, results)
+                            registry.update_node_execution(node_id, class_type, results, prompt_id)
                 except Exception as e:
                     logger.error(f"Metadata collection error (post): {e}")
 
@@ -174,6 +183,8 @@ class MetadataHook:
         original_map_node_over_list = getattr(execution, map_node_func_name)
 
         # Wrapped async function, compatible with both stable and nightly
+        profiler = get_node_profiler()
+
         async def async_map_node_over_list_with_metadata(prompt_id, unique_id, obj, input_data_all, func, allow_interrupt=False, execution_block_cb=None, pre_execute_cb=None, *args, **kwargs):
             hidden_inputs = kwargs.get('hidden_inputs', None)
 
@@ -185,19 +196,25 @@ class MetadataHook:
                         class_type = obj.__class__.__name__
                         node_id = unique_id
                         if node_id is not None:
-                            registry.record_node_execution(node_id, class_type, input_data_all, None)
+                            registry.record_node_execution(node_id, class_type, input_data_all, None, prompt_id)
                 except Exception as e:
                     logger.error(f"Async metadata collection error (pre): {e}")
 
             # 调用原始函数（可能包含其他插件的 hook）
             # 使用关键字参数传递以确保链式钩子的兼容性
-            results = await original_map_node_over_list(
-                prompt_id, unique_id, obj, input_data_all, func,
-                allow_interrupt=allow_interrupt,
-                execution_block_cb=execution_block_cb,
-                pre_execute_cb=pre_execute_cb,
-                *args, **kwargs
-            )
+            profile_token = None
+            if func == obj.FUNCTION:
+                profile_token = profiler.begin(prompt_id, unique_id, obj.__class__.__name__)
+            try:
+                results = await original_map_node_over_list(
+                    prompt_id, unique_id, obj, input_data_all, func,
+                    allow_interrupt=allow_interrupt,
+                    execution_block_cb=execution_block_cb,
+                    pre_execute_cb=pre_execute_cb,
+                    *args, **kwargs
+                )
+            finally:
+                profiler.end(profile_token)
 
             # 收集元数据（后置）- 异常隔离
             if func == obj.FUNCTION and hasattr(obj, '__class__'):
@@ -207,7 +224,7 @@ class MetadataHook:
                         class_type = obj.__class__.__name__
                         node_id = unique_id
                         if node_id is not None:
-                            registry.update_node_execution(node_id, class_type, results)
+                            registry.update_node_execution(node_id, class_type, results, prompt_id)
                 except Exception as e:
                     logger.error(f"Async metadata collection error (post): {e}")
 
@@ -6,6 +6,7 @@ from .constants import IMAGES
 standalone_mode = os.environ.get("LORA_MANAGER_STANDALONE", "0") == "1" or os.environ.get("HF_HUB_DISABLE_TELEMETRY", "0") == "0"
 
 from .constants import MODELS, PROMPTS, SAMPLING, LORAS, SIZE, IS_SAMPLER
+from .prompt_graph import get_prompt_graph
 
 class MetadataProcessor:
     """Process and format collected metadata"""
@@ -23,21 +24,27 @@ class MetadataProcessor:
             if IMAGES in metadata and "first_decode" in metadata[IMAGES]:
                 downstream_id = metadata[IMAGES]["first_decode"]["node_id"]
                 
+        prompt = metadata.get("current_prompt")
+        graph = get_prompt_graph(prompt)
+
         # If we have a downstream_id and execution_order, use it to narrow down potential samplers
         if downstream_id and "execution_order" in metadata:
-            execution_order = metadata["execution_order"]
+            positions = graph.positions(metadata["execution_order"])
             
             # Find the index of the downstream node in the execution order
-            if downstream_id in execution_order:
-                downstream_index = execution_order.index(downstream_id)
+            if downstream_id in positions:
+                downstream_index = positions[downstream_id]
                 
-                # Extract all sampler nodes that executed before the downstream node
-                candidate_samplers = {}
-                for i in range(downstream_index):
-                    node_id = execution_order[i]
+                # Extract all sampler nodes that executed before the downstream node,
+                # in execution order
+                candidates = []
+                for node_id, sampler_info in metadata.get(SAMPLING, {}).items():
                     # Use IS_SAMPLER flag to identify true sampler nodes
-                    if node_id in metadata.get(SAMPLING, {}) and metadata[SAMPLING][node_id].get(IS_SAMPLER, False):
-                        candidate_samplers[node_id] = metadata[SAMPLING][node_id]
+                    position = positions.get(node_id)
+                    if position is not None and position < downstream_index and sampler_info.get(IS_SAMPLER, False):
+                        candidates.append((position, node_id))
+                candidates.sort()
+                candidate_samplers = {node_id: metadata[SAMPLING][node_id] for _, node_id in candidates}
                 
                 # If we found candidate samplers, apply primary sampler logic to these candidates only
                 if candidate_samplers:
@@ -49,12 +56,9 @@ class MetadataProcessor:
                     high_denoise_id = None
                     
                     # First, check for SamplerCustomAdvanced among candidates
-                    prompt = metadata.get("current_prompt")
-                    if prompt and prompt.original_prompt:
-                        for node_id in candidate_samplers:
-                            node_info = prompt.original_prompt.get(node_id, {})
-                            if node_info.get("class_type") == "SamplerCustomAdvanced":
-                                custom_advanced_samplers.append(node_id)
+                    for node_id in candidate_samplers:
+                        if graph.class_type(node_id) == "SamplerCustomAdvanced":
+                            custom_advanced_samplers.append(node_id)
                     
                     # Next, check for KSamplerAdvanced with add_noise="enable" among candidates
                     for node_id, sampler_info in candidate_samplers.items():
@@ -75,20 +79,16 @@ class MetadataProcessor:
                         high_denoise_samplers.append(high_denoise_id)
                     
                     # Combine all potential primary samplers
-                    potential_samplers = custom_advanced_samplers + advanced_add_noise_samplers + high_denoise_samplers
+                    potential_samplers = set(custom_advanced_samplers + advanced_add_noise_samplers + high_denoise_samplers)
                     
                     # Find the most recent potential primary sampler (closest to downstream node)
-                    for i in range(downstream_index - 1, -1, -1):
-                        node_id = execution_order[i]
+                    for _, node_id in reversed(candidates):
                         if node_id in potential_samplers:
                             return node_id, candidate_samplers[node_id]
                     
                     # If no potential sampler found from our criteria, return the most recent sampler
-                    if candidate_samplers:
-                        for i in range(downstream_index - 1, -1, -1):
-                            node_id = execution_order[i]
-                            if node_id in candidate_samplers:
-                                return node_id, candidate_samplers[node_id]
+                    node_id = candidates[-1][1]
+                    return node_id, candidate_samplers[node_id]
         
         # If no downstream_id provided or no suitable sampler found, fall back to original logic
         primary_sampler = None
@@ -96,13 +96,10 @@ class MetadataProcessor:
         max_denoise = -1
         
         # First, check for SamplerCustomAdvanced
-        prompt = metadata.get("current_prompt")
-        if prompt and prompt.original_prompt:
-            for node_id, node_info in prompt.original_prompt.items():
-                if node_info.get("class_type") == "SamplerCustomAdvanced":
-                    # Check if the node is in SAMPLING and has IS_SAMPLER flag
-                    if node_id in metadata.get(SAMPLING, {}) and metadata[SAMPLING][node_id].get(IS_SAMPLER, False):
-                        return node_id, metadata[SAMPLING][node_id]
+        for node_id in graph.nodes_of_class("SamplerCustomAdvanced"):
+            # Check if the node is in SAMPLING and has IS_SAMPLER flag
+            if node_id in metadata.get(SAMPLING, {}) and metadata[SAMPLING][node_id].get(IS_SAMPLER, False):
+                return node_id, metadata[SAMPLING][node_id]
         
         # Next, check for KSamplerAdvanced with add_noise="enable" using IS_SAMPLER flag
         for node_id, sampler_info in metadata.get(SAMPLING, {}).items():
@@ -150,6 +147,8 @@ class MetadataProcessor:
         """
         if not prompt or not prompt.original_prompt or node_id not in prompt.original_prompt:
             return None
+
+        graph = get_prompt_graph(prompt)
             
         # For depth tracking
         current_depth = 0
@@ -161,22 +160,18 @@ class MetadataProcessor:
         last_valid_node = None
         
         while current_depth < max_depth:
-            if current_node_id not in prompt.original_prompt:
+            if current_node_id not in graph.nodes:
                 return last_valid_node if not target_class else None
                 
-            node_inputs = prompt.original_prompt[current_node_id].get("inputs", {})
-            if current_input not in node_inputs:
+            if not graph.has_input(current_node_id, current_input):
                 # We've reached a node without the specified input - this is our origin node
                 # if we're not looking for a specific target_class
                 return current_node_id if not target_class else None
                 
-            input_value = node_inputs[current_input]
-            # Input connections are formatted as [node_id, output_index]
-            if isinstance(input_value, list) and len(input_value) >= 2:
-                found_node_id = input_value[0]  # Connected node_id
-                
+            found_node_id = graph.source(current_node_id, current_input)
+            if found_node_id is not None:
                 # If we're looking for a specific node class
-                if target_class and prompt.original_prompt[found_node_id].get("class_type") == target_class:
+                if target_class and graph.class_type(found_node_id) == target_class:
                     return found_node_id
                 
                 # If we're not looking for a specific class, update the last valid node
@@ -186,7 +181,7 @@ class MetadataProcessor:
                 # Continue tracing through intermediate nodes
                 current_node_id = found_node_id
                 # For most conditioning nodes, the input we want to follow is named "conditioning"
-                if "conditioning" in prompt.original_prompt[current_node_id].get("inputs", {}):
+                if graph.has_input(current_node_id, "conditioning"):
                     current_input = "conditioning"
                 else:
                     # If there's no "conditioning" input, return the current node
@@ -239,38 +234,38 @@ class MetadataProcessor:
             pos_conditioning = metadata[PROMPTS][sampler_id].get("pos_conditioning")
             neg_conditioning = metadata[PROMPTS][sampler_id].get("neg_conditioning")
             
+            # Index the stored conditioning objects by identity once, in prompt order,
+            # instead of scanning every prompt node for each lookup
+            positive_index = {}
+            negative_index = {}
+            for prompt_data in metadata[PROMPTS].values():
+                # For nodes with single conditioning output
+                if "conditioning" in prompt_data:
+                    for index in (positive_index, negative_index):
+                        index.setdefault(id(prompt_data["conditioning"]), []).append((prompt_data, True))
+                # For nodes with separate pos_conditioning and neg_conditioning outputs (like TSC_EfficientLoader)
+                if "positive_encoded" in prompt_data:
+                    positive_index.setdefault(id(prompt_data["positive_encoded"]), []).append((prompt_data, False))
+                if "negative_encoded" in prompt_data:
+                    negative_index.setdefault(id(prompt_data["negative_encoded"]), []).append((prompt_data, False))
+
             # Helper function to recursively find prompt text for a conditioning object
             def find_prompt_text_for_conditioning(conditioning_obj, is_positive=True):
                 if conditioning_obj is None:
                     return ""
-                    
-                # Try to match conditioning objects with those stored by extractors
-                for prompt_node_id, prompt_data in metadata[PROMPTS].items():
-                    # For nodes with single conditioning output
-                    if "conditioning" in prompt_data:
-                        if id(prompt_data["conditioning"]) == id(conditioning_obj):
-                            return prompt_data.get("text", "")
-                    
-                    # For nodes with separate pos_conditioning and neg_conditioning outputs (like TSC_EfficientLoader)
-                    if is_positive and "positive_encoded" in prompt_data:
-                        if id(prompt_data["positive_encoded"]) == id(conditioning_obj):
-                            if "positive_text" in prompt_data:
-                                return prompt_data["positive_text"]
-                            else:
-                                orig_conditioning = prompt_data.get("orig_pos_cond", None)
-                                if orig_conditioning is not None:
-                                    # Recursively find the prompt text for the original conditioning
-                                    return find_prompt_text_for_conditioning(orig_conditioning, is_positive=True)
-                    
-                    if not is_positive and "negative_encoded" in prompt_data:
-                        if id(prompt_data["negative_encoded"]) == id(conditioning_obj):
-                            if "negative_text" in prompt_data:
-                                return prompt_data["negative_text"]
-                            else:
-                                orig_conditioning = prompt_data.get("orig_neg_cond", None)
-                                if orig_conditioning is not None:
-                                    # Recursively find the prompt text for the original conditioning
-                                    return find_prompt_text_for_conditioning(orig_conditioning, is_positive=False)
+
+                index = positive_index if is_positive else negative_index
+                text_key = "positive_text" if is_positive else "negative_text"
+                orig_key = "orig_pos_cond" if is_positive else "orig_neg_cond"
+                for prompt_data, single_output in index.get(id(conditioning_obj), ()):
+                    if single_output:
+                        return prompt_data.get("text", "")
+                    if text_key in prompt_data:
+                        return prompt_data[text_key]
+                    orig_conditioning = prompt_data.get(orig_key, None)
+                    if orig_conditioning is not None:
+                        # Recursively find the prompt text for the original conditioning
+                        return find_prompt_text_for_conditioning(orig_conditioning, is_positive=is_positive)
                 
                 return ""
             
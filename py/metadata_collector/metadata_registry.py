@@ -1,12 +1,17 @@
+import itertools
 import time
 import threading
 from nodes import NODE_CLASS_MAPPINGS
 from .node_extractors import NODE_EXTRACTORS, GenericNodeExtractor
 from .constants import METADATA_CATEGORIES, IMAGES
+from .retention import collect_tensors, get_retention_policy, resolve_image
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Start order of prompt collections, used as the age of retained data
+_collection_sequence = itertools.count()
+
 
 def _is_prompt_link(value):
     """True if value is a ComfyUI prompt link: [source_node_id, output_index]."""
@@ -18,6 +23,90 @@ def _is_prompt_link(value):
     )
 
 
+class PromptCollection:
+    """
+    Metadata collected for one prompt
+
+    The node hooks write into a collection without taking the registry
+    lock: a prompt's nodes run one at a time, and each writes only its own
+    node_id entries. Nodes whose metadata changed are remembered in
+    `touched` and copied into the registry's node_cache once, when the
+    prompt is finished.
+    """
+
+    __slots__ = ("prompt_id", "sequence", "metadata", "executed_nodes", "touched",
+                 "indexed_prompt", "class_types", "pending_fill")
+
+    def __init__(self, prompt_id):
+        self.prompt_id = prompt_id
+        self.sequence = next(_collection_sequence)
+        self.metadata = {category: {} for category in METADATA_CATEGORIES}
+        self.metadata.update({
+            "execution_order": [],
+            "current_prompt": None,  # Will store the prompt object
+            "timestamp": time.time()
+        })
+        self.executed_nodes = set()
+        # node_id -> class_type of nodes to copy into node_cache
+        self.touched = {}
+        # original_prompt the index below was built from
+        self.indexed_prompt = None
+        # node_id -> Python class name (the key of NODE_EXTRACTORS / node_cache)
+        self.class_types = {}
+        # Nodes with an extractor that have neither run nor been filled yet
+        self.pending_fill = []
+
+    def index_prompt(self, original_prompt):
+        """Resolve the class name of every node in the prompt, once per prompt object"""
+        if original_prompt is self.indexed_prompt:
+            return
+        self.indexed_prompt = original_prompt
+        self.class_types = {}
+        for node_id, node_data in original_prompt.items():
+            # class_type in the prompt is the NODE_CLASS_MAPPINGS key; cache uses
+            # the Python class name (same as record_node_execution).
+            prompt_class_type = node_data.get("class_type")
+            if not prompt_class_type:
+                continue
+            class_obj = NODE_CLASS_MAPPINGS.get(prompt_class_type)
+            self.class_types[node_id] = class_obj.__name__ if class_obj is not None else prompt_class_type
+        self.pending_fill = [
+            node_id for node_id, class_type in self.class_types.items()
+            if class_type in NODE_EXTRACTORS
+        ]
+
+    def record(self, node_id, class_type, inputs, outputs):
+        # Add to execution order and mark as executed
+        if node_id not in self.executed_nodes:
+            self.executed_nodes.add(node_id)
+            self.metadata["execution_order"].append(node_id)
+
+        # Process inputs to simplify working with them
+        processed_inputs = {}
+        for input_name, input_values in inputs.items():
+            if isinstance(input_values, list) and len(input_values) > 0:
+                # For single values, just use the first one (most common case)
+                processed_inputs[input_name] = input_values[0]
+            else:
+                processed_inputs[input_name] = input_values
+
+        # Extract node-specific metadata
+        extractor = NODE_EXTRACTORS.get(class_type, GenericNodeExtractor)
+        extractor.extract(node_id, processed_inputs, outputs, self.metadata)
+        self.touched[node_id] = class_type
+
+    def update(self, node_id, class_type, outputs):
+        # Use the same extractor to update with outputs
+        extractor = NODE_EXTRACTORS.get(class_type, GenericNodeExtractor)
+        if hasattr(extractor, 'update'):
+            extractor.update(node_id, outputs, self.metadata)
+            # Decoded images are kept reduced (first_decode shares this entry)
+            image_entry = self.metadata.get(IMAGES, {}).get(node_id)
+            if image_entry is not None and image_entry.get("image") is outputs:
+                image_entry["image"] = get_retention_policy().retain_image(outputs)
+        self.touched[node_id] = class_type
+
+
 class MetadataRegistry:
     """A singleton registry to store and retrieve workflow metadata"""
     _instance = None
@@ -32,19 +121,28 @@ class MetadataRegistry:
         return cls._instance
     
     def _reset(self):
+        # Guards the collection table and node_cache; never taken per node
         self._lock = threading.RLock()
         self.current_prompt_id = None
         self.current_prompt = None
         self.metadata = {}
+        self.collections = {}
+        # prompt_id -> metadata dict of its collection
         self.prompt_metadata = {}
-        self.executed_nodes = set()
 
         # Node-level cache for metadata
         self.node_cache = {}
+        # cache_key -> sequence of the prompt that last refreshed the entry
+        self.node_cache_ages = {}
 
         # Limit the number of stored prompts
         self.max_prompt_history = 3
 
+        # Bytes of tensors still referenced after the last budget check
+        self.retained_bytes = 0
+        self.evicted_prompts = 0
+        self.evicted_cache_entries = 0
+
         # Categories we want to track and retrieve from cache
         self.metadata_categories = METADATA_CATEGORIES
     
@@ -63,24 +161,33 @@ class MetadataRegistry:
         prompts_to_remove = sorted_prompts[:len(sorted_prompts) - self.max_prompt_history]
         for pid in prompts_to_remove:
             del self.prompt_metadata[pid]
+            self.collections.pop(pid, None)
     
     def start_collection(self, prompt_id):
         """Begin metadata collection for a new prompt"""
         with self._lock:
+            # A new prompt means the previous ones have finished executing
+            for collection in self.collections.values():
+                self._flush_node_cache(collection)
+
+            collection = PromptCollection(prompt_id)
+            self.collections[prompt_id] = collection
+            self.prompt_metadata[prompt_id] = collection.metadata
             self.current_prompt_id = prompt_id
-            self.executed_nodes = set()
-            self.prompt_metadata[prompt_id] = {
-                category: {} for category in METADATA_CATEGORIES
-            }
-            # Add additional metadata fields
-            self.prompt_metadata[prompt_id].update({
-                "execution_order": [],
-                "current_prompt": None,  # Will store the prompt object
-                "timestamp": time.time()
-            })
 
             # Clean up old prompt data
             self._clean_old_prompts()
+            self._enforce_retention()
+
+    def get_collection(self, prompt_id=None):
+        """
+        The collection of prompt_id, or of the current prompt when prompt_id
+        is None or has no collection; None when nothing is being collected
+        """
+        collection = self.collections.get(prompt_id) if prompt_id is not None else None
+        if collection is None:
+            collection = self.collections.get(self.current_prompt_id)
+        return collection
     
     def set_current_prompt(self, prompt):
         """Set the current prompt object reference"""
@@ -98,6 +205,15 @@ class MetadataRegistry:
                 return {}
 
             metadata = self.prompt_metadata[key]
+            # Finished prompts the hooks have not flushed yet (no new prompt
+            # has started) still feed node_cache before it is read
+            flushed = False
+            for collection in self.collections.values():
+                if collection.prompt_id != self.current_prompt_id and collection.touched:
+                    self._flush_node_cache(collection)
+                    flushed = True
+            if flushed:
+                self._enforce_retention()
 
             # If we have a current prompt object, check for non-executed nodes
             prompt_obj = metadata.get("current_prompt")
@@ -117,31 +233,29 @@ class MetadataRegistry:
         fall back to re-running extractors on literal widget values from the
         prompt definition so loader names and scalar sampler params still appear
         in Save Image Plus metadata.
+
+        Each node is filled at most once per prompt: the class names are
+        resolved into a prompt-level index on the first call, and later calls
+        only visit the nodes that still have neither run nor been filled.
         """
         if not original_prompt:
             return
 
-        executed_nodes = self.executed_nodes
-        metadata = self.prompt_metadata[prompt_id]
-
-        for node_id, node_data in original_prompt.items():
-            if node_id in executed_nodes:
-                continue
-
-            # class_type in the prompt is the NODE_CLASS_MAPPINGS key; cache uses
-            # the Python class name (same as record_node_execution).
-            prompt_class_type = node_data.get("class_type")
-            if not prompt_class_type:
-                continue
+        collection = self.collections[prompt_id]
+        collection.index_prompt(original_prompt)
+        if not collection.pending_fill:
+            return
 
-            class_type = prompt_class_type
-            if prompt_class_type in NODE_CLASS_MAPPINGS:
-                class_obj = NODE_CLASS_MAPPINGS[prompt_class_type]
-                class_type = class_obj.__name__
+        executed_nodes = collection.executed_nodes
+        metadata = collection.metadata
+        pending, collection.pending_fill = collection.pending_fill, []
 
-            if class_type not in NODE_EXTRACTORS:
+        for node_id in pending:
+            if node_id in executed_nodes:
+                # Its own extractor output is newer than anything cached
                 continue
 
+            class_type = collection.class_types[node_id]
             cache_key = f"{node_id}:{class_type}"
 
             if cache_key in self.node_cache:
@@ -151,11 +265,11 @@ class MetadataRegistry:
                         if node_id not in metadata[category]:
                             metadata[category][node_id] = cached_data[category][node_id]
             else:
-                self._extract_from_prompt_inputs(node_id, class_type, node_data, metadata)
+                self._extract_from_prompt_inputs(node_id, class_type, original_prompt[node_id], metadata)
                 # Cache only for the active prompt so history lookups do not
-                # overwrite current-run cache entries via current_prompt_id.
+                # overwrite current-run cache entries.
                 if prompt_id == self.current_prompt_id:
-                    self._cache_node_metadata(node_id, class_type)
+                    collection.touched[node_id] = class_type
 
     def _extract_from_prompt_inputs(self, node_id, class_type, node_data, metadata):
         """Run the node extractor using literal widget values from the prompt.
@@ -185,81 +299,120 @@ class MetadataRegistry:
                 f"Fallback extractor failed for {node_id} ({class_type}): {e}"
             )
 
-    def record_node_execution(self, node_id, class_type, inputs, outputs):
+    def record_node_execution(self, node_id, class_type, inputs, outputs, prompt_id=None):
         """Record information about a node's execution"""
-        with self._lock:
-            if not self.current_prompt_id:
-                return
-
-            # Add to execution order and mark as executed
-            if node_id not in self.executed_nodes:
-                self.executed_nodes.add(node_id)
-                self.prompt_metadata[self.current_prompt_id]["execution_order"].append(node_id)
-
-            # Process inputs to simplify working with them
-            processed_inputs = {}
-            for input_name, input_values in inputs.items():
-                if isinstance(input_values, list) and len(input_values) > 0:
-                    # For single values, just use the first one (most common case)
-                    processed_inputs[input_name] = input_values[0]
-                else:
-                    processed_inputs[input_name] = input_values
-
-            # Extract node-specific metadata
-            extractor = NODE_EXTRACTORS.get(class_type, GenericNodeExtractor)
-            extractor.extract(
-                node_id,
-                processed_inputs,
-                outputs,
-                self.prompt_metadata[self.current_prompt_id]
-            )
-
-            # Cache this node's metadata
-            self._cache_node_metadata(node_id, class_type)
+        collection = self.get_collection(prompt_id)
+        if collection is None:
+            return
+        collection.record(node_id, class_type, inputs, outputs)
     
-    def update_node_execution(self, node_id, class_type, outputs):
+    def update_node_execution(self, node_id, class_type, outputs, prompt_id=None):
         """Update node metadata with output information"""
-        with self._lock:
-            if not self.current_prompt_id:
-                return
-
-            # Process outputs to make them more usable
-            processed_outputs = outputs
-
-            # Use the same extractor to update with outputs
-            extractor = NODE_EXTRACTORS.get(class_type, GenericNodeExtractor)
-            if hasattr(extractor, 'update'):
-                extractor.update(
-                    node_id,
-                    processed_outputs,
-                    self.prompt_metadata[self.current_prompt_id]
-                )
-
-            # Update the cached metadata for this node
-            self._cache_node_metadata(node_id, class_type)
-            
-    def _cache_node_metadata(self, node_id, class_type):
-        """Cache the metadata for a specific node"""
-        with self._lock:
-            if not self.current_prompt_id or not node_id or not class_type:
-                return
+        collection = self.get_collection(prompt_id)
+        if collection is None:
+            return
+        collection.update(node_id, class_type, outputs)
 
-            # Create a cache key combining node_id and class_type
-            cache_key = f"{node_id}:{class_type}"
+    def _flush_node_cache(self, collection):
+        """Copy the metadata of the nodes a collection touched into node_cache (lock held)"""
+        if not collection.touched:
+            return
+        touched, collection.touched = collection.touched, {}
+        metadata = collection.metadata
 
-            # Create a shallow copy of the node's metadata
-            node_metadata = {}
-            current_metadata = self.prompt_metadata[self.current_prompt_id]
+        for node_id, class_type in list(touched.items()):
+            if not node_id or not class_type:
+                continue
 
+            # Shallow copy of the node's entries, keyed by node_id and class_type
+            node_metadata = {}
             for category in self.metadata_categories:
-                if category in current_metadata and node_id in current_metadata[category]:
-                    if category not in node_metadata:
-                        node_metadata[category] = {}
-                    node_metadata[category][node_id] = current_metadata[category][node_id]
-
-            # Save to cache if we have any metadata for this node
-            if any(node_metadata.values()):
+                if category in metadata and node_id in metadata[category]:
+                    node_metadata[category] = {node_id: metadata[category][node_id]}
+
+            # Save to cache if we have any metadata for this node; re-inserting
+            # keeps node_cache ordered from least to most recently refreshed
+            if node_metadata:
+                cache_key = f"{node_id}:{class_type}"
+                self.node_cache.pop(cache_key, None)
                 self.node_cache[cache_key] = node_metadata
+                self.node_cache_ages[cache_key] = collection.sequence
+
+    def _enforce_retention(self):
+        """
+        Evict the oldest data until the tensors the registry references fit
+        the retention budget (lock held)
+
+        Tensors are counted once however many prompts and cache entries share
+        them. Finished prompts and node_cache entries are evicted together by
+        age (a cache entry is as old as the prompt that last refreshed it), so
+        the tensors they share are actually released; nodes evicted from the
+        cache fall back to the literal widget values of the prompt. The
+        running prompt is never evicted.
+        """
+        sizes = {}
+        owners = {}
+
+        def scan(value):
+            found = {}
+            collect_tensors(value, found)
+            for object_id, size in found.items():
+                sizes[object_id] = size
+                owners[object_id] = owners.get(object_id, 0) + 1
+            return found
+
+        current = self.collections.get(self.current_prompt_id)
+        if current is not None:
+            scan(current.metadata)
+        candidates = [
+            (collection.sequence, "prompt", collection.prompt_id, scan(collection.metadata))
+            for collection in self.collections.values()
+            if collection is not current
+        ]
+        candidates.extend(
+            (self.node_cache_ages.get(key, -1), "node", key, scan(entry))
+            for key, entry in self.node_cache.items()
+        )
+        # Oldest first; a prompt before the cache entries it refreshed
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[1] != "prompt"))
+
+        total = sum(sizes.values())
+        budget = get_retention_policy().budget_bytes
+        if budget is not None and total > budget:
+            for _, kind, key, found in candidates:
+                if total <= budget:
+                    break
+                if not found:
+                    continue
+                if kind == "prompt":
+                    self.collections.pop(key, None)
+                    self.prompt_metadata.pop(key, None)
+                    self.evicted_prompts += 1
+                else:
+                    del self.node_cache[key]
+                    self.node_cache_ages.pop(key, None)
+                    self.evicted_cache_entries += 1
+                for object_id in found:
+                    owners[object_id] -= 1
+                    if not owners[object_id]:
+                        total -= sizes[object_id]
+            logger.debug(f"Metadata retention: {total} bytes retained after eviction (budget {budget})")
+        self.retained_bytes = total
+
+    def get_retention_stats(self):
+        """Retained tensor bytes and eviction counters"""
+        with self._lock:
+            self._enforce_retention()
+            policy = get_retention_policy()
+            return {
+                "retained_bytes": self.retained_bytes,
+                "budget_bytes": policy.budget_bytes,
+                "image_mode": policy.image_mode,
+                "prompts": len(self.collections),
+                "node_cache_entries": len(self.node_cache),
+                "evicted_prompts": self.evicted_prompts,
+                "evicted_cache_entries": self.evicted_cache_entries,
+            }
     
     def clear_unused_cache(self):
         """Clean up node_cache entries that are no longer in use"""
@@ -281,6 +434,7 @@ class MetadataRegistry:
             # Remove cache entries that are no longer needed
             for key in keys_to_remove:
                 del self.node_cache[key]
+                self.node_cache_ages.pop(key, None)
     
     def clear_metadata(self, prompt_id=None):
         """Clear metadata for a specific prompt or reset all data"""
@@ -288,6 +442,7 @@ class MetadataRegistry:
             if prompt_id is not None:
                 if prompt_id in self.prompt_metadata:
                     del self.prompt_metadata[prompt_id]
+                    self.collections.pop(prompt_id, None)
                     # Clean up cache after removing prompt
                     self.clear_unused_cache()
             else:
@@ -303,7 +458,7 @@ class MetadataRegistry:
 
             metadata = self.prompt_metadata[key]
             if IMAGES in metadata and "first_decode" in metadata[IMAGES]:
-                image_data = metadata[IMAGES]["first_decode"]["image"]
+                image_data = resolve_image(metadata[IMAGES]["first_decode"]["image"])
 
                 # If it's an image batch or tuple, handle various formats
                 if isinstance(image_data, (list, tuple)) and len(image_data) > 0:
@@ -317,23 +472,20 @@ class MetadataRegistry:
             # This handles the case where VAEDecode was cached by ComfyUI and not executed
             prompt_obj = metadata.get("current_prompt")
             if prompt_obj and hasattr(prompt_obj, "original_prompt"):
-                original_prompt = prompt_obj.original_prompt
-                for node_id, node_data in original_prompt.items():
-                    class_type = node_data.get("class_type")
-                    if class_type and class_type in NODE_CLASS_MAPPINGS:
-                        class_obj = NODE_CLASS_MAPPINGS[class_type]
-                        class_name = class_obj.__name__
-                        # Check if this is a VAEDecode node
-                        if class_name == "VAEDecode":
-                            # Try to find this node in the cache
-                            cache_key = f"{node_id}:{class_name}"
-                            if cache_key in self.node_cache:
-                                cached_data = self.node_cache[cache_key]
-                                if IMAGES in cached_data and node_id in cached_data[IMAGES]:
-                                    image_data = cached_data[IMAGES][node_id]["image"]
-                                    # Handle different image formats
-                                    if isinstance(image_data, (list, tuple)) and len(image_data) > 0:
-                                        return image_data[0]
-                                    return image_data
+                collection = self.collections[key]
+                collection.index_prompt(prompt_obj.original_prompt)
+                for node_id, class_name in collection.class_types.items():
+                    # Check if this is a VAEDecode node
+                    if class_name == "VAEDecode":
+                        # Try to find this node in the cache
+                        cache_key = f"{node_id}:{class_name}"
+                        if cache_key in self.node_cache:
+                            cached_data = self.node_cache[cache_key]
+                            if IMAGES in cached_data and node_id in cached_data[IMAGES]:
+                                image_data = resolve_image(cached_data[IMAGES][node_id]["image"])
+                                # Handle different image formats
+                                if isinstance(image_data, (list, tuple)) and len(image_data) > 0:
+                                    return image_data[0]
+                                return image_data
 
             return None
@@ -0,0 +1,290 @@
+"""
+Per-node execution profiler
+
+MetadataHook wraps every node's _map_node_over_list call; when the
+profiler is enabled it records, for each (prompt_id, node_id, class_type),
+wall time, process CPU time and optionally how far the node raised the
+process-wide memory peaks (torch CUDA allocator and process RSS). The last
+`max_prompts` prompts are kept in a ring buffer.
+
+The memory fields are new-peak increases, not per-node peaks: both
+counters are process-lifetime high-water marks and are never reset here
+(other tools read them), so a node that stays below an earlier peak
+records 0.
+
+Disabled (the default), begin() returns None after one attribute check,
+so the hooks cost nothing measurable. Enable it with the
+"profiling.node_profiler" key in config.json or POST /danbooru/profiler/nodes.
+"""
+
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Nesting depth of profiled calls in the current thread / task (expanded subgraphs)
+_depth = ContextVar("danbooru_node_profiler_depth", default=0)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _rss_peak_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _cuda():
+    # Only use torch if ComfyUI already loaded it; never import it from here
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return None
+    try:
+        return torch.cuda if torch.cuda.is_available() else None
+    except Exception:
+        return None
+
+
+class NodeProfiler:
+    """Records node timings into a bounded per-prompt ring buffer"""
+
+    def __init__(self, max_prompts: int = 20):
+        self.enabled = False
+        self.track_memory = False
+        self.max_prompts = max_prompts
+        self._lock = threading.Lock()
+        # prompt_id -> {"started": perf_counter, "wall_clock": time, "nodes": [records]}
+        self._prompts: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def configure(self, enabled: Optional[bool] = None, track_memory: Optional[bool] = None,
+                  max_prompts: Optional[int] = None):
+        with self._lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if track_memory is not None:
+                self.track_memory = bool(track_memory)
+            if max_prompts is not None:
+                self.max_prompts = max(1, int(max_prompts))
+                self._trim()
+
+    def clear(self):
+        with self._lock:
+            self._prompts.clear()
+
+    def begin(self, prompt_id, node_id, class_type) -> Optional[tuple]:
+        """Start timing a node; returns a token for end(), or None when disabled"""
+        if not self.enabled or prompt_id is None:
+            return None
+        memory = None
+        if self.track_memory:
+            cuda = _cuda()
+            cuda_start = None
+            if cuda is not None:
+                cuda_start = cuda.max_memory_allocated()
+            memory = (cuda_start, _rss_peak_bytes())
+        depth = _depth.get()
+        reset = _depth.set(depth + 1)
+        return (str(prompt_id), str(node_id), class_type, depth, reset, memory,
+                time.perf_counter(), time.process_time())
+
+    def end(self, token: Optional[tuple]):
+        """Finish timing a node started with begin()"""
+        if token is None:
+            return
+        wall_end = time.perf_counter()
+        cpu_end = time.process_time()
+        prompt_id, node_id, class_type, depth, reset, memory, wall_start, cpu_start = token
+        try:
+            _depth.reset(reset)
+        except ValueError:
+            # end() ran in a different context than begin(); depth is cosmetic
+            pass
+
+        record = {
+            "node_id": node_id,
+            "class_type": class_type,
+            "depth": depth,
+            "wall_ms": (wall_end - wall_start) * 1000,
+            "cpu_ms": (cpu_end - cpu_start) * 1000,
+        }
+        if memory is not None:
+            cuda_start, rss_start = memory
+            cuda = _cuda()
+            if cuda is not None and cuda_start is not None:
+                record["cuda_new_peak_bytes"] = max(0, cuda.max_memory_allocated() - cuda_start)
+            rss_end = _rss_peak_bytes()
+            if rss_start is not None and rss_end is not None:
+                record["rss_new_peak_bytes"] = max(0, rss_end - rss_start)
+
+        with self._lock:
+            prompt = self._prompts.get(prompt_id)
+            if prompt is None:
+                prompt = {"started": wall_start, "wall_clock": time.time(), "nodes": []}
+                self._prompts[prompt_id] = prompt
+                self._trim()
+            record["start"] = wall_start
+            prompt["started"] = min(prompt["started"], wall_start)
+            prompt["nodes"].append(record)
+
+    def _trim(self):
+        while len(self._prompts) > self.max_prompts:
+            self._prompts.popitem(last=False)
+
+    def list_prompts(self) -> List[Dict]:
+        """Recent prompts, newest first, with node count and total node time"""
+        with self._lock:
+            items = [(pid, p["wall_clock"], list(p["nodes"])) for pid, p in self._prompts.items()]
+        return [
+            {
+                "prompt_id": pid,
+                "timestamp": wall_clock,
+                "node_count": len(nodes),
+                "node_ms": round(sum(n["wall_ms"] for n in nodes if n["depth"] == 0), 2),
+            }
+            for pid, wall_clock, nodes in reversed(items)
+        ]
+
+    def get_prompt_profile(self, prompt_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Flame-style breakdown of one prompt (the newest when prompt_id is None)
+
+        Each node carries its start offset, duration and nesting depth, in
+        execution order; `share` is its part of the top-level node time.
+        """
+        with self._lock:
+            if not self._prompts:
+                return None
+            if prompt_id is None:
+                prompt_id = next(reversed(self._prompts))
+            prompt = self._prompts.get(str(prompt_id))
+            if prompt is None:
+                return None
+            started = prompt["started"]
+            nodes = sorted(prompt["nodes"], key=lambda n: n["start"])
+            wall_clock = prompt["wall_clock"]
+
+        top_level_ms = sum(n["wall_ms"] for n in nodes if n["depth"] == 0)
+        span_ms = max(((n["start"] - started) * 1000 + n["wall_ms"] for n in nodes), default=0.0)
+        breakdown = []
+        for node in nodes:
+            entry = {key: value for key, value in node.items() if key != "start"}
+            entry["start_ms"] = round((node["start"] - started) * 1000, 2)
+            entry["wall_ms"] = round(node["wall_ms"], 2)
+            entry["cpu_ms"] = round(node["cpu_ms"], 2)
+            entry["share"] = round(node["wall_ms"] / top_level_ms, 4) if top_level_ms and node["depth"] == 0 else None
+            breakdown.append(entry)
+        return {
+            "prompt_id": str(prompt_id),
+            "timestamp": wall_clock,
+            "span_ms": round(span_ms, 2),
+            "node_ms": round(top_level_ms, 2),
+            "nodes": breakdown,
+        }
+
+    def get_class_aggregates(self) -> Dict[str, Dict]:
+        """Per class_type statistics over the prompts in the ring buffer, slowest total first"""
+        with self._lock:
+            records = [node for prompt in self._prompts.values() for node in prompt["nodes"]]
+        by_class: Dict[str, List[Dict]] = {}
+        for record in records:
+            by_class.setdefault(record["class_type"], []).append(record)
+
+        aggregates = {}
+        for class_type, items in by_class.items():
+            wall = sorted(r["wall_ms"] for r in items)
+            cpu = sorted(r["cpu_ms"] for r in items)
+            aggregates[class_type] = {
+                "count": len(items),
+                "total_ms": round(sum(wall), 2),
+                "mean_ms": round(sum(wall) / len(wall), 2),
+                "p50_ms": round(_percentile(wall, 0.50), 2),
+                "p95_ms": round(_percentile(wall, 0.95), 2),
+                "max_ms": round(wall[-1], 2),
+                "cpu_p50_ms": round(_percentile(cpu, 0.50), 2),
+                "cpu_p95_ms": round(_percentile(cpu, 0.95), 2),
+            }
+        return dict(sorted(aggregates.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+_profiler = NodeProfiler()
+
+
+def get_node_profiler() -> NodeProfiler:
+    return _profiler
+
+
+def load_profiler_config():
+    """Apply the "profiling" section of config.json"""
+    from ..utils.config_manager import config_manager
+
+    _profiler.configure(
+        enabled=config_manager.get_value("profiling.node_profiler", False),
+        track_memory=config_manager.get_value("profiling.track_memory", False),
+        max_prompts=config_manager.get_value("profiling.max_prompts", 20),
+    )
+    if _profiler.enabled:
+        logger.info("Node profiler enabled")
+
+
+def setup_node_profiler_api():
+    """Register GET/POST /danbooru/profiler/nodes"""
+    from aiohttp import web
+    from server import PromptServer
+
+    @PromptServer.instance.routes.get("/danbooru/profiler/nodes")
+    async def get_node_profile(request):
+        """
+        Query参数:
+            prompt_id: 要查看的 prompt（默认最近一次）
+        """
+        return web.json_response({
+            "success": True,
+            "enabled": _profiler.enabled,
+            "track_memory": _profiler.track_memory,
+            "prompts": _profiler.list_prompts(),
+            "profile": _profiler.get_prompt_profile(request.query.get("prompt_id")),
+            "classes": _profiler.get_class_aggregates(),
+        })
+
+    @PromptServer.instance.routes.post("/danbooru/profiler/nodes")
+    async def update_node_profiler(request):
+        """
+        POST Body: {"enabled": true, "track_memory": false, "max_prompts": 20, "clear": false}
+        """
+        try:
+            data = await request.json()
+            _profiler.configure(
+                enabled=data.get("enabled"),
+                track_memory=data.get("track_memory"),
+                max_prompts=data.get("max_prompts"),
+            )
+            if data.get("clear"):
+                _profiler.clear()
+        except Exception as e:
+            return web.json_response({"success": False, "error": str(e)}, status=400)
+        return web.json_response({
+            "success": True,
+            "enabled": _profiler.enabled,
+            "track_memory": _profiler.track_memory,
+            "max_prompts": _profiler.max_prompts,
+        })
@@ -0,0 +1,101 @@
+"""
+Prompt graph index for metadata tracing
+
+MetadataProcessor follows links between nodes (sampler -> conditioning ->
+text encoder, guider -> CFGGuider, ...) and compares execution positions
+for every save. PromptGraph indexes a prompt's original_prompt once:
+
+* links: node_id -> {input_name: source node_id} (upstream edges)
+* consumers: node_id -> [(node_id, input_name)] (downstream edges)
+* by_class: class_type -> node_ids in prompt order
+* positions: node_id -> index in the execution order
+
+so each tracing step is a dict lookup instead of a scan of the prompt or of
+execution_order.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Graphs of the last few prompt objects; a prompt does not change while it runs
+_MAX_CACHED_GRAPHS = 8
+_graphs: "OrderedDict[int, Tuple[dict, PromptGraph]]" = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+class PromptGraph:
+    """Adjacency, class and execution-position index of one prompt"""
+
+    def __init__(self, original_prompt: Optional[dict]):
+        self.nodes: Dict[str, dict] = original_prompt or {}
+        self.links: Dict[str, Dict[str, str]] = {}
+        self.consumers: Dict[str, List[Tuple[str, str]]] = {}
+        self.by_class: Dict[str, List[str]] = {}
+
+        for node_id, node_data in self.nodes.items():
+            class_type = node_data.get("class_type")
+            if class_type:
+                self.by_class.setdefault(class_type, []).append(node_id)
+            node_links = {}
+            for input_name, value in node_data.get("inputs", {}).items():
+                # Input connections are formatted as [node_id, output_index]
+                if isinstance(value, list) and len(value) >= 2:
+                    node_links[input_name] = value[0]
+                    self.consumers.setdefault(value[0], []).append((node_id, input_name))
+            self.links[node_id] = node_links
+
+        # Execution positions, extended as the execution order grows
+        self._order: Optional[list] = None
+        self._positions: Dict[str, int] = {}
+        self._indexed = 0
+        self._positions_lock = threading.Lock()
+
+    def class_type(self, node_id) -> Optional[str]:
+        node = self.nodes.get(node_id)
+        return node.get("class_type") if node else None
+
+    def has_input(self, node_id, input_name) -> bool:
+        node = self.nodes.get(node_id)
+        return bool(node) and input_name in node.get("inputs", {})
+
+    def source(self, node_id, input_name) -> Optional[str]:
+        """The node linked into node_id's input_name, or None for a widget value"""
+        return self.links.get(node_id, {}).get(input_name)
+
+    def nodes_of_class(self, class_type) -> List[str]:
+        return self.by_class.get(class_type, [])
+
+    def positions(self, execution_order: list) -> Dict[str, int]:
+        """node_id -> first index in execution_order, indexing only new entries"""
+        with self._positions_lock:
+            if execution_order is not self._order or len(execution_order) < self._indexed:
+                self._order = execution_order
+                self._positions = {}
+                self._indexed = 0
+            for index in range(self._indexed, len(execution_order)):
+                self._positions.setdefault(execution_order[index], index)
+            self._indexed = len(execution_order)
+            return self._positions
+
+
+def get_prompt_graph(prompt) -> PromptGraph:
+    """The graph of a prompt object (anything with original_prompt), built once per prompt"""
+    original_prompt = getattr(prompt, "original_prompt", None) if prompt else None
+    if not original_prompt:
+        return PromptGraph(None)
+
+    key = id(original_prompt)
+    with _graphs_lock:
+        cached = _graphs.get(key)
+        # Identity check: an id can be reused once its prompt is gone
+        if cached is not None and cached[0] is original_prompt:
+            _graphs.move_to_end(key)
+            return cached[1]
+
+    graph = PromptGraph(original_prompt)
+    with _graphs_lock:
+        _graphs[key] = (original_prompt, graph)
+        while len(_graphs) > _MAX_CACHED_GRAPHS:
+            _graphs.popitem(last=False)
+    return graph
@@ -0,0 +1,165 @@
+"""
+Memory retention policy for collected metadata
+
+Extractors keep references to runtime objects: VAEDecode outputs (full
+image batches, possibly still on the GPU) and conditioning tensors used to
+match samplers to prompts. The registry holds them for up to
+max_prompt_history prompts and in node_cache until the node disappears
+from the workflow, which on large batches pins hundreds of MB.
+
+Decoded images are therefore kept in reduced form ("preview": a small
+uint8 CPU copy of the first image, "weakref": a weak reference that does
+not keep the tensor alive, "full": the original object), and the registry
+evicts the oldest prompts and node_cache entries once the tensors it
+still references exceed a byte budget. Configure it with the
+"metadata_retention" section of config.json.
+"""
+
+import sys
+import weakref
+from typing import Dict, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+IMAGE_MODES = ("preview", "weakref", "full")
+
+# Nesting depth of conditioning data below the metadata root:
+# category -> node -> field -> [[tensor, {"pooled_output": tensor}]]
+_MAX_SCAN_DEPTH = 8
+
+
+def object_nbytes(value) -> int:
+    """Bytes held by a tensor / array / bytes object, 0 for anything else"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    numel = getattr(value, "numel", None)
+    element_size = getattr(value, "element_size", None)
+    if callable(numel) and callable(element_size):
+        try:
+            return int(numel()) * int(element_size())
+        except Exception:
+            return 0
+    nbytes = getattr(value, "nbytes", None)
+    return nbytes if isinstance(nbytes, int) else 0
+
+
+def collect_tensors(value, found: Dict[int, int], depth: int = 0):
+    """Add id -> bytes of every sized object reachable through dicts, lists and tuples"""
+    if depth > _MAX_SCAN_DEPTH:
+        return
+    if isinstance(value, dict):
+        for key, item in value.items():
+            # The prompt object is owned by ComfyUI, not by the registry
+            if key != "current_prompt":
+                collect_tensors(item, found, depth + 1)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            collect_tensors(item, found, depth + 1)
+    else:
+        size = object_nbytes(value)
+        if size:
+            found[id(value)] = size
+
+
+def _first_tensor(value, depth: int = 0):
+    """The first torch tensor in a node's outputs (list of output tuples)"""
+    torch = sys.modules.get("torch")
+    if torch is None or depth > 3:
+        return None
+    if isinstance(value, torch.Tensor):
+        return value
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            tensor = _first_tensor(item, depth + 1)
+            if tensor is not None:
+                return tensor
+    return None
+
+
+def make_preview(image, max_side: int):
+    """Downscaled uint8 CPU copy of the first image of an IMAGE batch [B, H, W, C]"""
+    import torch
+    import torch.nn.functional as F
+
+    with torch.no_grad():
+        first = image[:1] if image.dim() == 4 else image.unsqueeze(0)
+        height, width = first.shape[1], first.shape[2]
+        scale = max_side / max(height, width)
+        if scale < 1:
+            size = (max(1, round(height * scale)), max(1, round(width * scale)))
+            first = F.interpolate(first.movedim(-1, 1).float(), size=size, mode="area").movedim(1, -1)
+        return (first.clamp(0, 1) * 255).round().to(dtype=torch.uint8, device="cpu")
+
+
+class RetentionPolicy:
+    """Image reduction mode and byte budget of the metadata registry"""
+
+    def __init__(self, budget_mb: Optional[float] = 512, image_mode: str = "preview", preview_size: int = 256):
+        self.budget_bytes: Optional[int] = None
+        self.image_mode = "preview"
+        self.preview_size = preview_size
+        self.configure(budget_mb=budget_mb, image_mode=image_mode)
+
+    def configure(self, budget_mb=None, image_mode=None, preview_size=None):
+        if budget_mb is not None:
+            # 0 or a negative budget disables eviction
+            self.budget_bytes = int(float(budget_mb) * 1024 * 1024) if float(budget_mb) > 0 else None
+        if image_mode is not None:
+            if image_mode not in IMAGE_MODES:
+                raise ValueError(f"image_mode must be one of {IMAGE_MODES}")
+            self.image_mode = image_mode
+        if preview_size is not None:
+            self.preview_size = max(16, int(preview_size))
+
+    def retain_image(self, outputs):
+        """The form of a decoded image the registry keeps after the node ran"""
+        if self.image_mode == "full":
+            return outputs
+        tensor = _first_tensor(outputs)
+        if tensor is None:
+            # Not a torch image; nothing to reduce
+            return outputs
+        if self.image_mode == "preview":
+            try:
+                return make_preview(tensor, self.preview_size)
+            except Exception as e:
+                logger.debug(f"Image preview failed, keeping a weak reference: {e}")
+        return weakref.ref(tensor)
+
+
+def resolve_image(image):
+    """The image stored by retain_image, or None when a weak reference has died"""
+    if isinstance(image, weakref.ref):
+        return image()
+    return image
+
+
+_policy = RetentionPolicy()
+
+
+def get_retention_policy() -> RetentionPolicy:
+    return _policy
+
+
+def load_retention_config():
+    """Apply the "metadata_retention" section of config.json"""
+    from ..utils.config_manager import config_manager
+
+    _policy.configure(
+        budget_mb=config_manager.get_value("metadata_retention.budget_mb", 512),
+        image_mode=config_manager.get_value("metadata_retention.image_mode", "preview"),
+        preview_size=config_manager.get_value("metadata_retention.preview_size", 256),
+    )
+
+
+def setup_metadata_retention_api():
+    """Register GET /danbooru/metadata/retention"""
+    from aiohttp import web
+    from server import PromptServer
+    from .metadata_registry import MetadataRegistry
+
+    @PromptServer.instance.routes.get("/danbooru/metadata/retention")
+    async def get_metadata_retention(request):
+        return web.json_response({"success": True, **MetadataRegistry().get_retention_stats()})
@@ -15,6 +15,7 @@ from datetime import datetime
 
 # Logger导入
 from ..utils.logger import get_logger
+from ..utils.response_cache import JsonResponseCache
 logger = get_logger(__name__)
 
 # 插件目录
@@ -24,6 +25,8 @@ CUSTOM_NODE_DIR = os.path.abspath(os.path.join(PLUGIN_DIR, '..', '..'))
 DATA_FILE = os.path.join(PLUGIN_DIR, "data.json")
 DEFAULT_DATA_FILE = os.path.join(PLUGIN_DIR, "default.json")
 PREVIEW_DIR = os.path.join(PLUGIN_DIR, "preview")
+# GET /prompt_selector/data 的编码+压缩缓存，按 data.json 的 mtime/size 失效
+_data_response_cache = JsonResponseCache("prompt_selector/data")
 
 # === 数据安全工具函数 ===
 
@@ -147,6 +150,7 @@ def _atomic_save_json(file_path, data, create_backup=True):
         # 4. 原子重命名（覆盖旧文件）
         # os.replace 在 Windows 和 Unix 上都是原子操作
         os.replace(temp_path, file_path)
+        _data_response_cache.invalidate()
 
         logger.info(f"✓ 数据已安全保存: {os.path.basename(file_path)}")
 
@@ -214,14 +218,19 @@ class PromptSelector:
 
 # --- API 路由 ---
 
+def _read_data_file():
+    with open(DATA_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 @PromptServer.instance.routes.get("/prompt_selector/data")
 async def get_data(request):
-    if not os.path.exists(DATA_FILE):
+    try:
+        stat = os.stat(DATA_FILE)
+    except FileNotFoundError:
         return web.json_response({"error": "Data file not found"}, status=404)
     try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return web.json_response(data)
+        # 文件未变化时复用已编码/压缩的响应体，浏览器凭ETag获得304
+        return await _data_response_cache.respond(request, (stat.st_mtime_ns, stat.st_size), _read_data_file)
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
 
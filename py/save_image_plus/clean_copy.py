@@ -0,0 +1,111 @@
+"""
+纯净副本 (Save Image Plus clean copies)
+
+A clean copy is the saved image without its metadata. Instead of encoding
+the pixels a second time, the metadata is cut out of the already encoded
+file, so the compressed image data - and therefore every decoded pixel -
+is exactly the same as in the main file:
+
+* PNG  - drop the tEXt/zTXt/iTXt chunks
+* JPEG - drop the APP1 "Exif" segments before the scan data
+* WEBP - drop the EXIF chunk; a VP8X header left with nothing to describe
+  is collapsed back to the simple format, as the encoder writes it
+
+For what Pillow writes this is byte-for-byte the file a metadata-free save
+produces. Anything unexpected raises ValueError and the caller falls back
+to re-encoding.
+"""
+
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_TEXT_CHUNKS = {b"tEXt", b"zTXt", b"iTXt"}
+
+# VP8X feature flags
+_WEBP_EXIF_FLAG = 0x08
+_WEBP_EXTENDED_FLAGS = 0x10 | 0x20 | 0x04 | 0x02  # alpha, ICC, XMP, animation
+
+
+def strip_png_text(data: bytes) -> bytes:
+    """PNG bytes without text chunks (A1111 parameters, prompt, workflow)"""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    parts = [PNG_SIGNATURE]
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        if pos + 8 > len(data):
+            raise ValueError("truncated PNG chunk")
+        length = struct.unpack(">I", data[pos:pos + 4])[0]
+        chunk_type = data[pos + 4:pos + 8]
+        end = pos + 12 + length
+        if end > len(data):
+            raise ValueError("truncated PNG chunk")
+        if chunk_type not in PNG_TEXT_CHUNKS:
+            parts.append(data[pos:end])
+        pos = end
+        if chunk_type == b"IEND":
+            break
+    return b"".join(parts)
+
+
+def strip_jpeg_exif(data: bytes) -> bytes:
+    """JPEG bytes without APP1 Exif segments"""
+    if not data.startswith(b"\xff\xd8"):
+        raise ValueError("not a JPEG file")
+    parts = [data[:2]]
+    pos = 2
+    while True:
+        if pos + 4 > len(data) or data[pos] != 0xFF:
+            raise ValueError("malformed JPEG segment")
+        marker = data[pos + 1]
+        if marker == 0xDA:  # SOS: entropy-coded data follows, copy the rest as is
+            parts.append(data[pos:])
+            return b"".join(parts)
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        end = pos + 2 + length
+        if end > len(data):
+            raise ValueError("truncated JPEG segment")
+        if not (marker == 0xE1 and data[pos + 4:pos + 10] == b"Exif\x00\x00"):
+            parts.append(data[pos:end])
+        pos = end
+
+
+def strip_webp_exif(data: bytes) -> bytes:
+    """WEBP bytes without the EXIF chunk"""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WEBP":
+        raise ValueError("not a WEBP file")
+    chunks = []
+    pos = 12
+    while pos < len(data):
+        if pos + 8 > len(data):
+            raise ValueError("truncated WEBP chunk")
+        size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        end = pos + 8 + size + (size & 1)
+        if end > len(data):
+            raise ValueError("truncated WEBP chunk")
+        chunks.append(data[pos:end])
+        pos = end
+
+    if not chunks or chunks[0][:4] != b"VP8X":
+        return data  # simple format has no room for EXIF
+    chunks = [chunk for chunk in chunks if chunk[:4] != b"EXIF"]
+    vp8x = bytearray(chunks[0])
+    vp8x[8] &= ~_WEBP_EXIF_FLAG & 0xFF
+    if not vp8x[8] & _WEBP_EXTENDED_FLAGS and len(chunks) == 2 and chunks[1][:4] in (b"VP8 ", b"VP8L"):
+        chunks = chunks[1:]
+    else:
+        chunks[0] = bytes(vp8x)
+
+    body = b"WEBP" + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def strip_metadata(data: bytes, file_format: str) -> bytes:
+    """Clean copy of an encoded PNG/JPEG/WEBP file"""
+    if file_format == "PNG":
+        return strip_png_text(data)
+    if file_format == "JPEG":
+        return strip_jpeg_exif(data)
+    if file_format == "WEBP":
+        return strip_webp_exif(data)
+    raise ValueError(f"unsupported format: {file_format}")
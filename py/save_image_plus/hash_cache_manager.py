@@ -2,132 +2,134 @@
 哈希缓存管理器 - 用于加速模型文件哈希计算
 
 功能：
-- 内存LRU缓存（基于文件路径+修改时间）
-- JSON持久化存储
+- SQLite 持久化存储（WAL 模式，每条记录单独写入，无条目上限）
+- 以文件路径为键，用 size + mtime_ns + inode 校验
+- 只在查询时校验（一次 os.stat），启动时不扫描已缓存的文件
 - 线程安全操作
-- 自动清理过期缓存
+- 首次启动时导入旧的 hash_cache.json
 """
 
 import os
 import json
+import time
+import sqlite3
 import hashlib
 import threading
 from typing import Dict, Optional, Tuple
 from pathlib import Path
-from collections import OrderedDict
 from ..utils.logger import get_logger
 
 # 初始化logger
 logger = get_logger(__name__)
 
+# (size, mtime_ns, inode)
+FileSignature = Tuple[int, int, int]
 
-class HashCacheManager:
-    """哈希缓存管理器 - 提供高速缓存和持久化支持"""
 
-    # 类级别的单例实例和锁
-    _instance = None
-    _instance_lock = threading.Lock()
+def file_signature(file_path: str) -> Optional[FileSignature]:
+    """文件的校验签名；文件不存在时返回 None"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_ino
 
-    def __new__(cls, cache_file: str = None, max_memory_entries: int = 100):
-        """单例模式，确保全局只有一个缓存实例"""
-        if cls._instance is None:
-            with cls._instance_lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-        return cls._instance
 
-    def __init__(self, cache_file: str = None, max_memory_entries: int = 100):
+class HashCacheManager:
+    """哈希缓存管理器 - 提供高速缓存和持久化支持"""
+
+    def __init__(self, cache_file: str = None, legacy_json_file: str = None):
         """
         初始化缓存管理器
 
         Args:
-            cache_file: 缓存文件路径，默认为当前目录下的 hash_cache.json
-            max_memory_entries: 内存缓存最大条目数（LRU）
+            cache_file: SQLite 数据库路径，默认为当前目录下的 hash_cache.db
+            legacy_json_file: 旧版 JSON 缓存，数据库新建时导入一次，默认为 hash_cache.json
         """
-        # 避免重复初始化
-        if hasattr(self, '_initialized'):
-            return
-
-        self._initialized = True
-        self.max_memory_entries = max_memory_entries
+        current_dir = Path(__file__).parent
+        self.cache_file = Path(cache_file) if cache_file else current_dir / "hash_cache.db"
+        self.legacy_json_file = Path(legacy_json_file) if legacy_json_file else current_dir / "hash_cache.json"
         self._cache_lock = threading.Lock()
 
-        # 设置缓存文件路径
-        if cache_file is None:
-            current_dir = Path(__file__).parent
-            cache_file = current_dir / "hash_cache.json"
-        self.cache_file = Path(cache_file)
-
-        # 内存缓存：{(file_path, mtime): hash_value}
-        self._memory_cache: OrderedDict[Tuple[str, float], str] = OrderedDict()
+        # 已查询过的记录：{file_path: (signature, hash_value)}，None 表示数据库中没有
+        self._memory_cache: Dict[str, Optional[Tuple[FileSignature, str]]] = {}
 
         # 统计信息
         self._stats = {
             'hits': 0,
             'misses': 0,
+            'stale': 0,
             'disk_loads': 0,
             'disk_saves': 0
         }
 
-        # 从磁盘加载缓存
-        self._load_cache_from_disk()
-
-    def _load_cache_from_disk(self):
-        """从JSON文件加载缓存"""
-        if not self.cache_file.exists():
+        is_new = not self.cache_file.exists()
+        self._connection = self._connect()
+        if is_new:
+            self._import_legacy_json()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self.cache_file), timeout=5.0, check_same_thread=False)
+        connection.execute("PRAGMA busy_timeout=5000")
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    hashed_at INTEGER NOT NULL
+                )
+                """
+            )
+        return connection
+
+    def _import_legacy_json(self):
+        """导入旧版 JSON 缓存（按旧规则校验 mtime，允许1秒误差）"""
+        if not self.legacy_json_file.exists():
             return
 
         try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
+            with open(self.legacy_json_file, 'r', encoding='utf-8') as f:
                 disk_cache = json.load(f)
 
-            # 将磁盘缓存加载到内存，但不超过最大条目数
-            loaded_count = 0
+            rows = []
             for file_path, cache_data in disk_cache.items():
-                if loaded_count >= self.max_memory_entries:
-                    break
-
-                # 验证文件是否仍存在且修改时间匹配
-                if os.path.exists(file_path):
-                    cached_mtime = cache_data.get('mtime')
-                    cached_hash = cache_data.get('hash')
-
-                    if cached_mtime and cached_hash:
-                        current_mtime = os.path.getmtime(file_path)
-                        # 如果文件未修改，加载到内存
-                        if abs(current_mtime - cached_mtime) < 1.0:  # 允许1秒误差
-                            cache_key = (file_path, current_mtime)
-                            self._memory_cache[cache_key] = cached_hash
-                            loaded_count += 1
-
+                cached_mtime = cache_data.get('mtime')
+                cached_hash = cache_data.get('hash')
+                signature = file_signature(file_path)
+                if not cached_mtime or not cached_hash or signature is None:
+                    continue
+                if abs(signature[1] / 1e9 - cached_mtime) < 1.0:
+                    rows.append((file_path, *signature, cached_hash, int(time.time())))
+
+            with self._cache_lock, self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO file_hashes(path, size, mtime_ns, inode, hash, hashed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
             self._stats['disk_loads'] += 1
-            logger.info(f"从磁盘加载了 {loaded_count} 条缓存记录")
+            logger.info(f"从 {self.legacy_json_file.name} 导入了 {len(rows)} 条缓存记录")
 
         except Exception as e:
-            logger.error(f"加载缓存文件失败: {e}")
-
-    def _save_cache_to_disk(self):
-        """保存缓存到JSON文件"""
-        try:
-            # 准备保存的数据
-            disk_cache = {}
-            for (file_path, mtime), hash_value in self._memory_cache.items():
-                disk_cache[file_path] = {
-                    'mtime': mtime,
-                    'hash': hash_value
-                }
-
-            # 确保目录存在
-            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
-
-            # 写入文件
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(disk_cache, f, indent=2, ensure_ascii=False)
-
-            self._stats['disk_saves'] += 1
-
-        except Exception as e:
-            logger.error(f"保存缓存文件失败: {e}")
+            logger.error(f"导入旧缓存文件失败: {e}")
+
+    def _lookup(self, file_path: str) -> Optional[Tuple[FileSignature, str]]:
+        # 调用方持有 _cache_lock
+        if file_path in self._memory_cache:
+            return self._memory_cache[file_path]
+        row = self._connection.execute(
+            "SELECT size, mtime_ns, inode, hash FROM file_hashes WHERE path = ?", (file_path,)
+        ).fetchone()
+        entry = ((row[0], row[1], row[2]), row[3]) if row else None
+        self._memory_cache[file_path] = entry
+        return entry
 
     def get_hash(self, file_path: str) -> Optional[str]:
         """
@@ -137,58 +139,55 @@ class HashCacheManager:
             file_path: 文件路径
 
         Returns:
-            哈希值，如果缓存未命中则返回 None
+            哈希值，如果缓存未命中或文件已改变则返回 None
         """
-        if not os.path.exists(file_path):
+        signature = file_signature(file_path)
+        if signature is None:
             return None
 
-        # 获取文件修改时间
-        mtime = os.path.getmtime(file_path)
-        cache_key = (file_path, mtime)
-
         with self._cache_lock:
-            # 检查内存缓存
-            if cache_key in self._memory_cache:
-                # LRU: 移动到末尾（最近使用）
-                self._memory_cache.move_to_end(cache_key)
+            entry = self._lookup(file_path)
+            if entry is not None and entry[0] == signature:
                 self._stats['hits'] += 1
-                return self._memory_cache[cache_key]
-
-            # 检查是否有该文件的旧缓存（不同mtime）
-            for (cached_path, cached_mtime), cached_hash in list(self._memory_cache.items()):
-                if cached_path == file_path and cached_mtime != mtime:
-                    # 文件已修改，删除旧缓存
-                    del self._memory_cache[(cached_path, cached_mtime)]
-
+                return entry[1]
+
+            if entry is not None:
+                # 文件已修改或被替换，删除旧缓存
+                self._stats['stale'] += 1
+                self._memory_cache[file_path] = None
+                with self._connection:
+                    self._connection.execute("DELETE FROM file_hashes WHERE path = ?", (file_path,))
             self._stats['misses'] += 1
             return None
 
-    def set_hash(self, file_path: str, hash_value: str, auto_save: bool = True):
+    def set_hash(self, file_path: str, hash_value: str, auto_save: bool = True,
+                 signature: Optional[FileSignature] = None):
         """
         设置文件哈希值到缓存
 
         Args:
             file_path: 文件路径
             hash_value: 哈希值
-            auto_save: 是否自动保存到磁盘
+            auto_save: 兼容旧接口；每条记录都会立即写入数据库
+            signature: 计算哈希前取得的文件签名（默认现在读取）
         """
-        if not os.path.exists(file_path):
+        if signature is None:
+            signature = file_signature(file_path)
+        if signature is None:
             return
 
-        mtime = os.path.getmtime(file_path)
-        cache_key = (file_path, mtime)
-
         with self._cache_lock:
-            # 如果缓存已满，删除最旧的条目（LRU）
-            if len(self._memory_cache) >= self.max_memory_entries:
-                self._memory_cache.popitem(last=False)
-
-            # 添加到缓存
-            self._memory_cache[cache_key] = hash_value
-
-            # 自动保存到磁盘
-            if auto_save:
-                self._save_cache_to_disk()
+            self._memory_cache[file_path] = (signature, hash_value)
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO file_hashes(path, size, mtime_ns, inode, hash, hashed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (file_path, *signature, hash_value, int(time.time())),
+                    )
+                self._stats['disk_saves'] += 1
+            except sqlite3.Error as e:
+                logger.error(f"保存缓存记录失败: {e}")
 
     def calculate_and_cache_hash(self, file_path: str, block_size: int = 128 * 1024) -> str:
         """
@@ -206,6 +205,9 @@ class HashCacheManager:
         if cached_hash:
             return cached_hash
 
+        # 计算前记录签名：计算期间文件被修改时，记录会在下次查询时失效
+        signature = file_signature(file_path)
+
         # 计算哈希
         sha256_hash = hashlib.sha256()
         with open(file_path, "rb") as f:
@@ -215,7 +217,7 @@ class HashCacheManager:
         hash_result = sha256_hash.hexdigest()[:10].lower()
 
         # 保存到缓存
-        self.set_hash(file_path, hash_result)
+        self.set_hash(file_path, hash_result, signature=signature)
 
         return hash_result
 
@@ -224,13 +226,12 @@ class HashCacheManager:
         清空缓存
 
         Args:
-            save_to_disk: 清空前是否保存到磁盘
+            save_to_disk: 兼容旧接口（记录总是已经写入数据库）
         """
         with self._cache_lock:
-            if save_to_disk:
-                self._save_cache_to_disk()
-
             self._memory_cache.clear()
+            with self._connection:
+                self._connection.execute("DELETE FROM file_hashes")
             logger.info("缓存已清空")
 
     def get_stats(self) -> Dict:
@@ -238,12 +239,14 @@ class HashCacheManager:
         with self._cache_lock:
             total_requests = self._stats['hits'] + self._stats['misses']
             hit_rate = (self._stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+            entries = self._connection.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0]
 
             return {
-                'memory_entries': len(self._memory_cache),
-                'max_entries': self.max_memory_entries,
+                'entries': entries,
+                'memory_entries': sum(1 for entry in self._memory_cache.values() if entry),
                 'hits': self._stats['hits'],
                 'misses': self._stats['misses'],
+                'stale': self._stats['stale'],
                 'hit_rate': f"{hit_rate:.2f}%",
                 'disk_loads': self._stats['disk_loads'],
                 'disk_saves': self._stats['disk_saves']
@@ -255,35 +258,37 @@ class HashCacheManager:
         logger.info("\n" + "=" * 50)
         logger.info("📊 哈希缓存统计信息")
         logger.info("=" * 50)
-        logger.info(f"内存缓存条目: {stats['memory_entries']} / {stats['max_entries']}")
+        logger.info(f"缓存条目: {stats['entries']}（内存 {stats['memory_entries']}）")
         logger.info(f"缓存命中: {stats['hits']} 次")
-        logger.info(f"缓存未命中: {stats['misses']} 次")
+        logger.info(f"缓存未命中: {stats['misses']} 次（文件已改变 {stats['stale']} 次）")
         logger.info(f"命中率: {stats['hit_rate']}")
-        logger.info(f"磁盘加载: {stats['disk_loads']} 次")
-        logger.info(f"磁盘保存: {stats['disk_saves']} 次")
+        logger.info(f"旧缓存导入: {stats['disk_loads']} 次")
+        logger.info(f"磁盘写入: {stats['disk_saves']} 次")
         logger.info("=" * 50 + "\n")
 
     def remove_file_cache(self, file_path: str):
         """
-        删除指定文件的所有缓存
+        删除指定文件的缓存
 
         Args:
             file_path: 文件路径
         """
         with self._cache_lock:
-            keys_to_remove = [
-                key for key in self._memory_cache.keys()
-                if key[0] == file_path
-            ]
-            for key in keys_to_remove:
-                del self._memory_cache[key]
+            self._memory_cache[file_path] = None
+            with self._connection:
+                self._connection.execute("DELETE FROM file_hashes WHERE path = ?", (file_path,))
 
     def force_save(self):
-        """强制保存当前缓存到磁盘"""
+        """强制保存当前缓存到磁盘（WAL 检查点）"""
         with self._cache_lock:
-            self._save_cache_to_disk()
+            self._connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
             logger.info("缓存已强制保存到磁盘")
 
+    def close(self):
+        """关闭数据库连接"""
+        with self._cache_lock:
+            self._connection.close()
+
 
 # 全局缓存管理器实例
 _global_cache_manager = None
@@ -0,0 +1,269 @@
+"""
+保存图像增强版的后台写入 (Save Image Plus background writer)
+
+SaveImagePlus converts the batch to uint8 arrays, builds its metadata and
+picks every file name on the execution thread, then hands the encoding and
+the disk write to a small thread pool so the next prompt can start
+sampling. PNG/JPEG/WEBP encoding and file I/O release the GIL, so the
+images of one batch are encoded on several cores at once and in parallel
+with the sampler. Each image is encoded once: its clean copy is the same
+encoded file with the metadata cut out (see clean_copy.py).
+Threads rather than processes: the pixels are not copied to a child
+process, and nothing has to be re-imported inside ComfyUI's process.
+
+* Worker cap - "encode_workers" in config.json; 0 picks half the CPUs (at
+  most 4) so encoding does not starve the sampler's own CPU threads.
+* Ordering - submit_batch() returns futures in file order; counters and
+  file names are fixed before anything is queued.
+* Backpressure - at most `max_pending` files wait in the pool; submit()
+  blocks while it is full, so a fast workflow cannot queue unbounded RAM.
+* Failures - logged and sent to the frontend as a "save_image_plus_error"
+  websocket event (the node has already returned).
+* Shutdown - pending writes are flushed from an atexit handler.
+
+Files are written to a temporary name and renamed into place, so nothing
+ever sees a half-written image. Because queued images are not on disk yet,
+folder_paths.get_save_image_path cannot see them when it picks the next
+counter; reserve_counters() remembers the counters handed out in-process.
+"""
+
+import atexit
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from .clean_copy import strip_metadata
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ImageSaveJob:
+    """Everything needed to encode and write one image (and its clean copy)"""
+
+    __slots__ = ("pixels", "file_path", "file_format", "quality", "compress_level",
+                 "text_chunks", "exif_comment", "clean_path")
+
+    def __init__(self, pixels, file_path: str, file_format: str, quality: int = 95,
+                 compress_level: int = 4, text_chunks: Optional[List[Tuple[str, str]]] = None,
+                 exif_comment: Optional[str] = None, clean_path: Optional[str] = None):
+        self.pixels = pixels
+        self.file_path = file_path
+        self.file_format = file_format
+        self.quality = quality
+        self.compress_level = compress_level
+        # PNG tEXt chunks, in order (A1111 "parameters", then the workflow)
+        self.text_chunks = text_chunks or []
+        # JPEG/WEBP EXIF UserComment
+        self.exif_comment = exif_comment
+        self.clean_path = clean_path
+
+
+_reserved_counters: Dict[Tuple[str, str], int] = {}
+_reserved_lock = threading.Lock()
+
+
+def reserve_counters(folder: str, filename: str, counter: int, count: int) -> int:
+    """
+    First of `count` consecutive file counters for folder/filename
+
+    counter is what get_save_image_path found on disk; counters already
+    handed to images that may still be queued are skipped.
+    """
+    key = (os.path.normcase(os.path.abspath(folder)), filename)
+    with _reserved_lock:
+        start = max(counter, _reserved_counters.get(key, 0))
+        _reserved_counters[key] = start + count
+        return start
+
+
+def _write_atomic(file_path: str, data: bytes):
+    temp_path = f"{file_path}.part"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _encode(img, **params) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, **params)
+    return buffer.getvalue()
+
+
+def _encode_clean(img, job: ImageSaveJob) -> bytes:
+    if job.file_format == "PNG":
+        return _encode(img, format="PNG", compress_level=job.compress_level)
+    if job.file_format == "JPEG":
+        return _encode(img, format="JPEG", quality=job.quality)
+    return _encode(img, format="WEBP", quality=job.quality, method=6)
+
+
+def write_image(job: ImageSaveJob):
+    """Encode and write one job (any thread)"""
+    img = Image.fromarray(job.pixels)
+
+    if job.file_format == "PNG":
+        metadata_png = PngInfo()
+        for key, value in job.text_chunks:
+            metadata_png.add_text(key, value)
+        data = _encode(img, format="PNG", pnginfo=metadata_png, compress_level=job.compress_level)
+    else:
+        exif_data = img.getexif()
+        # UserComment 字段（标签 0x9286）
+        if job.exif_comment:
+            exif_data[0x9286] = job.exif_comment.encode('utf-16')
+        if job.file_format == "JPEG":
+            data = _encode(img, format="JPEG", quality=job.quality, exif=exif_data)
+        else:  # WEBP
+            data = _encode(img, format="WEBP", quality=job.quality, exif=exif_data, method=6)
+    _write_atomic(job.file_path, data)
+
+    # 纯净副本（无元数据和工作流）：从已编码的数据中剔除元数据，不再重新编码
+    if job.clean_path:
+        try:
+            clean_data = strip_metadata(data, job.file_format)
+        except ValueError as e:
+            logger.warning(f"无法剔除元数据，重新编码纯净副本: {e}")
+            clean_data = _encode_clean(img, job)
+        _write_atomic(job.clean_path, clean_data)
+
+
+def default_encode_workers() -> int:
+    """Half the CPUs, at most 4: leaves cores for the sampler and the UI"""
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def report_save_failure(job: ImageSaveJob, error: BaseException):
+    """Tell the frontend that a background save failed"""
+    try:
+        from server import PromptServer
+        PromptServer.instance.send_sync("save_image_plus_error", {
+            "filename": os.path.basename(job.file_path),
+            "error": str(error),
+        })
+    except Exception as e:
+        logger.debug(f"无法发送保存失败通知: {e}")
+
+
+class AsyncImageWriter:
+    """Bounded background pool that encodes and writes ImageSaveJobs"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 16,
+                 on_error: Callable[[ImageSaveJob, BaseException], None] = report_save_failure,
+                 background: bool = True):
+        self.workers = max(1, int(workers))
+        # False: callers wait for every batch (config "async_save")
+        self.background = background
+        self.max_pending = max(1, int(max_pending))
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="SaveImagePlus")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._closed = False
+        self.stats = {"submitted": 0, "written": 0, "failed": 0, "blocked_ms": 0.0}
+
+    def submit(self, job: ImageSaveJob) -> Future:
+        """Queue a job; blocks while max_pending jobs are already waiting"""
+        if self._closed:
+            raise RuntimeError("image writer is shut down")
+        started = time.perf_counter()
+        self._slots.acquire()
+        blocked_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            future = self._executor.submit(self._run, job)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.stats["submitted"] += 1
+            self.stats["blocked_ms"] += blocked_ms
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def submit_batch(self, jobs: List[ImageSaveJob]) -> List[Future]:
+        """Queue a batch; futures come back in file order"""
+        return [self.submit(job) for job in jobs]
+
+    def _run(self, job: ImageSaveJob):
+        try:
+            write_image(job)
+        except Exception as e:
+            logger.error(f"后台保存图像失败 ({job.file_path}): {e}")
+            with self._lock:
+                self.stats["failed"] += 1
+            if self.on_error:
+                self.on_error(job, e)
+            raise
+        with self._lock:
+            self.stats["written"] += 1
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for every queued job; False if the timeout expired first"""
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return True
+        _, not_done = wait(pending, timeout=timeout)
+        return not not_done
+
+    def shutdown(self):
+        """Flush pending writes and stop the pool"""
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            pending = len(self._pending)
+        if pending:
+            logger.info(f"等待 {pending} 张图像写入完成...")
+        self._executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "pending": len(self._pending),
+                    "workers": self.workers, "max_pending": self.max_pending}
+
+
+_writer: Optional[AsyncImageWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_image_writer() -> AsyncImageWriter:
+    """
+    Process-wide writer configured from the "save_image_plus" section of
+    config.json; with async_save disabled it still encodes in parallel,
+    but the node waits for its batch
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            from ..utils.config_manager import config_manager
+
+            workers = config_manager.get_value("save_image_plus.encode_workers", 0)
+            _writer = AsyncImageWriter(
+                workers=workers if workers and workers > 0 else default_encode_workers(),
+                max_pending=config_manager.get_value("save_image_plus.max_pending_images", 16),
+                background=config_manager.get_value("save_image_plus.async_save", True),
+            )
+            atexit.register(_writer.shutdown)
+        return _writer
@@ -0,0 +1,322 @@
+"""
+模型哈希后台预计算 (Save Image Plus model pre-hasher)
+
+SaveImagePlus writes the A1111 "Model hash"/"Lora hashes" fields, which
+are the first 10 hex digits of the full-file SHA256. Hashing a multi-GB
+checkpoint takes seconds, so the first save after new models are added
+used to block on it. ModelPreHasher fills the hash cache ahead of time:
+
+* Discovery - the checkpoints / diffusion_models / unet / loras folders of
+  folder_paths are listed shortly after startup and again every
+  `rescan_interval` seconds (folder_paths caches the listing and only
+  re-reads folders whose mtime changed, so a rescan is cheap); files the
+  cache does not know, or whose size/mtime/inode changed, are hashed.
+* Low priority - one background thread, reads of `buffer_mb` and at most
+  `max_mb_per_sec`, so it does not compete with model loading for disk.
+* No duplicate work - hash_file() (the save-time path) returns the cached
+  hash, or waits for the hash that is already being computed; waiting
+  lifts the throttle for that file. Otherwise it hashes at full speed,
+  with hashlib.file_digest where available (Python 3.11+).
+
+Progress is logged and served from GET /danbooru/save_image_plus/prehash;
+POST /danbooru/save_image_plus/prehash/rescan asks for a rescan now.
+"""
+
+import atexit
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from .hash_cache_manager import file_signature
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# The folders SaveImagePlus looks models up in
+MODEL_FOLDER_TYPES = ("checkpoints", "diffusion_models", "unet", "loras")
+HASH_LENGTH = 10
+
+
+class _InFlight:
+    """A hash being computed; other callers wait on `done`"""
+
+    __slots__ = ("done", "urgent", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        # Set when a save is waiting: stop throttling this file
+        self.urgent = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class ModelPreHasher:
+    """Background model hashing on top of the hash cache"""
+
+    def __init__(self, cache=None, folder_types: Sequence[str] = MODEL_FOLDER_TYPES,
+                 max_mb_per_sec: float = 200, buffer_mb: int = 4,
+                 rescan_interval: float = 300, start_delay: float = 30):
+        self.cache = cache
+        self.folder_types = tuple(folder_types)
+        self.max_bytes_per_sec = max(0.0, float(max_mb_per_sec)) * 1024 * 1024
+        self.buffer_size = max(1, int(buffer_mb)) * 1024 * 1024
+        self.rescan_interval = max(1.0, float(rescan_interval))
+        self.start_delay = max(0.0, float(start_delay))
+
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.progress = {
+            "state": "stopped",
+            "models": 0,
+            "pending": 0,
+            "hashed": 0,
+            "failed": 0,
+            "current": None,
+            "current_bytes": 0,
+            "current_size": 0,
+            "last_scan": None,
+            "waited": 0,
+        }
+
+    # ---- hashing ----
+
+    def hash_file(self, file_path: str) -> str:
+        """
+        Hash of one model file for a save: cached, in flight, or computed now
+
+        Raises:
+            OSError: The file cannot be read
+        """
+        if self.cache:
+            cached = self.cache.get_hash(file_path)
+            if cached:
+                return cached
+
+        with self._lock:
+            entry = self._in_flight.get(file_path)
+            owner = entry is None
+            if owner:
+                entry = self._in_flight[file_path] = _InFlight()
+            else:
+                self.progress["waited"] += 1
+
+        if not owner:
+            logger.debug(f"等待后台哈希计算完成: {os.path.basename(file_path)}")
+            entry.urgent.set()
+            entry.done.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.result
+
+        return self._compute(file_path, entry, background=False)
+
+    def _compute(self, file_path: str, entry: _InFlight, background: bool) -> str:
+        # Caller owns `entry`; always resolves and unregisters it
+        try:
+            signature = file_signature(file_path)
+            if signature is None:
+                raise FileNotFoundError(file_path)
+            hash_result = self._digest(file_path, entry, background)[:HASH_LENGTH].lower()
+            if self.cache:
+                # Signature from before hashing: a file changed mid-hash misses next time
+                self.cache.set_hash(file_path, hash_result, signature=signature)
+            entry.result = hash_result
+            return hash_result
+        except BaseException as e:
+            entry.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(file_path, None)
+            entry.done.set()
+
+    def _digest(self, file_path: str, entry: _InFlight, background: bool) -> str:
+        with open(file_path, "rb", buffering=0) as f:
+            if not background and hasattr(hashlib, "file_digest"):
+                return hashlib.file_digest(f, "sha256").hexdigest()
+
+            sha256_hash = hashlib.sha256()
+            buffer = bytearray(self.buffer_size)
+            view = memoryview(buffer)
+            started = time.monotonic()
+            read = 0
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                sha256_hash.update(view[:count])
+                read += count
+                if not background:
+                    continue
+                self.progress["current_bytes"] = read
+                if self._stop.is_set():
+                    raise InterruptedError("prehasher stopped")
+                if self.max_bytes_per_sec and not entry.urgent.is_set():
+                    ahead = read / self.max_bytes_per_sec - (time.monotonic() - started)
+                    if ahead > 0:
+                        entry.urgent.wait(ahead)
+            return sha256_hash.hexdigest()
+
+    # ---- discovery ----
+
+    def enumerate_models(self) -> List[str]:
+        """Full paths of every model file in the watched folder types"""
+        import folder_paths
+
+        paths = []
+        seen = set()
+        for folder_type in self.folder_types:
+            try:
+                names = folder_paths.get_filename_list(folder_type)
+            except Exception:
+                continue
+            for name in names:
+                file_path = folder_paths.get_full_path(folder_type, name)
+                if file_path and file_path not in seen:
+                    seen.add(file_path)
+                    paths.append(file_path)
+        return paths
+
+    def scan_once(self):
+        """List the model folders and hash every file the cache does not know"""
+        self._set_progress(state="scanning")
+        paths = self.enumerate_models()
+        pending = [path for path in paths if self.cache.get_hash(path) is None]
+        self._set_progress(models=len(paths), pending=len(pending), last_scan=time.time())
+        if pending:
+            logger.info(f"后台预计算 {len(pending)} 个模型哈希（共 {len(paths)} 个模型）")
+
+        hashed = 0
+        for file_path in pending:
+            if self._stop.is_set():
+                break
+            with self._lock:
+                if file_path in self._in_flight:
+                    # A save is hashing it right now
+                    self.progress["pending"] -= 1
+                    continue
+                entry = self._in_flight[file_path] = _InFlight()
+            signature = file_signature(file_path)
+            self._set_progress(state="hashing", current=os.path.basename(file_path),
+                               current_bytes=0, current_size=signature[0] if signature else 0)
+            try:
+                self._compute(file_path, entry, background=True)
+                hashed += 1
+                with self._lock:
+                    self.progress["hashed"] += 1
+            except InterruptedError:
+                break
+            except Exception as e:
+                logger.warning(f"后台计算模型哈希失败 ({file_path}): {e}")
+                with self._lock:
+                    self.progress["failed"] += 1
+            finally:
+                with self._lock:
+                    self.progress["pending"] -= 1
+
+        self._set_progress(state="idle", current=None, current_bytes=0, current_size=0)
+        if hashed:
+            logger.info(f"后台预计算完成: {hashed} 个模型哈希")
+
+    # ---- thread ----
+
+    def start(self):
+        """Start the background thread (no-op without a hash cache)"""
+        if self.cache is None or self._thread is not None:
+            return
+        self._set_progress(state="waiting")
+        self._thread = threading.Thread(target=self._run, name="ModelPreHasher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        if self._stop.wait(self.start_delay):
+            return
+        while not self._stop.is_set():
+            try:
+                self.scan_once()
+            except Exception as e:
+                logger.error(f"模型哈希预计算出错: {e}")
+                self._set_progress(state="idle")
+            self._wake.wait(self.rescan_interval)
+            self._wake.clear()
+        self._set_progress(state="stopped")
+
+    def request_rescan(self):
+        """Rescan the model folders now instead of at the next interval"""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = 5):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            for entry in self._in_flight.values():
+                entry.urgent.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _set_progress(self, **values):
+        with self._lock:
+            self.progress.update(values)
+
+    def get_progress(self) -> Dict:
+        with self._lock:
+            return {**self.progress, "in_flight": len(self._in_flight)}
+
+
+_hasher: Optional[ModelPreHasher] = None
+_hasher_lock = threading.Lock()
+
+
+def get_model_hasher() -> ModelPreHasher:
+    """Process-wide hasher configured from the "model_prehash" section of config.json"""
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            from ..utils.config_manager import config_manager
+
+            try:
+                from .hash_cache_manager import get_cache_manager
+                cache = get_cache_manager()
+            except Exception as e:
+                logger.warning(f"哈希缓存不可用，模型哈希不会被缓存: {e}")
+                cache = None
+
+            _hasher = ModelPreHasher(
+                cache,
+                max_mb_per_sec=config_manager.get_value("model_prehash.max_mb_per_sec", 200),
+                buffer_mb=config_manager.get_value("model_prehash.buffer_mb", 4),
+                rescan_interval=config_manager.get_value("model_prehash.rescan_interval_seconds", 300),
+                start_delay=config_manager.get_value("model_prehash.start_delay_seconds", 30),
+            )
+        return _hasher
+
+
+def start_model_prehasher():
+    """Start background pre-hashing unless "model_prehash.enabled" is false"""
+    from ..utils.config_manager import config_manager
+
+    if not config_manager.get_value("model_prehash.enabled", True):
+        return
+    hasher = get_model_hasher()
+    hasher.start()
+    atexit.register(hasher.stop, 1)
+
+
+def setup_model_prehash_api():
+    """Register GET /danbooru/save_image_plus/prehash and POST .../prehash/rescan"""
+    from aiohttp import web
+    from server import PromptServer
+
+    @PromptServer.instance.routes.get("/danbooru/save_image_plus/prehash")
+    async def get_prehash_progress(request):
+        return web.json_response({"success": True, **get_model_hasher().get_progress()})
+
+    @PromptServer.instance.routes.post("/danbooru/save_image_plus/prehash/rescan")
+    async def rescan_models(request):
+        get_model_hasher().request_rescan()
+        return web.json_response({"success": True})
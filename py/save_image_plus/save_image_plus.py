@@ -3,17 +3,16 @@
 支持直接传入提示词和 LoRA 语法，使用独立的元数据收集模块
 """
 
-import hashlib
 import json
 import os
 import re
 from pathlib import Path
-from PIL import Image
-from PIL.PngImagePlugin import PngInfo
 import numpy as np
 import folder_paths
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Tuple
+from .image_writer import ImageSaveJob, get_image_writer, reserve_counters
+from .prehasher import get_model_hasher
 from ..utils.logger import get_logger
 
 # 初始化logger
@@ -374,29 +373,9 @@ class SaveImagePlus:
                 logger.warning(f"找不到 LoRA 文件: {lora_name}")
                 return ""
 
-            # 如果有缓存管理器，使用缓存计算
-            if self.hash_cache_manager:
-                cached_hash = self.hash_cache_manager.get_hash(lora_file)
-                if cached_hash:
-                    logger.debug(f"从缓存获取 LoRA 哈希: {lora_name} -> {cached_hash}")
-                    return cached_hash
-
-            logger.debug(f"计算 LoRA 哈希: {lora_name} -> {lora_file}")
-
-            # 计算完整文件的 SHA256 哈希（与 LoRA Manager 一致）
-            sha256_hash = hashlib.sha256()
-
-            with open(lora_file, "rb") as f:
-                # 使用 128KB 块大小，与 LoRA Manager 一致
-                for byte_block in iter(lambda: f.read(128 * 1024), b""):
-                    sha256_hash.update(byte_block)
-
-            # 返回前 10 个字符（保持小写，符合 A1111 标准）
-            hash_result = sha256_hash.hexdigest()[:10]
-
-            # 保存到缓存
-            if self.hash_cache_manager:
-                self.hash_cache_manager.set_hash(lora_file, hash_result)
+            # 命中缓存、等待后台预计算中的结果，或立即计算
+            # （完整文件 SHA256 的前 10 个字符，与 LoRA Manager 一致）
+            hash_result = get_model_hasher().hash_file(lora_file)
 
             logger.debug(f"计算哈希成功: {hash_result}")
             return hash_result
@@ -455,29 +434,9 @@ class SaveImagePlus:
                 logger.warning(f"找不到 checkpoint 文件: {checkpoint_name}")
                 return ""
 
-            # 如果有缓存管理器，使用缓存计算
-            if self.hash_cache_manager:
-                cached_hash = self.hash_cache_manager.get_hash(checkpoint_file)
-                if cached_hash:
-                    logger.debug(f"从缓存获取 checkpoint 哈希: {checkpoint_name} -> {cached_hash}")
-                    return cached_hash
-
-            logger.debug(f"计算 checkpoint 哈希: {checkpoint_name} -> {checkpoint_file}")
-
-            # 计算完整文件的 SHA256 哈希（与 LoRA Manager 一致）
-            sha256_hash = hashlib.sha256()
-
-            with open(checkpoint_file, "rb") as f:
-                # 使用 128KB 块大小，与 LoRA Manager 一致
-                for byte_block in iter(lambda: f.read(128 * 1024), b""):
-                    sha256_hash.update(byte_block)
-
-            # 返回前 10 个字符（保持小写，符合 A1111 标准）
-            hash_result = sha256_hash.hexdigest()[:10]
-
-            # 保存到缓存
-            if self.hash_cache_manager:
-                self.hash_cache_manager.set_hash(checkpoint_file, hash_result)
+            # 命中缓存、等待后台预计算中的结果，或立即计算
+            # （完整文件 SHA256 的前 10 个字符，与 LoRA Manager 一致）
+            hash_result = get_model_hasher().hash_file(checkpoint_file)
 
             logger.debug(f"计算 checkpoint 哈希成功: {hash_result}")
             return hash_result
@@ -852,75 +811,67 @@ class SaveImagePlus:
         if not os.path.exists(full_output_folder):
             os.makedirs(full_output_folder, exist_ok=True)
 
+        # 元数据在所有图像间共享，只构建一次
+        text_chunks = []
+        if file_format == "PNG":
+            # 嵌入 A1111 格式参数（formatted_metadata 现在是字符串）
+            if formatted_metadata:
+                text_chunks.append(("parameters", formatted_metadata))
+            # 嵌入 ComfyUI 工作流（受 embed_workflow 开关控制）
+            if embed_workflow and extra_pnginfo is not None:
+                for key, value in extra_pnginfo.items():
+                    text_chunks.append((key, json.dumps(value)))
+
+        # 后台写入中的文件尚未落盘，跳过已分配的序号
+        counter = reserve_counters(full_output_folder, filename, counter, len(images))
+
         results = list()
+        jobs = []
 
-        for batch_number, image in enumerate(images):
-            # 转换图像格式
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
+        # 整批一次转换为 uint8（单次设备拷贝），数组交给编码线程
+        batch_pixels = np.clip(255. * images.cpu().numpy(), 0, 255).astype(np.uint8)
 
+        for batch_number, pixels in enumerate(batch_pixels):
             # 构建文件名
             file = f"{filename}_{counter:05}_.{file_format.lower()}"
-            file_path = os.path.join(full_output_folder, file)
-
-            # 根据格式保存
-            if file_format == "PNG":
-                # PNG 格式：使用 PngInfo 嵌入元数据
-                metadata_png = PngInfo()
-
-                # 嵌入 A1111 格式参数（formatted_metadata 现在是字符串）
-                if formatted_metadata:
-                    metadata_png.add_text("parameters", formatted_metadata)
-
-                # 嵌入 ComfyUI 工作流（受 embed_workflow 开关控制）
-                if embed_workflow and extra_pnginfo is not None:
-                    for key, value in extra_pnginfo.items():
-                        metadata_png.add_text(key, json.dumps(value))
-
-                img.save(file_path, format="PNG", pnginfo=metadata_png, compress_level=self.compress_level)
-
-            elif file_format in ["JPEG", "WEBP"]:
-                # JPEG/WebP 格式：使用 exif 嵌入元数据
-                exif_data = img.getexif()
-
-                # UserComment 字段（标签 0x9286）（formatted_metadata 现在是字符串）
-                if formatted_metadata:
-                    exif_data[0x9286] = formatted_metadata.encode('utf-16')
-
-                if file_format == "JPEG":
-                    img.save(file_path, quality=quality, exif=exif_data)
-                else:  # WEBP
-                    img.save(file_path, quality=quality, exif=exif_data, method=6)
-
             results.append({
                 "filename": file,
                 "subfolder": subfolder,
                 "type": self.type
             })
 
-            # 保存纯净副本（无元数据和工作流）
+            # 纯净副本（无元数据和工作流）
+            clean_path = None
             if save_clean_copy:
-                # 生成纯净副本文件名
                 clean_file = f"{filename}_{counter:05}_no_metadata.{file_format.lower()}"
                 clean_path = os.path.join(full_output_folder, clean_file)
-
-                # 保存为原始图像，不嵌入任何元数据
-                if file_format == "PNG":
-                    img.save(clean_path, compress_level=self.compress_level)
-                elif file_format == "JPEG":
-                    img.save(clean_path, quality=quality)
-                else:  # WEBP
-                    img.save(clean_path, quality=quality, method=6)
-
-                # 添加到返回结果
                 results.append({
                     "filename": clean_file,
                     "subfolder": subfolder,
                     "type": self.type
                 })
 
+            jobs.append(ImageSaveJob(
+                pixels,
+                os.path.join(full_output_folder, file),
+                file_format,
+                quality=quality,
+                compress_level=self.compress_level,
+                text_chunks=text_chunks,
+                exif_comment=formatted_metadata if file_format in ["JPEG", "WEBP"] else None,
+                clean_path=clean_path,
+            ))
+
             counter += 1
 
+        # 整批（含纯净副本）并行编码，序号与文件名已在上面确定
+        writer = get_image_writer()
+        futures = writer.submit_batch(jobs)
+        # 预览需要文件已写入，等待本批完成；否则立即返回
+        if enable_preview or not writer.background:
+            for future in futures:
+                future.result()
+
         # 根据 enable_preview 控制是否显示预览
         if enable_preview:
             return {"ui": {"images": results}}
@@ -6,24 +6,35 @@ Provides two working modes for tag autocomplete:
    - Zero memory footprint
    - 2-5ms query latency (FTS5 optimized)
    - Always up-to-date
+   - Use the async_* methods from the event loop
 
 2. Memory cache mode (optional):
    - <1ms query latency
-   - ~100MB memory usage
+   - Compact sorted-array index (no per-prefix lists)
    - Manual sync required
 
 Thread-safe with RLock protection.
 """
 
+import asyncio
+import heapq
+import sys
 import threading
 import time
-import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
 
 # Logger导入
 from ...utils.logger import get_logger
 logger = get_logger(__name__)
 from typing import List, Dict, Optional, Tuple
 
+# Upper bound for every character, used to close a prefix range in the sorted key list
+_PREFIX_END = '\U0010ffff'
+# Seconds a worker thread waits for the event loop to run a database query
+_DB_CALL_TIMEOUT = 10.0
+
 
 class HotTagsCache:
     """
@@ -40,28 +51,38 @@ class HotTagsCache:
         Args:
             use_database_query: Whether to use database query mode
                 - True (default): Pass-through to database, no memory cache
-                - False: Use in-memory cache with prefix indexing
+                - False: Use in-memory cache with sorted-array indexing
         """
         # ========== Configuration ==========
         self.use_database_query = use_database_query
 
         # ========== Database Connection (lazy-loaded) ==========
         self.db_manager = None  # Will be initialized on first query
+        self._db_loop: Optional[asyncio.AbstractEventLoop] = None  # Loop that last ran an async query
 
         # ========== Memory Cache Data (only used when use_database_query=False) ==========
-        self._tags_list: List[Dict] = []  # All tags list
-        self._prefix_index: Dict[str, List[int]] = {}  # prefix -> tag indices
-        self._translation_index: Dict[str, List[int]] = {}  # character -> tag indices
+        # Tags ordered by post_count (descending); a tag's position is its rank
+        self._tags_list: List[Dict] = []
+        # Lowercased tag name per rank
+        self._names: List[str] = []
+        # Names and aliases in lexicographic order, and the rank each one points to
+        self._sorted_keys: List[str] = []
+        self._sorted_ranks = array('I')
+        # Translation per rank ('' when missing)
+        self._translations: List[str] = []
+        # character -> ranks (ascending, i.e. hottest first) of tags whose translation contains it
+        self._translation_index: Dict[str, array] = {}
 
         # ========== State Flags ==========
         self._loaded: bool = False  # Whether data is loaded
         self._last_update: float = 0.0  # Last update timestamp
+        self._memory_bytes: Optional[int] = None  # Measured lazily by get_stats()
 
         # ========== Thread Safety ==========
         self._lock = threading.RLock()  # Recursive lock for thread safety
 
         # ========== Query Result Cache (LRU) ==========
-        self._query_result_cache: Dict[str, Tuple[float, List[Dict]]] = {}
+        self._query_result_cache: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
         self._query_cache_size: int = 500  # Max 500 cached queries
         self._query_cache_ttl: float = 300.0  # Cache TTL: 5 minutes
 
@@ -78,7 +99,7 @@ class HotTagsCache:
             limit: Maximum number of results
 
         Returns:
-            List[Dict]: Matching tags
+            List[Dict]: Matching tags, highest post_count first
                 [{
                     'tag': str,
                     'category': int,
@@ -86,6 +107,10 @@ class HotTagsCache:
                     'translation_cn': str,
                     'aliases': List[str]
                 }, ...]
+
+        Note:
+            In database mode this blocks, so it cannot be used on the event loop
+            thread; use async_search_by_prefix there.
         """
         if not prefix:
             return []
@@ -93,12 +118,9 @@ class HotTagsCache:
         prefix = prefix.lower().strip()
 
         if self.use_database_query:
-            # Database mode: pass-through to database
-            return self._search_database_by_prefix(prefix, limit)
-        else:
-            # Memory mode: search in memory index
-            with self._lock:
-                return self._search_in_memory_by_prefix(prefix, limit)
+            return self._run_database_query('search_tags_by_prefix', prefix, limit)
+        with self._lock:
+            return self._search_in_memory_by_prefix(prefix, limit)
 
     def search_by_translation(self, query: str, limit: int = 10) -> List[Dict]:
         """
@@ -117,12 +139,9 @@ class HotTagsCache:
         query = query.strip()
 
         if self.use_database_query:
-            # Database mode: pass-through to database
-            return self._search_database_by_translation(query, limit)
-        else:
-            # Memory mode: search in memory index
-            with self._lock:
-                return self._search_in_memory_by_translation(query, limit)
+            return self._run_database_query('search_tags_by_translation', query, limit)
+        with self._lock:
+            return self._search_in_memory_by_translation(query, limit)
 
     def search_optimized(self, query: str, limit: int = 10,
                         search_type: str = "auto") -> List[Dict]:
@@ -142,25 +161,77 @@ class HotTagsCache:
 
         query = query.strip()
 
-        # Check query result cache
         cache_key = f"{query}:{limit}:{search_type}"
         cached_result = self._get_cached_query_result(cache_key)
         if cached_result is not None:
             return cached_result
 
-        # Auto-detect language
         if search_type == "auto":
             search_type = self._detect_language(query)
 
-        # Execute search
         if search_type == "chinese":
             results = self.search_by_translation(query, limit)
         else:
             results = self.search_by_prefix(query, limit)
 
-        # Cache the result
         self._cache_query_result(cache_key, results)
+        return results
+
+    # ==================== Async Query Interfaces ====================
 
+    async def async_search_by_prefix(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """Async version of search_by_prefix, safe to call from the event loop"""
+        if not prefix:
+            return []
+
+        prefix = prefix.lower().strip()
+
+        if self.use_database_query:
+            return await self._query_database('search_tags_by_prefix', prefix, limit)
+        with self._lock:
+            return self._search_in_memory_by_prefix(prefix, limit)
+
+    async def async_search_by_translation(self, query: str, limit: int = 10) -> List[Dict]:
+        """Async version of search_by_translation, safe to call from the event loop"""
+        if not query:
+            return []
+
+        query = query.strip()
+
+        if self.use_database_query:
+            return await self._query_database('search_tags_by_translation', query, limit)
+        with self._lock:
+            return self._search_in_memory_by_translation(query, limit)
+
+    async def async_search_optimized(self, query: str, limit: int = 10,
+                                     search_type: str = "auto") -> List[Dict]:
+        """
+        Async version of search_optimized
+
+        Database mode uses the FTS5-backed search_tags_optimized; results share
+        the same LRU query cache as the sync API.
+        """
+        if not query:
+            return []
+
+        query = query.strip()
+
+        cache_key = f"{query}:{limit}:{search_type}"
+        cached_result = self._get_cached_query_result(cache_key)
+        if cached_result is not None:
+            return cached_result
+
+        if search_type == "auto":
+            search_type = self._detect_language(query)
+
+        if self.use_database_query:
+            results = await self._query_database('search_tags_optimized', query, limit, search_type)
+        elif search_type == "chinese":
+            results = await self.async_search_by_translation(query, limit)
+        else:
+            results = await self.async_search_by_prefix(query, limit)
+
+        self._cache_query_result(cache_key, results)
         return results
 
     # ==================== Data Management Interfaces ====================
@@ -174,7 +245,7 @@ class HotTagsCache:
 
         Note:
             - Only effective when use_database_query=False
-            - Will build prefix and translation indices
+            - Builds the sorted key array and the translation character index
         """
         if self.use_database_query:
             logger.info("数据库查询模式下不需要加载标签到内存")
@@ -185,9 +256,12 @@ class HotTagsCache:
 
         with self._lock:
             try:
-                self._tags_list = tags
+                # Stable sort: equal post_count keeps the database order
+                self._tags_list = sorted(tags, key=lambda t: t.get('post_count') or 0, reverse=True)
                 self._build_prefix_index()
                 self._build_translation_index()
+                self._query_result_cache.clear()
+                self._memory_bytes = None
                 self._loaded = True
                 self._last_update = time.time()
 
@@ -202,10 +276,14 @@ class HotTagsCache:
     def clear(self) -> None:
         """Clear memory cache"""
         with self._lock:
-            self._tags_list.clear()
-            self._prefix_index.clear()
-            self._translation_index.clear()
+            self._tags_list = []
+            self._names = []
+            self._sorted_keys = []
+            self._sorted_ranks = array('I')
+            self._translations = []
+            self._translation_index = {}
             self._query_result_cache.clear()
+            self._memory_bytes = None
             self._loaded = False
             self._last_update = 0.0
             logger.info("缓存已清空")
@@ -231,167 +309,168 @@ class HotTagsCache:
             {
                 'mode': str,              # "database" or "memory"
                 'total_tags': int,        # Total number of tags
-                'memory_size_mb': float,  # Memory usage in MB
+                'memory_size_mb': float,  # Measured memory usage in MB
                 'index_count': int,       # Number of index entries
-                'last_update': float      # Last update timestamp
+                'last_update': float,     # Last update timestamp
+                'query_cache_size': int   # Cached query results
             }
         """
         with self._lock:
-            stats = {
+            if self._memory_bytes is None:
+                self._memory_bytes = self._calculate_memory_size()
+            return {
                 'mode': 'database' if self.use_database_query else 'memory',
                 'total_tags': len(self._tags_list),
-                'memory_size_mb': self._calculate_memory_size(),
-                'index_count': len(self._prefix_index) + len(self._translation_index),
+                'memory_size_mb': round(self._memory_bytes / (1024 * 1024), 2),
+                'index_count': len(self._sorted_keys) + len(self._translation_index),
                 'last_update': self._last_update,
+                'query_cache_size': len(self._query_result_cache),
             }
-            return stats
 
     # ==================== Internal Implementation Methods ====================
 
-    def _search_database_by_prefix(self, prefix: str, limit: int) -> List[Dict]:
-        """Search by prefix using database (transparent pass-through)"""
-        try:
-            # Lazy-load database manager
-            if self.db_manager is None:
-                from ..db.db_manager import get_db_manager
-                self.db_manager = get_db_manager()
-
-            # Call database search (assumes async method exists)
-            # Note: If the database method is async, we need to handle it properly
-            # For now, assume it has a sync version or we're in async context
-            import asyncio
-
-            # Try to get event loop
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    # We're in async context, but can't await here
-                    # Fall back to sync version or return empty
-                    logger.warning("Warning: 在异步上下文中无法同步调用数据库")
-                    return []
-                else:
-                    # Run the async method
-                    return loop.run_until_complete(
-                        self.db_manager.search_tags_by_prefix(prefix, limit)
-                    )
-            except RuntimeError:
-                # No event loop, try sync version
-                # For simplicity, return empty list (caller should use async version)
-                logger.warning("Warning: 数据库查询需要异步上下文")
-                return []
+    def _get_db_manager(self):
+        if self.db_manager is None:
+            from ..db.db_manager import get_db_manager
+            self.db_manager = get_db_manager()
+        return self.db_manager
 
+    async def _query_database(self, method: str, *args) -> List[Dict]:
+        """Await a TagDatabaseManager search method"""
+        self._db_loop = asyncio.get_running_loop()
+        try:
+            return await getattr(self._get_db_manager(), method)(*args)
         except Exception as e:
             logger.error(f"Warning: 数据库查询失败: {e}")
             return []
 
-    def _search_database_by_translation(self, query: str, limit: int) -> List[Dict]:
-        """Search by translation using database"""
-        try:
-            if self.db_manager is None:
-                from ..db.db_manager import get_db_manager
-                self.db_manager = get_db_manager()
+    def _run_database_query(self, method: str, *args) -> List[Dict]:
+        """
+        Run a database query from synchronous code
 
-            import asyncio
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    logger.warning("Warning: 在异步上下文中无法同步调用数据库")
-                    return []
-                else:
-                    return loop.run_until_complete(
-                        self.db_manager.search_tags_by_translation(query, limit)
-                    )
-            except RuntimeError:
-                logger.warning("Warning: 数据库查询需要异步上下文")
-                return []
+        From a worker thread the query is handed to the event loop that owns the
+        database connection; without any loop it runs on a temporary one. The
+        event loop thread itself must use the async API, since blocking there
+        would deadlock.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            logger.warning(f"Warning: 事件循环中请使用 async_ 版本的查询方法 ({method})")
+            return []
 
+        loop = self._db_loop
+        try:
+            if loop is not None and loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(self._query_database(method, *args), loop)
+                return future.result(timeout=_DB_CALL_TIMEOUT)
+            return asyncio.run(self._query_database(method, *args))
         except Exception as e:
             logger.error(f"Warning: 数据库查询失败: {e}")
             return []
 
     def _search_in_memory_by_prefix(self, prefix: str, limit: int) -> List[Dict]:
-        """Search by prefix in memory index"""
+        """Search by prefix in the sorted key array, hottest tags first"""
         if not self._loaded:
             logger.warning("Warning: 缓存未加载")
             return []
+        if limit <= 0:
+            return []
 
-        # Find matching indices
-        matching_indices = self._prefix_index.get(prefix, [])
+        keys = self._sorted_keys
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + _PREFIX_END, lo)
+        matched = hi - lo
+        if matched == 0:
+            return []
 
-        # Get tag info
+        tags = self._tags_list
+        if matched * matched > limit * len(tags):
+            # Dense match (short prefix): walking the tags hottest-first finds
+            # `limit` hits after about limit * len(tags) / matched steps. A tag
+            # matches by its name or any alias, like the nsmallest path below.
+            results = []
+            for rank, name in enumerate(self._names):
+                if name.startswith(prefix):
+                    results.append(tags[rank].copy())
+                else:
+                    alias = self._matched_alias(rank, prefix)
+                    if alias is None:
+                        continue
+                    results.append({**tags[rank], 'matched_alias': alias})
+                if len(results) >= limit:
+                    break
+            return results
+
+        # A tag can be in the range under its name and several aliases
+        ranks = heapq.nsmallest(limit, set(self._sorted_ranks[lo:hi]))
         results = []
-        for idx in matching_indices[:limit]:
-            if idx < len(self._tags_list):
-                results.append(self._tags_list[idx].copy())
-
-        # Sort by post_count (descending)
-        results.sort(key=lambda x: x.get('post_count', 0), reverse=True)
+        for rank in ranks:
+            result = tags[rank].copy()
+            if not self._names[rank].startswith(prefix):
+                result['matched_alias'] = self._matched_alias(rank, prefix)
+            results.append(result)
+        return results
 
-        return results[:limit]
+    def _matched_alias(self, rank: int, prefix: str) -> Optional[str]:
+        """Smallest alias of the tag at `rank` that starts with prefix"""
+        matches = [alias for alias in self._tags_list[rank].get('aliases') or () if alias.lower().startswith(prefix)]
+        return min(matches) if matches else None
 
     def _search_in_memory_by_translation(self, query: str, limit: int) -> List[Dict]:
-        """Search by translation in memory index"""
+        """Search by translation substring, hottest tags first"""
         if not self._loaded:
             logger.warning("Warning: 缓存未加载")
             return []
+        if limit <= 0:
+            return []
 
-        # Find tags containing the query characters
-        matching_indices_set = set()
-
-        for char in query:
-            indices = self._translation_index.get(char, [])
-            if not matching_indices_set:
-                matching_indices_set = set(indices)
-            else:
-                matching_indices_set &= set(indices)
+        # Walk the shortest posting list; it is already in rank order
+        shortest = None
+        for char in set(query):
+            ranks = self._translation_index.get(char)
+            if ranks is None:
+                return []
+            if shortest is None or len(ranks) < len(shortest):
+                shortest = ranks
 
-        # Get tag info and filter by full match
+        translations = self._translations
         results = []
-        for idx in matching_indices_set:
-            if idx < len(self._tags_list):
-                tag_info = self._tags_list[idx]
-                translation = tag_info.get('translation_cn', '')
-                if query in translation:
-                    results.append(tag_info.copy())
-
-        # Sort by post_count (descending)
-        results.sort(key=lambda x: x.get('post_count', 0), reverse=True)
-
-        return results[:limit]
+        for rank in shortest:
+            if query in translations[rank]:
+                results.append(self._tags_list[rank].copy())
+                if len(results) >= limit:
+                    break
+        return results
 
     def _build_prefix_index(self) -> None:
-        """Build prefix index for English tags"""
-        self._prefix_index.clear()
-
-        for idx, tag_info in enumerate(self._tags_list):
-            tag = tag_info.get('tag', '').lower()
-            if not tag:
-                continue
-
-            # Build index for each prefix
-            for i in range(1, len(tag) + 1):
-                prefix = tag[:i]
-                if prefix not in self._prefix_index:
-                    self._prefix_index[prefix] = []
-                self._prefix_index[prefix].append(idx)
-
-        logger.info(f"前缀索引构建完成: {len(self._prefix_index)} 个前缀")
+        """Build the sorted key array for English prefix ranges (names and aliases)"""
+        self._names = [(tag_info.get('tag') or '').lower() for tag_info in self._tags_list]
+        entries = [(name, rank) for rank, name in enumerate(self._names) if name]
+        for rank, tag_info in enumerate(self._tags_list):
+            for alias in tag_info.get('aliases') or ():
+                entries.append((alias.lower(), rank))
+        entries.sort()
+        self._sorted_keys = [key for key, _ in entries]
+        self._sorted_ranks = array('I', (rank for _, rank in entries))
+
+        logger.info(f"前缀索引构建完成: {len(self._sorted_keys)} 个标签及别名")
 
     def _build_translation_index(self) -> None:
         """Build translation index for Chinese characters"""
-        self._translation_index.clear()
-
-        for idx, tag_info in enumerate(self._tags_list):
-            translation = tag_info.get('translation_cn', '')
-            if not translation:
-                continue
+        self._translations = [tag_info.get('translation_cn') or '' for tag_info in self._tags_list]
+        index: Dict[str, array] = {}
 
-            # Build index for each character
-            for char in translation:
-                if char not in self._translation_index:
-                    self._translation_index[char] = []
-                self._translation_index[char].append(idx)
+        for rank, translation in enumerate(self._translations):
+            for char in set(translation):
+                postings = index.get(char)
+                if postings is None:
+                    postings = index[char] = array('I')
+                postings.append(rank)
 
+        self._translation_index = index
         logger.info(f"翻译索引构建完成: {len(self._translation_index)} 个字符")
 
     def _detect_language(self, query: str) -> str:
@@ -410,49 +489,51 @@ class HotTagsCache:
                 return 'chinese'
         return 'english'
 
-    def _calculate_memory_size(self) -> float:
+    def _calculate_memory_size(self) -> int:
         """
-        Calculate memory usage in MB
+        Measure memory held by the in-memory index in bytes
 
-        Returns:
-            Memory size in MB
+        Strings shared between the tag dicts and the indices are counted once.
         """
-        if not self._loaded:
-            return 0.0
-
-        # Rough estimation
-        # tags_list: ~1KB per tag
-        # indices: ~100 bytes per entry
-        tags_size = len(self._tags_list) * 1024  # bytes
-        index_size = (len(self._prefix_index) + len(self._translation_index)) * 100
-
-        total_bytes = tags_size + index_size
-        return total_bytes / (1024 * 1024)  # Convert to MB
+        seen = set()
+        total = 0
+        stack = [
+            self._tags_list, self._names, self._sorted_keys, self._sorted_ranks,
+            self._translations, self._translation_index,
+        ]
+        while stack:
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            total += sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple)):
+                stack.extend(obj)
+        return total
 
     def _get_cached_query_result(self, cache_key: str) -> Optional[List[Dict]]:
         """Get cached query result if valid"""
-        if cache_key in self._query_result_cache:
-            cached_time, cached_results = self._query_result_cache[cache_key]
-            # Check TTL
-            if time.time() - cached_time < self._query_cache_ttl:
-                return cached_results
-            else:
-                # Expired, remove from cache
+        with self._lock:
+            entry = self._query_result_cache.get(cache_key)
+            if entry is None:
+                return None
+            cached_time, cached_results = entry
+            if time.time() - cached_time >= self._query_cache_ttl:
                 del self._query_result_cache[cache_key]
-        return None
+                return None
+            self._query_result_cache.move_to_end(cache_key)
+            return cached_results
 
     def _cache_query_result(self, cache_key: str, results: List[Dict]) -> None:
         """Cache query result with LRU eviction"""
-        self._query_result_cache[cache_key] = (time.time(), results)
-
-        # LRU eviction
-        if len(self._query_result_cache) > self._query_cache_size:
-            # Remove oldest entry
-            oldest_key = min(
-                self._query_result_cache.items(),
-                key=lambda x: x[1][0]
-            )[0]
-            del self._query_result_cache[oldest_key]
+        with self._lock:
+            self._query_result_cache[cache_key] = (time.time(), results)
+            self._query_result_cache.move_to_end(cache_key)
+            while len(self._query_result_cache) > self._query_cache_size:
+                self._query_result_cache.popitem(last=False)
 
 
 # ==================== Factory Function (Singleton Pattern) ====================
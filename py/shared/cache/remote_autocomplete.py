@@ -0,0 +1,156 @@
+"""
+Coordination of remote autocomplete lookups
+
+Every keystroke that misses the local tag database becomes a remote
+lookup. This module keeps those lookups from piling up:
+
+* Supersession - requests carry the id of the input field they came from;
+  a newer query for the same field releases the waiting older request at
+  once instead of letting it hold a handler until the remote answers.
+* Sharing - a query already in flight is joined rather than sent twice.
+* Prefix extension - a complete answer for "hat" (fewer results than were
+  asked for) already contains every answer for "hats". The longer query is
+  still sent at once, but if an in-flight shorter one answers first and
+  turns out complete, it is narrowed locally instead of waited for.
+
+Remote calls that lose all their waiters still run to completion, so
+their answer reaches the write-through cache for the next keystroke.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ...utils.logger import get_logger
+logger = get_logger(__name__)
+
+from ..db.prefix_results import narrow_prefix_results
+
+RemoteFetch = Callable[[], Awaitable[Optional[List[Dict]]]]
+
+
+class AutocompleteSuperseded(Exception):
+    """A newer query from the same input field replaced this lookup"""
+
+
+class RemoteAutocompleteCoordinator:
+    """
+    Per-session supersession and sharing of remote autocomplete lookups
+
+    All methods run on the event loop; no locking is needed.
+    """
+
+    def __init__(self):
+        # (session, source) -> future of the newest waiting request
+        self._sessions: Dict[Tuple[str, str], asyncio.Future] = {}
+        # (source, lowercased query) -> (requested limit, task of the remote call)
+        self._inflight: Dict[Tuple[str, str], Tuple[int, asyncio.Task]] = {}
+        self.stats = {"superseded": 0, "joined": 0, "prefix_reused": 0}
+
+    async def lookup(self, source: str, query: str, limit: int, fetch: RemoteFetch,
+                     session: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Answer a remote autocomplete query
+
+        Args:
+            source: Cache source key; lookups are only shared within a source
+            fetch: Performs the remote call (and its cache handling) for
+                query / limit; returns None on failure
+            session: Client-supplied id of the input field, or None to opt out
+                of supersession
+
+        Returns:
+            Results, or None when the remote call failed
+
+        Raises:
+            AutocompleteSuperseded: A newer query for the same session arrived
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        session_key = (session, source)
+        if session:
+            previous = self._sessions.get(session_key)
+            if previous is not None and not previous.done():
+                previous.set_exception(AutocompleteSuperseded(session))
+                self.stats["superseded"] += 1
+            self._sessions[session_key] = waiter
+
+        resolver = asyncio.ensure_future(
+            self._resolve(source, query.lower(), limit, fetch)
+        )
+        resolver.add_done_callback(lambda task: self._settle(waiter, task))
+        try:
+            return await waiter
+        finally:
+            if session and self._sessions.get(session_key) is waiter:
+                del self._sessions[session_key]
+
+    @staticmethod
+    def _settle(waiter: asyncio.Future, task: asyncio.Task):
+        if waiter.done():
+            # Superseded or cancelled; the result only matters for the cache
+            if not task.cancelled():
+                task.exception()
+            return
+        if task.cancelled():
+            waiter.cancel()
+        elif task.exception() is not None:
+            waiter.set_exception(task.exception())
+        else:
+            waiter.set_result(task.result())
+
+    async def _resolve(self, source: str, query: str, limit: int, fetch: RemoteFetch) -> Optional[List[Dict]]:
+        inflight = self._inflight.get((source, query))
+        if inflight is not None and inflight[0] >= limit:
+            self.stats["joined"] += 1
+            results = await inflight[1]
+            return results[:limit] if results is not None else None
+
+        # Longest in-flight prefix: it has the fewest results to narrow
+        parent = None
+        for end in range(len(query) - 1, 0, -1):
+            parent = self._inflight.get((source, query[:end]))
+            if parent is not None:
+                parent_query = query[:end]
+                break
+
+        key = (source, query)
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = (limit, task)
+
+        def forget(_):
+            if self._inflight.get(key, (None, None))[1] is task:
+                del self._inflight[key]
+
+        task.add_done_callback(forget)
+
+        if parent is not None:
+            # The parent answer is only usable if it is complete, which is not
+            # known until it arrives; race it against this query's own call
+            parent_limit, parent_task = parent
+            await asyncio.wait({parent_task, task}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done() and not parent_task.cancelled() and parent_task.exception() is None:
+                parent_results = parent_task.result()
+                if parent_results is not None and len(parent_results) < parent_limit:
+                    narrowed = narrow_prefix_results(parent_results, parent_query, query)
+                    if narrowed is not None:
+                        # The own call still finishes and fills the cache
+                        self.stats["prefix_reused"] += 1
+                        return narrowed[:limit]
+        return await task
+
+    def get_status(self) -> Dict:
+        return {
+            **self.stats,
+            "sessions": len(self._sessions),
+            "inflight": len(self._inflight),
+        }
+
+
+_coordinator: Optional[RemoteAutocompleteCoordinator] = None
+
+
+def get_remote_autocomplete_coordinator() -> RemoteAutocompleteCoordinator:
+    """Process-wide coordinator shared by the autocomplete routes"""
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = RemoteAutocompleteCoordinator()
+    return _coordinator
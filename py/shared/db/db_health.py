@@ -0,0 +1,210 @@
+"""
+Tiered health checks for the hot tags database
+
+* quick - ``PRAGMA quick_check`` plus a schema / row-count probe. Cheap
+  enough to run on every start (~0.1s for 100k tags).
+* full  - ``PRAGMA integrity_check`` plus the FTS5 integrity check. Reads
+  and cross-checks every index; run it in the background or on demand.
+
+Each check uses its own blocking sqlite3 connection (read-only for the
+quick tier) so it never queues behind the shared aiosqlite connection.
+The last report of each tier, including per-step timings, is kept for
+the status endpoint.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from ...utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+REQUIRED_TABLES = ("hot_tags", "hot_tags_fts", "sync_metadata")
+# Niceness of the background full-check thread (Linux only)
+BACKGROUND_NICENESS = 10
+
+PathLike = Union[str, Path]
+
+_reports: Dict[str, Dict] = {}
+_reports_lock = threading.Lock()
+_background_thread: Optional[threading.Thread] = None
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _new_report(tier: str) -> Dict:
+    return {
+        "tier": tier,
+        "healthy": False,
+        "error": None,
+        "checked_at": int(time.time()),
+        "timings_ms": {},
+    }
+
+
+def _finish(report: Dict, started: float) -> Dict:
+    report["timings_ms"]["total"] = _elapsed_ms(started)
+    with _reports_lock:
+        _reports[report["tier"]] = report
+    return report
+
+
+def _probe_schema(conn: sqlite3.Connection, report: Dict) -> Optional[str]:
+    """Check required tables and record row counts; returns an error message"""
+    tables = {
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (?, ?, ?)",
+            REQUIRED_TABLES,
+        )
+    }
+    missing = [t for t in REQUIRED_TABLES if t not in tables]
+    if missing:
+        return f"Missing required tables: {', '.join(missing)}"
+
+    report["tag_count"] = conn.execute("SELECT COUNT(*) FROM hot_tags").fetchone()[0]
+    # The docsize shadow table holds one row per indexed document, so this is
+    # the FTS row count without scanning the external content table
+    try:
+        report["fts_count"] = conn.execute("SELECT COUNT(*) FROM hot_tags_fts_docsize").fetchone()[0]
+    except sqlite3.DatabaseError:
+        report["fts_count"] = None
+    metadata = dict(conn.execute(
+        "SELECT key, value FROM sync_metadata WHERE key IN ('last_sync_time', 'sync_progress')"
+    ))
+    report["last_sync_time"] = int(metadata.get("last_sync_time") or 0)
+    report["sync_in_progress"] = bool(metadata.get("sync_progress"))
+    return None
+
+
+def quick_health_check(db_path: PathLike) -> Dict:
+    """
+    Startup tier: quick_check and a schema / row-count probe
+
+    Returns:
+        Report dict: tier, healthy, error, checked_at, timings_ms
+        (quick_check, schema_probe, total), tag_count, fts_count,
+        last_sync_time and sync_in_progress
+    """
+    started = time.perf_counter()
+    report = _new_report("quick")
+    try:
+        conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            step = time.perf_counter()
+            result = conn.execute("PRAGMA quick_check").fetchone()
+            report["timings_ms"]["quick_check"] = _elapsed_ms(step)
+            if not result or result[0] != "ok":
+                report["error"] = f"Database quick check failed: {result[0] if result else None}"
+                return _finish(report, started)
+
+            step = time.perf_counter()
+            report["error"] = _probe_schema(conn, report)
+            report["timings_ms"]["schema_probe"] = _elapsed_ms(step)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        report["error"] = f"Health check error: {e}"
+
+    report["healthy"] = report["error"] is None
+    return _finish(report, started)
+
+
+def full_integrity_check(db_path: PathLike) -> Dict:
+    """
+    Full tier: integrity_check over every page and index, then the FTS5
+    index is verified against hot_tags
+
+    Returns:
+        Report dict like quick_health_check, with integrity_check and
+        fts_integrity_check timings
+    """
+    started = time.perf_counter()
+    report = _new_report("full")
+    try:
+        conn = sqlite3.connect(str(db_path), timeout=30.0)
+        try:
+            step = time.perf_counter()
+            rows = conn.execute("PRAGMA integrity_check").fetchall()
+            report["timings_ms"]["integrity_check"] = _elapsed_ms(step)
+            if [row[0] for row in rows] != ["ok"]:
+                report["error"] = "Database integrity check failed: " + "; ".join(row[0] for row in rows[:5])
+                return _finish(report, started)
+
+            step = time.perf_counter()
+            error = _probe_schema(conn, report)
+            if error is None:
+                try:
+                    # Writes nothing; rank=1 compares the index with the hot_tags
+                    # content table and raises when they are out of sync
+                    conn.execute("INSERT INTO hot_tags_fts(hot_tags_fts, rank) VALUES ('integrity-check', 1)")
+                except sqlite3.DatabaseError as e:
+                    error = f"FTS index integrity check failed: {e}"
+                finally:
+                    conn.rollback()
+            report["timings_ms"]["fts_integrity_check"] = _elapsed_ms(step)
+            report["error"] = error
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        report["error"] = f"Health check error: {e}"
+
+    report["healthy"] = report["error"] is None
+    return _finish(report, started)
+
+
+def get_health_reports() -> Dict[str, Dict]:
+    """Last report of each tier that has run, keyed by tier"""
+    with _reports_lock:
+        return {tier: dict(report) for tier, report in _reports.items()}
+
+
+def _lower_thread_priority():
+    # Per-thread niceness is a Linux feature; elsewhere PRIO_PROCESS means a pid
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKGROUND_NICENESS)
+    except (AttributeError, OSError):
+        # Not supported on this platform; the delay still keeps it off the startup path
+        pass
+
+
+def schedule_full_integrity_check(db_path: PathLike, delay: float = 120.0) -> bool:
+    """
+    Run full_integrity_check once in a low-priority daemon thread
+
+    Args:
+        delay: Seconds to wait first, so the check stays out of startup
+
+    Returns:
+        False if a background check is already pending or running
+    """
+    global _background_thread
+
+    def worker():
+        _lower_thread_priority()
+        time.sleep(delay)
+        if not Path(db_path).exists():
+            return
+        report = full_integrity_check(db_path)
+        if report["healthy"]:
+            logger.info(f"✓ Background integrity check passed ({report['timings_ms']['total']}ms)")
+        else:
+            logger.error(f"⚠️ Background integrity check failed: {report['error']}")
+            logger.info("💡 Run a full tag sync or delete the database file to rebuild it")
+
+    with _reports_lock:
+        if _background_thread is not None and _background_thread.is_alive():
+            return False
+        _background_thread = threading.Thread(
+            target=worker, daemon=True, name="DanbooruTagDbIntegrity"
+        )
+        _background_thread.start()
+    return True
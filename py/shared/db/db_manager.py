@@ -4,6 +4,7 @@ Manages SQLite database for offline tag autocomplete
 """
 
 import aiosqlite
+import asyncio
 import os
 import time
 import json
@@ -14,6 +15,125 @@ from pathlib import Path
 from ...utils.logger import get_logger
 logger = get_logger(__name__)
 
+from .db_health import full_integrity_check, quick_health_check
+from .prefix_results import narrow_prefix_results
+
+
+# Tables and indexes (all IF NOT EXISTS, safe to run on every start)
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS hot_tags (
+        tag TEXT PRIMARY KEY,
+        category INTEGER NOT NULL,
+        post_count INTEGER NOT NULL,
+        translation_cn TEXT,
+        last_updated INTEGER NOT NULL,
+        aliases TEXT
+    )
+    """,
+    # Indexes for performance
+    "CREATE INDEX IF NOT EXISTS idx_post_count ON hot_tags(post_count DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_category ON hot_tags(category)",
+    "CREATE INDEX IF NOT EXISTS idx_translation ON hot_tags(translation_cn)",
+    # FTS5 virtual table for full-text search (优化中文搜索性能)
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS hot_tags_fts USING fts5(
+        tag,
+        translation_cn,
+        content='hot_tags',
+        content_rowid='rowid',
+        tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at INTEGER
+    )
+    """,
+    # Danbooru tag aliases (antecedent -> canonical tag), only for tags in hot_tags
+    """
+    CREATE TABLE IF NOT EXISTS tag_aliases (
+        antecedent TEXT PRIMARY KEY,
+        consequent TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_alias_consequent ON tag_aliases(consequent)",
+    # Danbooru tag implications (antecedent implies consequent)
+    """
+    CREATE TABLE IF NOT EXISTS tag_implications (
+        antecedent TEXT NOT NULL,
+        consequent TEXT NOT NULL,
+        PRIMARY KEY (antecedent, consequent)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_implication_consequent ON tag_implications(consequent)",
+    # Remote autocomplete answers per source (write-through cache, '[]' = negative entry)
+    """
+    CREATE TABLE IF NOT EXISTS remote_autocomplete (
+        source TEXT NOT NULL,
+        query TEXT NOT NULL,
+        request_limit INTEGER NOT NULL,
+        result_count INTEGER NOT NULL,
+        results TEXT NOT NULL,
+        expires_at INTEGER NOT NULL,
+        PRIMARY KEY (source, query)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_remote_expires ON remote_autocomplete(expires_at)",
+]
+
+# Upper bound for every character, closes a prefix range on a TEXT key
+PREFIX_END = '\U0010ffff'
+# Prefix ranges with at least this many keys are searched hottest-first
+# through idx_post_count instead of being read and sorted
+DENSE_PREFIX_ROWS = 2000
+
+# Upsert that keeps the stored aliases when the incoming row has none
+# (tag pages from the API never carry aliases; the alias sync fills them)
+UPSERT_TAG_SQL = """
+    INSERT INTO hot_tags
+    (tag, category, post_count, translation_cn, last_updated, aliases)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(tag) DO UPDATE SET
+        category = excluded.category,
+        post_count = excluded.post_count,
+        translation_cn = excluded.translation_cn,
+        last_updated = excluded.last_updated,
+        aliases = COALESCE(excluded.aliases, hot_tags.aliases)
+"""
+
+# Secondary indexes created above; bulk loads drop and recreate them
+INDEX_NAMES = ("idx_post_count", "idx_category", "idx_translation")
+
+# Triggers that keep the FTS index in sync with hot_tags row by row.
+# Bulk loads drop them and rebuild the index once instead.
+FTS_TRIGGER_NAMES = ("hot_tags_ai", "hot_tags_au", "hot_tags_ad")
+FTS_TRIGGER_STATEMENTS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_tags_ai
+    AFTER INSERT ON hot_tags BEGIN
+        INSERT INTO hot_tags_fts(rowid, tag, translation_cn)
+        VALUES (NEW.rowid, NEW.tag, NEW.translation_cn);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_tags_au
+    AFTER UPDATE OF tag, translation_cn ON hot_tags BEGIN
+        UPDATE hot_tags_fts
+        SET tag = NEW.tag, translation_cn = NEW.translation_cn
+        WHERE rowid = NEW.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_tags_ad
+    AFTER DELETE ON hot_tags BEGIN
+        DELETE FROM hot_tags_fts WHERE rowid = OLD.rowid;
+    END
+    """,
+]
+
 
 class TagDatabaseManager:
     """Manage hot tags database for offline autocomplete"""
@@ -30,6 +150,9 @@ class TagDatabaseManager:
 
         self.db_path = db_path
         self._connection = None
+        # Remote autocomplete cache writes happen per keystroke on the request
+        # loop; on their own connection they cannot commit a sync transaction
+        self._remote_connection = None
 
     async def get_connection(self) -> aiosqlite.Connection:
         """Get or create database connection"""
@@ -38,91 +161,30 @@ class TagDatabaseManager:
             self._connection.row_factory = aiosqlite.Row
         return self._connection
 
+    async def get_remote_connection(self) -> aiosqlite.Connection:
+        """Get or create the connection for the remote_autocomplete table"""
+        if self._remote_connection is None:
+            self._remote_connection = await aiosqlite.connect(self.db_path)
+            self._remote_connection.row_factory = aiosqlite.Row
+        return self._remote_connection
+
     async def close(self):
-        """Close database connection"""
+        """Close database connections"""
         if self._connection:
             await self._connection.close()
             self._connection = None
+        if self._remote_connection:
+            await self._remote_connection.close()
+            self._remote_connection = None
 
     async def initialize_database(self):
         """Create database tables if they don't exist"""
         conn = await self.get_connection()
 
-        # Create hot_tags table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS hot_tags (
-                tag TEXT PRIMARY KEY,
-                category INTEGER NOT NULL,
-                post_count INTEGER NOT NULL,
-                translation_cn TEXT,
-                last_updated INTEGER NOT NULL,
-                aliases TEXT
-            )
-        """)
-
-        # Create indexes for performance
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_post_count
-            ON hot_tags(post_count DESC)
-        """)
-
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_category
-            ON hot_tags(category)
-        """)
-
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_translation
-            ON hot_tags(translation_cn)
-        """)
-
-        # Create FTS5 virtual table for full-text search (优化中文搜索性能)
-        await conn.execute("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS hot_tags_fts USING fts5(
-                tag,
-                translation_cn,
-                content='hot_tags',
-                content_rowid='rowid',
-                tokenize='unicode61'
-            )
-        """)
-
-        # Create triggers to keep FTS index in sync
-        # Trigger for INSERT
-        await conn.execute("""
-            CREATE TRIGGER IF NOT EXISTS hot_tags_ai
-            AFTER INSERT ON hot_tags BEGIN
-                INSERT INTO hot_tags_fts(rowid, tag, translation_cn)
-                VALUES (NEW.rowid, NEW.tag, NEW.translation_cn);
-            END
-        """)
-
-        # Trigger for UPDATE
-        await conn.execute("""
-            CREATE TRIGGER IF NOT EXISTS hot_tags_au
-            AFTER UPDATE ON hot_tags BEGIN
-                UPDATE hot_tags_fts
-                SET tag = NEW.tag, translation_cn = NEW.translation_cn
-                WHERE rowid = NEW.rowid;
-            END
-        """)
-
-        # Trigger for DELETE
-        await conn.execute("""
-            CREATE TRIGGER IF NOT EXISTS hot_tags_ad
-            AFTER DELETE ON hot_tags BEGIN
-                DELETE FROM hot_tags_fts WHERE rowid = OLD.rowid;
-            END
-        """)
-
-        # Create sync_metadata table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS sync_metadata (
-                key TEXT PRIMARY KEY,
-                value TEXT,
-                updated_at INTEGER
-            )
-        """)
+        # Older databases have an update trigger that fired for every column
+        await conn.execute("DROP TRIGGER IF EXISTS hot_tags_au")
+        for statement in SCHEMA_STATEMENTS + FTS_TRIGGER_STATEMENTS:
+            await conn.execute(statement)
 
         await conn.commit()
         logger.info(f"✓ Database initialized at {self.db_path}")
@@ -137,14 +199,17 @@ class TagDatabaseManager:
         aliases_json = json.dumps(aliases) if aliases else None
         current_time = int(time.time())
 
-        await conn.execute("""
-            INSERT OR REPLACE INTO hot_tags
-            (tag, category, post_count, translation_cn, last_updated, aliases)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (tag, category, post_count, translation_cn, current_time, aliases_json))
+        await conn.execute(UPSERT_TAG_SQL, (tag, category, post_count, translation_cn, current_time, aliases_json))
+
+    async def insert_tags_batch(self, tags: List[Dict], sync_progress: Optional[Dict] = None):
+        """
+        Insert multiple tags in batch
 
-    async def insert_tags_batch(self, tags: List[Dict]):
-        """Insert multiple tags in batch"""
+        Args:
+            tags: Tag dictionaries
+            sync_progress: If given, stored as sync progress in the same commit,
+                so the recorded progress never runs ahead of the saved tags
+        """
         conn = await self.get_connection()
         current_time = int(time.time())
 
@@ -160,25 +225,53 @@ class TagDatabaseManager:
                 aliases_json
             ))
 
-        await conn.executemany("""
-            INSERT OR REPLACE INTO hot_tags
-            (tag, category, post_count, translation_cn, last_updated, aliases)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, data)
+        await conn.executemany(UPSERT_TAG_SQL, data)
+
+        if sync_progress is not None:
+            await conn.execute("""
+                INSERT OR REPLACE INTO sync_metadata (key, value, updated_at)
+                VALUES ('sync_progress', ?, ?)
+            """, (json.dumps(sync_progress), current_time))
 
         await conn.commit()
 
+    async def _is_dense_prefix(self, conn, table: str, column: str, prefix: str) -> bool:
+        """Whether at least DENSE_PREFIX_ROWS keys of table.column start with prefix"""
+        cursor = await conn.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM {table} WHERE {column} >= ? AND {column} < ? LIMIT ?
+            )
+        """, (prefix, prefix + PREFIX_END, DENSE_PREFIX_ROWS))
+        row = await cursor.fetchone()
+        return row[0] >= DENSE_PREFIX_ROWS
+
     async def search_tags_by_prefix(self, prefix: str, limit: int = 10) -> List[Dict]:
-        """Search tags by prefix"""
-        conn = await self.get_connection()
+        """
+        Search tags by prefix, including tag aliases
 
-        cursor = await conn.execute("""
+        A tag whose alias matches is returned as its canonical tag with an
+        extra 'matched_alias'; results are merged by post_count.
+
+        Tags are stored lowercase, so a prefix is a key range. A sparse range
+        is read through the primary key and sorted; a dense one (short
+        prefix) walks idx_post_count instead and stops after `limit` hits.
+        """
+        conn = await self.get_connection()
+        prefix = prefix.lower()
+        bounds = (prefix, prefix + PREFIX_END)
+
+        if await self._is_dense_prefix(conn, "hot_tags", "tag", prefix):
+            # Unary + keeps the planner off the primary key
+            where = "+tag >= ? AND +tag < ?"
+        else:
+            where = "tag >= ? AND tag < ?"
+        cursor = await conn.execute(f"""
             SELECT tag, category, post_count, translation_cn, aliases
             FROM hot_tags
-            WHERE tag LIKE ? || '%'
+            WHERE {where}
             ORDER BY post_count DESC
             LIMIT ?
-        """, (prefix.lower(), limit))
+        """, (*bounds, limit))
 
         rows = await cursor.fetchall()
 
@@ -192,7 +285,48 @@ class TagDatabaseManager:
                 'aliases': json.loads(row['aliases']) if row['aliases'] else []
             })
 
-        return results
+        if await self._is_dense_prefix(conn, "tag_aliases", "antecedent", prefix):
+            cursor = await conn.execute("""
+                SELECT tag, category, post_count, translation_cn, aliases, matched_alias
+                FROM (
+                    SELECT h.*, (
+                        SELECT MIN(a.antecedent) FROM tag_aliases a
+                        WHERE a.consequent = h.tag AND a.antecedent >= ? AND a.antecedent < ?
+                    ) AS matched_alias
+                    FROM hot_tags h
+                )
+                WHERE matched_alias IS NOT NULL
+                ORDER BY post_count DESC
+                LIMIT ?
+            """, (*bounds, limit))
+        else:
+            cursor = await conn.execute("""
+                SELECT h.tag, h.category, h.post_count, h.translation_cn, h.aliases,
+                       MIN(a.antecedent) AS matched_alias
+                FROM tag_aliases a
+                JOIN hot_tags h ON h.tag = a.consequent
+                WHERE a.antecedent >= ? AND a.antecedent < ?
+                GROUP BY h.tag
+                ORDER BY h.post_count DESC
+                LIMIT ?
+            """, (*bounds, limit))
+
+        seen = {result['tag'] for result in results}
+        for row in await cursor.fetchall():
+            if row['tag'] in seen:
+                continue
+            results.append({
+                'tag': row['tag'],
+                'category': row['category'],
+                'post_count': row['post_count'],
+                'translation_cn': row['translation_cn'],
+                'aliases': json.loads(row['aliases']) if row['aliases'] else [],
+                'matched_alias': row['matched_alias']
+            })
+
+        # Stable sort: on equal post_count a direct match stays ahead of an alias
+        results.sort(key=lambda result: result['post_count'], reverse=True)
+        return results[:limit]
 
     async def search_tags_by_translation(self, query: str, limit: int = 10) -> List[Dict]:
         """Search tags by Chinese translation (legacy method, use search_tags_optimized for better performance)"""
@@ -250,26 +384,10 @@ class TagDatabaseManager:
             search_type = "chinese" if has_chinese else "english"
 
         if search_type == "english":
-            # English prefix search (fast with index)
-            cursor = await conn.execute("""
-                SELECT tag, category, post_count, translation_cn, aliases
-                FROM hot_tags
-                WHERE tag LIKE ? || '%'
-                ORDER BY post_count DESC
-                LIMIT ?
-            """, (query.lower(), limit))
-
-            rows = await cursor.fetchall()
-            results = []
-            for row in rows:
-                results.append({
-                    'tag': row['tag'],
-                    'category': row['category'],
-                    'post_count': row['post_count'],
-                    'translation_cn': row['translation_cn'],
-                    'aliases': json.loads(row['aliases']) if row['aliases'] else [],
-                    'match_score': 10
-                })
+            # English prefix search (fast with index), alias hits score lower
+            results = await self.search_tags_by_prefix(query, limit)
+            for result in results:
+                result['match_score'] = 9 if 'matched_alias' in result else 10
             return results
 
         else:  # Chinese search using FTS5
@@ -360,6 +478,29 @@ class TagDatabaseManager:
             }
         return None
 
+    async def get_tags_state(self, tags: List[str]) -> Dict[str, Tuple[int, int]]:
+        """
+        Get (category, post_count) for the given tags that exist in the database
+
+        Lets a sync compare fetched tags against stored rows without loading the table.
+        """
+        conn = await self.get_connection()
+        state = {}
+
+        # Stay below SQLite's default limit of 999 bound parameters
+        for i in range(0, len(tags), 500):
+            chunk = tags[i:i + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor = await conn.execute(f"""
+                SELECT tag, category, post_count
+                FROM hot_tags
+                WHERE tag IN ({placeholders})
+            """, chunk)
+            for row in await cursor.fetchall():
+                state[row['tag']] = (row['category'], row['post_count'])
+
+        return state
+
     async def get_tags_count(self) -> int:
         """Get total number of tags in database"""
         conn = await self.get_connection()
@@ -454,6 +595,131 @@ class TagDatabaseManager:
         await conn.execute("DELETE FROM sync_metadata WHERE key = 'sync_progress'")
         await conn.commit()
 
+    async def replace_tag_aliases(self, aliases: List[Tuple[str, str]]) -> int:
+        """
+        Replace the alias table and each tag's aliases column in one commit
+
+        Aliases whose canonical tag is not in hot_tags are dropped, they can
+        never be returned by a local search. Only rows whose alias list
+        changed are rewritten.
+
+        Args:
+            aliases: (antecedent, consequent) pairs
+
+        Returns:
+            Number of aliases stored
+        """
+        conn = await self.get_connection()
+        await conn.execute("DELETE FROM tag_aliases")
+        await conn.executemany(
+            "INSERT OR REPLACE INTO tag_aliases (antecedent, consequent) VALUES (?, ?)",
+            aliases,
+        )
+        await conn.execute("DELETE FROM tag_aliases WHERE consequent NOT IN (SELECT tag FROM hot_tags)")
+
+        grouped: Dict[str, List[str]] = {}
+        cursor = await conn.execute(
+            "SELECT consequent, antecedent FROM tag_aliases ORDER BY consequent, antecedent"
+        )
+        for consequent, antecedent in await cursor.fetchall():
+            grouped.setdefault(consequent, []).append(antecedent)
+
+        cursor = await conn.execute("SELECT tag, aliases FROM hot_tags WHERE aliases IS NOT NULL")
+        current = {row[0]: row[1] for row in await cursor.fetchall()}
+        updates = []
+        for tag in current.keys() | grouped.keys():
+            aliases_json = json.dumps(grouped[tag]) if tag in grouped else None
+            if current.get(tag) != aliases_json:
+                updates.append((aliases_json, tag))
+        await conn.executemany("UPDATE hot_tags SET aliases = ? WHERE tag = ?", updates)
+        await conn.commit()
+
+        return sum(len(antecedents) for antecedents in grouped.values())
+
+    async def replace_tag_implications(self, implications: List[Tuple[str, str]]) -> int:
+        """Replace the implication table with (antecedent, consequent) pairs"""
+        conn = await self.get_connection()
+        await conn.execute("DELETE FROM tag_implications")
+        await conn.executemany(
+            "INSERT OR IGNORE INTO tag_implications (antecedent, consequent) VALUES (?, ?)",
+            implications,
+        )
+        await conn.commit()
+        cursor = await conn.execute("SELECT COUNT(*) FROM tag_implications")
+        row = await cursor.fetchone()
+        return row[0] if row else 0
+
+    async def get_tag_implications(self, tag: str) -> List[str]:
+        """Tags directly implied by `tag`"""
+        conn = await self.get_connection()
+        cursor = await conn.execute(
+            "SELECT consequent FROM tag_implications WHERE antecedent = ? ORDER BY consequent",
+            (tag,),
+        )
+        return [row[0] for row in await cursor.fetchall()]
+
+    async def get_remote_autocomplete(self, source: str, query: str, limit: int) -> Optional[List[Dict]]:
+        """
+        Cached remote autocomplete answer, or None when the remote must be asked
+
+        An entry answers `limit` if it holds at least that many results, or
+        if it held fewer than were requested (the full answer). A full answer
+        for a shorter prefix answers every longer query as well: an empty one
+        directly, others narrowed by tag name (see narrow_prefix_results).
+        """
+        conn = await self.get_remote_connection()
+        now = int(time.time())
+        query = query.lower()
+
+        cursor = await conn.execute("""
+            SELECT request_limit, result_count, results
+            FROM remote_autocomplete
+            WHERE source = ? AND query = ? AND expires_at > ?
+        """, (source, query, now))
+        row = await cursor.fetchone()
+        if row and (row['result_count'] >= limit or row['result_count'] < row['request_limit']):
+            return json.loads(row['results'])[:limit]
+
+        prefixes = [query[:end] for end in range(1, len(query))]
+        if prefixes:
+            cursor = await conn.execute(f"""
+                SELECT query, result_count, results FROM remote_autocomplete
+                WHERE source = ? AND result_count < request_limit AND expires_at > ?
+                  AND query IN ({", ".join("?" * len(prefixes))})
+                ORDER BY length(query) DESC
+            """, (source, now, *prefixes))
+            for row in await cursor.fetchall():
+                if row['result_count'] == 0:
+                    return []
+                narrowed = narrow_prefix_results(json.loads(row['results']), row['query'], query)
+                if narrowed is not None:
+                    return narrowed[:limit]
+        return None
+
+    async def put_remote_autocomplete(self, source: str, query: str, limit: int,
+                                      results: List[Dict], ttl: float, negative_ttl: float):
+        """
+        Store a remote autocomplete answer and drop expired ones
+
+        Args:
+            ttl: Seconds a non-empty answer stays valid
+            negative_ttl: Seconds an empty answer stays valid
+        """
+        conn = await self.get_remote_connection()
+        now = int(time.time())
+        lifetime = ttl if results else negative_ttl
+        if lifetime <= 0:
+            return
+
+        await conn.execute("DELETE FROM remote_autocomplete WHERE expires_at <= ?", (now,))
+        await conn.execute("""
+            INSERT OR REPLACE INTO remote_autocomplete
+            (source, query, request_limit, result_count, results, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (source, query.lower(), limit, len(results),
+              json.dumps(results, ensure_ascii=False), now + int(lifetime)))
+        await conn.commit()
+
     async def rebuild_fts_index(self):
         """
         Rebuild FTS5 index from existing data
@@ -482,50 +748,21 @@ class TagDatabaseManager:
         logger.info(f"✓ FTS5 index rebuilt with {count} entries")
         return count
 
-    async def check_database_health(self) -> Tuple[bool, Optional[str]]:
+    async def check_database_health(self, full: bool = False) -> Tuple[bool, Optional[str]]:
         """
         Check database integrity and health
 
+        Args:
+            full: Run the full integrity check instead of the quick startup tier
+
         Returns:
             Tuple[bool, Optional[str]]: (is_healthy, error_message)
         """
-        try:
-            conn = await self.get_connection()
-
-            # Test 1: PRAGMA integrity_check
-            cursor = await conn.execute("PRAGMA integrity_check")
-            row = await cursor.fetchone()
-            integrity_result = row[0] if row else None
-
-            if integrity_result != "ok":
-                return False, f"Database integrity check failed: {integrity_result}"
-
-            # Test 2: Check if tables exist
-            cursor = await conn.execute("""
-                SELECT name FROM sqlite_master
-                WHERE type='table' AND name IN ('hot_tags', 'hot_tags_fts', 'sync_metadata')
-            """)
-            tables = [row[0] for row in await cursor.fetchall()]
-
-            required_tables = ['hot_tags', 'hot_tags_fts', 'sync_metadata']
-            missing_tables = [t for t in required_tables if t not in tables]
-
-            if missing_tables:
-                return False, f"Missing required tables: {', '.join(missing_tables)}"
-
-            # Test 3: Try a simple query on each table
-            try:
-                await conn.execute("SELECT COUNT(*) FROM hot_tags")
-                await conn.execute("SELECT COUNT(*) FROM hot_tags_fts")
-                await conn.execute("SELECT COUNT(*) FROM sync_metadata")
-            except Exception as e:
-                return False, f"Query test failed: {str(e)}"
-
-            # All tests passed
-            return True, None
-
-        except Exception as e:
-            return False, f"Health check error: {str(e)}"
+        check = full_integrity_check if full else quick_health_check
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(None, check, self.db_path)
+        logger.info(f"Database {report['tier']} health check: {report['timings_ms']}")
+        return report["healthy"], report["error"]
 
     async def recover_from_corruption(self) -> bool:
         """
@@ -0,0 +1,29 @@
+"""
+Narrowing of complete prefix answers
+
+Shared by the remote autocomplete cache table (db_manager) and the
+in-flight request coordinator (cache.remote_autocomplete).
+"""
+
+from typing import Dict, List, Optional
+
+
+def narrow_prefix_results(results: List[Dict], parent_query: str, query: str) -> Optional[List[Dict]]:
+    """
+    Narrow a complete answer for parent_query to query, which extends it
+
+    Only answers matched by tag name can be narrowed. A result whose name
+    does not start with parent_query was matched some other way (a Danbooru
+    alias, a fuzzy match), which cannot be re-checked locally, so None is
+    returned and the caller must ask the remote.
+    """
+    parent_query = parent_query.lower()
+    query = query.lower()
+    narrowed = []
+    for item in results:
+        name = str(item.get('name', '')).lower()
+        if not name.startswith(parent_query):
+            return None
+        if name.startswith(query):
+            narrowed.append(item)
+    return narrowed
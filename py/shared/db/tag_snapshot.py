@@ -0,0 +1,276 @@
+"""
+Offline snapshots of the hot tags database
+
+A snapshot is a gzip-compressed JSON-lines file:
+
+    {"format": "danbooru-gallery-tags", "version": 1, "tag_count": N, "metadata": {...}}
+    [["1girl", 0, 5300000, "1个女孩", 1700000000, null], ...]
+    ...
+    {"sha256": "<hex digest of every line above>", "tag_count": N}
+
+Rows are grouped into lines of up to 1000 (one json.loads per line instead
+of per row) and written in primary key order, which keeps the import's
+B-tree inserts sequential.
+
+Tag aliases travel in the ``aliases`` column; the tag_aliases table is
+rebuilt from it on import. ``metadata`` carries sync_metadata
+(last_sync_time, delta_watermark, ...) so incremental syncs on the
+importing machine continue from the exporter's watermark. Export and
+import use their own blocking sqlite3 connection; call them through an
+executor from async code.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+from .db_manager import FTS_TRIGGER_NAMES, FTS_TRIGGER_STATEMENTS, INDEX_NAMES, SCHEMA_STATEMENTS
+
+SNAPSHOT_FORMAT = "danbooru-gallery-tags"
+SNAPSHOT_VERSION = 1
+TAG_COLUMNS = ("tag", "category", "post_count", "translation_cn", "last_updated", "aliases")
+
+# Metadata that describes an unfinished local sync; never exported or imported
+_LOCAL_METADATA_KEYS = ("sync_progress",)
+_ROWS_PER_LINE = 1000
+# Page cache for the import connection (negative = KiB)
+_IMPORT_CACHE_KIB = 64 * 1024
+
+PathLike = Union[str, Path]
+
+
+class TagSnapshotError(ValueError):
+    """The snapshot cannot be written or is not a valid, intact snapshot"""
+
+
+def default_tag_snapshot_path() -> Path:
+    """Snapshot imported automatically when a node starts without a database"""
+    return Path(__file__).resolve().parent.parent / "data" / "tags_snapshot.jsonl.gz"
+
+
+def _encode_line(value) -> bytes:
+    return (json.dumps(value, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def export_tag_snapshot(db_path: PathLike, snapshot_path: PathLike) -> Dict:
+    """
+    Write hot_tags and sync_metadata to a snapshot file
+
+    The file is written to a temporary name and renamed, so a failed export
+    never leaves a truncated snapshot behind.
+
+    Returns:
+        The snapshot header, plus 'size_bytes'
+
+    Raises:
+        TagSnapshotError: The database is missing or a sync is half-finished
+    """
+    db_path = Path(db_path)
+    snapshot_path = Path(snapshot_path)
+    if not db_path.exists():
+        raise TagSnapshotError(f"Database not found: {db_path}")
+
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        metadata = dict(conn.execute("SELECT key, value FROM sync_metadata"))
+        if any(key in metadata for key in _LOCAL_METADATA_KEYS):
+            raise TagSnapshotError("A tag sync is still in progress; finish it before exporting")
+        tag_count = conn.execute("SELECT COUNT(*) FROM hot_tags").fetchone()[0]
+
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created_at": int(time.time()),
+            "columns": list(TAG_COLUMNS),
+            "tag_count": tag_count,
+            "metadata": metadata,
+        }
+        digest = hashlib.sha256()
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+        try:
+            with gzip.open(temp_path, "wb", compresslevel=6) as f:
+                line = _encode_line(header)
+                digest.update(line)
+                f.write(line)
+                rows = conn.execute(f"""
+                    SELECT {", ".join(TAG_COLUMNS)}
+                    FROM hot_tags
+                    ORDER BY tag
+                """)
+                while True:
+                    batch = rows.fetchmany(_ROWS_PER_LINE)
+                    if not batch:
+                        break
+                    line = _encode_line(batch)
+                    digest.update(line)
+                    f.write(line)
+                f.write(_encode_line({"sha256": digest.hexdigest(), "tag_count": tag_count}))
+            os.replace(temp_path, snapshot_path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+    finally:
+        conn.close()
+
+    header["size_bytes"] = snapshot_path.stat().st_size
+    return header
+
+
+def _read_header(line: bytes) -> Dict:
+    try:
+        header = json.loads(line)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT:
+        raise TagSnapshotError("Not a tag snapshot file")
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise TagSnapshotError(f"Unsupported snapshot version: {header.get('version')}")
+    if header.get("columns") != list(TAG_COLUMNS):
+        raise TagSnapshotError("Snapshot columns do not match this version")
+    return header
+
+
+def _iter_snapshot(snapshot_path: PathLike) -> Iterator[Tuple[str, object]]:
+    """
+    Yield ("header", dict), then ("rows", list of rows) for every row line
+
+    The checksum and row count are verified when the trailer is reached;
+    consumers must not commit anything before the iterator is exhausted.
+    """
+    digest = hashlib.sha256()
+    row_count = 0
+    header = None
+    trailer = None
+    try:
+        with gzip.open(snapshot_path, "rb") as f:
+            for line in f:
+                if trailer is not None:
+                    raise TagSnapshotError("Data after snapshot trailer")
+                if header is None:
+                    header = _read_header(line)
+                    digest.update(line)
+                    yield "header", header
+                elif line.startswith(b"["):
+                    digest.update(line)
+                    rows = json.loads(line)
+                    row_count += len(rows)
+                    yield "rows", rows
+                else:
+                    trailer = json.loads(line)
+    except (OSError, EOFError, ValueError) as e:
+        if isinstance(e, TagSnapshotError):
+            raise
+        raise TagSnapshotError(f"Snapshot is damaged: {e}") from e
+
+    if header is None:
+        raise TagSnapshotError("Snapshot is empty")
+    if not isinstance(trailer, dict) or trailer.get("sha256") != digest.hexdigest():
+        raise TagSnapshotError("Snapshot checksum mismatch (truncated or modified)")
+    if not (trailer.get("tag_count") == header.get("tag_count") == row_count):
+        raise TagSnapshotError("Snapshot row count mismatch")
+
+
+def read_tag_snapshot_info(snapshot_path: PathLike) -> Dict:
+    """Verify a snapshot completely and return its header"""
+    header = None
+    for kind, value in _iter_snapshot(snapshot_path):
+        if kind == "header":
+            header = value
+    return header
+
+
+def import_tag_snapshot(db_path: PathLike, snapshot_path: PathLike,
+                        busy_timeout: float = 30.0) -> Dict:
+    """
+    Replace hot_tags and sync_metadata with the snapshot contents
+
+    tag_aliases is rebuilt from the snapshot; tag_implications and the
+    remote_autocomplete cache are emptied, as they describe the old tags.
+
+    Everything happens in one transaction: the per-row FTS triggers and the
+    secondary indexes are dropped, rows are bulk-inserted, then the indexes
+    and the FTS index are built once and the triggers restored. A damaged
+    snapshot rolls back and leaves the existing database untouched.
+
+    Returns:
+        The snapshot header, plus 'elapsed_ms'
+
+    Raises:
+        TagSnapshotError: The snapshot is invalid, damaged or a different version
+    """
+    started = time.perf_counter()
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(str(db_path), timeout=busy_timeout, isolation_level=None)
+    try:
+        conn.execute(f"PRAGMA cache_size = -{_IMPORT_CACHE_KIB}")
+        for statement in SCHEMA_STATEMENTS + FTS_TRIGGER_STATEMENTS:
+            conn.execute(statement)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name in FTS_TRIGGER_NAMES:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            for name in INDEX_NAMES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+            conn.execute("DELETE FROM hot_tags")
+            conn.execute("DELETE FROM sync_metadata")
+
+            insert_sql = f"""
+                INSERT OR REPLACE INTO hot_tags ({", ".join(TAG_COLUMNS)})
+                VALUES ({", ".join("?" * len(TAG_COLUMNS))})
+            """
+            header: Optional[Dict] = None
+            aliases_column = TAG_COLUMNS.index("aliases")
+            alias_pairs = []
+            for kind, value in _iter_snapshot(snapshot_path):
+                if kind == "header":
+                    header = value
+                    continue
+                conn.executemany(insert_sql, value)
+                for row in value:
+                    if row[aliases_column]:
+                        alias_pairs.extend((alias, row[0]) for alias in json.loads(row[aliases_column]))
+
+            # The alias table is derived from the aliases column; implications
+            # and cached remote answers belong to the replaced tags and are
+            # refetched by the next sync / lookup
+            conn.execute("DELETE FROM tag_aliases")
+            conn.execute("DELETE FROM tag_implications")
+            conn.execute("DELETE FROM remote_autocomplete")
+            conn.executemany(
+                "INSERT OR REPLACE INTO tag_aliases (antecedent, consequent) VALUES (?, ?)",
+                alias_pairs,
+            )
+
+            now = int(time.time())
+            conn.executemany(
+                "INSERT OR REPLACE INTO sync_metadata (key, value, updated_at) VALUES (?, ?, ?)",
+                [
+                    (key, value, now)
+                    for key, value in header["metadata"].items()
+                    if key not in _LOCAL_METADATA_KEYS
+                ],
+            )
+            # Recreates the dropped indexes, then the FTS index in one pass
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(statement)
+            conn.execute("INSERT INTO hot_tags_fts(hot_tags_fts) VALUES ('rebuild')")
+            for statement in FTS_TRIGGER_STATEMENTS:
+                conn.execute(statement)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    header["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return header
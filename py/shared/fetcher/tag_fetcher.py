@@ -6,7 +6,9 @@ Fetches hot tags from Danbooru API with rate limiting and retry mechanism
 import aiohttp
 import asyncio
 import time
-from typing import List, Dict, Optional, Callable
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from pathlib import Path
 
 # Logger导入
@@ -14,6 +16,77 @@ from ...utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Danbooru ISO 8601 timestamp -> aware datetime"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket rate limiter for coroutines
+
+    Allows bursts of up to `capacity` requests while keeping the long-run
+    average at `rate` per second. Implemented as its virtual-scheduling
+    equivalent (each caller reserves the next free slot), so it needs no
+    asyncio.Lock and is not bound to one event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._next_slot = 0.0  # theoretical arrival time of the next request
+        self._blocked_until = 0.0
+
+    def _reserve(self, now: float) -> float:
+        """Claim the next slot and return how long to wait for it"""
+        interval = 1.0 / self.rate
+        start = max(now, self._next_slot - (self.capacity - 1) * interval, self._blocked_until)
+        self._next_slot = max(self._next_slot, start) + interval
+        return start - now
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._reserve(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # A pause (Retry-After) may have started while we slept
+            if time.monotonic() >= self._blocked_until:
+                return
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds`, then resume at the base rate without a burst"""
+        resume_at = time.monotonic() + seconds
+        self._blocked_until = max(self._blocked_until, resume_at)
+        if self.rate > 0:
+            self._next_slot = max(self._next_slot, self._blocked_until + 1.0 / self.rate)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (delta-seconds or HTTP date) -> seconds to wait"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
 class DanbooruTagFetcher:
     """Fetch tags from Danbooru API"""
 
@@ -29,15 +102,20 @@ class DanbooruTagFetcher:
         5: "meta"
     }
 
-    def __init__(self, rate_limit: float = 2.0):
+    def __init__(self, rate_limit: float = 2.0, burst: Optional[float] = None,
+                 max_concurrent_pages: int = 4):
         """
         Initialize fetcher
 
         Args:
-            rate_limit: Requests per second (default 2 to respect Danbooru limits)
+            rate_limit: Average requests per second (default 2 to respect Danbooru limits)
+            burst: Requests allowed back to back before the rate applies
+                (defaults to max_concurrent_pages)
+            max_concurrent_pages: Pages kept in flight by iter_hot_tag_pages
         """
         self.rate_limit = rate_limit
-        self.last_request_time = 0
+        self.max_concurrent_pages = max(1, max_concurrent_pages)
+        self._bucket = AsyncTokenBucket(rate_limit, burst if burst is not None else self.max_concurrent_pages)
         self.session = None
 
     async def _get_session(self) -> aiohttp.ClientSession:
@@ -55,12 +133,7 @@ class DanbooruTagFetcher:
 
     async def _rate_limit_wait(self):
         """Wait to respect rate limit"""
-        if self.rate_limit > 0:
-            min_interval = 1.0 / self.rate_limit
-            elapsed = time.time() - self.last_request_time
-            if elapsed < min_interval:
-                await asyncio.sleep(min_interval - elapsed)
-        self.last_request_time = time.time()
+        await self._bucket.acquire()
 
     async def _fetch_with_retry(self, url: str, params: Dict,
                                 max_retries: int = 3,
@@ -87,9 +160,12 @@ class DanbooruTagFetcher:
                     if response.status == 200:
                         return await response.json()
                     elif response.status == 429:  # Rate limited
-                        wait_time = backoff_factor ** (attempt + 1)
-                        logger.warning(f"⚠️ Rate limited, waiting {wait_time}s...")
-                        await asyncio.sleep(wait_time)
+                        wait_time = _parse_retry_after(response.headers.get("Retry-After"))
+                        if wait_time is None:
+                            wait_time = backoff_factor ** (attempt + 1)
+                        logger.warning(f"⚠️ Rate limited, waiting {wait_time:.1f}s...")
+                        # Pause every request sharing this fetcher, not just this one
+                        self._bucket.pause(wait_time)
                     elif response.status == 404:
                         # No more results
                         return []
@@ -154,73 +230,197 @@ class DanbooruTagFetcher:
 
         return results
 
-    async def fetch_hot_tags(self,
-                            max_tags: int = 100000,
-                            min_post_count: int = 100,
-                            progress_callback: Optional[Callable[[int, int, int], None]] = None,
-                            start_page: int = 1) -> List[Dict]:
+    async def iter_hot_tag_pages(self,
+                                 max_tags: int = 100000,
+                                 min_post_count: int = 100,
+                                 start_page: int = 1,
+                                 fetched_count: int = 0) -> AsyncIterator[Tuple[int, List[Dict]]]:
         """
-        Fetch hot tags from Danbooru
+        Yield hot tags one page at a time, in page order
+
+        Up to max_concurrent_pages requests are in flight at once (all paced
+        by the shared token bucket); pages that complete early are held until
+        the pages before them have been yielded. No more pages are requested
+        than max_tags still needs, assuming full pages.
 
         Args:
-            max_tags: Maximum number of tags to fetch
+            max_tags: Maximum number of tags to fetch in total
             min_post_count: Minimum post count threshold
-            progress_callback: Callback(current_page, total_pages, fetched_count)
             start_page: Starting page (for resume)
+            fetched_count: Tags already stored by earlier pages (for resume)
 
-        Returns:
-            List of tag dictionaries
+        Yields:
+            (page, tags) - tags already filtered by min_post_count and capped
+            so the running total never exceeds max_tags; may be empty
+
+        Raises:
+            RuntimeError: A page could not be fetched after retries. Pages
+                yielded before it are complete, so the caller can resume
+                from the next one.
         """
-        all_tags = []
         tags_per_page = 1000
-        estimated_pages = (max_tags + tags_per_page - 1) // tags_per_page
-
-        logger.info(f"📥 Starting to fetch {max_tags} hot tags (min_count={min_post_count})...")
-
         page = start_page
+        next_to_request = start_page
+        in_flight: Dict[int, asyncio.Future] = {}
         consecutive_empty = 0
 
-        while len(all_tags) < max_tags:
-            # Fetch one page
-            tags = await self.fetch_tags_page(page, tags_per_page, min_post_count)
+        try:
+            while fetched_count < max_tags:
+                # Safety limit: don't go beyond 200 pages
+                if page > 200:
+                    logger.warning(f"⚠️ Reached page limit (200), stopping...")
+                    break
 
-            if tags is None:
-                logger.error(f"❌ Failed to fetch page {page}, stopping...")
-                break
+                pages_needed = (max_tags - fetched_count + tags_per_page - 1) // tags_per_page
+                while (len(in_flight) < self.max_concurrent_pages
+                       and next_to_request < page + pages_needed
+                       and next_to_request <= 200):
+                    in_flight[next_to_request] = asyncio.ensure_future(
+                        self.fetch_tags_page(next_to_request, tags_per_page, min_post_count)
+                    )
+                    next_to_request += 1
+
+                tags = await in_flight.pop(page)
+
+                if tags is None:
+                    raise RuntimeError(f"Failed to fetch page {page}")
+
+                if not tags:
+                    consecutive_empty += 1
+                    if consecutive_empty >= 2:
+                        logger.info(f"✓ No more tags available (page {page})")
+                        break
+                else:
+                    consecutive_empty = 0
+
+                # Filter out tags below threshold
+                valid_tags = [t for t in tags if t['post_count'] >= min_post_count]
+                valid_tags = valid_tags[:max_tags - fetched_count]
+                fetched_count += len(valid_tags)
+
+                yield page, valid_tags
+
+                page += 1
+        finally:
+            for future in in_flight.values():
+                future.cancel()
+
+    async def iter_tag_changes(self, since: datetime,
+                               page_size: int = 1000,
+                               max_pages: int = 200) -> AsyncIterator[List[Dict]]:
+        """
+        Yield pages of tags changed on Danbooru after `since`
 
-            if not tags or len(tags) == 0:
-                consecutive_empty += 1
-                if consecutive_empty >= 2:
-                    logger.info(f"✓ No more tags available (page {page})")
-                    break
-            else:
-                consecutive_empty = 0
-
-            # Filter out tags below threshold
-            valid_tags = [t for t in tags if t['post_count'] >= min_post_count]
-            all_tags.extend(valid_tags)
-
-            # Progress callback
-            if progress_callback:
-                progress_callback(page, estimated_pages, len(all_tags))
-            else:
-                logger.info(f"📥 Page {page}/{estimated_pages} | "
-                      f"Fetched: {len(all_tags)}/{max_tags} tags")
-
-            # Check if we have enough
-            if len(all_tags) >= max_tags:
-                all_tags = all_tags[:max_tags]
-                break
+        Pages are requested with an updated_at filter and walked with the
+        id cursor (page=b<id>, newest id first), so results stay stable while
+        tags keep changing. Paging stops at a short page, or at the first tag
+        that is not newer than `since` (already seen).
 
-            page += 1
+        Args:
+            since: Watermark (timezone-aware); only later changes are returned
+            page_size: Tags per request (max 1000)
+            max_pages: Safety limit on requests
 
-            # Safety limit: don't go beyond 200 pages
-            if page > 200:
-                logger.warning(f"⚠️ Reached page limit (200), stopping...")
-                break
+        Yields:
+            Lists of tag dicts, each with an extra 'updated_at' (aware datetime)
+
+        Raises:
+            RuntimeError: A page could not be fetched after retries
+        """
+        url = f"{self.API_BASE}/tags.json"
+        page_size = min(page_size, 1000)
+        cursor = None
+
+        for _ in range(max_pages):
+            params = {
+                "search[updated_at]": f">{since.isoformat()}",
+                "limit": page_size,
+            }
+            if cursor is not None:
+                params["page"] = f"b{cursor}"
+
+            rows = await self._fetch_with_retry(url, params)
+            if rows is None:
+                raise RuntimeError("Failed to fetch changed tags")
+            if not rows:
+                return
+
+            changed = []
+            reached_seen = False
+            for row in rows:
+                updated_at = _parse_timestamp(row.get("updated_at"))
+                if updated_at is None or updated_at <= since:
+                    reached_seen = True
+                    continue
+                changed.append({
+                    "tag": row.get("name", "").lower(),
+                    "category": row.get("category", 0),
+                    "post_count": row.get("post_count", 0),
+                    "translation_cn": None,
+                    "updated_at": updated_at,
+                })
+
+            if changed:
+                yield changed
+
+            if reached_seen or len(rows) < page_size:
+                return
+            cursor = min(row["id"] for row in rows)
+
+        logger.warning(f"⚠️ Reached page limit ({max_pages}) while fetching changed tags")
+
+    async def iter_tag_relations(self, kind: str = "aliases",
+                                 page_size: int = 1000,
+                                 max_pages: int = 200) -> AsyncIterator[List[Tuple[str, str]]]:
+        """
+        Yield pages of active tag aliases or implications
+
+        Walked with the id cursor (page=b<id>) like iter_tag_changes.
 
-        logger.info(f"✅ Fetched {len(all_tags)} tags successfully!")
-        return all_tags
+        Args:
+            kind: "aliases" or "implications"
+            page_size: Relations per request (max 1000)
+            max_pages: Safety limit on requests
+
+        Yields:
+            Lists of (antecedent, consequent) tag name pairs
+
+        Raises:
+            RuntimeError: A page could not be fetched after retries
+        """
+        if kind not in ("aliases", "implications"):
+            raise ValueError(f"Unknown tag relation: {kind}")
+        url = f"{self.API_BASE}/tag_{kind}.json"
+        page_size = min(page_size, 1000)
+        cursor = None
+
+        for _ in range(max_pages):
+            params = {
+                "search[status]": "active",
+                "limit": page_size,
+            }
+            if cursor is not None:
+                params["page"] = f"b{cursor}"
+
+            rows = await self._fetch_with_retry(url, params)
+            if rows is None:
+                raise RuntimeError(f"Failed to fetch tag {kind}")
+            if not rows:
+                return
+
+            pairs = [
+                (row["antecedent_name"].lower(), row["consequent_name"].lower())
+                for row in rows
+                if row.get("antecedent_name") and row.get("consequent_name")
+            ]
+            if pairs:
+                yield pairs
+
+            if len(rows) < page_size:
+                return
+            cursor = min(row["id"] for row in rows)
+
+        logger.warning(f"⚠️ Reached page limit ({max_pages}) while fetching tag {kind}")
 
     async def fetch_tag_details(self, tag_name: str) -> Optional[Dict]:
         """
@@ -251,58 +451,6 @@ class DanbooruTagFetcher:
 
         return None
 
-    async def incremental_update(self,
-                                 existing_tags: List[str],
-                                 update_count: int = 10000,
-                                 progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
-        """
-        Incrementally update existing tags
-
-        Args:
-            existing_tags: List of existing tag names
-            update_count: Number of top tags to update
-            progress_callback: Callback(current, total)
-
-        Returns:
-            List of updated tag dictionaries
-        """
-        logger.info(f"🔄 Incremental update: checking top {update_count} tags...")
-
-        # Fetch top N tags
-        updated_tags = []
-        page = 1
-        tags_per_page = 1000
-
-        while len(updated_tags) < update_count:
-            tags = await self.fetch_tags_page(page, tags_per_page)
-
-            if tags is None or len(tags) == 0:
-                break
-
-            updated_tags.extend(tags)
-
-            if progress_callback:
-                progress_callback(len(updated_tags), update_count)
-            else:
-                logger.info(f"🔄 Checked {len(updated_tags)}/{update_count} tags")
-
-            if len(updated_tags) >= update_count:
-                updated_tags = updated_tags[:update_count]
-                break
-
-            page += 1
-
-        # Count new tags
-        existing_set = set(existing_tags)
-        new_tags = [t for t in updated_tags if t['tag'] not in existing_set]
-
-        logger.info(f"✅ Incremental update complete!")
-        logger.info(f"Total checked: {len(updated_tags)}")
-        logger.info(f"New tags: {len(new_tags)}")
-        logger.info(f"Updated: {len(updated_tags) - len(new_tags)}")
-
-        return updated_tags
-
 
 async def test_fetcher():
     """Test the fetcher"""
@@ -128,7 +128,8 @@ class BackgroundSyncManager:
         Run synchronization task asynchronously
 
         Args:
-            sync_mode: "auto", "full", or "incremental"
+            sync_mode: "auto", "full", "incremental", or "recover" (delete a
+                corrupted database, then run a full sync)
         """
         from .tag_sync_manager import get_sync_manager
         from ..db.db_manager import get_db_manager
@@ -142,6 +143,12 @@ class BackgroundSyncManager:
                 current_task="初始化同步系统..."
             )
 
+            if sync_mode == "recover":
+                self._update_progress(current_task="修复损坏的标签数据库...")
+                if not await get_db_manager().recover_from_corruption():
+                    raise Exception("无法删除损坏的数据库文件，请手动删除后重启 ComfyUI")
+                sync_mode = "full"
+
             # Check if database exists
             from pathlib import Path
             db_path = Path(get_db_manager().db_path)
@@ -149,7 +156,8 @@ class BackgroundSyncManager:
 
             # Determine sync mode
             if sync_mode == "auto":
-                if needs_full_sync:
+                if needs_full_sync or await get_db_manager().get_sync_progress():
+                    # No database yet, or an interrupted full sync to resume
                     sync_mode = "full"
                 else:
                     # Check if update needed
@@ -175,7 +183,7 @@ class BackgroundSyncManager:
 
                 self._update_progress(
                     status=SyncStatus.FETCHING,
-                    progress=0.1 + (current_page / max(estimated_pages, 1)) * 0.7,
+                    progress=0.1 + min(current_page / max(estimated_pages, 1), 1.0) * 0.85,
                     current_task=f"抓取标签数据 (第 {current_page}/{estimated_pages} 页)",
                     current_page=current_page,
                     estimated_pages=estimated_pages,
@@ -189,10 +197,16 @@ class BackgroundSyncManager:
                 # Initialize database (includes FTS5 virtual table)
                 await get_db_manager().initialize_database()
 
+                if needs_full_sync and await manager.import_bundled_snapshot():
+                    # Bundled offline snapshot imported, nothing to fetch
+                    sync_mode = "snapshot"
+
+            if sync_mode == "full":
                 # Check if database has data but FTS index is empty (migration case)
                 db = get_db_manager()
                 tag_count = await db.get_tags_count()
-                if tag_count > 0:
+                resuming = bool(await db.get_sync_progress())
+                if tag_count > 0 and not resuming:
                     # Rebuild FTS5 index for existing data
                     self._update_progress(
                         status=SyncStatus.SAVING,
@@ -202,60 +216,19 @@ class BackgroundSyncManager:
                     await db.rebuild_fts_index()
                     logger.info(f"[AsyncSync] Rebuilt FTS5 index for {tag_count} existing tags")
 
-                # Fetch tags
+                # Fetch, translate and save page by page
                 self._update_progress(
                     status=SyncStatus.FETCHING,
                     progress=0.1,
-                    current_task="开始抓取热门标签..."
+                    current_task="继续抓取热门标签..." if resuming else "开始抓取热门标签..."
                 )
 
-                max_tags = manager.config['tag_sync']['max_tags']
-                min_post_count = manager.config['tag_sync']['min_post_count']
-
-                fetched_tags = await manager.fetcher.fetch_hot_tags(
-                    max_tags=max_tags,
-                    min_post_count=min_post_count,
-                    progress_callback=fetch_progress
-                )
+                saved_count = await manager.sync_hot_tags(progress_callback=fetch_progress)
 
-                if not fetched_tags:
+                if not saved_count:
                     raise Exception("无法抓取标签数据")
 
-                self._update_progress(
-                    status=SyncStatus.TRANSLATING,
-                    progress=0.8,
-                    current_task="加载翻译数据...",
-                    total_tags=len(fetched_tags)
-                )
-
-                # Add translations
-                manager.translation_loader.load_all()
-                manager.translation_loader.add_translations_to_tags(fetched_tags)
-
-                # Save to database
-                self._update_progress(
-                    status=SyncStatus.SAVING,
-                    progress=0.85,
-                    current_task="保存到数据库..."
-                )
-
-                batch_size = 1000
-                for i in range(0, len(fetched_tags), batch_size):
-                    if self._cancel_requested:
-                        raise asyncio.CancelledError("User cancelled")
-
-                    batch = fetched_tags[i:i + batch_size]
-                    await get_db_manager().insert_tags_batch(batch)
-
-                    progress = 0.85 + (i / len(fetched_tags)) * 0.1
-                    self._update_progress(
-                        progress=progress,
-                        current_task=f"保存标签 ({i + len(batch)}/{len(fetched_tags)})"
-                    )
-
-                # Update metadata
-                await get_db_manager().set_last_sync_time()
-                await get_db_manager().set_metadata('initial_sync_version', '1.0')
+                self._update_progress(total_tags=saved_count)
 
             elif sync_mode == "incremental":
                 logger.info("[AsyncSync] Starting incremental update...")
@@ -340,7 +313,7 @@ class BackgroundSyncManager:
         Start background synchronization
 
         Args:
-            sync_mode: "auto", "full", or "incremental"
+            sync_mode: "auto", "full", "incremental", or "recover"
 
         Returns:
             True if started, False if already running
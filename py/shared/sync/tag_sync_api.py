@@ -4,6 +4,7 @@ Tag sync API - Simple background sync with global toast integration
 
 import asyncio
 import json
+import time
 from pathlib import Path
 from aiohttp import web
 from server import PromptServer
@@ -264,10 +265,115 @@ async def get_sync_status(request):
         return web.json_response({"success": False, "error": str(e)})
 
 
+@PromptServer.instance.routes.get("/danbooru_gallery/tags_snapshot/export")
+async def export_tags_snapshot(request):
+    """Download the tag database as an offline snapshot file"""
+    try:
+        if not SYNC_AVAILABLE:
+            return web.json_response({"success": False, "error": "Sync system not available"})
+
+        from .. import get_sync_manager
+        from ..db.tag_snapshot import TagSnapshotError
+
+        if get_background_sync_manager().is_running():
+            return web.json_response({"success": False, "error": "Synchronization running"}, status=409)
+
+        manager = get_sync_manager()
+        export_path = Path(manager.db_manager.db_path).with_name(f"tags_export_{id(request)}.jsonl.gz")
+        try:
+            info = await manager.export_snapshot(export_path)
+        except TagSnapshotError as e:
+            return web.json_response({"success": False, "error": str(e)}, status=409)
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "application/gzip",
+            "Content-Disposition": 'attachment; filename="tags_snapshot.jsonl.gz"',
+            "Content-Length": str(info["size_bytes"]),
+        })
+        try:
+            await response.prepare(request)
+            with open(export_path, "rb") as f:
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    await response.write(chunk)
+            await response.write_eof()
+        finally:
+            export_path.unlink(missing_ok=True)
+        return response
+
+    except Exception as e:
+        logger.error(f"[标签同步] 导出快照失败: {e}")
+        return web.json_response({"success": False, "error": str(e)})
+
+
+@PromptServer.instance.routes.post("/danbooru_gallery/tags_snapshot/import")
+async def import_tags_snapshot(request):
+    """Replace the tag database with an uploaded snapshot (request body is the file)"""
+    try:
+        if not SYNC_AVAILABLE:
+            return web.json_response({"success": False, "error": "Sync system not available"})
+
+        from .. import get_sync_manager
+        from ..db.tag_snapshot import TagSnapshotError
+
+        if get_background_sync_manager().is_running():
+            return web.json_response({"success": False, "error": "Synchronization running"}, status=409)
+
+        manager = get_sync_manager()
+        upload_path = Path(manager.db_manager.db_path).with_name(f"tags_import_{id(request)}.jsonl.gz")
+        try:
+            with open(upload_path, "wb") as f:
+                async for chunk in request.content.iter_chunked(1024 * 1024):
+                    f.write(chunk)
+            info = await manager.import_snapshot(upload_path)
+        except TagSnapshotError as e:
+            return web.json_response({"success": False, "error": str(e)}, status=400)
+        finally:
+            upload_path.unlink(missing_ok=True)
+
+        send_toast(f"✅ 已导入 {info['tag_count']} 个标签", "success", 3000)
+        return web.json_response({
+            "success": True,
+            "tag_count": info["tag_count"],
+            "created_at": info["created_at"],
+            "elapsed_ms": info["elapsed_ms"],
+        })
+
+    except Exception as e:
+        logger.error(f"[标签同步] 导入快照失败: {e}")
+        return web.json_response({"success": False, "error": str(e)})
+
+
+@PromptServer.instance.routes.get("/danbooru_gallery/db_health")
+async def get_db_health(request):
+    """Last health report of each tier; ?full=1 runs the full integrity check now"""
+    try:
+        from ..db.db_health import full_integrity_check, get_health_reports
+        from .. import get_db_manager
+
+        if request.query.get("full") in ("1", "true"):
+            db_path = get_db_manager().db_path
+            if not Path(db_path).exists():
+                return web.json_response({"success": False, "error": "Database not found"}, status=404)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, full_integrity_check, db_path)
+
+        return web.json_response({"success": True, "reports": get_health_reports()})
+
+    except Exception as e:
+        logger.error(f"[标签同步] 数据库健康检查失败: {e}")
+        return web.json_response({"success": False, "error": str(e)})
+
+
 # ========================================
 # Initialize
 # ========================================
 
+# Delay before the background full integrity check, keeps it out of startup
+FULL_CHECK_DELAY_SECONDS = 120
+
 def auto_start_sync():
     """Auto-start sync on ComfyUI startup if needed"""
     if not SYNC_AVAILABLE:
@@ -275,7 +381,6 @@ def auto_start_sync():
 
     try:
         from .. import get_db_manager
-        from pathlib import Path
 
         # Check if database exists
         db_manager = get_db_manager()
@@ -294,28 +399,32 @@ def auto_start_sync():
             bg_manager = get_background_sync_manager()
             bg_manager.start_sync("full")
         else:
-            # Database exists, check if update needed
-            import asyncio
-            import time
-
-            # Create event loop for async check
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            # Database exists: quick tier only, the full integrity check runs later
+            from ..db.db_health import quick_health_check, schedule_full_integrity_check
 
-            async def check_update():
-                last_sync = await db_manager.get_last_sync_time()
-                days_since_sync = (time.time() - last_sync) / 86400
+            report = quick_health_check(db_path)
+            logger.info(f"[标签同步] 数据库快速检查耗时: {report['timings_ms']}")
+            bg_manager = get_background_sync_manager()
 
-                # Default sync interval: 7 days
-                if last_sync == 0 or days_since_sync >= 7:
-                    logger.info(f"[标签同步] 数据库需要更新 (已 {days_since_sync:.1f} 天未同步),开始增量同步...")
-                    bg_manager = get_background_sync_manager()
-                    bg_manager.start_sync("incremental")
-                else:
-                    logger.info(f"[标签同步] 数据库是最新的 (上次同步: {days_since_sync:.1f} 天前)")
+            if not report["healthy"]:
+                logger.warning(f"[标签同步] 数据库已损坏 ({report['error']}),重建数据库...")
+                bg_manager.start_sync("recover")
+                return
+
+            last_sync = report["last_sync_time"]
+            days_since_sync = (time.time() - last_sync) / 86400
+
+            if report["sync_in_progress"]:
+                logger.info("[标签同步] 检测到未完成的同步,从中断处继续...")
+                bg_manager.start_sync("full")
+            # Default sync interval: 7 days
+            elif last_sync == 0 or days_since_sync >= 7:
+                logger.info(f"[标签同步] 数据库需要更新 (已 {days_since_sync:.1f} 天未同步),开始增量同步...")
+                bg_manager.start_sync("incremental")
+            else:
+                logger.info(f"[标签同步] 数据库是最新的 (上次同步: {days_since_sync:.1f} 天前)")
 
-            loop.run_until_complete(check_update())
-            loop.close()
+            schedule_full_integrity_check(db_path, delay=FULL_CHECK_DELAY_SECONDS)
 
     except Exception as e:
         logger.error(f"[标签同步] 自动启动检查失败: {e}")
@@ -331,7 +440,6 @@ if SYNC_AVAILABLE:
 
     # Auto-start sync with smart waiting (check if WebSocket clients are connected)
     import threading
-    import time
 
     def wait_for_clients_and_start():
         """循环等待 WebSocket 客户端连接后再启动同步"""
@@ -369,3 +477,6 @@ logger.info("[标签同步] API 端点已注册:")
 logger.info("[标签同步]    POST /danbooru_gallery/sync_start")
 logger.info("[标签同步]    POST /danbooru_gallery/sync_cancel")
 logger.info("[标签同步]    GET  /danbooru_gallery/sync_status")
+logger.info("[标签同步]    GET  /danbooru_gallery/tags_snapshot/export")
+logger.info("[标签同步]    POST /danbooru_gallery/tags_snapshot/import")
+logger.info("[标签同步]    GET  /danbooru_gallery/db_health")
@@ -7,10 +7,13 @@ import asyncio
 import time
 import os
 from pathlib import Path
-from typing import Optional, Dict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Callable, List, Tuple
 import json
 
+from ..db.db_health import schedule_full_integrity_check
 from ..db.db_manager import get_db_manager
+from ..db.tag_snapshot import TagSnapshotError, default_tag_snapshot_path, export_tag_snapshot, import_tag_snapshot
 from ..fetcher.tag_fetcher import DanbooruTagFetcher
 from ..translation.translation_loader import get_translation_loader
 from ..cache.memory_cache import get_hot_tags_cache
@@ -19,6 +22,14 @@ from ..cache.memory_cache import get_hot_tags_cache
 from ...utils.logger import get_logger
 logger = get_logger(__name__)
 
+# Watermarks taken from the local clock are moved back this far to absorb clock
+# skew against Danbooru (re-seen unchanged tags are not rewritten)
+WATERMARK_OVERLAP = timedelta(hours=1)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
 
 class TagSyncManager:
     """Manage tag synchronization and caching"""
@@ -40,7 +51,8 @@ class TagSyncManager:
 
         self.db_manager = get_db_manager()
         self.fetcher = DanbooruTagFetcher(
-            rate_limit=self.config['tag_sync']['api_rate_limit']
+            rate_limit=self.config['tag_sync']['api_rate_limit'],
+            max_concurrent_pages=self.config['tag_sync']['api_max_concurrent_pages']
         )
         self.translation_loader = get_translation_loader()
 
@@ -58,12 +70,17 @@ class TagSyncManager:
                 "max_tags": 100000,
                 "sync_interval_days": 7,
                 "incremental_update_count": 10000,
-                "api_rate_limit": 2
+                "api_rate_limit": 2,
+                "api_max_concurrent_pages": 4,
+                "sync_aliases": True,
+                "sync_implications": False
             },
             "offline_mode": {
                 "enabled": True,
                 "fallback_to_remote": True,
-                "remote_timeout_ms": 2000
+                "remote_timeout_ms": 2000,
+                "remote_cache_ttl_hours": 168,
+                "remote_negative_ttl_hours": 24
             },
             "cache": {
                 "memory_cache_enabled": False,           # ✅ 优化: 禁用内存缓存
@@ -106,76 +123,258 @@ class TagSyncManager:
         # Initialize database
         await self.db_manager.initialize_database()
 
-        # Fetch hot tags from Danbooru
+        # A bundled offline snapshot makes the node ready without touching the network
+        if await self.import_bundled_snapshot():
+            return True
+
+        # Stream hot tags from Danbooru into the database
+        saved_count = await self.sync_hot_tags()
+
+        if not saved_count:
+            logger.error("❌ Failed to fetch tags!")
+            return False
+
+        logger.info("\n" + "=" * 60)
+        logger.info(f"✅ Initial sync complete! {saved_count} tags added.")
+        logger.info("=" * 60 + "\n")
+
+        return True
+
+    async def sync_hot_tags(self,
+                            progress_callback: Optional[Callable[[int, int, int], None]] = None) -> int:
+        """
+        Stream hot tags from Danbooru into the database page by page
+
+        Each page is translated and upserted as soon as it arrives, together
+        with the sync progress. If the sync is interrupted, the next call with
+        the same max_tags/min_post_count resumes after the last saved page.
+
+        Args:
+            progress_callback: Callback(current_page, estimated_pages, saved_count),
+                called after each page is saved
+
+        Returns:
+            Number of tags saved (including pages saved before a resume), 0 if none
+        """
         max_tags = self.config['tag_sync']['max_tags']
         min_post_count = self.config['tag_sync']['min_post_count']
+        estimated_pages = (max_tags + 999) // 1000
+
+        start_page, saved_count = 1, 0
+        started_at = _utc_now().isoformat()
+        progress = await self.db_manager.get_sync_progress()
+        if progress.get('max_tags') == max_tags and progress.get('min_post_count') == min_post_count:
+            start_page = progress['page'] + 1
+            saved_count = progress['saved_count']
+            started_at = progress.get('started_at', started_at)
+            logger.info(f"⏩ Resuming tag sync at page {start_page} ({saved_count} tags already saved)")
+        else:
+            logger.info(f"📥 Fetching top {max_tags} hot tags (min_count={min_post_count})...")
 
-        logger.info(f"📥 Fetching top {max_tags} hot tags (min_count={min_post_count})...")
+        self.translation_loader.load_all()
 
-        fetched_tags = await self.fetcher.fetch_hot_tags(
+        pages = self.fetcher.iter_hot_tag_pages(
             max_tags=max_tags,
-            min_post_count=min_post_count
+            min_post_count=min_post_count,
+            start_page=start_page,
+            fetched_count=saved_count
         )
+        try:
+            async for page, tags in pages:
+                self.translation_loader.add_translations_to_tags(tags)
+                saved_count += len(tags)
+                await self.db_manager.insert_tags_batch(tags, sync_progress={
+                    'page': page,
+                    'saved_count': saved_count,
+                    'max_tags': max_tags,
+                    'min_post_count': min_post_count,
+                    'started_at': started_at,
+                })
+
+                if progress_callback:
+                    progress_callback(page, estimated_pages, saved_count)
+                else:
+                    logger.info(f"💾 Page {page}/{estimated_pages} | Saved: {saved_count}/{max_tags} tags")
+        finally:
+            # Cancels page requests still in flight if we stop early
+            await pages.aclose()
 
-        if not fetched_tags:
-            logger.error("❌ Failed to fetch tags!")
-            return False
+        if not saved_count:
+            return 0
 
-        # Load translations
-        logger.info("📚 Loading translation data...")
-        self.translation_loader.load_all()
+        await self.db_manager.clear_sync_progress()
+        await self.db_manager.set_last_sync_time()
+        await self.db_manager.set_metadata('initial_sync_version', '1.0')
+        # Later delta syncs pick up every change made since this sync began
+        await self._set_delta_watermark(datetime.fromisoformat(started_at) - WATERMARK_OVERLAP)
+        await self.sync_tag_relations()
+        return saved_count
 
-        # Add translations to tags
-        logger.info("🔧 Adding translations...")
-        self.translation_loader.add_translations_to_tags(fetched_tags)
+    async def _incremental_update(self):
+        """
+        Incremental update - apply tags changed on Danbooru since the last sync
 
-        # Save to database in batches
-        logger.info("💾 Saving to database...")
-        batch_size = 1000
-        for i in range(0, len(fetched_tags), batch_size):
-            batch = fetched_tags[i:i + batch_size]
-            await self.db_manager.insert_tags_batch(batch)
-            logger.info(f"💾 Saved {min(i + batch_size, len(fetched_tags))}/{len(fetched_tags)} tags")
+        Pages through tags whose updated_at is past the stored watermark and
+        upserts only rows that are new or differ from the database. Databases
+        without a watermark (created by older versions) get one refresh of
+        the top N tags instead, which also sets the watermark.
+        """
+        logger.info("🔄 Performing incremental update...")
+
+        started_at = _utc_now()
+        watermark = await self._get_delta_watermark()
+        self.translation_loader.load_all()
+
+        try:
+            if watermark is not None:
+                changed_count, newest = await self._apply_tag_changes_since(watermark)
+                new_watermark = max(newest, watermark) if newest else watermark
+            else:
+                changed_count = await self._refresh_top_tags()
+                new_watermark = started_at - WATERMARK_OVERLAP
+        except RuntimeError as e:
+            logger.warning(f"⚠️ Incremental update failed, skipping... ({e})")
+            return
 
-        # Update sync metadata
+        await self._set_delta_watermark(new_watermark)
         await self.db_manager.set_last_sync_time()
-        await self.db_manager.set_metadata('initial_sync_version', '1.0')
 
-        logger.info("\n" + "=" * 60)
-        logger.info(f"✅ Initial sync complete! {len(fetched_tags)} tags added.")
-        logger.info("=" * 60 + "\n")
+        logger.info(f"✅ Incremental update complete! {changed_count} tags changed")
+        await self.sync_tag_relations()
 
-        return True
+    async def sync_tag_relations(self) -> Dict[str, int]:
+        """
+        Replace the local tag aliases (and implications, if enabled) with
+        the active ones on Danbooru
 
-    async def _incremental_update(self):
-        """Incremental update - refresh top N tags"""
-        logger.info("🔄 Performing incremental update...")
+        A relation kind that fails to download keeps its stored rows.
+
+        Returns:
+            Rows stored per kind that was synced
+        """
+        kinds = [
+            kind for kind in ("aliases", "implications")
+            if self.config['tag_sync'].get(f"sync_{kind}")
+        ]
+        counts = {}
+        for kind in kinds:
+            pairs = []
+            pages = self.fetcher.iter_tag_relations(kind)
+            try:
+                async for page in pages:
+                    pairs.extend(page)
+            except RuntimeError as e:
+                logger.warning(f"⚠️ Tag {kind} sync failed, keeping stored {kind}... ({e})")
+                continue
+            finally:
+                await pages.aclose()
+
+            if not pairs:
+                continue
+            if kind == "aliases":
+                counts[kind] = await self.db_manager.replace_tag_aliases(pairs)
+            else:
+                counts[kind] = await self.db_manager.replace_tag_implications(pairs)
+            logger.info(f"✅ Synced {counts[kind]} tag {kind} ({len(pairs)} fetched)")
+        return counts
+
+    async def _apply_tag_changes_since(self, watermark: datetime) -> Tuple[int, Optional[datetime]]:
+        """Upsert tags changed after watermark; returns (rows written, newest updated_at seen)"""
+        min_post_count = self.config['tag_sync']['min_post_count']
+        changed_count = 0
+        newest = None
+
+        pages = self.fetcher.iter_tag_changes(watermark)
+        try:
+            async for tags in pages:
+                page_newest = max(t['updated_at'] for t in tags)
+                newest = page_newest if newest is None else max(newest, page_newest)
+                changed_count += await self._upsert_changed_tags(tags, min_post_count)
+        finally:
+            await pages.aclose()
+
+        return changed_count, newest
 
+    async def _refresh_top_tags(self) -> int:
+        """Compare the top N hot tags with the database and upsert the differences"""
         update_count = self.config['tag_sync']['incremental_update_count']
+        min_post_count = self.config['tag_sync']['min_post_count']
+        changed_count = 0
 
-        # Get existing tags
-        existing_tags = await self.db_manager.get_all_tags()
-        existing_tag_names = [t['tag'] for t in existing_tags]
+        pages = self.fetcher.iter_hot_tag_pages(max_tags=update_count, min_post_count=min_post_count)
+        try:
+            async for _page, tags in pages:
+                changed_count += await self._upsert_changed_tags(tags, min_post_count)
+        finally:
+            await pages.aclose()
 
-        # Fetch updates
-        updated_tags = await self.fetcher.incremental_update(
-            existing_tag_names,
-            update_count=update_count
-        )
+        return changed_count
 
-        if not updated_tags:
-            logger.warning("⚠️ Incremental update failed, skipping...")
-            return
+    async def _upsert_changed_tags(self, tags: List[Dict], min_post_count: int) -> int:
+        """
+        Write tags that are new (and popular enough) or differ from their stored row
 
-        # Add translations
-        self.translation_loader.load_all()
-        self.translation_loader.add_translations_to_tags(updated_tags)
+        Only the fetched names are looked up, so the table is never loaded into Python.
+        """
+        stored = await self.db_manager.get_tags_state([t['tag'] for t in tags])
+        changed = []
+        for tag in tags:
+            state = stored.get(tag['tag'])
+            if state is None:
+                if tag['post_count'] >= min_post_count:
+                    changed.append(tag)
+            elif state != (tag['category'], tag['post_count']):
+                changed.append(tag)
+
+        if changed:
+            self.translation_loader.add_translations_to_tags(changed)
+            await self.db_manager.insert_tags_batch(changed)
+        return len(changed)
+
+    async def _get_delta_watermark(self) -> Optional[datetime]:
+        value = await self.db_manager.get_metadata('delta_watermark')
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            logger.warning(f"⚠️ Invalid delta watermark {value!r}, ignoring")
+            return None
 
-        # Update database
-        await self.db_manager.insert_tags_batch(updated_tags)
-        await self.db_manager.set_last_sync_time()
+    async def _set_delta_watermark(self, watermark: datetime):
+        await self.db_manager.set_metadata('delta_watermark', watermark.astimezone(timezone.utc).isoformat())
+
+    async def export_snapshot(self, snapshot_path) -> Dict:
+        """Write the tag database to an offline snapshot file"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, export_tag_snapshot, self.db_manager.db_path, snapshot_path)
 
-        logger.info(f"✅ Incremental update complete!")
+    async def import_snapshot(self, snapshot_path) -> Dict:
+        """
+        Replace the tag database with an offline snapshot
+
+        Raises:
+            TagSnapshotError: The snapshot is invalid or damaged (database unchanged)
+        """
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(None, import_tag_snapshot, self.db_manager.db_path, snapshot_path)
+        self.cache.clear()
+        await self._load_to_memory()
+        logger.info(f"✅ Imported {info['tag_count']} tags from snapshot in {info['elapsed_ms']}ms")
+        return info
+
+    async def import_bundled_snapshot(self) -> bool:
+        """Import the snapshot shipped at the default path, if there is one"""
+        snapshot_path = default_tag_snapshot_path()
+        if not snapshot_path.exists():
+            return False
+        logger.info(f"📦 Importing tag snapshot: {snapshot_path}")
+        try:
+            await self.import_snapshot(snapshot_path)
+        except TagSnapshotError as e:
+            logger.warning(f"⚠️ Tag snapshot unusable, falling back to online sync: {e}")
+            return False
+        return True
 
     async def _load_to_memory(self):
         """Load tags from database to memory cache"""
@@ -246,6 +445,7 @@ class TagSyncManager:
                 else:
                     # Database is healthy, proceed with normal initialization
                     logger.info("✓ Database health check passed")
+                    schedule_full_integrity_check(db_path)
 
                     await self.db_manager.initialize_database()  # Ensure schema is up to date (includes FTS5)
 
@@ -268,7 +468,15 @@ class TagSyncManager:
 
                     sync_interval = self.config['tag_sync']['sync_interval_days']
 
-                    if last_sync == 0:
+                    if await self.db_manager.get_sync_progress():
+                        # A previous full sync was interrupted, continue where it stopped
+                        logger.info("⏩ Interrupted tag sync found, resuming...")
+                        try:
+                            await self.sync_hot_tags()
+                        except Exception as e:
+                            # Offline: keep the already-saved pages usable, resume next start
+                            logger.warning(f"⚠️ Resuming tag sync failed, using existing tags ({e})")
+                    elif last_sync == 0:
                         # Database exists but no sync record, probably from old version
                         logger.warning("⚠️ No sync metadata found, marking as synced")
                         await self.db_manager.set_last_sync_time()
@@ -369,7 +577,7 @@ async def test_sync_manager():
         cache = manager.cache
         if cache.is_loaded():
             logger.info("\nTesting cache search:")
-            results = cache.search_by_prefix("1girl", limit=5)
+            results = await cache.async_search_by_prefix("1girl", limit=5)
             for r in results:
                 logger.info(f"  {r['tag']} - {r['translation_cn']} (count: {r['post_count']})")
 
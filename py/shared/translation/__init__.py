@@ -1,5 +1,6 @@
 """Translation management module"""
 
 from .translation_loader import TranslationLoader, get_translation_loader
+from .translation_store import TranslationStore, get_translation_store
 
-__all__ = ['TranslationLoader', 'get_translation_loader']
+__all__ = ['TranslationLoader', 'get_translation_loader', 'TranslationStore', 'get_translation_store']
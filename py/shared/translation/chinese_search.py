@@ -0,0 +1,228 @@
+"""In-memory index for the Chinese tag search fallback.
+
+``TagTranslationSystem.search_chinese_tags`` ranks every Chinese tag into
+weight tiers (exact 10, prefix 8, n-gram index 6, contains 4, fuzzy 2, partial
+character 1) and sorts by ``(-weight, len(tag))`` with ties kept in dictionary
+order.  This module answers the same query without walking the whole
+dictionary: a sorted key array serves prefixes, id posting lists serve
+substring lookups and per-character bitsets score the fuzzy overlap.  Lower
+tiers are only evaluated while the result list is still short of ``limit``.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+
+def _ids_to_bitset(ids: Iterable[int], size: int) -> int:
+    bits = bytearray((size + 7) // 8)
+    for tag_id in ids:
+        bits[tag_id >> 3] |= 1 << (tag_id & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _iter_bits(value: int):
+    while value:
+        low = value & -value
+        yield low.bit_length() - 1
+        value ^= low
+
+
+class ChineseTagSearchIndex:
+    """Immutable search structures over the ``cn_to_en`` keys.
+
+    Tag ids are positions in the source mapping, so ordering by id reproduces
+    the iteration order the linear scan used to break ties.
+    """
+
+    BITSET_CACHE_SIZE = 256
+
+    def __init__(
+        self,
+        cn_tags: Sequence[str],
+        index_lists: Optional[Mapping[str, Sequence[str]]] = None,
+        _payload: Optional[Mapping[str, object]] = None,
+    ):
+        self.tags: List[str] = list(cn_tags)
+        self._ids: Dict[str, int] = {tag: tag_id for tag_id, tag in enumerate(self.tags)}
+        self._index_lists = index_lists or {}
+        self._bitset_cache: Dict[str, int] = {}
+        if _payload is not None:
+            self._restore(_payload)
+            return
+
+        order = sorted(range(len(self.tags)), key=self.tags.__getitem__)
+        self._sorted_tags = [self.tags[tag_id] for tag_id in order]
+        self._sorted_ids = array("I", order)
+
+        unigrams: Dict[str, array] = {}
+        bigrams: Dict[str, array] = {}
+        length_ids: Dict[int, List[int]] = {}
+        for tag_id, tag in enumerate(self.tags):
+            length_ids.setdefault(len(tag), []).append(tag_id)
+            for char in set(tag):
+                unigrams.setdefault(char, array("I")).append(tag_id)
+            for gram in {tag[i:i + 2] for i in range(len(tag) - 1)}:
+                bigrams.setdefault(gram, array("I")).append(tag_id)
+        # set() above scrambles insertion order within a tag, not across tags,
+        # so every posting list is still ascending by id.
+        self._unigrams = unigrams
+        self._bigrams = bigrams
+        self._length_masks: List[Tuple[int, int]] = [
+            (length, _ids_to_bitset(ids, len(self.tags)))
+            for length, ids in sorted(length_ids.items())
+        ]
+
+    def _restore(self, payload: Mapping[str, object]) -> None:
+        def unpack(raw: bytes) -> array:
+            values = array("I")
+            values.frombytes(raw)
+            return values
+
+        self._sorted_ids = unpack(payload["sorted_ids"])
+        self._sorted_tags = [self.tags[tag_id] for tag_id in self._sorted_ids]
+        self._unigrams = {key: unpack(raw) for key, raw in payload["unigrams"].items()}
+        self._bigrams = {key: unpack(raw) for key, raw in payload["bigrams"].items()}
+        self._length_masks = [tuple(item) for item in payload["length_masks"]]
+
+    @classmethod
+    def from_mapping(cls, cn_to_en: Mapping[str, str], index_lists: Optional[Mapping[str, Sequence[str]]] = None):
+        return cls(list(cn_to_en.keys()), index_lists)
+
+    def to_payload(self) -> Dict[str, object]:
+        """Marshal-friendly form of the derived structures (see ``from_payload``)."""
+        return {
+            "item_size": self._sorted_ids.itemsize,
+            "sorted_ids": self._sorted_ids.tobytes(),
+            "unigrams": {key: value.tobytes() for key, value in self._unigrams.items()},
+            "bigrams": {key: value.tobytes() for key, value in self._bigrams.items()},
+            "length_masks": [list(item) for item in self._length_masks],
+        }
+
+    @classmethod
+    def from_payload(
+        cls,
+        cn_to_en: Mapping[str, str],
+        index_lists: Optional[Mapping[str, Sequence[str]]],
+        payload: Optional[Mapping[str, object]],
+    ):
+        """Rebuild from ``to_payload`` output, falling back to a fresh build if it does not fit."""
+        if not payload or payload.get("item_size") != array("I").itemsize:
+            return cls.from_mapping(cn_to_en, index_lists)
+        return cls(list(cn_to_en.keys()), index_lists, _payload=payload)
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    # ------------------------------------------------------------------
+    # Candidate generators
+    # ------------------------------------------------------------------
+
+    def _by_length(self, ids: Iterable[int]) -> List[int]:
+        tags = self.tags
+        return sorted(ids, key=lambda tag_id: (len(tags[tag_id]), tag_id))
+
+    def prefix_ids(self, query: str) -> List[int]:
+        """Ids of tags starting with ``query`` in sorted-key order."""
+        tags = self._sorted_tags
+        position = bisect_left(tags, query)
+        found = []
+        while position < len(tags) and tags[position].startswith(query):
+            found.append(self._sorted_ids[position])
+            position += 1
+        return found
+
+    def contains_ids(self, query: str) -> List[int]:
+        """Ids of tags containing ``query``, ascending."""
+        if len(query) == 1:
+            return list(self._unigrams.get(query, ()))
+        postings = []
+        for i in range(len(query) - 1):
+            posting = self._bigrams.get(query[i:i + 2])
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        tags = self.tags
+        return sorted(tag_id for tag_id in candidates if query in tags[tag_id])
+
+    def _char_bitset(self, char: str) -> int:
+        bitset = self._bitset_cache.get(char)
+        if bitset is None:
+            bitset = _ids_to_bitset(self._unigrams.get(char, ()), len(self.tags))
+            if len(self._bitset_cache) >= self.BITSET_CACHE_SIZE:
+                self._bitset_cache.pop(next(iter(self._bitset_cache)))
+            self._bitset_cache[char] = bitset
+        return bitset
+
+    def fuzzy_bitset(self, query: str) -> int:
+        """Bitset of tags sharing at least half of the query's distinct characters."""
+        chars = set(query)
+        needed = next(count for count in range(len(chars) + 1) if count / len(chars) >= 0.5)
+        # at_least[k] holds ids matching at least k+1 of the characters seen so far.
+        at_least: List[int] = []
+        for char in chars:
+            bits = self._char_bitset(char)
+            at_least.append(0)
+            for level in range(len(at_least) - 1, 0, -1):
+                at_least[level] |= at_least[level - 1] & bits
+            at_least[0] |= bits
+        return at_least[needed - 1]
+
+    # ------------------------------------------------------------------
+    # Ranked search
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, int]]:
+        """Return ``(chinese_tag, weight)`` pairs exactly as the linear scan ranked them."""
+        if limit <= 0:
+            return []
+        tags = self.tags
+        ranked: List[Tuple[str, int]] = []
+        seen = set()
+
+        def take(ids: Iterable[int], weight: int) -> bool:
+            for tag_id in ids:
+                if tag_id not in seen:
+                    seen.add(tag_id)
+                    ranked.append((tags[tag_id], weight))
+                    if len(ranked) >= limit:
+                        return True
+            return False
+
+        exact_id = self._ids.get(query)
+        if exact_id is not None and take((exact_id,), 10):
+            return ranked
+        if take(self._by_length(self.prefix_ids(query)), 8):
+            return ranked
+
+        # Index matches keep the order of the n-gram index lists.
+        index_ids = [self._ids[tag] for tag in self._index_lists.get(query, ()) if tag in self._ids]
+        index_ids = [tag_id for tag_id in dict.fromkeys(index_ids) if tag_id not in seen]
+        if take(sorted(index_ids, key=lambda tag_id: len(tags[tag_id])), 6):
+            return ranked
+
+        if take(self._by_length(tag_id for tag_id in self.contains_ids(query) if tag_id not in seen), 4):
+            return ranked
+
+        if len(query) >= 2:
+            candidates = self.fuzzy_bitset(query) & ~_ids_to_bitset(seen, len(tags))
+            for _length, mask in self._length_masks:
+                if take(_iter_bits(candidates & mask), 2):
+                    return ranked
+
+        partial: Dict[int, None] = {}
+        for char in query:
+            for tag in self._index_lists.get(char, ()):
+                tag_id = self._ids.get(tag)
+                if tag_id is not None and tag_id not in seen:
+                    partial[tag_id] = None
+        take(sorted(partial, key=lambda tag_id: len(tags[tag_id])), 1)
+        return ranked
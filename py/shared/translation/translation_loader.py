@@ -1,130 +1,79 @@
 """
 Translation data loader
-Loads and integrates translation data from multiple sources
+Lookup helpers over the shared translation store (see translation_store.py)
 """
 
-import json
-import csv
 from pathlib import Path
-from typing import Dict, Optional, List, Set
+from typing import Dict, Iterator, Mapping, Optional, List
+
+from .translation_store import DEFAULT_ZH_CN_DIR, TranslationStore, get_translation_store
 
 # Logger导入
 from ...utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+class _LowercaseValues(Mapping):
+    """Read-only view of a mapping whose values are lowercased on access"""
+
+    def __init__(self, data: Mapping[str, str]):
+        self._data = data
+
+    def __getitem__(self, key: str) -> str:
+        return self._data[key].lower()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
 class TranslationLoader:
-    """Load and manage translation data"""
+    """Tag translation lookups backed by the process-wide TranslationStore"""
 
     def __init__(self, zh_cn_dir: Optional[str] = None):
         """
         Initialize translation loader
 
         Args:
-            zh_cn_dir: Path to zh_cn directory (auto-detect if None)
+            zh_cn_dir: Path to zh_cn directory (bundled dictionaries if None)
         """
-        if zh_cn_dir is None:
-            # Auto-detect zh_cn directory
-            # From py/global/translation to py/ then to danbooru_gallery/zh_cn
-            current_dir = Path(__file__).parent  # py/global/translation
-            py_dir = current_dir.parent.parent   # py/
-            zh_cn_dir = py_dir / "danbooru_gallery" / "zh_cn"
+        self.zh_cn_dir = Path(zh_cn_dir) if zh_cn_dir is not None else DEFAULT_ZH_CN_DIR
+
+        # Shared read-only data, resolved on first use
+        self._store: Optional[TranslationStore] = None
 
-        self.zh_cn_dir = Path(zh_cn_dir)
+    @property
+    def _loaded(self) -> bool:
+        return self._store is not None
 
-        # Translation mappings
-        self.en_to_cn: Dict[str, str] = {}  # English -> Chinese
-        self.cn_to_en: Dict[str, str] = {}  # Chinese -> English
+    @property
+    def en_to_cn(self) -> Mapping[str, str]:
+        """English -> Chinese (English tags lowercased, no underscore variants)"""
+        if not self._loaded:
+            self.load_all()
+        return self._store.lowercase_en_to_cn() if self._store else {}
 
-        # Loaded flag
-        self._loaded = False
+    @property
+    def cn_to_en(self) -> Mapping[str, str]:
+        """Chinese -> English (English tags lowercased, like get_chinese's lookups)"""
+        if not self._loaded:
+            self.load_all()
+        return _LowercaseValues(self._store.cn_to_en) if self._store else {}
 
     def _normalize_tag(self, tag: str) -> str:
         """Normalize tag name (lowercase, strip)"""
         return tag.lower().strip()
 
-    def _load_json_translations(self):
-        """Load translations from all_tags_cn.json"""
-        json_file = self.zh_cn_dir / "all_tags_cn.json"
-
-        if not json_file.exists():
-            logger.warning(f"⚠️ File not found: {json_file}")
-            return
-
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            for en_tag, cn_trans in data.items():
-                en_tag_norm = self._normalize_tag(en_tag)
-                cn_trans_norm = cn_trans.strip()
-
-                self.en_to_cn[en_tag_norm] = cn_trans_norm
-                # Also add reverse mapping
-                if cn_trans_norm:
-                    self.cn_to_en[cn_trans_norm] = en_tag_norm
-
-            logger.info(f"✓ Loaded {len(data)} translations from JSON")
-
-        except Exception as e:
-            logger.error(f"❌ Error loading JSON: {e}")
-
-    def _load_csv_translations(self, csv_file: Path, reverse: bool = False):
-        """
-        Load translations from CSV file
-
-        Args:
-            csv_file: Path to CSV file
-            reverse: If True, first column is CN, second is EN
-        """
-        if not csv_file.exists():
-            logger.warning(f"⚠️ File not found: {csv_file}")
-            return
-
-        try:
-            count = 0
-            with open(csv_file, 'r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if len(row) < 2:
-                        continue
-
-                    if reverse:
-                        # Chinese, English
-                        cn_trans = row[0].strip()
-                        en_tag = self._normalize_tag(row[1])
-                    else:
-                        # English, Chinese
-                        en_tag = self._normalize_tag(row[0])
-                        cn_trans = row[1].strip()
-
-                    if en_tag and cn_trans:
-                        # Don't overwrite existing translations
-                        if en_tag not in self.en_to_cn:
-                            self.en_to_cn[en_tag] = cn_trans
-                        if cn_trans not in self.cn_to_en:
-                            self.cn_to_en[cn_trans] = en_tag
-                        count += 1
-
-            logger.info(f"✓ Loaded {count} translations from {csv_file.name}")
-
-        except Exception as e:
-            logger.error(f"❌ Error loading CSV {csv_file.name}: {e}")
-
     def load_all(self):
-        """Load all translation files"""
+        """Attach to the shared translation store (loads it on first use)"""
         if self._loaded:
             return
 
-        logger.info(f"📚 Loading translation data from {self.zh_cn_dir}...")
-
-        # Load in priority order (later sources don't overwrite earlier ones)
-        self._load_json_translations()
-        self._load_csv_translations(self.zh_cn_dir / "danbooru.csv", reverse=False)
-        self._load_csv_translations(self.zh_cn_dir / "wai_characters.csv", reverse=True)
-
-        self._loaded = True
-        logger.info(f"✅ Total: {len(self.en_to_cn)} EN->CN, {len(self.cn_to_en)} CN->EN")
+        self._store = get_translation_store(self.zh_cn_dir)
+        if self._store is None:
+            logger.error(f"❌ Translation data unavailable: {self.zh_cn_dir}")
 
     def get_chinese(self, english_tag: str) -> Optional[str]:
         """
@@ -140,20 +89,13 @@ class TranslationLoader:
             self.load_all()
 
         tag_norm = self._normalize_tag(english_tag)
+        en_to_cn = self.en_to_cn
 
-        # Try exact match
-        if tag_norm in self.en_to_cn:
-            return self.en_to_cn[tag_norm]
-
-        # Try with underscores replaced with spaces
-        tag_space = tag_norm.replace('_', ' ')
-        if tag_space in self.en_to_cn:
-            return self.en_to_cn[tag_space]
-
-        # Try with spaces replaced with underscores
-        tag_under = tag_norm.replace(' ', '_')
-        if tag_under in self.en_to_cn:
-            return self.en_to_cn[tag_under]
+        # Try exact match, then with underscores/spaces swapped
+        for candidate in (tag_norm, tag_norm.replace('_', ' '), tag_norm.replace(' ', '_')):
+            translation = en_to_cn.get(candidate)
+            if translation is not None:
+                return translation
 
         return None
 
@@ -236,11 +178,11 @@ class TranslationLoader:
         if not self._loaded:
             self.load_all()
 
-        return {
-            'en_to_cn_count': len(self.en_to_cn),
-            'cn_to_en_count': len(self.cn_to_en),
-            'loaded': self._loaded
+        stats = self._store.memory_stats() if self._store else {
+            'en_to_cn_count': 0,
+            'cn_to_en_count': 0,
         }
+        return {**stats, 'loaded': self._loaded}
 
 
 # Global translation loader instance
@@ -0,0 +1,100 @@
+"""Versioned binary snapshots of the parsed ``zh_cn`` translation dictionaries.
+
+Parsing ``all_tags_cn.json`` plus the two CSV files and deriving the search
+structures costs far more than reading them back with :mod:`marshal`.  A
+snapshot stores the derived payload together with a fingerprint of the source
+files; any edit to a source file, a format bump or a different interpreter
+(marshal is version specific) makes the snapshot stale and it is rebuilt.
+"""
+
+from __future__ import annotations
+
+import gc
+import hashlib
+import marshal
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+SNAPSHOT_VERSION = 2
+SOURCE_FILES = ("all_tags_cn.json", "danbooru.csv", "wai_characters.csv")
+_MAGIC = b"DGTS"
+_HEADER = struct.Struct("<4sHH64s")
+
+PathLike = Union[str, Path]
+
+
+def default_snapshot_path(name: str) -> Path:
+    """Snapshot location next to the tag database (``py/shared/data``)."""
+    return Path(__file__).resolve().parents[1] / "data" / f"translation_{name}.snapshot"
+
+
+def source_fingerprint(zh_cn_dir: PathLike, extra: str = "") -> str:
+    """SHA256 over the source files' names and contents.
+
+    ``extra`` lets a consumer fold its own build parameters into the key so two
+    consumers that derive different structures never share a snapshot.
+    """
+    digest = hashlib.sha256()
+    digest.update(extra.encode("utf-8"))
+    for name in SOURCE_FILES:
+        digest.update(b"\0" + name.encode("utf-8") + b"\0")
+        try:
+            with open(Path(zh_cn_dir) / name, "rb") as handle:
+                for chunk in iter(lambda: handle.read(1 << 20), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+def load_snapshot(path: PathLike, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Return the stored payload, or ``None`` when missing, stale or unreadable."""
+    try:
+        with open(path, "rb") as handle:
+            header = handle.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return None
+            magic, version, marshal_version, stored = _HEADER.unpack(header)
+            if (
+                magic != _MAGIC
+                or version != SNAPSHOT_VERSION
+                or marshal_version != marshal.version
+                or stored.decode("ascii", "replace") != fingerprint
+            ):
+                return None
+            data = handle.read()
+        # The payload is hundreds of thousands of acyclic containers; letting
+        # the cyclic GC rescan them mid-load costs more than the load itself.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            payload = marshal.loads(data)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def save_snapshot(path: PathLike, fingerprint: str, payload: Dict[str, Any]) -> bool:
+    """Atomically write ``payload``; failures are reported, never raised."""
+    path = Path(path)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = marshal.dumps(payload)
+        with open(temp_path, "wb") as handle:
+            handle.write(_HEADER.pack(_MAGIC, SNAPSHOT_VERSION, marshal.version, fingerprint.encode("ascii")))
+            handle.write(data)
+        os.replace(temp_path, path)
+        return True
+    except (OSError, ValueError):
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
+        return False
@@ -0,0 +1,315 @@
+"""
+Process-wide translation store
+
+The zh_cn dictionaries are parsed (or read back from a snapshot) exactly once
+per process.  TagTranslationSystem, TranslationLoader and the character swap
+tag list all read from the same immutable TranslationStore instead of keeping
+their own copies.
+"""
+
+import csv
+import json
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from itertools import islice
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+from .chinese_search import ChineseTagSearchIndex
+from .translation_snapshot import default_snapshot_path, load_snapshot, save_snapshot, source_fingerprint
+
+# Logger导入
+from ...utils.logger import get_logger
+logger = get_logger(__name__)
+
+
+DEFAULT_ZH_CN_DIR = (Path(__file__).resolve().parents[2] / "danbooru_gallery" / "zh_cn").resolve()
+SNAPSHOT_NAME = "store"
+
+
+def _deep_sizeof(*roots) -> int:
+    """Bytes held by the given containers and everything they reference (shared objects counted once)."""
+    seen = set()
+    total = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return total
+
+
+class TranslationStore:
+    """Immutable translation data shared by every consumer in the process"""
+
+    def __init__(
+        self,
+        data: Dict,
+        search_index: ChineseTagSearchIndex,
+        zh_cn_dir: Path,
+        fingerprint: str,
+        source: str,
+        elapsed_ms: float,
+    ):
+        self._data = data
+        # English tag -> Chinese, case preserved, includes underscore variants
+        self.en_to_cn = MappingProxyType(data["en_to_cn"])
+        # Chinese -> English tag
+        self.cn_to_en = MappingProxyType(data["cn_to_en"])
+        # Chinese n-gram -> Chinese tags (unigram, bigram, trigram)
+        self.cn_search_index = MappingProxyType(data["cn_search_index"])
+        # all_tags_cn.json as shipped (danbooru.csv if the JSON is unusable), served to the frontend
+        self.all_tags = MappingProxyType(data["all_tags"])
+        # lowercase key -> original key, only for keys that are not already lowercase
+        self._folded_keys = MappingProxyType(data["folded_keys"])
+        # en_to_cn holds the JSON keys, then the CSV keys, then the variants
+        self._json_key_count, self._source_key_count = data["en_key_counts"]
+        self._lowercase_en_to_cn: Optional[Mapping[str, str]] = None
+        self.search_index = search_index
+        self.zh_cn_dir = zh_cn_dir
+        # SHA256 of the source files; changes whenever the data does
+        self.fingerprint = fingerprint
+        self.load_stats = {"source": source, "elapsed_ms": elapsed_ms}
+        self._memory_bytes = None
+
+    def get_chinese(self, english_tag: str) -> Optional[str]:
+        """Exact lookup, then a case-insensitive one"""
+        translation = self.en_to_cn.get(english_tag)
+        if translation is None:
+            original = self._folded_keys.get(english_tag.lower())
+            if original is not None:
+                translation = self.en_to_cn.get(original)
+        return translation
+
+    def lowercase_en_to_cn(self) -> Mapping[str, str]:
+        """
+        English -> Chinese with lowercased keys and no underscore variants
+
+        The map TranslationLoader has always exposed: among keys that only
+        differ in case the last JSON one wins, then the first CSV one.
+        Built on first use.
+        """
+        if self._lowercase_en_to_cn is None:
+            mapping = {}
+            source_items = islice(self.en_to_cn.items(), self._source_key_count)
+            for index, (en_tag, cn_tag) in enumerate(source_items):
+                if index < self._json_key_count:
+                    mapping[en_tag.lower()] = cn_tag
+                else:
+                    mapping.setdefault(en_tag.lower(), cn_tag)
+            self._lowercase_en_to_cn = MappingProxyType(mapping)
+        return self._lowercase_en_to_cn
+
+    def memory_stats(self) -> Dict:
+        """Measured footprint of the store (computed once, objects shared between maps counted once)"""
+        if self._memory_bytes is None:
+            self._memory_bytes = _deep_sizeof(self._data, *vars(self.search_index).values())
+        return {
+            "en_to_cn_count": len(self.en_to_cn),
+            "cn_to_en_count": len(self.cn_to_en),
+            "all_tags_count": len(self.all_tags),
+            "memory_bytes": self._memory_bytes,
+            "memory_mb": round(self._memory_bytes / (1024 * 1024), 2),
+        }
+
+
+# ================================
+# 构建（解析源文件）
+# ================================
+
+def _read_csv_rows(csv_file: Path):
+    # utf-8-sig: wai_characters.csv starts with a BOM
+    with open(csv_file, 'r', encoding='utf-8-sig') as f:
+        yield from csv.reader(f)
+
+
+def _build_data(zh_cn_dir: Path) -> Dict:
+    en_to_cn: Dict[str, str] = {}
+    cn_to_en: Dict[str, str] = {}
+    all_tags: Dict[str, str] = {}
+
+    # JSON数据优先，后续来源不覆盖已有翻译
+    json_file = zh_cn_dir / "all_tags_cn.json"
+    if json_file.exists():
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                all_tags = data
+                for en_tag, cn_tag in data.items():
+                    if en_tag and cn_tag:
+                        en_to_cn[en_tag.strip()] = cn_tag.strip()
+                        cn_to_en[cn_tag.strip()] = en_tag.strip()
+        except Exception as e:
+            logger.error(f"[TranslationStore] JSON加载失败: {e}")
+    json_key_count = len(en_to_cn)
+
+    csv_file = zh_cn_dir / "danbooru.csv"
+    if csv_file.exists():
+        try:
+            csv_tags = {}
+            for row in _read_csv_rows(csv_file):
+                if len(row) >= 2 and row[0] and row[1]:
+                    csv_tags[row[0]] = row[1]
+                    en_tag, cn_tag = row[0].strip(), row[1].strip()
+                    en_to_cn.setdefault(en_tag, cn_tag)
+                    cn_to_en.setdefault(cn_tag, en_tag)
+            if not all_tags:
+                all_tags = csv_tags
+        except Exception as e:
+            logger.error(f"[TranslationStore] CSV加载失败: {e}")
+
+    # 角色CSV格式：中文名称,英文tag
+    character_file = zh_cn_dir / "wai_characters.csv"
+    if character_file.exists():
+        try:
+            for row in _read_csv_rows(character_file):
+                if len(row) >= 2 and row[0] and row[1]:
+                    cn_tag, en_tag = row[0].strip(), row[1].strip()
+                    en_to_cn.setdefault(en_tag, cn_tag)
+                    cn_to_en.setdefault(cn_tag, en_tag)
+        except Exception as e:
+            logger.error(f"[TranslationStore] 角色CSV加载失败: {e}")
+
+    # 下划线变体：long_hair -> longhair，1girl -> 1_girl
+    source_key_count = len(en_to_cn)
+    variants = {}
+    for en_tag, cn_tag in en_to_cn.items():
+        if '_' in en_tag:
+            variant = en_tag.replace('_', '')
+        else:
+            variant = re.sub(r'(\d)([a-zA-Z])', r'\1_\2', en_tag)
+        if variant != en_tag and variant not in en_to_cn:
+            variants[variant] = cn_tag
+    en_to_cn.update(variants)
+
+    folded_keys = {}
+    for en_tag in en_to_cn:
+        lowered = en_tag.lower()
+        if lowered != en_tag and lowered not in en_to_cn:
+            folded_keys.setdefault(lowered, en_tag)
+
+    # 中文n-gram索引（单字、2字、3字）
+    cn_search_index = {}
+    for cn_tag in cn_to_en:
+        for i, char in enumerate(cn_tag):
+            cn_search_index.setdefault(char, set()).add(cn_tag)
+            for length in (2, 3):
+                if i + length <= len(cn_tag):
+                    cn_search_index.setdefault(cn_tag[i:i + length], set()).add(cn_tag)
+    cn_search_index = {key: list(value) for key, value in cn_search_index.items()}
+
+    return {
+        "en_to_cn": en_to_cn,
+        "cn_to_en": cn_to_en,
+        "cn_search_index": cn_search_index,
+        "all_tags": all_tags,
+        "folded_keys": folded_keys,
+        "en_key_counts": (json_key_count, source_key_count),
+    }
+
+
+def build_translation_store(zh_cn_dir=None, snapshot_path=None) -> TranslationStore:
+    """
+    Load from the snapshot when it matches the sources, otherwise parse and write a new snapshot
+
+    Only the bundled dictionaries get a default snapshot path; other directories
+    are parsed every time unless snapshot_path is given.
+    """
+    zh_cn_dir = Path(zh_cn_dir) if zh_cn_dir else DEFAULT_ZH_CN_DIR
+    if snapshot_path is None and zh_cn_dir.resolve() == DEFAULT_ZH_CN_DIR:
+        snapshot_path = default_snapshot_path(SNAPSHOT_NAME)
+    started = time.perf_counter()
+
+    fingerprint = source_fingerprint(zh_cn_dir, extra=SNAPSHOT_NAME)
+    data = load_snapshot(snapshot_path, fingerprint) if snapshot_path else None
+    if data is not None:
+        search_index = ChineseTagSearchIndex.from_payload(
+            data["cn_to_en"], data["cn_search_index"], data.pop("search_index", None)
+        )
+        source = "snapshot"
+    else:
+        data = _build_data(zh_cn_dir)
+        search_index = ChineseTagSearchIndex.from_mapping(data["cn_to_en"], data["cn_search_index"])
+        source = "source"
+        if snapshot_path and not save_snapshot(snapshot_path, fingerprint, {**data, "search_index": search_index.to_payload()}):
+            logger.warning(f"[TranslationStore] 快照写入失败: {snapshot_path}")
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    return TranslationStore(data, search_index, zh_cn_dir, fingerprint, source, elapsed_ms)
+
+
+# ================================
+# 进程级单例
+# ================================
+
+_stores: Dict[Path, TranslationStore] = {}
+_loader_threads: Dict[Path, threading.Thread] = {}
+_store_lock = threading.Lock()
+
+
+def _store_key(zh_cn_dir) -> Path:
+    return Path(zh_cn_dir).resolve() if zh_cn_dir else DEFAULT_ZH_CN_DIR
+
+
+def get_translation_store(zh_cn_dir=None, wait: bool = True) -> Optional[TranslationStore]:
+    """
+    Get the shared store for a zh_cn directory
+
+    Args:
+        zh_cn_dir: zh_cn directory (bundled dictionaries if None)
+        wait: if False, return None instead of blocking while a background load is running
+
+    Returns:
+        The store, or None when not ready (wait=False) or loading failed
+    """
+    key = _store_key(zh_cn_dir)
+    store = _stores.get(key)
+    if store is not None or (not wait and key in _loader_threads and _loader_threads[key].is_alive()):
+        return store
+    with _store_lock:
+        store = _stores.get(key)
+        if store is None:
+            try:
+                store = build_translation_store(key)
+            except Exception as e:
+                logger.error(f"[TranslationStore] 加载失败: {e}")
+                return None
+            _stores[key] = store
+            stats = store.memory_stats()
+            logger.info(
+                f"[TranslationStore] 加载完成({store.load_stats['source']}): "
+                f"{stats['en_to_cn_count']} EN->CN, {stats['cn_to_en_count']} CN->EN, "
+                f"{stats['memory_mb']}MB, 耗时 {store.load_stats['elapsed_ms']}ms"
+            )
+        return store
+
+
+def start_background_load(zh_cn_dir=None) -> None:
+    """Load the store on a daemon thread so plugin import is not blocked"""
+    key = _store_key(zh_cn_dir)
+    with _store_lock:
+        if key in _stores or (key in _loader_threads and _loader_threads[key].is_alive()):
+            return
+        thread = threading.Thread(
+            target=get_translation_store,
+            args=(key,),
+            name="DanbooruTranslationLoader",
+            daemon=True,
+        )
+        _loader_threads[key] = thread
+        thread.start()
+
+
+def is_translation_store_ready(zh_cn_dir=None) -> bool:
+    return _store_key(zh_cn_dir) in _stores
@@ -0,0 +1,142 @@
+"""
+Precompressed, ETag-validated caching for large JSON GET endpoints.
+
+A route hands the cache a cheap ``version`` (file stat, store fingerprint, ...)
+and a loader.  While the version is unchanged the JSON body is encoded and
+compressed only once; browsers revalidate with ``If-None-Match`` and get a
+bodiless 304 when nothing changed.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from aiohttp import hdrs, web
+
+try:
+    import brotli  # optional: only used when installed
+except ImportError:
+    brotli = None
+
+
+class _PrecompressedResponse(web.Response):
+    """Response whose body may already be encoded.
+
+    ComfyUI's ``--enable-compress-response-body`` middleware calls
+    ``enable_compression()`` on JSON responses; doing that to a gzip/br body
+    would encode it twice.
+    """
+
+    def enable_compression(self, *args, **kwargs):
+        if hdrs.CONTENT_ENCODING in self.headers:
+            return
+        super().enable_compression(*args, **kwargs)
+
+
+class _CachedBody:
+    __slots__ = ("version", "etag", "variants")
+
+    def __init__(self, version: Hashable, body: bytes):
+        self.version = version
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.variants: Dict[str, bytes] = {"identity": body}
+        gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(gzipped) < len(body):
+            self.variants["gzip"] = gzipped
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.variants["br"] = compressed
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted = {}
+    for item in header.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    return accepted
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class JsonResponseCache:
+    """One cached JSON payload with identity/gzip/br variants and an ETag"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._entry: Optional[_CachedBody] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "builds": 0, "not_modified": 0}
+
+    def invalidate(self) -> None:
+        """Drop the cached body; the next request re-runs the loader"""
+        self._entry = None
+
+    def _build(self, version: Hashable, load: Callable[[], Any]) -> _CachedBody:
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry.version == version:
+                return entry
+            body = json.dumps(load(), ensure_ascii=False).encode("utf-8")
+            entry = _CachedBody(version, body)
+            self._entry = entry
+            self.stats["builds"] += 1
+            return entry
+
+    async def respond(self, request: web.Request, version: Hashable, load: Callable[[], Any]) -> web.Response:
+        """
+        Serve the payload for ``version``, re-encoding only when it changed
+
+        ``load`` runs in the default executor together with encoding and
+        compression so a rebuild never blocks the event loop.
+        """
+        entry = self._entry
+        if entry is None or entry.version != version:
+            loop = asyncio.get_running_loop()
+            entry = await loop.run_in_executor(None, self._build, version, load)
+        else:
+            self.stats["hits"] += 1
+
+        headers = {
+            hdrs.ETAG: entry.etag,
+            hdrs.CACHE_CONTROL: "no-cache",
+            hdrs.VARY: hdrs.ACCEPT_ENCODING,
+        }
+        if _etag_matches(request.headers.get(hdrs.IF_NONE_MATCH, ""), entry.etag):
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers=headers)
+
+        accepted = _accepted_encodings(request.headers.get(hdrs.ACCEPT_ENCODING, ""))
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in entry.variants and accepted.get(candidate, 0) > 0:
+                encoding = candidate
+                break
+        if encoding != "identity":
+            headers[hdrs.CONTENT_ENCODING] = encoding
+        return _PrecompressedResponse(
+            body=entry.variants[encoding],
+            content_type="application/json",
+            charset="utf-8",
+            headers=headers,
+        )
@@ -0,0 +1,45 @@
+"""Package stubs shared by the tools/ tests and benchmarks.
+
+The plugin's modules use relative imports (``from ..utils.logger import
+get_logger``) and importing the real ``py`` package would pull in ComfyUI.
+stub_packages registers bare packages under a private prefix instead, so
+single modules can be imported with importlib without running any
+``__init__.py``. Scripts import this module after putting tools/ on
+sys.path, which works both for ``python -m unittest tools.test_x`` and for
+``python tools/benchmark_x.py``.
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+import sys
+from types import ModuleType
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def package(name: str, path: Path) -> ModuleType:
+    """Register an empty package `name` whose modules are loaded from `path`"""
+    module = ModuleType(name)
+    module.__path__ = [str(path)]
+    sys.modules[name] = module
+    return module
+
+
+def stub_packages(prefix: str, *subpackages: str) -> None:
+    """
+    Register `prefix` as the py/ package, plus `subpackages` of it
+
+    Subpackages are dotted paths below py/ ("shared.db"); their parents
+    must be listed too. `prefix`.utils.logger is always provided, backed
+    by the standard logging module.
+    """
+    package(prefix, ROOT / "py")
+    for subpackage in subpackages:
+        package(f"{prefix}.{subpackage}", ROOT / "py" / Path(*subpackage.split(".")))
+    package(f"{prefix}.utils", ROOT / "py" / "utils")
+    logger_module = ModuleType(f"{prefix}.utils.logger")
+    logger_module.get_logger = logging.getLogger
+    sys.modules[logger_module.__name__] = logger_module
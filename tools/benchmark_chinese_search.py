@@ -0,0 +1,85 @@
+"""Offline benchmark for the Chinese tag search fallback.
+
+Run with the Python environment used by ComfyUI:
+    python tools/benchmark_chinese_search.py
+
+Loads the bundled ``zh_cn`` dictionaries the same way TagTranslationSystem
+does, then compares the old linear scan against ChineseTagSearchIndex on a
+fixed query mix.  Both variants must return identical ``(tag, weight)`` lists.
+"""
+
+from __future__ import annotations
+
+import csv
+import importlib.util
+import json
+from pathlib import Path
+import sys
+import time
+
+
+ROOT = Path(__file__).resolve().parents[1]
+ZH_CN_DIR = ROOT / "py" / "danbooru_gallery" / "zh_cn"
+QUERIES = ["女", "头发", "眼睛", "蓝色眼", "猫耳", "长发女孩", "白色连衣裙", "机器", "不存在的词", "手"]
+ROUNDS = 5
+LIMIT = 10
+
+
+def _load(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    assert spec.loader is not None
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_cn_to_en():
+    cn_to_en = {}
+    data = json.loads((ZH_CN_DIR / "all_tags_cn.json").read_text(encoding="utf-8"))
+    for en_tag, cn_tag in data.items():
+        if en_tag and cn_tag:
+            cn_to_en[cn_tag.strip()] = en_tag.strip()
+    for file_name, cn_column in (("danbooru.csv", 1), ("wai_characters.csv", 0)):
+        with open(ZH_CN_DIR / file_name, "r", encoding="utf-8") as handle:
+            for row in csv.reader(handle):
+                if len(row) >= 2 and row[0] and row[1]:
+                    cn_to_en.setdefault(row[cn_column].strip(), row[1 - cn_column].strip())
+    return cn_to_en
+
+
+def main():
+    sys.path.insert(0, str(ROOT / "tools"))
+    from test_gallery_chinese_search import build_index_lists, linear_search
+
+    search_module = _load("chinese_search_benchmark", ROOT / "py" / "shared" / "translation" / "chinese_search.py")
+    cn_to_en = _load_cn_to_en()
+    index_lists = build_index_lists(cn_to_en)
+
+    started = time.perf_counter()
+    index = search_module.ChineseTagSearchIndex.from_mapping(cn_to_en, index_lists)
+    build_elapsed = time.perf_counter() - started
+
+    timings = {}
+    for name, search in (
+        ("linear-scan", lambda query: linear_search(cn_to_en, index_lists, query, LIMIT)),
+        ("indexed", lambda query: index.search(query, LIMIT)),
+    ):
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            for query in QUERIES:
+                search(query)
+        timings[name] = (time.perf_counter() - started) / (ROUNDS * len(QUERIES))
+
+    for query in QUERIES:
+        assert index.search(query, LIMIT) == linear_search(cn_to_en, index_lists, query, LIMIT), query
+
+    print(f"Chinese tags: {len(cn_to_en)} | index build: {build_elapsed * 1000:.1f}ms")
+    print("Variant | Per query | Correct?")
+    for name, elapsed in timings.items():
+        print(f"{name} | {elapsed * 1000:.3f}ms | yes")
+    print(f"speedup | {timings['linear-scan'] / max(timings['indexed'], 1e-9):.1f}x | identical results | yes")
+
+
+if __name__ == "__main__":
+    main()
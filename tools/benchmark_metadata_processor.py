@@ -0,0 +1,124 @@
+"""Offline benchmark for metadata tracing on large prompt graphs.
+
+Run with the Python environment used by ComfyUI:
+    python tools/benchmark_metadata_processor.py
+
+Builds a synthetic 500-node prompt with four pipelines, each a base sampler
+followed by two hires passes, and a decode after every pass.  Every decode
+is treated as a save node and asks MetadataProcessor for its generation
+parameters.  The baseline drops the prompt graph index before each call,
+reproducing a full scan of the prompt and of the execution order per save.
+"""
+
+from __future__ import annotations
+
+import importlib
+from pathlib import Path
+import sys
+import time
+from types import SimpleNamespace
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+TOTAL_NODES = 500
+PIPELINES = 4
+HIRES_PASSES = 2
+ROUNDS = 20
+
+
+def _load_modules():
+    stub_packages("processor_benchmark", "metadata_collector")
+    processor = importlib.import_module("processor_benchmark.metadata_collector.metadata_processor")
+    graph = importlib.import_module("processor_benchmark.metadata_collector.prompt_graph")
+    return processor.MetadataProcessor, graph
+
+
+def build_workflow():
+    original_prompt = {}
+    sampling = {}
+    prompts = {}
+    order = []
+    decodes = []
+
+    def add(node_id, class_type, **inputs):
+        original_prompt[node_id] = {"class_type": class_type, "inputs": inputs}
+        order.append(node_id)
+
+    add("ckpt", "CheckpointLoaderSimple", ckpt_name="model.safetensors")
+    for pipeline in range(PIPELINES):
+        prefix = f"p{pipeline}"
+        pos, neg = object(), object()
+        add(f"{prefix}_pos", "CLIPTextEncode", text=f"prompt {pipeline}", clip=["ckpt", 1])
+        add(f"{prefix}_neg", "CLIPTextEncode", text="lowres", clip=["ckpt", 1])
+        prompts[f"{prefix}_pos"] = {"text": f"prompt {pipeline}", "conditioning": pos}
+        prompts[f"{prefix}_neg"] = {"text": "lowres", "conditioning": neg}
+
+        latent = None
+        for stage in range(HIRES_PASSES + 1):
+            sampler = f"{prefix}_s{stage}"
+            conditioning = f"{prefix}_c{stage}"
+            add(conditioning, "ConditioningSetArea", conditioning=[f"{prefix}_pos", 0])
+            inputs = {"positive": [conditioning, 0], "negative": [f"{prefix}_neg", 0], "seed": pipeline}
+            if latent:
+                add(f"{prefix}_up{stage}", "LatentUpscale", samples=[latent, 0])
+                inputs["latent_image"] = [f"{prefix}_up{stage}", 0]
+            add(sampler, "KSampler", **inputs)
+            sampling[sampler] = {
+                "is_sampler": True,
+                "parameters": {"seed": pipeline, "steps": 20, "denoise": 1.0 if stage == 0 else 0.5},
+            }
+            if stage == 0:
+                sampling[sampler]["parameters"]["add_noise"] = "enable"
+            prompts[sampler] = {"pos_conditioning": object(), "neg_conditioning": neg}
+            add(f"{prefix}_d{stage}", "VAEDecode", samples=[sampler, 0])
+            decodes.append(f"{prefix}_d{stage}")
+            latent = sampler
+
+    filler = 0
+    while len(original_prompt) < TOTAL_NODES:
+        add(f"f{filler}", "PrimitiveNode", value=filler)
+        filler += 1
+
+    metadata = {
+        "sampling": sampling,
+        "prompts": prompts,
+        "execution_order": order,
+        "current_prompt": SimpleNamespace(original_prompt=original_prompt),
+    }
+    return metadata, decodes
+
+
+def run(processor, graph_module, metadata, decodes, cold):
+    results = []
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for decode in decodes:
+            if cold:
+                graph_module._graphs.clear()
+            results.append(processor.extract_generation_params(metadata, decode))
+            processor.trace_node_input(metadata["current_prompt"], decode, "samples")
+    return time.perf_counter() - started, results
+
+
+def main():
+    processor, graph_module = _load_modules()
+    metadata, decodes = build_workflow()
+    calls = ROUNDS * len(decodes)
+
+    baseline, expected = run(processor, graph_module, metadata, decodes, cold=True)
+    optimized, results = run(processor, graph_module, metadata, decodes, cold=False)
+    assert results == expected
+    assert {params["seed"] for params in results} == set(range(PIPELINES))
+
+    print(f"{len(metadata['current_prompt'].original_prompt)} nodes, {len(decodes)} saves, {calls} calls")
+    print("Variant | Per save | Correct?")
+    print(f"index rebuilt per save | {baseline / calls * 1e6:.1f}us | yes")
+    print(f"cached prompt graph | {optimized / calls * 1e6:.1f}us | yes")
+    print(f"speedup | {baseline / optimized:.1f}x | yes")
+
+
+if __name__ == "__main__":
+    main()
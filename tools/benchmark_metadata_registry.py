@@ -0,0 +1,92 @@
+"""Offline benchmark for the per-node cost of metadata collection.
+
+Run with the Python environment used by ComfyUI:
+    python tools/benchmark_metadata_registry.py
+
+Each "node" is one record_node_execution plus one update_node_execution, the
+two calls MetadataHook makes around every node.  The baseline reproduces the
+old hot path: both calls under the registry lock, each followed by a copy of
+the node's metadata into node_cache.  Four threads run separate prompts to
+show the effect of the shared lock.
+"""
+
+from __future__ import annotations
+
+import importlib
+from pathlib import Path
+import sys
+import threading
+import time
+from types import ModuleType
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+NODES = 20000
+THREADS = 4
+
+
+def _load_registry_module():
+    nodes = ModuleType("nodes")
+    nodes.NODE_CLASS_MAPPINGS = {}
+    sys.modules.setdefault("nodes", nodes)
+    stub_packages("registry_benchmark", "metadata_collector")
+    return importlib.import_module("registry_benchmark.metadata_collector.metadata_registry")
+
+
+INPUTS = {"seed": [1], "steps": [20], "cfg": [7.0], "sampler_name": ["euler"], "scheduler": ["normal"]}
+
+
+def baseline_node(registry, prompt_id, node_id):
+    collection = registry.collections[prompt_id]
+    with registry._lock:
+        collection.record(node_id, "KSampler", INPUTS, None)
+        registry._flush_node_cache(collection)
+    with registry._lock:
+        collection.update(node_id, "KSampler", None)
+        registry._flush_node_cache(collection)
+
+
+def optimized_node(registry, prompt_id, node_id):
+    registry.record_node_execution(node_id, "KSampler", INPUTS, None, prompt_id)
+    registry.update_node_execution(node_id, "KSampler", None, prompt_id)
+
+
+def run(registry, run_node, threads):
+    registry.clear_metadata()
+    registry.max_prompt_history = threads + 1
+    prompt_ids = [f"prompt-{index}" for index in range(threads)]
+    for prompt_id in prompt_ids:
+        registry.start_collection(prompt_id)
+
+    def worker(prompt_id):
+        for index in range(NODES):
+            run_node(registry, prompt_id, str(index % 50))
+
+    workers = [threading.Thread(target=worker, args=(prompt_id,)) for prompt_id in prompt_ids]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    registry.start_collection("flush")
+    assert len(registry.node_cache) == 50
+    return elapsed / (NODES * threads)
+
+
+def main():
+    registry = _load_registry_module().MetadataRegistry()
+    print("Variant | Threads | Per node")
+    for threads in (1, THREADS):
+        baseline = run(registry, baseline_node, threads)
+        optimized = run(registry, optimized_node, threads)
+        print(f"locked + per-node cache | {threads} | {baseline * 1e6:.2f}us")
+        print(f"per-prompt collection | {threads} | {optimized * 1e6:.2f}us")
+        print(f"speedup | {threads} | {baseline / optimized:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
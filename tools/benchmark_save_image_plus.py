@@ -0,0 +1,133 @@
+"""Offline benchmark for Save Image Plus background writing.
+
+Run with the Python environment used by ComfyUI:
+    python tools/benchmark_save_image_plus.py
+
+Each prompt "samples" for SAMPLE_SECONDS (a sleep, like GPU work it releases
+the GIL) and then saves a batch of eight 1024x1024 PNGs.  The baseline
+encodes and writes on the execution thread, as SaveImagePlus used to; the
+optimized variant hands the batch to AsyncImageWriter and starts the next
+prompt at once.  Both variants must produce identical files.
+
+The second table saves one batch with clean copies and waits for it (as the
+node does with previews enabled): one image after another versus
+submit_batch() spread over the encode workers.  The speedup scales with the
+number of free cores; on a single CPU both variants take the same time.
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+PROMPTS = 3
+BATCH = 8
+SIZE = 1024
+SAMPLE_SECONDS = 0.5
+
+
+def _load_writer_module():
+    stub_packages("save_benchmark", "save_image_plus")
+    return importlib.import_module("save_benchmark.save_image_plus.image_writer")
+
+
+def make_batch(seed):
+    # Smooth gradients with mild noise compress like rendered images, not like static
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, SIZE, dtype=np.float32)
+    base = (ramp[None, :, None] + ramp[:, None, None] * 0.5 + rng.normal(0, 6, (SIZE, SIZE, 3)))
+    return [np.clip(base + index * 8, 0, 255).astype(np.uint8) for index in range(BATCH)]
+
+
+def run(writer_module, output_dir, batches, writer=None):
+    blocked = 0.0
+    started = time.perf_counter()
+    for prompt, batch in enumerate(batches):
+        time.sleep(SAMPLE_SECONDS)
+        save_started = time.perf_counter()
+        for index, pixels in enumerate(batch):
+            job = writer_module.ImageSaveJob(
+                pixels, os.path.join(output_dir, f"ComfyUI_{prompt}_{index:05}_.png"), "PNG",
+                text_chunks=[("parameters", "1girl\nNegative prompt: lowres\nSteps: 20")],
+            )
+            if writer is None:
+                writer_module.write_image(job)
+            else:
+                writer.submit(job)
+        blocked += time.perf_counter() - save_started
+    if writer is not None:
+        writer.shutdown()
+    return time.perf_counter() - started, blocked / len(batches)
+
+
+def run_batch(writer_module, output_dir, batch, writer=None):
+    jobs = [
+        writer_module.ImageSaveJob(
+            pixels, os.path.join(output_dir, f"ComfyUI_{index:05}_.png"), "PNG",
+            text_chunks=[("parameters", "1girl\nSteps: 20")],
+            clean_path=os.path.join(output_dir, f"ComfyUI_{index:05}_no_metadata.png"),
+        )
+        for index, pixels in enumerate(batch)
+    ]
+    started = time.perf_counter()
+    if writer is None:
+        for job in jobs:
+            writer_module.write_image(job)
+    else:
+        for future in writer.submit_batch(jobs):
+            future.result()
+        writer.shutdown()
+    return time.perf_counter() - started
+
+
+def assert_identical(first_dir, second_dir, count):
+    names = sorted(os.listdir(first_dir))
+    assert names == sorted(os.listdir(second_dir)) and len(names) == count
+    for name in names:
+        with open(os.path.join(first_dir, name), "rb") as a, open(os.path.join(second_dir, name), "rb") as b:
+            assert a.read() == b.read()
+
+
+def main():
+    writer_module = _load_writer_module()
+    batches = [make_batch(prompt) for prompt in range(PROMPTS)]
+    with tempfile.TemporaryDirectory() as baseline_dir, tempfile.TemporaryDirectory() as async_dir:
+        baseline_total, baseline_blocked = run(writer_module, baseline_dir, batches)
+        writer = writer_module.AsyncImageWriter(workers=min(4, os.cpu_count() or 1), max_pending=16)
+        async_total, async_blocked = run(writer_module, async_dir, batches, writer)
+
+        assert_identical(baseline_dir, async_dir, PROMPTS * BATCH)
+
+    workers = max(2, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as sequential_dir, tempfile.TemporaryDirectory() as parallel_dir:
+        sequential_batch = run_batch(writer_module, sequential_dir, batches[0])
+        writer = writer_module.AsyncImageWriter(workers=workers, max_pending=2 * BATCH)
+        parallel_batch = run_batch(writer_module, parallel_dir, batches[0], writer)
+        assert_identical(sequential_dir, parallel_dir, 2 * BATCH)
+
+    images = PROMPTS * BATCH
+    print(f"{PROMPTS} prompts x {BATCH} images of {SIZE}x{SIZE}, {SAMPLE_SECONDS}s sampling each, {os.cpu_count()} CPUs")
+    print("Variant | Node blocked per batch | Total | Images/s | Identical?")
+    print(f"sync encode+write | {baseline_blocked:.3f}s | {baseline_total:.2f}s | {images / baseline_total:.2f} | yes")
+    print(f"background writer | {async_blocked:.3f}s | {async_total:.2f}s | {images / async_total:.2f} | yes")
+    print(f"speedup | {baseline_blocked / max(async_blocked, 1e-9):.0f}x | {baseline_total / async_total:.2f}x | | yes")
+    print()
+    print(f"One batch of {BATCH} images + clean copies, waited for")
+    print("Variant | Batch time | Files/s | Identical?")
+    print(f"sequential | {sequential_batch:.2f}s | {2 * BATCH / sequential_batch:.1f} | yes")
+    print(f"submit_batch ({workers} workers) | {parallel_batch:.2f}s | {2 * BATCH / parallel_batch:.1f} | yes")
+
+
+if __name__ == "__main__":
+    main()
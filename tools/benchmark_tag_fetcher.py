@@ -0,0 +1,109 @@
+"""Offline benchmark for concurrent hot tag page fetching.
+
+Run with the Python environment used by ComfyUI:
+    python tools/benchmark_tag_fetcher.py
+
+Serves a fake ``/tags.json`` from a local aiohttp server with a fixed
+per-request latency, then fetches the same pages with one page in flight
+(the previous serial behaviour) and with several pages in flight under the
+shared token bucket.  Every variant must return identical pages in the same
+order and keep its average request rate at or below the configured limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+from pathlib import Path
+import sys
+import time
+from types import ModuleType
+
+from aiohttp import web
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PAGES = 30
+LATENCY = 0.3
+RATE_LIMIT = 10.0
+
+
+def _load_fetcher_module():
+    for name, path in (
+        ("tag_fetcher_benchmark", ROOT / "py"),
+        ("tag_fetcher_benchmark.shared", ROOT / "py" / "shared"),
+        ("tag_fetcher_benchmark.shared.fetcher", ROOT / "py" / "shared" / "fetcher"),
+        ("tag_fetcher_benchmark.utils", ROOT / "py" / "utils"),
+    ):
+        module = ModuleType(name)
+        module.__path__ = [str(path)]
+        sys.modules[name] = module
+    logger_module = ModuleType("tag_fetcher_benchmark.utils.logger")
+    logger_module.get_logger = logging.getLogger
+    sys.modules[logger_module.__name__] = logger_module
+    return importlib.import_module("tag_fetcher_benchmark.shared.fetcher.tag_fetcher")
+
+
+async def _run_variant(module, base_url, request_times, concurrency):
+    request_times.clear()
+    fetcher = module.DanbooruTagFetcher(rate_limit=RATE_LIMIT, max_concurrent_pages=concurrency)
+    fetcher.API_BASE = base_url
+    started = time.perf_counter()
+    try:
+        pages = [(page, tags) async for page, tags in fetcher.iter_hot_tag_pages(PAGES * 1000, 0)]
+    finally:
+        await fetcher.close()
+    elapsed = time.perf_counter() - started
+    span = request_times[-1] - request_times[0]
+    # Requests after the initial burst must respect the average rate
+    steady_rate = (len(request_times) - concurrency) / span if span else 0.0
+    return elapsed, pages, steady_rate
+
+
+async def _main():
+    module = _load_fetcher_module()
+    request_times = []
+
+    async def tags_handler(request):
+        request_times.append(time.perf_counter())
+        page = int(request.query["page"])
+        await asyncio.sleep(LATENCY)
+        return web.json_response([
+            {"name": f"tag_{page}_{i}", "category": 0, "post_count": 10 ** 7 - page * 1000 - i}
+            for i in range(1000)
+        ])
+
+    app = web.Application()
+    app.router.add_get("/tags.json", tags_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    try:
+        results = []
+        for name, concurrency in (("serial (1 in flight)", 1), ("token bucket, 4 in flight", 4), ("token bucket, 8 in flight", 8)):
+            elapsed, pages, steady_rate = await _run_variant(module, base_url, request_times, concurrency)
+            results.append((name, elapsed, pages, steady_rate))
+    finally:
+        await runner.cleanup()
+
+    baseline_pages = results[0][2]
+    print(f"{PAGES} pages | {LATENCY * 1000:.0f}ms latency | limit {RATE_LIMIT:.0f} req/s")
+    print("Variant | Time | Steady rate | Identical pages?")
+    for name, elapsed, pages, steady_rate in results:
+        same = [p for p, _ in pages] == list(range(1, PAGES + 1)) and pages == baseline_pages
+        assert same, name
+        assert steady_rate <= RATE_LIMIT * 1.05, (name, steady_rate)
+        print(f"{name} | {elapsed:.2f}s | {steady_rate:.1f} req/s | yes")
+    print(f"speedup | {results[0][1] / results[1][1]:.1f}x with 4 in flight")
+
+
+def main():
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Offline benchmark for translation store loading.
+
+Run with the Python environment used by ComfyUI:
+    python tools/benchmark_translation_snapshot.py
+
+Measures how long ``danbooru_gallery.py`` takes to import now that the
+translation store loads on a background thread, then compares a cold store
+build (parsing the zh_cn sources) with a warm load from the binary snapshot.
+Both loads must produce identical dictionaries.  The store's measured memory
+footprint is printed as well.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def main():
+    sys.path.insert(0, str(ROOT / "tools"))
+    from benchmark_gallery_fast_paths import _load_gallery_module
+
+    started = time.perf_counter()
+    _load_gallery_module()
+    import_elapsed = time.perf_counter() - started
+    print(f"module import (translations on background thread) | {import_elapsed * 1000:.1f}ms")
+
+    store_module = sys.modules["gallery_benchmark.shared.translation.translation_store"]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        snapshot_path = Path(temp_dir) / "translation.snapshot"
+        results = []
+        for name in ("parse-sources", "binary-snapshot"):
+            started = time.perf_counter()
+            store = store_module.build_translation_store(snapshot_path=snapshot_path)
+            elapsed = time.perf_counter() - started
+            results.append((name, elapsed, store))
+
+    (_, cold, cold_store), (_, warm, warm_store) = results
+    assert cold_store.load_stats["source"] == "source"
+    assert warm_store.load_stats["source"] == "snapshot"
+    assert dict(warm_store.en_to_cn) == dict(cold_store.en_to_cn)
+    assert dict(warm_store.cn_to_en) == dict(cold_store.cn_to_en)
+    assert dict(warm_store.all_tags) == dict(cold_store.all_tags)
+    assert warm_store.search_index.search("长发", 10) == cold_store.search_index.search("长发", 10)
+
+    print("Variant | Load time | Correct?")
+    for name, elapsed, _store in results:
+        print(f"{name} | {elapsed * 1000:.1f}ms | yes")
+    print(f"speedup | {cold / max(warm, 1e-9):.1f}x | identical dictionaries | yes")
+    stats = warm_store.memory_stats()
+    print(f"store footprint | {stats['memory_mb']}MB | {stats['en_to_cn_count']} EN->CN, {stats['cn_to_en_count']} CN->EN")
+
+
+if __name__ == "__main__":
+    main()
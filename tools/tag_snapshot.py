@@ -0,0 +1,70 @@
+"""Export or import offline snapshots of the hot tags database.
+
+Run with the Python environment used by ComfyUI (ComfyUI itself should be
+stopped while importing):
+    python tools/tag_snapshot.py export tags_snapshot.jsonl.gz
+    python tools/tag_snapshot.py import tags_snapshot.jsonl.gz
+    python tools/tag_snapshot.py info tags_snapshot.jsonl.gz
+
+``--db`` selects another database than py/shared/data/tags_cache.db.  A
+snapshot copied to py/shared/data/tags_snapshot.jsonl.gz is imported
+automatically on a node's first start instead of syncing from Danbooru.
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime
+import importlib
+from pathlib import Path
+import sys
+from types import ModuleType
+
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_DB = ROOT / "py" / "shared" / "data" / "tags_cache.db"
+
+
+def _load_snapshot_module():
+    # Load py/shared/db without running py/__init__.py, which needs ComfyUI
+    for name, path in (
+        ("tag_snapshot_cli", ROOT / "py"),
+        ("tag_snapshot_cli.shared", ROOT / "py" / "shared"),
+        ("tag_snapshot_cli.shared.db", ROOT / "py" / "shared" / "db"),
+        ("tag_snapshot_cli.utils", ROOT / "py" / "utils"),
+    ):
+        module = ModuleType(name)
+        module.__path__ = [str(path)]
+        sys.modules[name] = module
+    return importlib.import_module("tag_snapshot_cli.shared.db.tag_snapshot")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("export", "import", "info"))
+    parser.add_argument("snapshot", type=Path)
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="tag database path")
+    args = parser.parse_args(argv)
+
+    snapshot = _load_snapshot_module()
+    try:
+        if args.command == "export":
+            info = snapshot.export_tag_snapshot(args.db, args.snapshot)
+            print(f"exported {info['tag_count']} tags to {args.snapshot} ({info['size_bytes'] / 1024 / 1024:.1f}MB)")
+        elif args.command == "import":
+            info = snapshot.import_tag_snapshot(args.db, args.snapshot)
+            print(f"imported {info['tag_count']} tags into {args.db} in {info['elapsed_ms']}ms")
+        else:
+            info = snapshot.read_tag_snapshot_info(args.snapshot)
+            created = datetime.fromtimestamp(info["created_at"]).isoformat(timespec="seconds")
+            print(f"valid snapshot v{info['version']}: {info['tag_count']} tags, created {created}")
+            for key, value in sorted(info["metadata"].items()):
+                print(f"  {key} = {value}")
+    except snapshot.TagSnapshotError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Behavior tests for the tiered tag database health checks."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+from pathlib import Path
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("db_health_tiers_test", "shared", "shared.db")
+DB = importlib.import_module("db_health_tiers_test.shared.db.db_manager")
+HEALTH = importlib.import_module("db_health_tiers_test.shared.db.db_health")
+
+
+class DatabaseHealthTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "tags.db"
+
+        async def build():
+            db = DB.TagDatabaseManager(str(self.db_path))
+            await db.initialize_database()
+            await db.insert_tags_batch([
+                {"tag": "1girl", "category": 0, "post_count": 5000, "translation_cn": "1个女孩"},
+                {"tag": "long_hair", "category": 0, "post_count": 3000, "translation_cn": "长发"},
+            ], sync_progress={"page": 2})
+            await db.set_last_sync_time(1700000000)
+            await db.close()
+
+        asyncio.run(build())
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_quick_tier_reports_timings_and_sync_state(self):
+        report = HEALTH.quick_health_check(self.db_path)
+        self.assertTrue(report["healthy"], report["error"])
+        self.assertEqual(report["tier"], "quick")
+        self.assertEqual(set(report["timings_ms"]), {"quick_check", "schema_probe", "total"})
+        self.assertEqual((report["tag_count"], report["fts_count"]), (2, 2))
+        self.assertEqual(report["last_sync_time"], 1700000000)
+        self.assertTrue(report["sync_in_progress"])
+        self.assertIs(HEALTH.get_health_reports()["quick"]["healthy"], True)
+
+    def test_quick_tier_rejects_damaged_or_incomplete_files(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DROP TABLE sync_metadata")
+        report = HEALTH.quick_health_check(self.db_path)
+        self.assertFalse(report["healthy"])
+        self.assertIn("sync_metadata", report["error"])
+
+        self.db_path.write_bytes(b"not a database" * 512)
+        report = HEALTH.quick_health_check(self.db_path)
+        self.assertFalse(report["healthy"])
+        self.assertFalse(asyncio.run(DB.TagDatabaseManager(str(self.db_path)).check_database_health())[0])
+
+    def test_full_tier_catches_stale_fts_index(self):
+        report = HEALTH.full_integrity_check(self.db_path)
+        self.assertTrue(report["healthy"], report["error"])
+        self.assertIn("integrity_check", report["timings_ms"])
+        self.assertIn("fts_integrity_check", report["timings_ms"])
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DROP TRIGGER hot_tags_au")
+            conn.execute("UPDATE hot_tags SET translation_cn = '短发' WHERE tag = 'long_hair'")
+
+        # Page structure is intact, so only the full tier sees the mismatch
+        self.assertTrue(HEALTH.quick_health_check(self.db_path)["healthy"])
+        report = HEALTH.full_integrity_check(self.db_path)
+        self.assertFalse(report["healthy"])
+        self.assertIn("FTS", report["error"])
+        self.assertEqual(set(HEALTH.get_health_reports()), {"quick", "full"})
+
+
+if __name__ == "__main__":
+    unittest.main()
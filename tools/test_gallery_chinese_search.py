@@ -0,0 +1,115 @@
+"""Equivalence tests for the indexed Chinese tag search."""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+from pathlib import Path
+import random
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = ROOT / "py" / "shared" / "translation" / "chinese_search.py"
+SPEC = importlib.util.spec_from_file_location("gallery_chinese_search_test_module", MODULE_PATH)
+MODULE = importlib.util.module_from_spec(SPEC)
+assert SPEC.loader is not None
+SPEC.loader.exec_module(MODULE)
+ChineseTagSearchIndex = MODULE.ChineseTagSearchIndex
+
+
+def build_index_lists(cn_tags):
+    """Same construction as TagTranslationSystem._build_chinese_search_index."""
+    index = {}
+    for cn_tag in cn_tags:
+        for i, char in enumerate(cn_tag):
+            index.setdefault(char, set()).add(cn_tag)
+            for length in (2, 3):
+                if i + length <= len(cn_tag):
+                    index.setdefault(cn_tag[i:i + length], set()).add(cn_tag)
+    return {key: list(value) for key, value in index.items()}
+
+
+def linear_search(cn_to_en, index_lists, query, limit):
+    """The pre-index implementation of search_chinese_tags, kept as the oracle."""
+    matches = {}
+    if query in cn_to_en:
+        matches[query] = 10
+    for cn_tag in cn_to_en:
+        if cn_tag.startswith(query) and cn_tag not in matches:
+            matches[cn_tag] = 8
+    if query in index_lists:
+        for cn_tag in index_lists[query]:
+            if cn_tag not in matches:
+                matches[cn_tag] = 6
+    for cn_tag in cn_to_en:
+        if query in cn_tag and cn_tag not in matches:
+            matches[cn_tag] = 4
+    if len(query) >= 2:
+        query_chars = set(query)
+        for cn_tag in cn_to_en:
+            if cn_tag not in matches:
+                if len(query_chars & set(cn_tag)) / len(query_chars) >= 0.5:
+                    matches[cn_tag] = 2
+    for char in query:
+        if char in index_lists:
+            for cn_tag in index_lists[char]:
+                if cn_tag not in matches:
+                    matches[cn_tag] = 1
+    return sorted(matches.items(), key=lambda x: (-x[1], len(x[0])))[:limit]
+
+
+class ChineseTagSearchIndexTests(unittest.TestCase):
+    def assert_equivalent(self, cn_to_en, queries, limits=(1, 5, 10, 50, 100000)):
+        index_lists = build_index_lists(cn_to_en)
+        index = ChineseTagSearchIndex.from_mapping(cn_to_en, index_lists)
+        for query in queries:
+            for limit in limits:
+                with self.subTest(query=query, limit=limit):
+                    self.assertEqual(
+                        index.search(query, limit),
+                        linear_search(cn_to_en, index_lists, query, limit),
+                    )
+
+    def test_weight_tiers_match_linear_scan(self):
+        cn_to_en = {
+            "长发": "long_hair",
+            "长发女孩": "long_hair_girl",
+            "金色长发": "blonde_long_hair",
+            "短发": "short_hair",
+            "发饰": "hair_ornament",
+            "长": "long",
+            "蓝色眼睛": "blue_eyes",
+            "红色眼睛": "red_eyes",
+            "眼镜": "glasses",
+        }
+        queries = ["长发", "长", "发", "眼睛", "色眼", "蓝眼", "金长发", "不存在", "长发女孩", "红蓝绿"]
+        self.assert_equivalent(cn_to_en, queries)
+
+    def test_randomized_vocabulary_matches_linear_scan(self):
+        rng = random.Random(20240601)
+        alphabet = "一二三四五六七八九十长短发眼色红蓝"
+        cn_to_en = {}
+        while len(cn_to_en) < 600:
+            tag = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 6)))
+            cn_to_en.setdefault(tag, f"tag_{len(cn_to_en)}")
+        queries = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(60)]
+        self.assert_equivalent(cn_to_en, queries)
+
+    def test_payload_round_trip_preserves_results(self):
+        cn_to_en = {"长发": "long_hair", "金色长发": "blonde_long_hair", "短发": "short_hair", "眼镜": "glasses"}
+        index_lists = build_index_lists(cn_to_en)
+        built = ChineseTagSearchIndex.from_mapping(cn_to_en, index_lists)
+        restored = ChineseTagSearchIndex.from_payload(cn_to_en, index_lists, built.to_payload())
+        for query in ("长发", "发", "金长", "镜眼"):
+            self.assertEqual(restored.search(query, 10), built.search(query, 10))
+
+    def test_bundled_dictionary_matches_linear_scan(self):
+        json_file = ROOT / "py" / "danbooru_gallery" / "zh_cn" / "all_tags_cn.json"
+        data = json.loads(json_file.read_text(encoding="utf-8"))
+        cn_to_en = {cn.strip(): en.strip() for en, cn in data.items() if en and cn}
+        self.assert_equivalent(cn_to_en, ["女", "头发", "眼睛", "蓝色眼", "女孩子", "猫耳"], limits=(10, 20))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,11 @@
 
 from __future__ import annotations
 
+import asyncio
 import importlib.util
 from pathlib import Path
+import threading
+import time
 import unittest
 from unittest import mock
 
@@ -56,6 +59,9 @@ class FakeSession:
     def post(self, url, **kwargs):
         return self.request("POST", url, **kwargs)
 
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
     def close(self):
         self.closed = True
 
@@ -142,6 +148,161 @@ class GallerySiteClientTests(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         sleep.assert_called_once_with(3.0)
 
+    def test_throttled_response_backs_off_the_shared_limiter(self):
+        session = FakeSession([
+            FakeResponse(429, {"Retry-After": "0.5"}),
+            FakeResponse(200),
+        ])
+        client = MODULE.DanbooruHttpClient(session)
+        with mock.patch.object(MODULE.time, "sleep") as sleep:
+            response = client.request("GET", "https://danbooru.donmai.us/posts.json")
+        self.assertEqual(response.status_code, 200)
+        # The retry sleeps through the pause itself instead of queueing again
+        sleep.assert_called_once_with(0.5)
+        stats = client.get_limiter_stats()["api"]
+        self.assertEqual((stats["throttled"], stats["acquired"]), (1, 1))
+        self.assertLess(stats["rate"], stats["base_rate"])
+
+
+class AdaptiveRateLimiterTests(unittest.TestCase):
+    def test_aimd_cuts_once_per_pause_and_recovers(self):
+        limiter = MODULE.AdaptiveRateLimiter(10.0, min_rate=2.0, max_rate=11.0, increase=1.0)
+        limiter.on_throttled(0.1)
+        limiter.on_throttled(0.1)  # same episode, reported by a request already in flight
+        self.assertEqual(limiter.rate, 5.0)
+        self.assertEqual(limiter.get_stats()["throttled"], 2)
+
+        started = time.monotonic()
+        limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+        for _ in range(100):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 11.0)
+        limiter.on_throttled(0)
+        limiter.on_throttled(0)
+        self.assertEqual(limiter.rate, 2.75)
+
+    def test_waiting_threads_sleep_concurrently(self):
+        limiter = MODULE.AdaptiveRateLimiter(5.0)
+        barrier = threading.Barrier(4)
+
+        def worker():
+            barrier.wait()
+            limiter.wait()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        stats = limiter.get_stats()
+        self.assertEqual((stats["acquired"], stats["max_queue_depth"], stats["queue_depth"]), (4, 3, 0))
+        self.assertGreaterEqual(elapsed, 0.55)
+        self.assertLess(elapsed, 1.0)
+        self.assertGreater(stats["avg_wait_ms"], 250)
+
+    def test_async_acquire_allows_burst_then_paces(self):
+        limiter = MODULE.AdaptiveRateLimiter(50.0, burst=3)
+
+        async def run():
+            started = time.monotonic()
+            await asyncio.gather(*(limiter.acquire() for _ in range(6)))
+            return time.monotonic() - started
+
+        elapsed = asyncio.run(run())
+        # Three go at once, the other three at 20ms spacing
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 0.3)
+        self.assertEqual(limiter.get_stats()["max_queue_depth"], 3)
+
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_open_circuit_fails_fast_and_background_probe_closes_it(self):
+        offline = MODULE.requests.exceptions.ConnectionError("offline")
+        session = FakeSession([offline, offline, FakeResponse(200), FakeResponse(200)])
+        client = MODULE.DanbooruHttpClient(session, failure_threshold=2, open_seconds=0.05)
+        client.rate_limiter.min_interval = 0
+        url = "https://danbooru.donmai.us/posts.json"
+
+        for _ in range(2):
+            with self.assertRaises(MODULE.requests.exceptions.ConnectionError):
+                client.request("GET", url)
+        with self.assertRaises(MODULE.CircuitOpenError) as raised:
+            client.request("GET", url)
+        self.assertIsInstance(raised.exception, MODULE.requests.exceptions.RequestException)
+        with self.assertRaises(MODULE.CircuitOpenError):
+            client.check_circuit(url)
+        self.assertEqual(len(session.calls), 2)
+        # Other hosts keep their own circuit
+        client.check_circuit("https://cdn.donmai.us/original/a.jpg")
+
+        deadline = time.monotonic() + 2
+        while client.get_circuit_stats()["danbooru.donmai.us/api"]["state"] != "closed":
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(session.calls[2][0], "HEAD")
+        self.assertEqual(client.request("GET", url).status_code, 200)
+        stats = client.get_circuit_stats()["danbooru.donmai.us/api"]
+        self.assertEqual((stats["opened"], stats["rejected"], stats["probes"]), (1, 2, 1))
+
+    def test_half_open_trial_without_probe_backs_off(self):
+        breaker = MODULE.CircuitBreaker("host/api", failure_threshold=1, open_seconds=0.05)
+        breaker.record_failure()
+        with self.assertRaises(MODULE.CircuitOpenError):
+            breaker.before_request()
+        time.sleep(0.06)
+        breaker.check()  # does not claim the trial
+        breaker.before_request()
+        self.assertEqual(breaker.state, "half_open")
+        with self.assertRaises(MODULE.CircuitOpenError):
+            breaker.before_request()
+        breaker.record_failure()
+        self.assertGreater(breaker.get_stats()["retry_in"], 0.05)
+        time.sleep(0.11)
+        breaker.before_request()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_blocked_probe_keeps_backing_off_until_a_real_success(self):
+        blocked = FakeResponse(403, {"Server": "cloudflare"})
+        session = FakeSession([blocked, FakeResponse(404)])
+        probe = MODULE._probe_host(lambda: session, "danbooru.donmai.us")
+        breaker = MODULE.CircuitBreaker("host/api", failure_threshold=1, open_seconds=0.05, probe=probe)
+
+        def wait_for(state):
+            deadline = time.monotonic() + 2
+            while breaker.state != state:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+
+        breaker.record_failure()
+        wait_for("open")
+        deadline = time.monotonic() + 2
+        while breaker.get_stats()["probes"] < 1 or breaker.state != "open":
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        # The Cloudflare block counted as a failed probe: open for twice as long
+        self.assertEqual(breaker._current_open, 0.1)
+        wait_for("closed")
+        # The probe's 404 closed the circuit, but the next failure still waits longer
+        breaker.record_failure()
+        self.assertGreater(breaker.get_stats()["retry_in"], 0.05)
+        breaker._timer.cancel()
+        breaker.record_success()
+        self.assertEqual(breaker._current_open, 0.05)
+
+    def test_only_host_level_failures_count(self):
+        self.assertTrue(MODULE._is_host_failure(FakeResponse(403, {"Server": "cloudflare"})))
+        self.assertTrue(MODULE._is_host_failure(FakeResponse(502)))
+        self.assertFalse(MODULE._is_host_failure(FakeResponse(403)))
+        self.assertFalse(MODULE._is_host_failure(FakeResponse(404)))
+
+
 
 if __name__ == "__main__":
     unittest.main()
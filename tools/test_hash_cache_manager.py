@@ -0,0 +1,108 @@
+"""Behavior tests for the SQLite-backed model hash cache."""
+
+from __future__ import annotations
+
+import importlib
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("hash_cache_test", "save_image_plus")
+HASH_CACHE = importlib.import_module("hash_cache_test.save_image_plus.hash_cache_manager")
+
+
+class HashCacheManagerTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name)
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.close()
+        self.temp_dir.cleanup()
+
+    def manager(self):
+        manager = HASH_CACHE.HashCacheManager(str(self.base / "hash_cache.db"), str(self.base / "hash_cache.json"))
+        self.managers.append(manager)
+        return manager
+
+    def model(self, name, content=b"weights"):
+        path = self.base / name
+        path.write_bytes(content)
+        return str(path)
+
+    def test_entries_persist_without_a_limit(self):
+        paths = [self.model(f"lora_{index}.safetensors", bytes([index])) for index in range(250)]
+        first = self.manager()
+        for index, path in enumerate(paths):
+            first.set_hash(path, f"{index:010x}")
+
+        second = self.manager()
+        self.assertEqual([second.get_hash(path) for path in paths], [f"{index:010x}" for index in range(250)])
+        self.assertEqual(second.get_stats()["entries"], 250)
+
+    def test_lookups_validate_only_the_requested_file(self):
+        paths = [self.model(f"lora_{index}.safetensors") for index in range(50)]
+        first = self.manager()
+        for path in paths:
+            first.set_hash(path, "abcdef0123")
+
+        def model_stats(stat):
+            return [call.args[0] for call in stat.call_args_list if str(call.args[0]).endswith(".safetensors")]
+
+        with mock.patch.object(HASH_CACHE.os, "stat", wraps=os.stat) as stat:
+            second = self.manager()
+            self.assertEqual(model_stats(stat), [])
+            self.assertEqual(second.get_hash(paths[7]), "abcdef0123")
+            self.assertEqual(model_stats(stat), [paths[7]])
+
+    def test_changed_or_replaced_files_miss(self):
+        manager = self.manager()
+        path = self.model("model.safetensors", b"aaaa")
+        manager.set_hash(path, "1111111111")
+        original = os.stat(path)
+
+        # Same size, new mtime
+        os.utime(path, ns=(original.st_atime_ns, original.st_mtime_ns + 1))
+        self.assertIsNone(manager.get_hash(path))
+
+        # Same size and mtime, but a different file swapped in
+        manager.set_hash(path, "2222222222")
+        replacement = self.model("replacement.safetensors", b"bbbb")
+        os.utime(replacement, ns=(original.st_atime_ns, original.st_mtime_ns + 1))
+        os.replace(replacement, path)
+        if os.stat(path).st_ino != original.st_ino:
+            self.assertIsNone(self.manager().get_hash(path))
+
+        self.assertIsNone(manager.get_hash(str(self.base / "missing.safetensors")))
+        self.assertGreaterEqual(manager.get_stats()["stale"], 1)
+
+    def test_legacy_json_is_imported_once(self):
+        fresh = self.model("fresh.safetensors")
+        changed = self.model("changed.safetensors")
+        (self.base / "hash_cache.json").write_text(json.dumps({
+            fresh: {"mtime": os.path.getmtime(fresh), "hash": "aaaaaaaaaa"},
+            changed: {"mtime": os.path.getmtime(changed) - 60, "hash": "bbbbbbbbbb"},
+            str(self.base / "deleted.safetensors"): {"mtime": 1.0, "hash": "cccccccccc"},
+        }), encoding="utf-8")
+
+        manager = self.manager()
+        self.assertEqual(manager.get_hash(fresh), "aaaaaaaaaa")
+        self.assertIsNone(manager.get_hash(changed))
+        self.assertEqual(manager.get_stats()["entries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+"""Behavior tests for the hot tags autocomplete cache."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+from pathlib import Path
+import random
+import sys
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("hot_tags_cache_test", "shared", "shared.cache")
+_SPEC = importlib.util.spec_from_file_location(
+    "hot_tags_cache_test.shared.cache.memory_cache",
+    ROOT / "py" / "shared" / "cache" / "memory_cache.py",
+)
+CACHE = importlib.util.module_from_spec(_SPEC)
+sys.modules[_SPEC.name] = CACHE
+assert _SPEC.loader is not None
+_SPEC.loader.exec_module(CACHE)
+
+
+def _make_tags(count: int = 3000):
+    rng = random.Random(7)
+    syllables = ["ha", "ir", "lo", "ng", "sk", "ir", "t_", "bl", "ue", "1g"]
+    chars = "长发短蓝裙女孩眼睛红白黑"
+    tags = []
+    seen = set()
+    while len(tags) < count:
+        tag = "".join(rng.choice(syllables) for _ in range(rng.randint(1, 5)))
+        if tag in seen:
+            continue
+        seen.add(tag)
+        translation = "".join(rng.choice(chars) for _ in range(rng.randint(0, 4))) or None
+        tags.append({
+            "tag": tag,
+            "category": 0,
+            "post_count": rng.randint(0, 500),
+            "translation_cn": translation,
+            "aliases": [],
+        })
+    return tags
+
+
+def _ranked(tags):
+    return sorted(tags, key=lambda t: t["post_count"], reverse=True)
+
+
+class _FakeDbManager:
+    def __init__(self):
+        self.calls = []
+
+    async def search_tags_by_prefix(self, prefix, limit):
+        self.calls.append(("prefix", prefix, limit))
+        return [{"tag": prefix + "_db", "post_count": 1}]
+
+    async def search_tags_by_translation(self, query, limit):
+        self.calls.append(("translation", query, limit))
+        return [{"tag": "db", "translation_cn": query}]
+
+    async def search_tags_optimized(self, query, limit, search_type):
+        self.calls.append(("optimized", query, limit, search_type))
+        return [{"tag": "db", "search_type": search_type}]
+
+
+class MemoryModeTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tags = _make_tags()
+        cls.cache = CACHE.HotTagsCache(use_database_query=False)
+        cls.cache.load_tags(list(cls.tags))
+
+    def test_prefix_search_matches_linear_scan(self):
+        ranked = _ranked(self.tags)
+        for prefix in ("h", "ha", "hai", "1g", "irt", "lo", "t_b", "zz", "HA"):
+            for limit in (1, 5, 50):
+                with self.subTest(prefix=prefix, limit=limit):
+                    expected = [t for t in ranked if t["tag"].startswith(prefix.lower())][:limit]
+                    self.assertEqual(self.cache.search_by_prefix(prefix, limit), expected)
+
+    def test_translation_search_matches_linear_scan(self):
+        ranked = _ranked(self.tags)
+        for query in ("长", "长发", "蓝裙", "女孩眼", "绿"):
+            with self.subTest(query=query):
+                expected = [t for t in ranked if query in (t["translation_cn"] or "")][:10]
+                self.assertEqual(self.cache.search_by_translation(query, 10), expected)
+
+    def test_results_are_copies(self):
+        result = self.cache.search_by_prefix("ha", 1)[0]
+        result["post_count"] = -1
+        self.assertNotEqual(self.cache.search_by_prefix("ha", 1)[0]["post_count"], -1)
+
+    def test_stats_report_measured_memory(self):
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["mode"], "memory")
+        self.assertEqual(stats["total_tags"], len(self.tags))
+        self.assertGreater(stats["memory_size_mb"], 0)
+
+
+class QueryCacheTests(unittest.TestCase):
+    def test_lru_evicts_least_recently_used(self):
+        cache = CACHE.HotTagsCache(use_database_query=False)
+        cache.load_tags(_make_tags(100))
+        cache._query_cache_size = 2
+        cache.search_optimized("ha")
+        cache.search_optimized("lo")
+        cache.search_optimized("ha")  # refresh
+        cache.search_optimized("sk")
+        self.assertEqual(list(cache._query_result_cache), ["ha:10:auto", "sk:10:auto"])
+
+    def test_expired_entries_are_dropped(self):
+        cache = CACHE.HotTagsCache(use_database_query=False)
+        cache._query_cache_ttl = 0
+        cache._cache_query_result("k", [])
+        self.assertIsNone(cache._get_cached_query_result("k"))
+        self.assertNotIn("k", cache._query_result_cache)
+
+
+class DatabaseModeTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = CACHE.HotTagsCache(use_database_query=True)
+        self.db = _FakeDbManager()
+        self.cache.db_manager = self.db
+
+    def test_async_api_awaits_database(self):
+        async def run():
+            prefix = await self.cache.async_search_by_prefix("Long", 3)
+            chinese = await self.cache.async_search_optimized("长发", 5)
+            again = await self.cache.async_search_optimized("长发", 5)
+            return prefix, chinese, again
+
+        prefix, chinese, again = asyncio.run(run())
+        self.assertEqual(prefix[0]["tag"], "long_db")
+        self.assertEqual(chinese, [{"tag": "db", "search_type": "chinese"}])
+        self.assertIs(again, chinese)
+        self.assertEqual(self.db.calls, [("prefix", "long", 3), ("optimized", "长发", 5, "chinese")])
+
+    def test_sync_api_from_worker_thread_uses_event_loop(self):
+        async def run():
+            await self.cache.async_search_by_prefix("a")
+            return await asyncio.to_thread(self.cache.search_by_translation, "长发", 2)
+
+        self.assertEqual(asyncio.run(run()), [{"tag": "db", "translation_cn": "长发"}])
+
+    def test_sync_api_without_loop_runs_query(self):
+        self.assertEqual(self.cache.search_by_prefix("x", 1)[0]["tag"], "x_db")
+
+    def test_sync_api_on_event_loop_thread_does_not_block(self):
+        async def run():
+            return self.cache.search_by_prefix("x", 1)
+
+        self.assertEqual(asyncio.run(run()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Behavior tests for prompt-graph based metadata tracing."""
+
+from __future__ import annotations
+
+import importlib
+from pathlib import Path
+import sys
+from types import SimpleNamespace
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("metadata_processor_test", "metadata_collector")
+PROCESSOR = importlib.import_module("metadata_processor_test.metadata_collector.metadata_processor")
+GRAPH = importlib.import_module("metadata_processor_test.metadata_collector.prompt_graph")
+MetadataProcessor = PROCESSOR.MetadataProcessor
+
+
+def node(class_type, **inputs):
+    return {"class_type": class_type, "inputs": inputs}
+
+
+def build_workflow(filler=0):
+    """Base pass plus a hires pass; the hires positive goes through ConditioningCombine"""
+    pos, neg, hires_pos = object(), object(), object()
+    original_prompt = {
+        "1": node("CheckpointLoaderSimple", ckpt_name="model.safetensors"),
+        "2": node("CLIPTextEncode", text="1girl", clip=["1", 1]),
+        "3": node("CLIPTextEncode", text="lowres", clip=["1", 1]),
+        "10": node("KSampler", seed=1, denoise=1.0, model=["1", 0], positive=["2", 0], negative=["3", 0]),
+        "11": node("VAEDecode", samples=["10", 0]),
+        "20": node("LatentUpscale", samples=["10", 0]),
+        "22": node("ConditioningCombine", conditioning=["2", 0]),
+        "21": node("KSampler", seed=2, denoise=0.5, positive=["22", 0], negative=["3", 0], latent_image=["20", 0]),
+        "23": node("VAEDecode", samples=["21", 0]),
+    }
+    for index in range(filler):
+        original_prompt[f"f{index}"] = node("PrimitiveNode", value=index)
+
+    metadata = {
+        "sampling": {
+            "10": {"node_id": "10", "is_sampler": True, "parameters": {"seed": 1, "steps": 20, "denoise": 1.0}},
+            "21": {"node_id": "21", "is_sampler": True, "parameters": {"seed": 2, "steps": 10, "denoise": 0.5}},
+        },
+        "prompts": {
+            "2": {"node_id": "2", "text": "1girl", "conditioning": pos},
+            "3": {"node_id": "3", "text": "lowres", "conditioning": neg},
+            "22": {"node_id": "22", "positive_encoded": hires_pos, "orig_pos_cond": pos},
+            "10": {"node_id": "10", "pos_conditioning": pos, "neg_conditioning": neg},
+            "21": {"node_id": "21", "pos_conditioning": hires_pos, "neg_conditioning": neg},
+        },
+        "execution_order": ["1", "2", "3"] + [f"f{index}" for index in range(filler)] + ["10", "11", "20", "22", "21", "23"],
+        "current_prompt": SimpleNamespace(original_prompt=original_prompt),
+    }
+    return metadata
+
+
+class MetadataProcessorTests(unittest.TestCase):
+    def test_primary_sampler_is_the_latest_candidate_before_the_decode(self):
+        metadata = build_workflow(filler=500)
+        self.assertEqual(MetadataProcessor.find_primary_sampler(metadata, "11")[0], "10")
+        # Highest denoise wins over the later hires pass
+        self.assertEqual(MetadataProcessor.find_primary_sampler(metadata, "23")[0], "10")
+        metadata["sampling"]["21"]["parameters"]["add_noise"] = "enable"
+        self.assertEqual(MetadataProcessor.find_primary_sampler(metadata, "23")[0], "21")
+
+        # Nodes that run later are indexed incrementally
+        metadata["execution_order"].extend(["30", "31"])
+        metadata["sampling"]["30"] = {"is_sampler": True, "parameters": {"add_noise": "enable"}}
+        self.assertEqual(MetadataProcessor.find_primary_sampler(metadata, "31")[0], "30")
+
+    def test_trace_follows_conditioning_links(self):
+        prompt = build_workflow()["current_prompt"]
+        self.assertEqual(MetadataProcessor.trace_node_input(prompt, "21", "positive"), "2")
+        self.assertEqual(MetadataProcessor.trace_node_input(prompt, "21", "positive", "CLIPTextEncode"), "2")
+        self.assertIsNone(MetadataProcessor.trace_node_input(prompt, "21", "positive", "KSamplerSelect"))
+        self.assertEqual(MetadataProcessor.trace_node_input(prompt, "10", "seed"), None)
+        self.assertEqual(MetadataProcessor.trace_node_input(prompt, "11", "vae"), "11")
+
+        graph = GRAPH.get_prompt_graph(prompt)
+        self.assertIs(GRAPH.get_prompt_graph(prompt), graph)
+        self.assertEqual(graph.nodes_of_class("VAEDecode"), ["11", "23"])
+        self.assertEqual(sorted(graph.consumers["10"]), [("11", "samples"), ("20", "samples")])
+
+    def test_conditioning_matches_through_encoded_outputs(self):
+        metadata = build_workflow()
+        self.assertEqual(MetadataProcessor.match_conditioning_to_prompts(metadata, "10"),
+                         {"prompt": "1girl", "negative_prompt": "lowres"})
+        self.assertEqual(MetadataProcessor.match_conditioning_to_prompts(metadata, "21"),
+                         {"prompt": "1girl", "negative_prompt": "lowres"})
+        params = MetadataProcessor.extract_generation_params(metadata, "23")
+        self.assertEqual((params["prompt"], params["seed"]), ("1girl", 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+"""Behavior tests for per-prompt metadata collection in MetadataRegistry."""
+
+from __future__ import annotations
+
+import importlib
+from pathlib import Path
+import sys
+import threading
+from types import ModuleType, SimpleNamespace
+import unittest
+
+import torch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+class CheckpointLoaderSimple:
+    pass
+
+
+class KSampler:
+    pass
+
+
+_nodes_module = sys.modules.setdefault("nodes", ModuleType("nodes"))
+if not hasattr(_nodes_module, "NODE_CLASS_MAPPINGS"):
+    _nodes_module.NODE_CLASS_MAPPINGS = {}
+_nodes_module.NODE_CLASS_MAPPINGS.update({
+    "CheckpointLoaderSimple": CheckpointLoaderSimple,
+    "KSampler": KSampler,
+})
+
+stub_packages("metadata_registry_test", "metadata_collector")
+REGISTRY = importlib.import_module("metadata_registry_test.metadata_collector.metadata_registry")
+RETENTION = importlib.import_module("metadata_registry_test.metadata_collector.retention")
+MODELS = "models"
+SAMPLING = "sampling"
+
+PROMPT = {
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}},
+    "3": {"class_type": "KSampler", "inputs": {"seed": 7, "steps": 20, "model": ["4", 0]}},
+}
+
+
+class CountingLock:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.acquired = 0
+
+    def __enter__(self):
+        self.acquired += 1
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._lock.__exit__(*exc_info)
+
+
+def run_prompt(registry, prompt_id, nodes):
+    registry.start_collection(prompt_id)
+    registry.set_current_prompt(SimpleNamespace(original_prompt=PROMPT))
+    for node_id, class_type, inputs in nodes:
+        registry.record_node_execution(node_id, class_type, inputs, None, prompt_id)
+        registry.update_node_execution(node_id, class_type, None, prompt_id)
+
+
+class MetadataRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.registry = REGISTRY.MetadataRegistry()
+        self.registry.clear_metadata()
+
+    def test_node_hooks_skip_the_registry_lock_and_cache_once(self):
+        registry = self.registry
+        registry.start_collection("p1")
+        registry._lock = lock = CountingLock()
+        for _ in range(3):
+            registry.record_node_execution("4", "CheckpointLoaderSimple", {"ckpt_name": ["model.safetensors"]}, None, "p1")
+            registry.update_node_execution("4", "CheckpointLoaderSimple", None, "p1")
+        self.assertEqual(lock.acquired, 0)
+        self.assertEqual(registry.node_cache, {})
+
+        metadata = registry.get_metadata("p1")
+        self.assertEqual(metadata["execution_order"], ["4"])
+        self.assertEqual(metadata[MODELS]["4"]["name"], "model.safetensors")
+
+        registry.start_collection("p2")
+        self.assertEqual(list(registry.node_cache), ["4:CheckpointLoaderSimple"])
+
+    def test_cached_nodes_fill_prompts_that_skipped_them(self):
+        run_prompt(self.registry, "p1", [
+            ("4", "CheckpointLoaderSimple", {"ckpt_name": ["cached.safetensors"]}),
+            ("3", "KSampler", {"seed": [1], "steps": [30]}),
+        ])
+        # ComfyUI's cache skips the loader in the next run
+        run_prompt(self.registry, "p2", [("3", "KSampler", {"seed": [2], "steps": [30]})])
+
+        metadata = self.registry.get_metadata()
+        self.assertEqual(metadata["execution_order"], ["3"])
+        self.assertEqual(metadata[MODELS]["4"]["name"], "cached.safetensors")
+        self.assertEqual(metadata[SAMPLING]["3"]["parameters"]["seed"], 2)
+        # History lookups use that prompt's own executed nodes
+        self.assertEqual(self.registry.get_metadata("p1")[SAMPLING]["3"]["parameters"]["seed"], 1)
+
+    def test_fill_visits_each_skipped_node_once(self):
+        registry = self.registry
+        registry.start_collection("p1")
+        registry.set_current_prompt(SimpleNamespace(original_prompt=PROMPT))
+        fallbacks = []
+        original = registry._extract_from_prompt_inputs
+
+        def counting(node_id, *args):
+            fallbacks.append(node_id)
+            return original(node_id, *args)
+
+        registry._extract_from_prompt_inputs = counting
+        try:
+            first = registry.get_metadata()
+            self.assertEqual(sorted(fallbacks), ["3", "4"])
+            self.assertEqual(first[SAMPLING]["3"]["parameters"], {"seed": 7, "steps": 20})
+
+            registry.record_node_execution("3", "KSampler", {"seed": [9], "steps": [20]}, None)
+            for _ in range(3):
+                metadata = registry.get_metadata()
+            self.assertEqual(sorted(fallbacks), ["3", "4"])
+            self.assertEqual(metadata[SAMPLING]["3"]["parameters"]["seed"], 9)
+            self.assertEqual(metadata[MODELS]["4"]["name"], "model.safetensors")
+            self.assertEqual(registry.get_collection().pending_fill, [])
+        finally:
+            del registry._extract_from_prompt_inputs
+
+    def test_concurrent_prompts_collect_separately(self):
+        registry = self.registry
+        registry.start_collection("a")
+        registry.start_collection("b")
+        barrier = threading.Barrier(2)
+
+        def worker(prompt_id, seed):
+            barrier.wait()
+            for index in range(200):
+                registry.record_node_execution(str(index), "KSampler", {"seed": [seed]}, None, prompt_id)
+
+        threads = [threading.Thread(target=worker, args=args) for args in (("a", 1), ("b", 2))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for prompt_id, seed in (("a", 1), ("b", 2)):
+            metadata = registry.prompt_metadata[prompt_id]
+            self.assertEqual(len(metadata["execution_order"]), 200)
+            self.assertEqual({entry["parameters"]["seed"] for entry in metadata[SAMPLING].values()}, {seed})
+
+
+class MetadataRetentionTests(unittest.TestCase):
+    def setUp(self):
+        self.registry = REGISTRY.MetadataRegistry()
+        self.registry.clear_metadata()
+        self.policy = RETENTION.get_retention_policy()
+        self.saved = (self.policy.budget_bytes, self.policy.image_mode, self.policy.preview_size)
+
+    def tearDown(self):
+        self.policy.budget_bytes, self.policy.image_mode, self.policy.preview_size = self.saved
+        self.registry.clear_metadata()
+
+    def decode(self, prompt_id, node_id, image):
+        self.registry.start_collection(prompt_id)
+        self.registry.update_node_execution(node_id, "VAEDecode", [(image,)], prompt_id)
+
+    def test_decoded_images_are_kept_as_small_previews(self):
+        self.policy.configure(image_mode="preview", preview_size=64)
+        self.decode("p1", "8", torch.rand(2, 512, 256, 3))
+
+        preview = self.registry.get_first_decoded_image()
+        self.assertEqual((tuple(preview.shape), preview.dtype, preview.device.type), ((1, 64, 32, 3), torch.uint8, "cpu"))
+        self.assertEqual(self.registry.get_retention_stats()["retained_bytes"], 64 * 32 * 3)
+
+    def test_weak_references_do_not_keep_images_alive(self):
+        self.policy.configure(image_mode="weakref")
+        image = torch.rand(1, 64, 64, 3)
+        self.decode("p1", "8", image)
+        self.assertIs(self.registry.get_first_decoded_image(), image)
+        del image
+        self.assertIsNone(self.registry.get_first_decoded_image())
+
+    def test_oldest_data_is_evicted_over_budget(self):
+        self.policy.configure(image_mode="full", budget_mb=1.5)
+        self.registry.max_prompt_history = 10
+        megabyte = 1024 * 1024  # one 256x256x4 float32 image
+        for index in range(4):
+            self.decode(f"p{index}", str(index), torch.zeros(1, 256, 256, 4))
+        self.registry.start_collection("p4")
+
+        stats = self.registry.get_retention_stats()
+        self.assertLessEqual(stats["retained_bytes"], 1.5 * megabyte)
+        self.assertEqual(stats["retained_bytes"], megabyte)
+        # Prompts share their images with node_cache, so both must go
+        self.assertEqual(list(self.registry.collections), ["p3", "p4"])
+        self.assertEqual(list(self.registry.node_cache), ["3:VAEDecode"])
+        self.assertEqual((stats["evicted_prompts"], stats["evicted_cache_entries"]), (3, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
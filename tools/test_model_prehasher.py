@@ -0,0 +1,110 @@
+"""Behavior tests for background model pre-hashing."""
+
+from __future__ import annotations
+
+import hashlib
+import importlib
+import os
+from pathlib import Path
+import sys
+import tempfile
+import threading
+import time
+from types import ModuleType
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+_folder_paths = sys.modules.setdefault("folder_paths", ModuleType("folder_paths"))
+stub_packages("prehasher_test", "save_image_plus")
+HASH_CACHE = importlib.import_module("prehasher_test.save_image_plus.hash_cache_manager")
+PREHASHER = importlib.import_module("prehasher_test.save_image_plus.prehasher")
+
+
+def sha10(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:10]
+
+
+class ModelPreHasherTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name)
+        self.folders = {"checkpoints": self.base / "checkpoints", "loras": self.base / "loras"}
+        for folder in self.folders.values():
+            folder.mkdir()
+        _folder_paths.get_filename_list = self.get_filename_list
+        _folder_paths.get_full_path = lambda folder_type, name: str(self.folders[folder_type] / name)
+        self.cache = HASH_CACHE.HashCacheManager(str(self.base / "hash_cache.db"), str(self.base / "none.json"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def get_filename_list(self, folder_type):
+        if folder_type not in self.folders:
+            raise KeyError(folder_type)
+        return sorted(os.listdir(self.folders[folder_type]))
+
+    def model(self, folder_type, name, size=1024):
+        path = self.folders[folder_type] / name
+        path.write_bytes(os.urandom(size))
+        return str(path)
+
+    def test_scan_hashes_new_and_changed_models_once(self):
+        checkpoint = self.model("checkpoints", "model.safetensors")
+        lora = self.model("loras", "style.safetensors")
+        hasher = PREHASHER.ModelPreHasher(self.cache, max_mb_per_sec=0, buffer_mb=1)
+
+        hasher.scan_once()
+        self.assertEqual(self.cache.get_hash(checkpoint), sha10(checkpoint))
+        self.assertEqual(self.cache.get_hash(lora), sha10(lora))
+        self.assertEqual(hasher.get_progress()["hashed"], 2)
+
+        hasher.scan_once()
+        self.assertEqual(hasher.get_progress()["hashed"], 2)
+
+        Path(lora).write_bytes(b"retrained")
+        hasher.scan_once()
+        progress = hasher.get_progress()
+        self.assertEqual((progress["hashed"], progress["models"], progress["state"]), (3, 2, "idle"))
+        self.assertEqual(hasher.hash_file(lora), sha10(lora))
+
+    def test_saves_wait_for_an_in_flight_hash(self):
+        checkpoint = self.model("checkpoints", "big.safetensors", size=4 * 1024 * 1024)
+        # 1 MiB reads at 1 MiB/s: about 4s in the background unless a save is waiting
+        hasher = PREHASHER.ModelPreHasher(self.cache, max_mb_per_sec=1, buffer_mb=1)
+        digests = []
+        original = hasher._digest
+
+        def counting(*args):
+            digests.append(args[0])
+            return original(*args)
+
+        hasher._digest = counting
+        scan = threading.Thread(target=hasher.scan_once)
+        scan.start()
+        while not hasher.get_progress()["in_flight"]:
+            time.sleep(0.01)
+
+        started = time.perf_counter()
+        self.assertEqual(hasher.hash_file(checkpoint), sha10(checkpoint))
+        self.assertLess(time.perf_counter() - started, 2)
+        scan.join(5)
+        self.assertEqual(digests, [checkpoint])
+        self.assertEqual(hasher.get_progress()["waited"], 1)
+
+    def test_hash_file_without_a_cache_or_file(self):
+        lora = self.model("loras", "style.safetensors")
+        hasher = PREHASHER.ModelPreHasher(None)
+        self.assertEqual(hasher.hash_file(lora), sha10(lora))
+        with self.assertRaises(OSError):
+            hasher.hash_file(str(self.base / "missing.safetensors"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""Behavior tests for the per-node execution profiler."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+from pathlib import Path
+import sys
+import time
+import unittest
+from unittest import mock
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("node_profiler_test", "metadata_collector")
+PROFILER = importlib.import_module("node_profiler_test.metadata_collector.node_profiler")
+
+
+def run_node(profiler, prompt_id, node_id, class_type, seconds=0.0, inner=None):
+    token = profiler.begin(prompt_id, node_id, class_type)
+    try:
+        if seconds:
+            time.sleep(seconds)
+        if inner:
+            inner()
+    finally:
+        profiler.end(token)
+
+
+class NodeProfilerTests(unittest.TestCase):
+    def test_disabled_profiler_is_a_no_op(self):
+        profiler = PROFILER.NodeProfiler()
+        for _ in range(3):
+            self.assertIsNone(profiler.begin("p", "1", "KSampler"))
+            profiler.end(None)
+        self.assertEqual(profiler.list_prompts(), [])
+        self.assertIsNone(profiler.get_prompt_profile())
+
+    def test_prompt_breakdown_keeps_order_depth_and_share(self):
+        profiler = PROFILER.NodeProfiler()
+        profiler.configure(enabled=True, track_memory=True)
+        run_node(profiler, "p1", "4", "CheckpointLoader", 0.01)
+        run_node(profiler, "p1", "7", "KSampler", 0.03,
+                 inner=lambda: run_node(profiler, "p1", "7.1", "VAEDecode", 0.01))
+
+        profile = profiler.get_prompt_profile()
+        self.assertEqual(profile["prompt_id"], "p1")
+        nodes = profile["nodes"]
+        self.assertEqual([(n["node_id"], n["depth"]) for n in nodes], [("4", 0), ("7", 0), ("7.1", 1)])
+        self.assertGreaterEqual(nodes[1]["wall_ms"], 40)
+        self.assertLess(nodes[0]["start_ms"], nodes[1]["start_ms"])
+        self.assertAlmostEqual(sum(n["share"] for n in nodes if n["share"] is not None), 1.0, places=3)
+        self.assertIsNone(nodes[2]["share"])
+        if PROFILER.resource is not None:
+            self.assertGreaterEqual(nodes[0]["rss_new_peak_bytes"], 0)
+        self.assertGreaterEqual(profile["span_ms"], profile["node_ms"] - 1)
+
+    def test_class_aggregates_and_ring_buffer(self):
+        profiler = PROFILER.NodeProfiler(max_prompts=2)
+        profiler.configure(enabled=True)
+        for index in range(3):
+            prompt_id = f"p{index}"
+            run_node(profiler, prompt_id, "1", "Fast")
+            run_node(profiler, prompt_id, "2", "Slow", 0.005 * (index + 1))
+
+        self.assertEqual([p["prompt_id"] for p in profiler.list_prompts()], ["p2", "p1"])
+        self.assertIsNone(profiler.get_prompt_profile("p0"))
+        classes = profiler.get_class_aggregates()
+        self.assertEqual(list(classes), ["Slow", "Fast"])
+        slow = classes["Slow"]
+        self.assertEqual(slow["count"], 2)
+        self.assertLess(slow["p50_ms"], slow["p95_ms"])
+        self.assertEqual(slow["p95_ms"], slow["max_ms"])
+
+    def test_memory_tracking_never_resets_the_cuda_peak(self):
+        calls = []
+
+        class FakeCuda:
+            peak = 100
+
+            def max_memory_allocated(self):
+                return self.peak
+
+            def reset_peak_memory_stats(self):
+                calls.append("reset")
+
+        cuda = FakeCuda()
+
+        def outer_work():
+            cuda.peak = 300
+            run_node(profiler, "mem", "7.1", "VAEDecode", inner=lambda: setattr(cuda, "peak", 350))
+
+        profiler = PROFILER.NodeProfiler()
+        profiler.configure(enabled=True, track_memory=True)
+        with mock.patch.object(PROFILER, "_cuda", return_value=cuda):
+            run_node(profiler, "mem", "7", "KSampler", inner=outer_work)
+
+        nodes = profiler.get_prompt_profile("mem")["nodes"]
+        self.assertEqual([n["cuda_new_peak_bytes"] for n in nodes], [250, 50])
+        self.assertEqual(calls, [])
+
+    def test_concurrent_tasks_do_not_nest(self):
+        profiler = PROFILER.NodeProfiler()
+        profiler.configure(enabled=True)
+
+        async def node(node_id):
+            token = profiler.begin("async", node_id, "AsyncNode")
+            await asyncio.sleep(0.01)
+            profiler.end(token)
+
+        async def run():
+            await asyncio.gather(node("1"), node("2"))
+
+        asyncio.run(run())
+        nodes = profiler.get_prompt_profile("async")["nodes"]
+        self.assertEqual([n["depth"] for n in nodes], [0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+"""Behavior tests for the remote autocomplete cache and request coordinator."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("remote_cache_test", "shared", "shared.db", "shared.cache")
+DB = importlib.import_module("remote_cache_test.shared.db.db_manager")
+COORD = importlib.import_module("remote_cache_test.shared.cache.remote_autocomplete")
+
+DAY = 86400
+RESULTS = [{"name": f"rare_tag_{i}", "category": 0, "post_count": 50 - i} for i in range(5)]
+
+
+class RemoteAutocompleteCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = DB.TagDatabaseManager(str(Path(self.temp_dir.name) / "tags.db"))
+        asyncio.run(self.db.initialize_database())
+
+    def tearDown(self):
+        asyncio.run(self.db.close())
+        self.temp_dir.cleanup()
+
+    def put(self, source, query, limit, results, ttl=7 * DAY, negative_ttl=DAY):
+        asyncio.run(self.db.put_remote_autocomplete(source, query, limit, results, ttl, negative_ttl))
+
+    def get(self, source, query, limit):
+        return asyncio.run(self.db.get_remote_autocomplete(source, query, limit))
+
+    def test_answers_are_reused_per_source_and_limit(self):
+        self.put("danbooru", "Rare_T", 5, RESULTS)
+        self.assertEqual(self.get("danbooru", "rare_t", 5), RESULTS)
+        self.assertEqual(self.get("danbooru", "rare_t", 3), RESULTS[:3])
+        # Five results for a limit of five may be a truncated answer
+        self.assertIsNone(self.get("danbooru", "rare_t", 10))
+        self.assertIsNone(self.get("gelbooru", "rare_t", 5))
+
+        # Fewer results than requested is the complete answer for any limit
+        self.put("gelbooru", "rare_t", 20, RESULTS)
+        self.assertEqual(self.get("gelbooru", "rare_t", 50), RESULTS)
+
+    def test_empty_prefix_answers_longer_queries(self):
+        self.put("danbooru", "zzq", 20, [])
+        self.assertEqual(self.get("danbooru", "zzq", 20), [])
+        self.assertEqual(self.get("danbooru", "zzqx_y", 20), [])
+        self.assertIsNone(self.get("danbooru", "zz", 20))
+        self.assertIsNone(self.get("gelbooru_public", "zzqx", 20))
+
+    def test_entries_expire(self):
+        self.put("danbooru", "rare_t", 5, RESULTS)
+        self.put("danbooru", "zzq", 20, [])
+        now = DB.time.time()
+        with mock.patch.object(DB.time, "time", return_value=now + 2 * DAY):
+            self.assertIsNone(self.get("danbooru", "zzqx", 20))
+            self.assertEqual(self.get("danbooru", "rare_t", 5), RESULTS)
+            # Writing prunes what has expired
+            self.put("danbooru", "other", 5, RESULTS)
+
+        async def rows():
+            conn = await self.db.get_connection()
+            cursor = await conn.execute("SELECT query FROM remote_autocomplete ORDER BY query")
+            return [row[0] for row in await cursor.fetchall()]
+
+        self.assertEqual(asyncio.run(rows()), ["other", "rare_t"])
+
+        self.put("danbooru", "never", 5, [], negative_ttl=0)
+        self.assertIsNone(self.get("danbooru", "never", 5))
+
+    def test_complete_prefix_answer_is_narrowed_by_name(self):
+        self.put("gelbooru", "rare", 20, RESULTS + [{"name": "rarely", "category": 0, "post_count": 1}])
+        self.assertEqual(self.get("gelbooru", "rare_tag_3", 20), [RESULTS[3]])
+        self.assertEqual(self.get("gelbooru", "rare_t", 2), RESULTS[:2])
+        self.assertEqual(self.get("gelbooru", "rarez", 20), [])
+
+        # An alias hit (name outside the prefix) cannot be re-checked locally
+        self.put("danbooru", "hat", 20, [{"name": "headwear", "category": 0, "post_count": 9}])
+        self.assertIsNone(self.get("danbooru", "hats", 20))
+        # A truncated answer is never narrowed
+        self.put("danbooru", "rare", 5, RESULTS)
+        self.assertIsNone(self.get("danbooru", "rare_t", 5))
+
+    def test_writes_leave_an_open_sync_transaction_alone(self):
+        async def scenario():
+            conn = await self.db.get_connection()
+            await conn.execute("INSERT INTO sync_metadata (key, value, updated_at) VALUES ('half', 'done', 0)")
+            write = asyncio.ensure_future(
+                self.db.put_remote_autocomplete("danbooru", "rare_t", 5, RESULTS, 7 * DAY, DAY)
+            )
+            await asyncio.sleep(0.2)
+            await conn.rollback()
+            await write
+            return await self.db.get_metadata("half")
+
+        self.assertIsNone(asyncio.run(scenario()))
+        self.assertEqual(self.get("danbooru", "rare_t", 5), RESULTS)
+
+
+class RemoteAutocompleteCoordinatorTests(unittest.TestCase):
+    def run_async(self, coroutine):
+        return asyncio.run(asyncio.wait_for(coroutine, 5))
+
+    def remote(self, answers, calls, release):
+        def fetcher(query):
+            async def fetch():
+                calls.append(query)
+                await release.wait()
+                return answers[query]
+            return fetch
+        return fetcher
+
+    def test_newer_query_supersedes_older_in_same_session(self):
+        async def scenario():
+            coordinator = COORD.RemoteAutocompleteCoordinator()
+            calls, release = [], asyncio.Event()
+            fetcher = self.remote({"ab": RESULTS, "abz": []}, calls, release)
+            old = asyncio.ensure_future(coordinator.lookup("danbooru", "ab", 5, fetcher("ab"), "field-1"))
+            other = asyncio.ensure_future(coordinator.lookup("danbooru", "ab", 5, fetcher("ab"), "field-2"))
+            await asyncio.sleep(0)
+            new = asyncio.ensure_future(coordinator.lookup("danbooru", "abz", 5, fetcher("abz"), "field-1"))
+            with self.assertRaises(COORD.AutocompleteSuperseded):
+                await old
+            release.set()
+            return await other, await new, calls, coordinator.get_status()
+
+        other, new, calls, status = self.run_async(scenario())
+        self.assertEqual((other, new), (RESULTS, []))
+        # The second field joined the first field's call instead of sending its own
+        self.assertEqual(calls, ["ab", "abz"])
+        self.assertEqual((status["superseded"], status["joined"]), (1, 1))
+        self.assertEqual((status["sessions"], status["inflight"]), (0, 0))
+
+    def test_longer_query_races_inflight_prefix(self):
+        async def scenario(parent_answer, limit, first):
+            coordinator = COORD.RemoteAutocompleteCoordinator()
+            calls = []
+            releases = {"rare": asyncio.Event(), "rare_tag_1": asyncio.Event()}
+            answers = {"rare": parent_answer, "rare_tag_1": ["remote"]}
+
+            def fetcher(query):
+                async def fetch():
+                    calls.append(query)
+                    await releases[query].wait()
+                    return answers[query]
+                return fetch
+
+            parent = asyncio.ensure_future(coordinator.lookup("gelbooru", "rare", limit, fetcher("rare")))
+            while not calls:
+                await asyncio.sleep(0)
+            child = asyncio.ensure_future(coordinator.lookup("gelbooru", "RARE_TAG_1", 20, fetcher("rare_tag_1")))
+            # Both remote calls go out without waiting for each other
+            while len(calls) < 2:
+                await asyncio.sleep(0)
+            releases[first].set()
+            done, _ = await asyncio.wait({child}, timeout=0.5)
+            for event in releases.values():
+                event.set()
+            await parent
+            result = await child
+            # Let the own call of a narrowed query finish and leave the table
+            await asyncio.sleep(0.01)
+            return result, bool(done), coordinator.get_status()
+
+        # A complete parent answer that arrives first is narrowed
+        result, answered_early, status = self.run_async(scenario(RESULTS, 20, "rare"))
+        self.assertEqual((result, answered_early, status["prefix_reused"]), ([RESULTS[1]], True, 1))
+        self.assertEqual(status["inflight"], 0)
+        # Five of five may be truncated, so the longer query waits for its own call
+        result, answered_early, _ = self.run_async(scenario(RESULTS, 5, "rare"))
+        self.assertEqual((result, answered_early), (["remote"], False))
+        # A slow parent does not hold up the longer query
+        result, answered_early, status = self.run_async(scenario(RESULTS, 20, "rare_tag_1"))
+        self.assertEqual((result, answered_early, status["prefix_reused"]), (["remote"], True, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Behavior tests for precompressed, ETag-validated JSON responses."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import importlib.util
+import json
+from pathlib import Path
+import unittest
+
+from aiohttp.test_utils import make_mocked_request
+
+
+ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = ROOT / "py" / "utils" / "response_cache.py"
+SPEC = importlib.util.spec_from_file_location("response_cache_test_module", MODULE_PATH)
+MODULE = importlib.util.module_from_spec(SPEC)
+assert SPEC.loader is not None
+SPEC.loader.exec_module(MODULE)
+
+
+class JsonResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = MODULE.JsonResponseCache("test")
+        self.payload = {"long_hair": "长发", "tags": [f"tag_{i}" for i in range(200)]}
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.payload
+
+    def respond(self, version, headers=None):
+        request = make_mocked_request("GET", "/data", headers=headers or {})
+        return asyncio.run(self.cache.respond(request, version, self.load))
+
+    def test_body_is_encoded_once_per_version(self):
+        first = self.respond(1)
+        second = self.respond(1)
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(json.loads(first.body), self.payload)
+        self.assertEqual(first.body, second.body)
+        self.assertEqual(first.headers["ETag"], second.headers["ETag"])
+
+        self.payload = {"changed": True}
+        third = self.respond(2)
+        self.assertEqual(self.loads, 2)
+        self.assertNotEqual(third.headers["ETag"], first.headers["ETag"])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.respond(1).headers["ETag"]
+        for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            with self.subTest(header=header):
+                response = self.respond(1, {"If-None-Match": header})
+                self.assertEqual(response.status, 304)
+                self.assertIsNone(response.body)
+                self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.respond(1, {"If-None-Match": '"stale"'}).status, 200)
+
+    def test_gzip_variant_is_served_when_accepted(self):
+        response = self.respond(1, {"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.body)), self.payload)
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+
+        refused = self.respond(1, {"Accept-Encoding": "gzip;q=0"})
+        self.assertNotIn("Content-Encoding", refused.headers)
+        self.assertEqual(json.loads(refused.body), self.payload)
+
+    def test_precompressed_body_is_not_compressed_again(self):
+        response = self.respond(1, {"Accept-Encoding": "gzip"})
+        response.enable_compression()
+        self.assertFalse(response.compression)
+        plain = self.respond(1)
+        plain.enable_compression()
+        self.assertTrue(plain.compression)
+
+    def test_invalidate_forces_reload(self):
+        self.respond(1)
+        self.cache.invalidate()
+        self.respond(1)
+        self.assertEqual(self.loads, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+"""Behavior tests for the Save Image Plus background writer."""
+
+from __future__ import annotations
+
+import importlib
+import io
+from pathlib import Path
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("save_writer_test", "save_image_plus")
+WRITER = importlib.import_module("save_writer_test.save_image_plus.image_writer")
+CLEAN = importlib.import_module("save_writer_test.save_image_plus.clean_copy")
+
+
+def pixels(seed=0, size=64):
+    return np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+
+class ImageWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_jobs_write_images_with_metadata_and_clean_copies(self):
+        writer = WRITER.AsyncImageWriter(workers=2, max_pending=4)
+        jobs = [
+            WRITER.ImageSaveJob(pixels(1), str(self.base / "a.png"), "PNG",
+                                text_chunks=[("parameters", "1girl\nSteps: 20"), ("prompt", "{}")],
+                                clean_path=str(self.base / "a_clean.png")),
+            WRITER.ImageSaveJob(pixels(2), str(self.base / "b.webp"), "WEBP", quality=90,
+                                exif_comment="1girl\nSteps: 20"),
+        ]
+        for job in jobs:
+            writer.submit(job)
+        writer.shutdown()
+
+        with Image.open(self.base / "a.png") as png:
+            self.assertEqual(png.text, {"parameters": "1girl\nSteps: 20", "prompt": "{}"})
+            self.assertTrue(np.array_equal(np.asarray(png), jobs[0].pixels))
+        with Image.open(self.base / "a_clean.png") as clean:
+            self.assertEqual(clean.text, {})
+        with Image.open(self.base / "b.webp") as webp:
+            self.assertEqual(webp.getexif()[0x9286], "1girl\nSteps: 20".encode("utf-16"))
+        self.assertEqual(sorted(p.name for p in self.base.iterdir()), ["a.png", "a_clean.png", "b.webp"])
+        self.assertEqual(writer.get_stats()["written"], 2)
+
+    def test_failures_are_reported_without_partial_files(self):
+        failures = []
+        writer = WRITER.AsyncImageWriter(on_error=lambda job, error: failures.append(Path(job.file_path).name))
+        future = writer.submit(WRITER.ImageSaveJob(pixels(), str(self.base / "missing" / "x.png"), "PNG"))
+        self.assertTrue(writer.flush(5))
+        self.assertIsNotNone(future.exception())
+        self.assertEqual(failures, ["x.png"])
+        self.assertEqual(writer.get_stats()["failed"], 1)
+        writer.shutdown()
+
+    def test_submit_blocks_while_the_queue_is_full(self):
+        release = threading.Event()
+        original = WRITER.write_image
+
+        def slow_write(job):
+            release.wait(5)
+            original(job)
+
+        WRITER.write_image = slow_write
+        try:
+            writer = WRITER.AsyncImageWriter(workers=1, max_pending=1)
+            writer.submit(WRITER.ImageSaveJob(pixels(1), str(self.base / "1.png"), "PNG"))
+            threading.Timer(0.1, release.set).start()
+            started = time.perf_counter()
+            writer.submit(WRITER.ImageSaveJob(pixels(2), str(self.base / "2.png"), "PNG"))
+            self.assertGreaterEqual(time.perf_counter() - started, 0.08)
+            writer.shutdown()
+        finally:
+            WRITER.write_image = original
+        self.assertTrue((self.base / "2.png").exists())
+        self.assertGreater(writer.get_stats()["blocked_ms"], 50)
+
+    def test_batches_encode_in_parallel_and_keep_file_order(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+        original = WRITER.write_image
+
+        def tracking_write(job):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            original(job)
+            with lock:
+                running[0] -= 1
+
+        jobs = [WRITER.ImageSaveJob(pixels(index), str(self.base / f"{index}.jpg"), "JPEG",
+                                    exif_comment="Steps: 20", clean_path=str(self.base / f"{index}_clean.jpg"))
+                for index in range(3)]
+        WRITER.write_image = tracking_write
+        try:
+            writer = WRITER.AsyncImageWriter(workers=4, max_pending=8)
+            futures = writer.submit_batch(jobs)
+            writer.shutdown()
+        finally:
+            WRITER.write_image = original
+
+        self.assertEqual(len(futures), 3)
+        self.assertGreater(peak[0], 1)
+        self.assertEqual(sorted(p.name for p in self.base.iterdir()),
+                         sorted(f"{index}{suffix}.jpg" for index in range(3) for suffix in ("", "_clean")))
+
+    def test_counters_skip_images_still_queued(self):
+        folder = str(self.base)
+        self.assertEqual(WRITER.reserve_counters(folder, "ComfyUI", 1, 8), 1)
+        # The disk scan still says 1 while the first batch is queued
+        self.assertEqual(WRITER.reserve_counters(folder, "ComfyUI", 1, 8), 9)
+        self.assertEqual(WRITER.reserve_counters(folder, "other", 1, 1), 1)
+        # Files written by something else move the counter past the reservation
+        self.assertEqual(WRITER.reserve_counters(folder, "ComfyUI", 40, 1), 40)
+
+
+class CleanCopyTests(unittest.TestCase):
+    def encode(self, file_format, **params):
+        buffer = io.BytesIO()
+        Image.fromarray(pixels(3)).save(buffer, format=file_format, **params)
+        return buffer.getvalue()
+
+    def test_stripped_files_match_a_metadata_free_encode(self):
+        exif = Image.new("RGB", (1, 1)).getexif()
+        exif[0x9286] = "1girl\nSteps: 20".encode("utf-16")
+        png_info = PngInfo()
+        png_info.add_text("parameters", "1girl\nSteps: 20")
+        png_info.add_itxt("workflow", "{\"nodes\": []}")
+        cases = [
+            ("PNG", {"pnginfo": png_info, "compress_level": 4}, {"compress_level": 4}),
+            ("JPEG", {"quality": 90, "exif": exif}, {"quality": 90}),
+            ("WEBP", {"quality": 90, "method": 6, "exif": exif}, {"quality": 90, "method": 6}),
+        ]
+        for file_format, with_metadata, without in cases:
+            with self.subTest(file_format):
+                stripped = CLEAN.strip_metadata(self.encode(file_format, **with_metadata), file_format)
+                self.assertEqual(stripped, self.encode(file_format, **without))
+                with Image.open(io.BytesIO(stripped)) as image:
+                    self.assertNotIn("exif", image.info)
+                    self.assertNotIn("parameters", image.info)
+
+    def test_unparseable_files_fall_back_to_reencoding(self):
+        with self.assertRaises(ValueError):
+            CLEAN.strip_metadata(b"\x89PNG\r\n\x1a\n\x00\x00", "PNG")
+        with self.assertRaises(ValueError):
+            CLEAN.strip_metadata(b"GIF89a", "JPEG")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""Behavior tests for alias-aware local tag autocomplete."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("tag_aliases_test", "shared", "shared.db", "shared.cache")
+DB = importlib.import_module("tag_aliases_test.shared.db.db_manager")
+SNAPSHOT = importlib.import_module("tag_aliases_test.shared.db.tag_snapshot")
+CACHE = importlib.import_module("tag_aliases_test.shared.cache.memory_cache")
+
+TAGS = [
+    {"tag": "long_hair", "category": 0, "post_count": 3000, "translation_cn": "长发"},
+    {"tag": "hatsune_miku", "category": 4, "post_count": 900, "translation_cn": "初音未来"},
+    {"tag": "miko", "category": 0, "post_count": 400, "translation_cn": "巫女"},
+]
+ALIASES = [
+    ("miku_hatsune", "hatsune_miku"),
+    ("miku", "hatsune_miku"),
+    ("longhair", "long_hair"),
+    ("orphan_alias", "not_a_hot_tag"),
+]
+
+
+class TagAliasDatabaseTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name)
+        self.db = DB.TagDatabaseManager(str(self.base / "tags.db"))
+
+        async def build():
+            await self.db.initialize_database()
+            await self.db.insert_tags_batch(TAGS)
+            return await self.db.replace_tag_aliases(ALIASES)
+
+        self.stored = asyncio.run(build())
+
+    def tearDown(self):
+        asyncio.run(self.db.close())
+        self.temp_dir.cleanup()
+
+    def search(self, db, prefix, limit=10):
+        return [(r["tag"], r.get("matched_alias")) for r in asyncio.run(db.search_tags_by_prefix(prefix, limit))]
+
+    def test_alias_prefix_returns_canonical_tag(self):
+        self.assertEqual(self.stored, 3)
+        # Direct and alias hits merge by post_count; the alias hit names its alias
+        self.assertEqual(self.search(self.db, "mi"), [("hatsune_miku", "miku"), ("miko", None)])
+        self.assertEqual(self.search(self.db, "miku_"), [("hatsune_miku", "miku_hatsune")])
+        # A tag matched by name is not repeated for its alias
+        self.assertEqual(self.search(self.db, "long"), [("long_hair", None)])
+        self.assertEqual(self.search(self.db, "orphan"), [])
+
+        scored = asyncio.run(self.db.search_tags_optimized("miku", 5, "english"))
+        self.assertEqual([(r["tag"], r["match_score"]) for r in scored], [("hatsune_miku", 9)])
+
+    def test_aliases_column_survives_tag_updates(self):
+        async def update_and_read():
+            await self.db.insert_tags_batch([dict(TAGS[1], post_count=950)])
+            return await self.db.get_tag("hatsune_miku")
+
+        tag = asyncio.run(update_and_read())
+        self.assertEqual(tag["post_count"], 950)
+        self.assertEqual(tag["aliases"], ["miku", "miku_hatsune"])
+
+        asyncio.run(self.db.replace_tag_aliases([("longhair", "long_hair")]))
+        self.assertEqual(asyncio.run(self.db.get_tag("hatsune_miku"))["aliases"], [])
+        self.assertEqual(self.search(self.db, "miku"), [])
+
+    def test_snapshot_import_rebuilds_alias_table(self):
+        snapshot = self.base / "tags.jsonl.gz"
+        SNAPSHOT.export_tag_snapshot(self.db.db_path, snapshot)
+        target = DB.TagDatabaseManager(str(self.base / "target.db"))
+        try:
+            SNAPSHOT.import_tag_snapshot(target.db_path, snapshot)
+            self.assertEqual(self.search(target, "longh"), [("long_hair", "longhair")])
+        finally:
+            asyncio.run(target.close())
+
+    def test_memory_cache_indexes_aliases(self):
+        tags = asyncio.run(self.db.get_all_tags())
+        cache = CACHE.HotTagsCache(use_database_query=False)
+        cache.load_tags(tags)
+
+        hits = cache.search_by_prefix("mi", 10)
+        self.assertEqual([(r["tag"], r.get("matched_alias")) for r in hits], [("hatsune_miku", "miku"), ("miko", None)])
+        self.assertEqual([r["tag"] for r in cache.search_by_prefix("l", 10)], ["long_hair"])
+
+    def test_dense_memory_prefix_keeps_hotter_alias_hits(self):
+        # Every tag matches "m", so the memory cache takes its dense walk
+        extra = [{"tag": f"m_tag_{i}", "category": 0, "post_count": 100 - i, "translation_cn": None} for i in range(20)]
+        asyncio.run(self.db.insert_tags_batch(extra))
+        asyncio.run(self.db.replace_tag_aliases(ALIASES + [("melon_hair", "long_hair")]))
+        cache = CACHE.HotTagsCache(use_database_query=False)
+        cache.load_tags(asyncio.run(self.db.get_all_tags()))
+
+        memory = [(r["tag"], r.get("matched_alias")) for r in cache.search_by_prefix("m", 3)]
+        self.assertEqual(memory, [("long_hair", "melon_hair"), ("hatsune_miku", "miku"), ("miko", None)])
+        self.assertEqual(memory, self.search(self.db, "m", 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""Behavior tests for rate-limited, concurrent Danbooru tag fetching."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+import importlib
+from pathlib import Path
+import sys
+import time
+import unittest
+
+from aiohttp import web
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("tag_fetcher_test", "shared", "shared.fetcher")
+FETCHER = importlib.import_module("tag_fetcher_test.shared.fetcher.tag_fetcher")
+
+
+def _page_tags(page, count=1000):
+    return [
+        {"tag": f"tag_{page}_{i}", "category": 0, "post_count": 1000000 - page * 1000 - i, "translation_cn": None}
+        for i in range(count)
+    ]
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_steady_rate(self):
+        bucket = FETCHER.AsyncTokenBucket(rate=50, capacity=3)
+
+        async def run():
+            started = time.monotonic()
+            stamps = []
+            for _ in range(8):
+                await bucket.acquire()
+                stamps.append(time.monotonic() - started)
+            return stamps
+
+        stamps = asyncio.run(run())
+        self.assertLess(stamps[2], 0.01)
+        # After the burst of 3, five more requests need 5 intervals of 20ms
+        self.assertGreaterEqual(stamps[-1], 0.095)
+        self.assertLess(stamps[-1], 0.2)
+
+    def test_pause_holds_all_callers(self):
+        bucket = FETCHER.AsyncTokenBucket(rate=1000, capacity=5)
+
+        async def run():
+            bucket.pause(0.1)
+            started = time.monotonic()
+            await asyncio.gather(bucket.acquire(), bucket.acquire())
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.095)
+
+    def test_retry_after_parsing(self):
+        self.assertEqual(FETCHER._parse_retry_after("3"), 3.0)
+        self.assertIsNone(FETCHER._parse_retry_after("soon"))
+        self.assertEqual(FETCHER._parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+
+class ConcurrentPagesTests(unittest.TestCase):
+    def test_pages_are_yielded_in_order_with_requests_overlapped(self):
+        fetcher = FETCHER.DanbooruTagFetcher(rate_limit=0, max_concurrent_pages=4)
+        active = []
+        peak = []
+
+        async def fake_fetch(page, limit=1000, min_post_count=None):
+            active.append(page)
+            peak.append(len(active))
+            # Later pages finish first
+            await asyncio.sleep(0.05 - page * 0.005)
+            active.remove(page)
+            return _page_tags(page)
+
+        fetcher.fetch_tags_page = fake_fetch
+
+        async def run():
+            return [(page, len(tags)) async for page, tags in fetcher.iter_hot_tag_pages(5500, 0)]
+
+        self.assertEqual(asyncio.run(run()), [(1, 1000), (2, 1000), (3, 1000), (4, 1000), (5, 1000), (6, 500)])
+        self.assertEqual(max(peak), 4)
+
+    def test_failed_page_stops_after_earlier_pages(self):
+        fetcher = FETCHER.DanbooruTagFetcher(rate_limit=0, max_concurrent_pages=3)
+        requested = []
+
+        async def fake_fetch(page, limit=1000, min_post_count=None):
+            requested.append(page)
+            return None if page == 2 else _page_tags(page)
+
+        fetcher.fetch_tags_page = fake_fetch
+
+        async def run():
+            seen = []
+            with self.assertRaises(RuntimeError):
+                async for page, _tags in fetcher.iter_hot_tag_pages(10000, 0):
+                    seen.append(page)
+            return seen
+
+        self.assertEqual(asyncio.run(run()), [1])
+
+    def test_tag_changes_walk_id_cursor_until_seen(self):
+        fetcher = FETCHER.DanbooruTagFetcher(rate_limit=0)
+        since = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        requests = []
+        rows = [
+            {"id": 100 - i, "name": f"Tag_{i}", "category": 0, "post_count": i,
+             "updated_at": f"2025-01-0{3 if i < 3 else 2}T00:00:00.000-05:00"}
+            for i in range(5)
+        ] + [{"id": 90, "name": "old", "category": 0, "post_count": 1, "updated_at": "2024-12-31T00:00:00Z"}]
+
+        async def fake_fetch(url, params):
+            requests.append(dict(params))
+            cursor = int(params.get("page", "b1000")[1:])
+            return [row for row in rows if row["id"] < cursor][:2]
+
+        fetcher._fetch_with_retry = fake_fetch
+
+        async def run():
+            return [[t["tag"] for t in page] async for page in fetcher.iter_tag_changes(since, page_size=2)]
+
+        self.assertEqual(asyncio.run(run()), [["tag_0", "tag_1"], ["tag_2", "tag_3"], ["tag_4"]])
+        self.assertEqual([r.get("page") for r in requests], [None, "b99", "b97"])
+        self.assertEqual(requests[0]["search[updated_at]"], ">2025-01-01T00:00:00+00:00")
+
+    def test_retry_after_is_honoured(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                return web.json_response([], status=429, headers={"Retry-After": "0.2"})
+            return web.json_response([{"name": "Long_Hair", "category": 0, "post_count": 5}])
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/tags.json", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            fetcher = FETCHER.DanbooruTagFetcher(rate_limit=100)
+            fetcher.API_BASE = f"http://127.0.0.1:{port}"
+            try:
+                return await fetcher.fetch_tags_page(1, limit=1)
+            finally:
+                await fetcher.close()
+                await runner.cleanup()
+
+        tags = asyncio.run(run())
+        self.assertEqual(tags[0]["tag"], "long_hair")
+        self.assertGreaterEqual(calls[1] - calls[0], 0.19)
+
+
+if __name__ == "__main__":
+    unittest.main()
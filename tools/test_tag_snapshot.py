@@ -0,0 +1,161 @@
+"""Behavior tests for offline tag database snapshots."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import importlib
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages("tag_snapshot_test", "shared", "shared.db")
+DB = importlib.import_module("tag_snapshot_test.shared.db.db_manager")
+SNAPSHOT = importlib.import_module("tag_snapshot_test.shared.db.tag_snapshot")
+
+TAGS = [
+    {"tag": "1girl", "category": 0, "post_count": 5000, "translation_cn": "1个女孩", "aliases": ["one_girl"]},
+    {"tag": "long_hair", "category": 0, "post_count": 3000, "translation_cn": "长发"},
+    {"tag": "hatsune_miku", "category": 4, "post_count": 900, "translation_cn": "初音未来"},
+    {"tag": "untranslated", "category": 5, "post_count": 120},
+]
+
+
+class TagSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name)
+        self.source = self.base / "source.db"
+        self.snapshot = self.base / "tags.jsonl.gz"
+
+        async def build():
+            db = DB.TagDatabaseManager(str(self.source))
+            await db.initialize_database()
+            await db.insert_tags_batch(TAGS)
+            await db.set_last_sync_time(1700000000)
+            await db.set_metadata("delta_watermark", "2025-01-01T00:00:00+00:00")
+            await db.close()
+
+        asyncio.run(build())
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _dump(self, db_path):
+        async def dump():
+            db = DB.TagDatabaseManager(str(db_path))
+            try:
+                return (
+                    await db.get_all_tags(),
+                    await db.get_last_sync_time(),
+                    await db.get_metadata("delta_watermark"),
+                    [r["tag"] for r in await db.search_tags_optimized("长发")],
+                    (await db.check_database_health())[0],
+                )
+            finally:
+                await db.close()
+
+        return asyncio.run(dump())
+
+    def test_round_trip_restores_tags_metadata_and_fts(self):
+        exported = SNAPSHOT.export_tag_snapshot(self.source, self.snapshot)
+        self.assertEqual(exported["tag_count"], len(TAGS))
+
+        target = self.base / "target.db"
+        imported = SNAPSHOT.import_tag_snapshot(target, self.snapshot)
+        self.assertEqual(imported["tag_count"], len(TAGS))
+
+        tags, last_sync, watermark, fts_hits, healthy = self._dump(target)
+        self.assertEqual(tags, self._dump(self.source)[0])
+        self.assertEqual(last_sync, 1700000000)
+        self.assertEqual(watermark, "2025-01-01T00:00:00+00:00")
+        self.assertEqual(fts_hits, ["long_hair"])
+        self.assertTrue(healthy)
+
+        # Triggers are back: later row writes reach the FTS index again
+        async def add_and_search():
+            db = DB.TagDatabaseManager(str(target))
+            try:
+                await db.insert_tags_batch([{"tag": "short_hair", "category": 0, "post_count": 10, "translation_cn": "短发"}])
+                return [r["tag"] for r in await db.search_tags_optimized("短发")]
+            finally:
+                await db.close()
+
+        self.assertEqual(asyncio.run(add_and_search()), ["short_hair"])
+
+    def test_import_drops_relations_and_remote_answers_of_the_old_tags(self):
+        SNAPSHOT.export_tag_snapshot(self.source, self.snapshot)
+        target = self.base / "target.db"
+
+        async def fill_old_database():
+            db = DB.TagDatabaseManager(str(target))
+            try:
+                await db.initialize_database()
+                await db.insert_tags_batch([{"tag": "old_tag", "category": 0, "post_count": 50}])
+                await db.replace_tag_aliases([("stale_alias", "old_tag")])
+                await db.replace_tag_implications([("old_tag", "long_hair")])
+                await db.put_remote_autocomplete("danbooru", "old", 5, [{"name": "old_tag"}], 3600, 3600)
+            finally:
+                await db.close()
+
+        async def leftovers():
+            db = DB.TagDatabaseManager(str(target))
+            try:
+                return (
+                    await db.get_tag_implications("old_tag"),
+                    await db.get_remote_autocomplete("danbooru", "old", 5),
+                    [r["tag"] for r in await db.search_tags_by_prefix("stale", 5)],
+                    [r["tag"] for r in await db.search_tags_by_prefix("one_", 5)],
+                )
+            finally:
+                await db.close()
+
+        asyncio.run(fill_old_database())
+        SNAPSHOT.import_tag_snapshot(target, self.snapshot)
+        self.assertEqual(asyncio.run(leftovers()), ([], None, [], ["1girl"]))
+
+    def test_damaged_snapshot_leaves_database_untouched(self):
+        SNAPSHOT.export_tag_snapshot(self.source, self.snapshot)
+        lines = gzip.decompress(self.snapshot.read_bytes()).splitlines(keepends=True)
+        self.assertTrue(lines[1].startswith(b"[["))
+        lines[1] = lines[1].replace(b"3000", b"3001", 1)
+        self.snapshot.write_bytes(gzip.compress(b"".join(lines)))
+
+        target = self.base / "target.db"
+        SNAPSHOT.import_tag_snapshot(target, self._fresh_snapshot())
+        before = self._dump(target)
+        with self.assertRaisesRegex(SNAPSHOT.TagSnapshotError, "checksum"):
+            SNAPSHOT.import_tag_snapshot(target, self.snapshot)
+        self.assertEqual(self._dump(target), before)
+
+        self.snapshot.write_bytes(self.snapshot.read_bytes()[:-20])
+        with self.assertRaises(SNAPSHOT.TagSnapshotError):
+            SNAPSHOT.read_tag_snapshot_info(self.snapshot)
+
+    def test_export_refuses_unfinished_sync(self):
+        async def mark_in_progress():
+            db = DB.TagDatabaseManager(str(self.source))
+            await db.set_sync_progress({"page": 3})
+            await db.close()
+
+        asyncio.run(mark_in_progress())
+        with self.assertRaisesRegex(SNAPSHOT.TagSnapshotError, "in progress"):
+            SNAPSHOT.export_tag_snapshot(self.source, self.snapshot)
+        self.assertFalse(self.snapshot.exists())
+
+    def _fresh_snapshot(self):
+        path = self.base / "fresh.jsonl.gz"
+        SNAPSHOT.export_tag_snapshot(self.source, path)
+        return path
+
+
+if __name__ == "__main__":
+    unittest.main()
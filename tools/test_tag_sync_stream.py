@@ -0,0 +1,220 @@
+"""Behavior tests for streaming, resumable hot tag sync."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import json
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+stub_packages(
+    "tag_sync_test",
+    "shared", "shared.db", "shared.fetcher", "shared.translation", "shared.cache", "shared.sync",
+)
+SYNC = importlib.import_module("tag_sync_test.shared.sync.tag_sync_manager")
+DB = importlib.import_module("tag_sync_test.shared.db.db_manager")
+
+
+class _Translations:
+    def load_all(self):
+        pass
+
+    def add_translations_to_tags(self, tags):
+        for tag in tags:
+            tag["translation_cn"] = "译" + tag["tag"]
+        return tags
+
+
+class _SyncManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        base = Path(self.temp_dir.name)
+        config_path = base / "config.json"
+        config_path.write_text(json.dumps({"tag_sync": {"max_tags": 2500, "min_post_count": 10}}))
+        self.manager = SYNC.TagSyncManager(str(config_path))
+        self.manager.db_manager = DB.TagDatabaseManager(str(base / "tags.db"))
+        self.manager.translation_loader = _Translations()
+        self.fetched_pages = []
+        self.fail_on_page = None
+        self.check_committed = True
+        self.manager.fetcher.fetch_tags_page = self.fake_fetch_tags_page
+        # Pages of (antecedent, consequent) per kind; None makes the download fail
+        self.relations = {"aliases": [], "implications": []}
+        self.manager.fetcher.iter_tag_relations = self.fake_tag_relations
+        # One page in flight, so each request can check what is already committed
+        self.manager.fetcher.max_concurrent_pages = 1
+
+    def tearDown(self):
+        asyncio.run(self.manager.db_manager.close())
+        self.temp_dir.cleanup()
+
+    async def fake_fetch_tags_page(self, page, limit=1000, min_post_count=None):
+        # Every earlier page must already be committed before the next is requested
+        if self.check_committed:
+            self.assertEqual(await self.manager.db_manager.get_tags_count(), (page - 1) * limit)
+        self.fetched_pages.append(page)
+        if page == self.fail_on_page:
+            return None
+        return [
+            {"tag": f"tag_{page}_{i}", "category": 0, "post_count": 100000 - page * limit - i, "translation_cn": None}
+            for i in range(limit)
+        ]
+
+    async def fake_tag_relations(self, kind="aliases", page_size=1000, max_pages=200):
+        if self.relations[kind] is None:
+            raise RuntimeError(f"Failed to fetch tag {kind}")
+        for page in self.relations[kind]:
+            yield page
+
+    def run_sync(self):
+        async def run():
+            await self.manager.db_manager.initialize_database()
+            return await self.manager.sync_hot_tags()
+
+        return asyncio.run(run())
+
+
+class TagSyncStreamTests(_SyncManagerTestCase):
+    def test_pages_are_saved_as_they_arrive(self):
+        self.assertEqual(self.run_sync(), 2500)
+        self.assertEqual(self.fetched_pages, [1, 2, 3])
+
+        async def check():
+            db = self.manager.db_manager
+            tag = await db.get_tag("tag_3_499")
+            return await db.get_tags_count(), tag, await db.get_sync_progress(), await db.get_last_sync_time()
+
+        count, tag, progress, last_sync = asyncio.run(check())
+        self.assertEqual(count, 2500)
+        self.assertEqual(tag["translation_cn"], "译tag_3_499")
+        self.assertEqual(progress, {})
+        self.assertGreater(last_sync, 0)
+
+    def test_failed_sync_resumes_after_last_saved_page(self):
+        self.fail_on_page = 2
+        with self.assertRaises(RuntimeError):
+            self.run_sync()
+        progress = asyncio.run(self.manager.db_manager.get_sync_progress())
+        self.assertEqual(progress["page"], 1)
+        self.assertEqual(progress["saved_count"], 1000)
+        self.assertEqual(asyncio.run(self.manager.db_manager.get_last_sync_time()), 0)
+
+        self.fail_on_page = None
+        self.fetched_pages.clear()
+        self.assertEqual(self.run_sync(), 2500)
+        self.assertEqual(self.fetched_pages, [2, 3])
+
+    def test_offline_resume_still_loads_existing_tags(self):
+        self.fail_on_page = 2
+        with self.assertRaises(RuntimeError):
+            self.run_sync()
+        loaded = []
+
+        async def load_to_memory():
+            loaded.append(await self.manager.db_manager.get_tags_count())
+
+        self.manager._load_to_memory = load_to_memory
+        original_schedule = SYNC.schedule_full_integrity_check
+        SYNC.schedule_full_integrity_check = lambda db_path: False
+        try:
+            # Still offline: the resumed page fails again
+            self.check_committed = False
+            self.assertTrue(asyncio.run(self.manager.initialize()))
+        finally:
+            SYNC.schedule_full_integrity_check = original_schedule
+        self.assertEqual(loaded, [1000])
+
+    def test_changed_limits_restart_from_first_page(self):
+        self.fail_on_page = 2
+        with self.assertRaises(RuntimeError):
+            self.run_sync()
+        self.manager.config["tag_sync"]["min_post_count"] = 20
+        self.fail_on_page = None
+        self.check_committed = False
+        self.fetched_pages.clear()
+        self.run_sync()
+        self.assertEqual(self.fetched_pages[0], 1)
+
+
+class DeltaSyncTests(_SyncManagerTestCase):
+    def test_delta_sync_writes_only_changed_rows(self):
+        self.run_sync()
+        db = self.manager.db_manager
+        watermark = asyncio.run(db.get_metadata("delta_watermark"))
+        self.assertTrue(watermark)
+
+        newer = SYNC.datetime.fromisoformat(watermark) + SYNC.timedelta(hours=2)
+        seen_since = []
+
+        async def fake_changes(since, page_size=1000, max_pages=200):
+            seen_since.append(since)
+            yield [
+                # unchanged, changed count, new popular tag, new unpopular tag
+                {"tag": "tag_1_0", "category": 0, "post_count": 100000 - 1000, "updated_at": newer},
+                {"tag": "tag_1_1", "category": 0, "post_count": 5, "updated_at": newer},
+                {"tag": "fresh", "category": 4, "post_count": 50, "updated_at": newer},
+                {"tag": "rare", "category": 0, "post_count": 1, "updated_at": newer},
+            ]
+
+        self.manager.fetcher.iter_tag_changes = fake_changes
+        written = []
+        original_insert = db.insert_tags_batch
+
+        async def recording_insert(tags, sync_progress=None):
+            written.extend(t["tag"] for t in tags)
+            await original_insert(tags, sync_progress)
+
+        db.insert_tags_batch = recording_insert
+        asyncio.run(self.manager._incremental_update())
+
+        self.assertEqual(seen_since, [SYNC.datetime.fromisoformat(watermark)])
+        self.assertEqual(written, ["tag_1_1", "fresh"])
+        self.assertEqual(asyncio.run(db.get_tag("fresh"))["translation_cn"], "译fresh")
+        self.assertIsNone(asyncio.run(db.get_tag("rare")))
+        self.assertEqual(asyncio.run(db.get_metadata("delta_watermark")), newer.isoformat())
+
+
+class TagRelationSyncTests(_SyncManagerTestCase):
+    def test_aliases_are_stored_for_known_tags(self):
+        self.relations["aliases"] = [
+            [("t1_0", "tag_1_0"), ("t1_0_old", "tag_1_0")],
+            [("gone", "tag_not_synced")],
+        ]
+        self.run_sync()
+        db = self.manager.db_manager
+
+        async def check():
+            hits = await db.search_tags_by_prefix("t1_0", 5)
+            return hits, (await db.get_tag("tag_1_0"))["aliases"]
+
+        hits, aliases = asyncio.run(check())
+        self.assertEqual([(h["tag"], h.get("matched_alias")) for h in hits], [("tag_1_0", "t1_0")])
+        self.assertEqual(aliases, ["t1_0", "t1_0_old"])
+        self.assertEqual(asyncio.run(db.search_tags_by_prefix("gone", 5)), [])
+
+    def test_failed_relation_download_keeps_stored_rows(self):
+        self.relations["aliases"] = [[("t1_0", "tag_1_0")]]
+        self.run_sync()
+        self.relations["aliases"] = None
+        self.manager.config["tag_sync"]["sync_implications"] = True
+        self.relations["implications"] = [[("tag_1_1", "tag_1_0")]]
+
+        counts = asyncio.run(self.manager.sync_tag_relations())
+        self.assertEqual(counts, {"implications": 1})
+        db = self.manager.db_manager
+        self.assertEqual(len(asyncio.run(db.search_tags_by_prefix("t1_", 5))), 1)
+        self.assertEqual(asyncio.run(db.get_tag_implications("tag_1_1")), ["tag_1_0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
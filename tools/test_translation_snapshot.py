@@ -0,0 +1,64 @@
+"""Behavior tests for the versioned translation snapshot files."""
+
+from __future__ import annotations
+
+import importlib.util
+from pathlib import Path
+import tempfile
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = ROOT / "py" / "shared" / "translation" / "translation_snapshot.py"
+SPEC = importlib.util.spec_from_file_location("translation_snapshot_test_module", MODULE_PATH)
+MODULE = importlib.util.module_from_spec(SPEC)
+assert SPEC.loader is not None
+SPEC.loader.exec_module(MODULE)
+
+
+class TranslationSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        base = Path(self.temp_dir.name)
+        self.zh_cn_dir = base / "zh_cn"
+        self.zh_cn_dir.mkdir()
+        (self.zh_cn_dir / "all_tags_cn.json").write_text('{"long_hair": "长发"}', encoding="utf-8")
+        (self.zh_cn_dir / "danbooru.csv").write_text("short_hair,短发\n", encoding="utf-8")
+        self.snapshot_path = base / "data" / "translation.snapshot"
+        self.payload = {"en_to_cn": {"long_hair": "长发"}, "cn_search_index": {"长": ["长发"]}}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip_with_matching_fingerprint(self):
+        fingerprint = MODULE.source_fingerprint(self.zh_cn_dir)
+        self.assertTrue(MODULE.save_snapshot(self.snapshot_path, fingerprint, self.payload))
+        self.assertEqual(MODULE.load_snapshot(self.snapshot_path, fingerprint), self.payload)
+
+    def test_source_edit_invalidates_snapshot(self):
+        fingerprint = MODULE.source_fingerprint(self.zh_cn_dir)
+        MODULE.save_snapshot(self.snapshot_path, fingerprint, self.payload)
+        (self.zh_cn_dir / "danbooru.csv").write_text("short_hair,短头发\n", encoding="utf-8")
+        changed = MODULE.source_fingerprint(self.zh_cn_dir)
+        self.assertNotEqual(changed, fingerprint)
+        self.assertIsNone(MODULE.load_snapshot(self.snapshot_path, changed))
+
+    def test_consumers_are_keyed_separately(self):
+        self.assertNotEqual(
+            MODULE.source_fingerprint(self.zh_cn_dir, extra="a"),
+            MODULE.source_fingerprint(self.zh_cn_dir, extra="b"),
+        )
+
+    def test_missing_truncated_or_foreign_files_are_ignored(self):
+        fingerprint = MODULE.source_fingerprint(self.zh_cn_dir)
+        self.assertIsNone(MODULE.load_snapshot(self.snapshot_path, fingerprint))
+        MODULE.save_snapshot(self.snapshot_path, fingerprint, self.payload)
+        data = self.snapshot_path.read_bytes()
+        self.snapshot_path.write_bytes(data[:-5])
+        self.assertIsNone(MODULE.load_snapshot(self.snapshot_path, fingerprint))
+        self.snapshot_path.write_bytes(b"XXXX" + data[4:])
+        self.assertIsNone(MODULE.load_snapshot(self.snapshot_path, fingerprint))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""Behavior tests for the process-wide translation store."""
+
+from __future__ import annotations
+
+import csv
+import importlib.util
+import json
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools"))
+
+from _test_support import stub_packages  # noqa: E402
+
+
+def _load(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    assert spec.loader is not None
+    spec.loader.exec_module(module)
+    return module
+
+
+stub_packages("translation_store_test", "shared", "shared.translation")
+STORE = _load(
+    "translation_store_test.shared.translation.translation_store",
+    ROOT / "py" / "shared" / "translation" / "translation_store.py",
+)
+LOADER = _load(
+    "translation_store_test.shared.translation.translation_loader",
+    ROOT / "py" / "shared" / "translation" / "translation_loader.py",
+)
+
+
+def _baseline_en_to_cn(zh_cn_dir: Path) -> dict:
+    """TranslationLoader.en_to_cn as the loader built it before the shared store"""
+    en_to_cn = {}
+    for en_tag, cn_tag in json.loads((zh_cn_dir / "all_tags_cn.json").read_text(encoding="utf-8")).items():
+        en_to_cn[en_tag.lower().strip()] = cn_tag.strip()
+    for file_name, reverse in (("danbooru.csv", False), ("wai_characters.csv", True)):
+        with open(zh_cn_dir / file_name, encoding="utf-8-sig") as handle:
+            for row in csv.reader(handle):
+                if len(row) < 2:
+                    continue
+                cn_tag, en_tag = (row[0], row[1]) if reverse else (row[1], row[0])
+                en_tag, cn_tag = en_tag.lower().strip(), cn_tag.strip()
+                if en_tag and cn_tag:
+                    en_to_cn.setdefault(en_tag, cn_tag)
+    return en_to_cn
+
+
+class TranslationStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        base = Path(self.temp_dir.name)
+        self.zh_cn_dir = base / "zh_cn"
+        self.zh_cn_dir.mkdir()
+        (self.zh_cn_dir / "all_tags_cn.json").write_text(
+            '{"long_hair": "长发", "Ball_bra": "球胸罩"}', encoding="utf-8"
+        )
+        (self.zh_cn_dir / "danbooru.csv").write_text(
+            "long_hair,长头发\n1girl,1个女孩\n", encoding="utf-8"
+        )
+        (self.zh_cn_dir / "wai_characters.csv").write_text(
+            "\ufeff初音未来,hatsune_miku\n", encoding="utf-8"
+        )
+        self.snapshot_path = base / "store.snapshot"
+
+    def tearDown(self):
+        STORE._stores.pop(STORE._store_key(self.zh_cn_dir), None)
+        self.temp_dir.cleanup()
+
+    def test_sources_merge_with_json_priority_and_variants(self):
+        store = STORE.build_translation_store(self.zh_cn_dir)
+        self.assertEqual(store.en_to_cn["long_hair"], "长发")
+        self.assertEqual(store.en_to_cn["longhair"], "长发")
+        self.assertEqual(store.en_to_cn["1_girl"], "1个女孩")
+        self.assertEqual(store.cn_to_en["初音未来"], "hatsune_miku")
+        self.assertEqual(store.get_chinese("ball_bra"), "球胸罩")
+        self.assertEqual(dict(store.all_tags), {"long_hair": "长发", "Ball_bra": "球胸罩"})
+        self.assertEqual(store.search_index.search("长发", 5)[0], ("长发", 10))
+        with self.assertRaises(TypeError):
+            store.en_to_cn["new"] = "x"
+
+    def test_snapshot_reload_matches_source_build(self):
+        cold = STORE.build_translation_store(self.zh_cn_dir, self.snapshot_path)
+        warm = STORE.build_translation_store(self.zh_cn_dir, self.snapshot_path)
+        self.assertEqual(cold.load_stats["source"], "source")
+        self.assertEqual(warm.load_stats["source"], "snapshot")
+        self.assertEqual(dict(warm.en_to_cn), dict(cold.en_to_cn))
+        self.assertEqual(dict(warm.all_tags), dict(cold.all_tags))
+        self.assertEqual(warm.search_index.search("发", 10), cold.search_index.search("发", 10))
+
+    def test_consumers_share_one_store(self):
+        alias = self.zh_cn_dir / ".." / "zh_cn"
+        first = STORE.get_translation_store(self.zh_cn_dir)
+        self.assertIs(STORE.get_translation_store(alias), first)
+        loader = LOADER.TranslationLoader(str(alias))
+        self.assertEqual(loader.get_chinese("Hatsune Miku"), "初音未来")
+        self.assertIs(loader._store, first)
+        # The store keeps the source spelling; the loader returns lowercased tags as it always did
+        self.assertEqual(first.cn_to_en["球胸罩"], "Ball_bra")
+        self.assertEqual(loader.get_english("球胸罩"), "ball_bra")
+        self.assertEqual(loader.search_chinese("球胸"), [("ball_bra", "球胸罩")])
+        stats = loader.get_stats()
+        self.assertTrue(stats["loaded"])
+        self.assertGreater(stats["memory_bytes"], 0)
+
+    def test_loader_en_to_cn_matches_the_pre_store_loader(self):
+        (self.zh_cn_dir / "all_tags_cn.json").write_text(
+            '{"long_hair": "长发", "Ball_bra": "球胸罩", "BALL_BRA": "胸罩", "1girl": "一个女孩"}',
+            encoding="utf-8",
+        )
+        (self.zh_cn_dir / "danbooru.csv").write_text(
+            "Long_Hair,长头发\nShort_Hair,短发\nshort_hair,短头发\n1boy,1个男孩\n", encoding="utf-8"
+        )
+        loader = LOADER.TranslationLoader(str(self.zh_cn_dir))
+        self.assertEqual(dict(loader.en_to_cn), _baseline_en_to_cn(self.zh_cn_dir))
+        self.assertEqual(loader.en_to_cn["short_hair"], "短发")
+        # Underscore variants stay inside the store
+        self.assertNotIn("longhair", loader.en_to_cn)
+        self.assertIsNone(loader.get_chinese("longhair"))
+        self.assertEqual(loader.get_chinese("Short Hair"), "短发")
+        self.assertEqual(loader._store.get_chinese("longhair"), "长发")
+
+
+if __name__ == "__main__":
+    unittest.main()